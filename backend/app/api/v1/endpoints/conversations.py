@@ -2,15 +2,29 @@
 Endpoints para conversações IA do MILAPP
 """
 
+import json
 import uuid
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 import structlog
 
+from app.core.database import get_session
 from app.core.security import get_current_user
+from app.core.config import settings
 from app.services.ai_service import AIService
+from app.services.batch_service import BatchService
+from app.services.embedding_service import EmbeddingService, SOURCE_MESSAGE
+from app.services.storage_service import StorageService, UploadTooLargeError
+from app.services.job_service import JobService
+from app.services.conversation_memory import ConversationMemoryManager
+from app.services.conversation_service import ConversationService
+from app.services.event_stream import EventStream, format_sse
+from app.services.project_service import ProjectService
+from app.workers.file_processing import enqueue_upload_job
+from app.models.conversation import Conversation, Message
 from app.models.user import User
 
 logger = structlog.get_logger()
@@ -30,12 +44,32 @@ class MessageResponse(BaseModel):
     """Schema de resposta de mensagem"""
     id: str
     conversation_id: str
+    seq: Optional[int] = None
     type: str
     content: str
     ai_analysis: Optional[dict] = None
     created_at: str
 
 
+class MessageHistoryResponse(BaseModel):
+    """Página do histórico de mensagens"""
+    messages: List[MessageResponse]
+    next_after_seq: Optional[int] = None
+
+
+class BatchItem(BaseModel):
+    """Item de análise em lote"""
+    content: str
+    id: Optional[str] = None
+    context: Optional[dict] = None
+
+
+class BatchMessageCreate(BaseModel):
+    """Schema para envio de mensagens em lote"""
+    items: List[BatchItem]
+    context: Optional[dict] = None
+
+
 class ConversationCreate(BaseModel):
     """Schema para criação de conversa"""
     title: str
@@ -51,42 +85,81 @@ class ConversationResponse(BaseModel):
     ai_summary: Optional[str] = None
     extracted_requirements: List[dict]
     confidence_score: float
+    message_count: int = 0
     created_at: str
     updated_at: str
 
 
+def _conversation_response(conversation: Conversation) -> ConversationResponse:
+    return ConversationResponse(
+        id=str(conversation.id),
+        title=conversation.title,
+        project_id=str(conversation.project_id) if conversation.project_id else None,
+        status=conversation.status,
+        ai_summary=conversation.ai_summary,
+        extracted_requirements=conversation.extracted_requirements or [],
+        confidence_score=conversation.confidence_score or 0.0,
+        message_count=conversation.message_count or 0,
+        created_at=conversation.created_at.isoformat(),
+        updated_at=(conversation.updated_at or conversation.created_at).isoformat()
+    )
+
+
+def _message_response(message: Message) -> MessageResponse:
+    return MessageResponse(
+        id=str(message.id),
+        conversation_id=str(message.conversation_id),
+        seq=message.seq,
+        type=message.type,
+        content=message.content,
+        ai_analysis=message.ai_analysis,
+        created_at=message.created_at.isoformat()
+    )
+
+
+async def _get_conversation_or_404(
+    session: AsyncSession,
+    conversation_id: str,
+    current_user: User
+) -> Conversation:
+    conversation = await ConversationService.get(session, conversation_id, current_user.id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversa não encontrada")
+    return conversation
+
+
 # Endpoints
 @router.post("/", response_model=ConversationResponse)
 async def create_conversation(
     conversation: ConversationCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
     """Criar nova conversa com IA"""
+    # O projeto da conversa define os trechos recuperados nas respostas
+    if conversation.project_id:
+        try:
+            uuid.UUID(conversation.project_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Projeto inválido")
+        if not await ProjectService.get_project(session, conversation.project_id, current_user.id):
+            raise HTTPException(status_code=404, detail="Projeto não encontrado")
     try:
-        conversation_id = str(uuid.uuid4())
-        
-        # Criar conversa no banco
-        conversation_data = {
-            "id": conversation_id,
-            "title": conversation.title,
-            "project_id": conversation.project_id,
-            "user_id": current_user.id,
-            "status": "active"
-        }
-        
-        # Por enquanto, retornar dados mock
-        return ConversationResponse(
-            id=conversation_id,
+        created = await ConversationService.create(
+            session,
+            user_id=current_user.id,
             title=conversation.title,
-            project_id=conversation.project_id,
-            status="active",
-            ai_summary=None,
-            extracted_requirements=[],
-            confidence_score=0.0,
-            created_at="2025-01-01T00:00:00Z",
-            updated_at="2025-01-01T00:00:00Z"
+            project_id=conversation.project_id
         )
         
+        logger.info("Conversation created",
+                   conversation_id=str(created.id),
+                   user_id=current_user.id)
+        
+        return _conversation_response(created)
+        
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Projeto inválido")
     except Exception as e:
         logger.error("Failed to create conversation", error=str(e))
         raise HTTPException(status_code=500, detail="Erro ao criar conversa")
@@ -96,42 +169,21 @@ async def create_conversation(
 async def get_conversations(
     current_user: User = Depends(get_current_user),
     project_id: Optional[str] = None,
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    session: AsyncSession = Depends(get_session)
 ):
     """Listar conversas do usuário"""
     try:
-        # Mock de conversas
-        conversations = [
-            ConversationResponse(
-                id="conv-1",
-                title="Análise de Processo Financeiro",
-                project_id="proj-1",
-                status="active",
-                ai_summary="Conversa sobre automação de processos financeiros",
-                extracted_requirements=[
-                    {"type": "process", "name": "Conciliação bancária", "complexity": "medium"}
-                ],
-                confidence_score=0.85,
-                created_at="2025-01-01T00:00:00Z",
-                updated_at="2025-01-01T00:00:00Z"
-            ),
-            ConversationResponse(
-                id="conv-2",
-                title="Automação de RH",
-                project_id="proj-2",
-                status="completed",
-                ai_summary="Análise de processos de recursos humanos",
-                extracted_requirements=[
-                    {"type": "process", "name": "Onboarding", "complexity": "low"}
-                ],
-                confidence_score=0.92,
-                created_at="2025-01-01T00:00:00Z",
-                updated_at="2025-01-01T00:00:00Z"
-            )
-        ]
-        
-        return conversations
+        conversations = await ConversationService.list_for_user(
+            session,
+            current_user.id,
+            project_id=project_id,
+            status=status
+        )
+        return [_conversation_response(c) for c in conversations]
         
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Projeto inválido")
     except Exception as e:
         logger.error("Failed to get conversations", error=str(e))
         raise HTTPException(status_code=500, detail="Erro ao buscar conversas")
@@ -140,130 +192,234 @@ async def get_conversations(
 @router.get("/{conversation_id}", response_model=ConversationResponse)
 async def get_conversation(
     conversation_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
     """Obter conversa específica"""
+    conversation = await _get_conversation_or_404(session, conversation_id, current_user)
+    return _conversation_response(conversation)
+
+
+@router.get("/{conversation_id}/messages", response_model=MessageHistoryResponse)
+async def get_messages(
+    conversation_id: str,
+    after_seq: int = Query(0, ge=0, description="Retornar mensagens com seq maior que este"),
+    limit: int = Query(settings.CONVERSATION_HISTORY_PAGE_SIZE, ge=1,
+                       le=settings.CONVERSATION_HISTORY_MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Histórico da conversa em ordem, paginado por seq"""
+    conversation = await _get_conversation_or_404(session, conversation_id, current_user)
     try:
-        # Mock de conversa
-        return ConversationResponse(
-            id=conversation_id,
-            title="Análise de Processo Financeiro",
-            project_id="proj-1",
-            status="active",
-            ai_summary="Conversa sobre automação de processos financeiros",
-            extracted_requirements=[
-                {"type": "process", "name": "Conciliação bancária", "complexity": "medium"}
-            ],
-            confidence_score=0.85,
-            created_at="2025-01-01T00:00:00Z",
-            updated_at="2025-01-01T00:00:00Z"
-        )
-        
+        messages = await ConversationService.history(session, conversation, after_seq=after_seq, limit=limit)
     except Exception as e:
-        logger.error("Failed to get conversation", error=str(e))
-        raise HTTPException(status_code=500, detail="Erro ao buscar conversa")
+        logger.error("Failed to get messages", error=str(e))
+        raise HTTPException(status_code=500, detail="Erro ao buscar mensagens")
+    
+    return MessageHistoryResponse(
+        messages=[_message_response(m) for m in messages],
+        next_after_seq=messages[-1].seq if len(messages) == limit else None
+    )
 
 
 @router.post("/{conversation_id}/messages", response_model=MessageResponse)
 async def send_message(
     conversation_id: str,
     message: MessageCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
     """Enviar mensagem de texto para IA"""
+    conversation = await _get_conversation_or_404(session, conversation_id, current_user)
     try:
-        # Processar mensagem com IA
+        # Histórico da conversa dentro do orçamento de tokens (resumo + turnos recentes)
+        memory = await ConversationService.load_memory(session, conversation)
+        # Só o projeto gravado na conversa (validado na criação); o contexto do cliente não amplia o acesso
+        project_id = str(conversation.project_id) if conversation.project_id else None
+        
+        # Processar mensagem com IA (com trechos recuperados do projeto/conversa)
         ai_response = await AIService.process_text_message(
             message=message.content,
-            context=message.context
+            context=message.context,
+            history=memory.messages(),
+            project_id=project_id,
+            conversation_id=conversation_id
         )
         
-        # Criar resposta
-        response_message = MessageResponse(
-            id=str(uuid.uuid4()),
-            conversation_id=conversation_id,
-            type="assistant",
-            content=ai_response.get("raw_response", "Erro no processamento"),
-            ai_analysis=ai_response,
-            created_at="2025-01-01T00:00:00Z"
+        # Gravar pergunta e resposta no histórico persistente
+        user_message, assistant_message = await ConversationService.append_messages(
+            session,
+            conversation,
+            [
+                {"type": "user", "content": message.content},
+                {
+                    "type": "assistant",
+                    "content": ai_response.get("raw_response") or "Erro no processamento",
+                    "ai_analysis": ai_response
+                }
+            ]
         )
         
+        if "error" not in ai_response:
+            await ConversationMemoryManager.record_exchange(
+                conversation_id,
+                message.content,
+                ai_response.get("raw_response")
+            )
+            
+            # Indexar a troca para busca semântica sem atrasar a resposta
+            if EmbeddingService.is_available():
+                EmbeddingService.schedule(EmbeddingService.index_source(
+                    SOURCE_MESSAGE,
+                    str(assistant_message.id),
+                    f"{message.content}\n\n{ai_response.get('raw_response', '')}",
+                    project_id=project_id,
+                    conversation_id=conversation_id
+                ))
+        
         logger.info("Message processed successfully", 
                    conversation_id=conversation_id,
+                   seq=assistant_message.seq,
                    user_id=current_user.id)
         
-        return response_message
+        return _message_response(assistant_message)
         
     except Exception as e:
         logger.error("Failed to process message", error=str(e))
         raise HTTPException(status_code=500, detail="Erro ao processar mensagem")
 
 
-@router.post("/{conversation_id}/upload")
+@router.post("/{conversation_id}/messages/batch")
+async def send_messages_batch(
+    conversation_id: str,
+    batch: BatchMessageCreate,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Analisar vários itens de uma vez; resultados chegam em NDJSON conforme ficam prontos"""
+    await _get_conversation_or_404(session, conversation_id, current_user)
+    if not batch.items:
+        raise HTTPException(status_code=400, detail="Nenhum item enviado")
+    if len(batch.items) > settings.AI_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lote excede o limite de {settings.AI_BATCH_MAX_ITEMS} itens"
+        )
+    
+    items = [
+        {"id": item.id or str(index), "content": item.content, "context": item.context}
+        for index, item in enumerate(batch.items, start=1)
+    ]
+    if len({item["id"] for item in items}) != len(items):
+        raise HTTPException(status_code=400, detail="Identificadores de itens duplicados")
+    
+    logger.info("Batch analysis started",
+               conversation_id=conversation_id,
+               items=len(items),
+               user_id=current_user.id)
+    
+    async def result_lines():
+        async for result in BatchService.process(items, context=batch.context):
+            yield json.dumps(result, ensure_ascii=False, default=str) + "\n"
+    
+    return StreamingResponse(
+        result_lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/{conversation_id}/upload", status_code=202)
 async def upload_file(
     conversation_id: str,
     file: UploadFile = File(...),
     description: Optional[str] = Form(None),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
-    """Upload e processamento de arquivo multimodal"""
+    """Upload de arquivo multimodal; o processamento ocorre em background"""
+    conversation = await _get_conversation_or_404(session, conversation_id, current_user)
+    spooled = None
     try:
-        # Ler arquivo
-        file_content = await file.read()
-        
-        # Determinar tipo de arquivo e processar
-        file_type = file.content_type
-        filename = file.filename
+        # Gravar arquivo em disco em blocos (sem carregar tudo em memória)
+        spooled = await StorageService.spool_upload(file)
         
-        if file_type.startswith("image/"):
-            # Processar imagem
-            ai_response = await AIService.process_image(
-                image_data=file_content,
-                description=description
-            )
-            
-        elif file_type == "application/pdf":
-            # Processar PDF
-            pdf_text = file_content.decode('utf-8', errors='ignore')
-            ai_response = await AIService.process_pdf(
-                pdf_content=pdf_text,
-                filename=filename
-            )
-            
-        elif file_type.startswith("audio/"):
-            # Processar áudio
-            ai_response = await AIService.process_audio(
-                audio_data=file_content,
-                filename=filename
-            )
-            
-        else:
-            # Processar como texto
-            text_content = file_content.decode('utf-8', errors='ignore')
-            ai_response = await AIService.process_text_message(
-                message=text_content,
-                context={"filename": filename, "description": description}
-            )
+        # Armazenar blob endereçado por conteúdo (gravado uma única vez)
+        spooled = await StorageService.persist(spooled)
         
-        # Criar resposta
-        response = {
-            "status": "success",
-            "file_processed": filename,
-            "file_type": file_type,
-            "ai_analysis": ai_response,
-            "confidence_score": ai_response.get("confidence_score", 0.0)
+        file_info = {
+            **spooled.to_dict(),
+            "conversation_id": conversation_id,
+            "project_id": str(conversation.project_id) if conversation.project_id else None
         }
+        job = await enqueue_upload_job(file_info, description, current_user.id)
         
-        logger.info("File processed successfully", 
+        logger.info("File queued for processing", 
                    conversation_id=conversation_id,
-                   filename=filename,
-                   file_type=file_type)
+                   job_id=job["id"],
+                   filename=spooled.filename,
+                   file_type=spooled.content_type,
+                   file_size=spooled.size)
         
-        return response
+        return {
+            "status": "queued",
+            "job_id": job["id"],
+            "file": file_info,
+            "status_url": f"/api/v1/conversations/jobs/{job['id']}",
+            "events_url": f"/api/v1/conversations/jobs/{job['id']}/events"
+        }
         
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        logger.error("Failed to process file", error=str(e))
+        logger.error("Failed to queue file", error=str(e))
         raise HTTPException(status_code=500, detail="Erro ao processar arquivo")
+    finally:
+        if spooled:
+            spooled.cleanup()
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Consultar status, progresso e resultado de um job de processamento"""
+    job = await JobService.get_job(job_id)
+    if not job or job.get("user_id") != str(current_user.id):
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    
+    return job
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    last_event_id: Optional[str] = Header(None)
+):
+    """Acompanhar eventos do job via Server-Sent Events"""
+    job = await JobService.get_job(job_id)
+    if not job or job.get("user_id") != str(current_user.id):
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    
+    async def event_generator():
+        async for event_id, event in EventStream.follow(
+            JobService.events_stream(job_id),
+            last_id=last_event_id or "0",
+            until=JobService.is_terminal_event
+        ):
+            if await request.is_disconnected():
+                break
+            yield format_sse(event_id, event, event=event["type"] if event else None)
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.post("/{conversation_id}/analyze")
@@ -318,11 +474,19 @@ async def analyze_conversation(
 @router.delete("/{conversation_id}")
 async def delete_conversation(
     conversation_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
     """Deletar conversa"""
+    conversation = await _get_conversation_or_404(session, conversation_id, current_user)
     try:
-        # Mock de deleção
+        await ConversationService.delete(session, conversation)
+        await ConversationMemoryManager.clear(conversation_id)
+        
+        # Trechos indexados da conversa também deixam de aparecer na busca
+        if EmbeddingService.is_available():
+            EmbeddingService.schedule(EmbeddingService.delete_conversation(conversation_id))
+        
         logger.info("Conversation deleted", 
                    conversation_id=conversation_id,
                    user_id=current_user.id)
@@ -2,267 +2,500 @@
 Endpoints para gerenciamento de Deployments
 """
 
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
 from datetime import datetime
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 import uuid
+import structlog
 
+from app.core.database import AsyncSessionLocal, get_session
 from app.core.security import get_current_user
+from app.models.deployment import Deployment
 from app.models.user import User
+from app.services.deployment_log_store import DeploymentLogStore
+from app.services.deployment_service import (
+    ACTION_STATUSES,
+    EXECUTABLE_STATUSES,
+    ROLLBACK_STATUSES,
+    STAGEABLE_STATUSES,
+    DeploymentConflictError,
+    DeploymentService
+)
+from app.services.dora_metrics import DoraMetricsService
+from app.services.event_stream import EventStream, format_sse
+from app.services.job_service import JobService
+from app.services.project_service import ProjectService
+from app.services.storage_service import StorageService, UploadTooLargeError
+from app.workers.deployments import (
+    ARTIFACT_JOB_TYPE,
+    DEPLOYMENT_JOB_TYPE,
+    enqueue_artifact_job,
+    enqueue_deployment_job
+)
+
+logger = structlog.get_logger()
 
 router = APIRouter()
 
+
+class DeploymentCreate(BaseModel):
+    """Schema para criação de deployment
+
+    targets: [{"id": "runner-01", "driver": "http", "address": "https://...",
+    "credential": "runners-prod"}] (token em DEPLOYMENT_RUNNER_TOKENS, nunca no cadastro;
+    address precisa estar em DEPLOYMENT_RUNNER_ADDRESSES para a credencial)
+    strategy: {"canary": 1, "batch_size": "25%", "max_parallel": 20,
+    "health_check": {"retries": 3, "interval": 5}, "max_failure_ratio": 0.0,
+    "auto_rollback": true, "pause": 0}
+    """
+    project_id: str
+    version: str
+    environment: str
+    name: Optional[str] = None
+    description: Optional[str] = None
+    previous_version: Optional[str] = None
+    changes: List[str] = []
+    artifact_id: Optional[str] = None  # artefato do artifact store (transferência por delta)
+    artifact: Dict = {}  # referência externa ({"url", "sha256"}) quando não há artifact_id
+    targets: List[Dict]
+    strategy: Dict = {}
+
+
+class DeploymentUpdate(BaseModel):
+    """Schema para atualização de deployment"""
+    name: Optional[str] = None
+    description: Optional[str] = None
+    changes: Optional[List[str]] = None
+    artifact: Optional[Dict] = None
+    targets: Optional[List[Dict]] = None
+    strategy: Optional[Dict] = None
+
+
+async def _owns_project(session: AsyncSession, project_id, user: User) -> bool:
+    try:
+        uuid.UUID(str(project_id))
+    except ValueError:
+        return False
+    return await ProjectService.get_project(session, str(project_id), user.id) is not None
+
+
+async def _ensure_project(session: AsyncSession, project_id: str, user: User):
+    if not await _owns_project(session, project_id, user):
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+
+
+async def _get_deployment_or_404(session: AsyncSession, deployment_id: str, user: User) -> Deployment:
+    """Deployment de um projeto do usuário (404 também para projetos de terceiros)"""
+    deployment = await DeploymentService.get(session, deployment_id)
+    if not deployment or not await _owns_project(session, deployment.project_id, user):
+        raise HTTPException(status_code=404, detail="Deployment não encontrado")
+    return deployment
+
+
+# Status de onde cada ação pode partir
+_ALLOWED_STATUSES = {"deploy": EXECUTABLE_STATUSES, "stage": STAGEABLE_STATUSES, "rollback": ROLLBACK_STATUSES}
+
+
+async def _start(session: AsyncSession, deployment: Deployment, user: User, action: str) -> Dict:
+    """Reservar o deployment e enfileirar o job do rollout, pré-carga ou rollback"""
+    previous_status = deployment.status
+    try:
+        await DeploymentService.claim(session, deployment, _ALLOWED_STATUSES[action], ACTION_STATUSES[action])
+    except DeploymentConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    try:
+        job = await enqueue_deployment_job(str(deployment.id), user.id, action=action)
+    except Exception:
+        await DeploymentService.release(session, deployment, previous_status)
+        raise
+
+    return {
+        "deployment_id": str(deployment.id),
+        "status": deployment.status,
+        "job_id": job["id"],
+        "status_url": f"/api/v1/deployments/jobs/{job['id']}",
+        "events_url": f"/api/v1/deployments/jobs/{job['id']}/events",
+        "logs_url": f"/api/v1/deployments/{deployment.id}/logs/stream"
+    }
+
+
+async def _get_job_or_404(job_id: str, user: User) -> Dict:
+    job = await JobService.get_job(job_id)
+    if not job or job.get("type") not in (DEPLOYMENT_JOB_TYPE, ARTIFACT_JOB_TYPE) or job.get("user_id") != str(user.id):
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
+
+@router.get("/environments")
+async def get_environments(
+    current_user: User = Depends(get_current_user)
+):
+    """Listar ambientes disponíveis"""
+    return {
+        "environments": [
+            {"id": "development", "name": "Desenvolvimento"},
+            {"id": "staging", "name": "Homologação"},
+            {"id": "production", "name": "Produção"},
+            {"id": "testing", "name": "Testes"}
+        ]
+    }
+
+
+@router.get("/metrics")
+async def get_deployment_metrics(
+    project_id: str,
+    environment: str = "production",
+    days: int = 30,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Métricas DORA do projeto no ambiente (frequência, lead time, taxa de falha e MTTR)"""
+    await _ensure_project(session, project_id, current_user)
+    days = min(max(days, 1), 365)
+    metrics = await DoraMetricsService.summary(
+        session, environment=environment, days=days, project_id=uuid.UUID(project_id)
+    )
+    return {"project_id": project_id, **metrics}
+
+
 @router.get("/")
 async def get_deployments(
-    skip: int = 0,
+    before: Optional[datetime] = None,
+    before_id: Optional[str] = None,
     limit: int = 100,
     project_id: Optional[str] = None,
     status: Optional[str] = None,
     environment: Optional[str] = None,
-    current_user: User = Depends(get_current_user)
+    include_total: bool = False,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
-    """Listar deployments"""
+    """Listar deployments dos projetos do usuário, mais recentes primeiro
+
+    Projeção compacta (detalhes em /{deployment_id}); paginar com `before` e
+    `before_id` da resposta anterior. `total` só com `include_total=true`.
+    """
+    limit = min(max(limit, 1), 500)
     try:
-        # Mock data para demonstração
-        deployments = [
-            {
-                "id": "dep-001",
-                "name": "Deploy v1.2.0 - Automação RH",
-                "project_id": "proj-001",
-                "project_name": "Automação RH",
-                "version": "1.2.0",
-                "environment": "production",
-                "status": "completed",
-                "created_at": "2025-01-15T10:30:00Z",
-                "deployed_at": "2025-01-15T11:00:00Z",
-                "deployed_by": "João Silva",
-                "duration": "15m 30s",
-                "rollback_available": True
-            },
-            {
-                "id": "dep-002",
-                "name": "Deploy v2.1.0 - Sistema Financeiro",
-                "project_id": "proj-002",
-                "project_name": "Automação Financeira",
-                "version": "2.1.0",
-                "environment": "staging",
-                "status": "in_progress",
-                "created_at": "2025-01-14T14:20:00Z",
-                "deployed_at": None,
-                "deployed_by": "Maria Santos",
-                "duration": "8m 45s",
-                "rollback_available": False
-            },
-            {
-                "id": "dep-003",
-                "name": "Deploy v1.0.5 - E-commerce",
-                "project_id": "proj-003",
-                "project_name": "Automação E-commerce",
-                "version": "1.0.5",
-                "environment": "production",
-                "status": "failed",
-                "created_at": "2025-01-13T09:15:00Z",
-                "deployed_at": None,
-                "deployed_by": "Carlos Oliveira",
-                "duration": "5m 20s",
-                "rollback_available": True
-            }
-        ]
-        
-        # Filtrar por projeto se especificado
-        if project_id:
-            deployments = [dep for dep in deployments if dep["project_id"] == project_id]
-            
-        # Filtrar por status se especificado
-        if status:
-            deployments = [dep for dep in deployments if dep["status"] == status]
-            
-        # Filtrar por ambiente se especificado
-        if environment:
-            deployments = [dep for dep in deployments if dep["environment"] == environment]
-            
-        return {
-            "deployments": deployments[skip:skip + limit],
-            "total": len(deployments),
-            "skip": skip,
-            "limit": limit
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao listar deployments: {str(e)}")
+        deployments, total = await DeploymentService.list_deployments(
+            session,
+            user_id=current_user.id,
+            project_id=project_id,
+            status=status,
+            environment=environment,
+            before=before,
+            before_id=before_id,
+            limit=limit,
+            with_total=include_total
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Filtro inválido")
 
-@router.get("/{deployment_id}")
-async def get_deployment(
-    deployment_id: str,
-    current_user: User = Depends(get_current_user)
+    last = deployments[-1] if len(deployments) == limit else None
+    return {
+        "deployments": [DeploymentService.summary_to_dict(deployment) for deployment in deployments],
+        "total": total,
+        "limit": limit,
+        "next_before": last.created_at.isoformat() if last else None,
+        "next_before_id": str(last.id) if last else None
+    }
+
+
+@router.post("/", status_code=201)
+async def create_deployment(
+    payload: DeploymentCreate,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
-    """Obter deployment específico"""
+    """Criar novo deployment"""
+    await _ensure_project(session, payload.project_id, current_user)
+    try:
+        deployment = await DeploymentService.create(session, created_by=current_user.id, **payload.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "message": "Deployment criado com sucesso",
+        "deployment": DeploymentService.to_dict(deployment)
+    }
+
+
+@router.post("/artifacts", status_code=202)
+async def upload_artifact(
+    response: Response,
+    project_id: str = Form(...),
+    version: str = Form(...),
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Enviar pacote ao artifact store
+
+    O corte em blocos roda no job (blocos já conhecidos não são regravados);
+    conteúdo já enviado ao projeto é devolvido na hora.
+    """
+    await _ensure_project(session, project_id, current_user)
+    spooled = None
     try:
-        # Mock data para demonstração
-        deployment = {
-            "id": deployment_id,
-            "name": "Deploy v1.2.0 - Automação RH",
-            "project_id": "proj-001",
-            "project_name": "Automação RH",
-            "version": "1.2.0",
-            "environment": "production",
-            "status": "completed",
-            "created_at": "2025-01-15T10:30:00Z",
-            "deployed_at": "2025-01-15T11:00:00Z",
-            "deployed_by": "João Silva",
-            "duration": "15m 30s",
-            "rollback_available": True,
-            "description": "Deploy da versão 1.2.0 com melhorias na automação de RH",
-            "changes": [
-                "Correção de bug na validação de dados",
-                "Melhoria na performance do processo",
-                "Adição de novos campos obrigatórios"
-            ],
-            "logs": [
-                {"timestamp": "2025-01-15T10:30:00Z", "level": "INFO", "message": "Iniciando deployment"},
-                {"timestamp": "2025-01-15T10:35:00Z", "level": "INFO", "message": "Backup realizado com sucesso"},
-                {"timestamp": "2025-01-15T10:40:00Z", "level": "INFO", "message": "Arquivos atualizados"},
-                {"timestamp": "2025-01-15T10:45:00Z", "level": "INFO", "message": "Testes de integração executados"},
-                {"timestamp": "2025-01-15T11:00:00Z", "level": "INFO", "message": "Deployment concluído com sucesso"}
-            ],
-            "metrics": {
-                "deployment_time": "15m 30s",
-                "downtime": "2m 15s",
-                "success_rate": 100.0
+        spooled = await StorageService.spool_upload(file)
+        existing = await DeploymentService.find_artifact(session, project_id, spooled.sha256)
+        if existing:
+            response.status_code = 200
+            return {
+                "message": "Artefato já armazenado",
+                "artifact": {**DeploymentService.artifact_to_dict(existing), "deduplicated": True}
             }
-        }
-        
-        return deployment
-    except Exception as e:
-        raise HTTPException(status_code=404, detail="Deployment não encontrado")
 
-@router.post("/")
-async def create_deployment(
+        spooled = await StorageService.persist(
+            spooled, object_name=DeploymentService.artifact_upload_key(str(uuid.uuid4()), spooled.sha256)
+        )
+        try:
+            job = await enqueue_artifact_job(spooled.to_dict(), project_id, version, current_user.id)
+        except Exception:
+            await StorageService.delete_object(spooled.object_name)
+            raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    finally:
+        if spooled:
+            spooled.cleanup()
+
+    logger.info("Artifact queued", project_id=project_id, version=version, job_id=job["id"])
+    return {
+        "message": "Artefato recebido; armazenamento em andamento",
+        "job_id": job["id"],
+        "status_url": f"/api/v1/deployments/jobs/{job['id']}",
+        "events_url": f"/api/v1/deployments/jobs/{job['id']}/events"
+    }
+
+
+@router.get("/artifacts")
+async def get_artifacts(
     project_id: str,
-    version: str,
-    environment: str,
-    description: Optional[str] = None,
-    current_user: User = Depends(get_current_user)
+    skip: int = 0,
+    limit: int = 100,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
-    """Criar novo deployment"""
+    """Listar artefatos do projeto"""
+    await _ensure_project(session, project_id, current_user)
     try:
-        deployment_id = f"dep-{uuid.uuid4().hex[:8]}"
-        
-        deployment = {
-            "id": deployment_id,
-            "project_id": project_id,
-            "version": version,
-            "environment": environment,
-            "description": description,
-            "status": "pending",
-            "created_at": datetime.now().isoformat(),
-            "created_by": current_user.name
-        }
-        
-        return {
-            "message": "Deployment criado com sucesso",
-            "deployment": deployment
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao criar deployment: {str(e)}")
-
-@router.post("/{deployment_id}/execute")
+        artifacts, total = await DeploymentService.list_artifacts(session, project_id, skip=skip, limit=limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="project_id inválido")
+
+    return {
+        "artifacts": [DeploymentService.artifact_to_dict(artifact) for artifact in artifacts],
+        "total": total,
+        "skip": skip,
+        "limit": limit
+    }
+
+
+@router.delete("/artifacts/{artifact_id}")
+async def delete_artifact(
+    artifact_id: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Deletar artefato (blocos sem outro uso são removidos)"""
+    artifact = await DeploymentService.get_artifact(session, artifact_id)
+    if not artifact or not await _owns_project(session, artifact.project_id, current_user):
+        raise HTTPException(status_code=404, detail="Artefato não encontrado")
+    try:
+        await DeploymentService.delete_artifact(session, artifact)
+    except DeploymentConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return {
+        "message": "Artefato deletado com sucesso",
+        "artifact_id": artifact_id
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_deployment_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Consultar status e resultado de um rollout/rollback ou do armazenamento de um artefato"""
+    return await _get_job_or_404(job_id, current_user)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_deployment_job_events(
+    job_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    last_event_id: Optional[str] = Header(None)
+):
+    """Acompanhar status do rollout via Server-Sent Events (logs em /{deployment_id}/logs/stream)"""
+    await _get_job_or_404(job_id, current_user)
+
+    async def event_generator():
+        async for event_id, event in EventStream.follow(
+            JobService.events_stream(job_id),
+            last_id=last_event_id or "0",
+            until=JobService.is_terminal_event
+        ):
+            if await request.is_disconnected():
+                break
+            yield format_sse(event_id, event, event=event["type"] if event else None)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/{deployment_id}")
+async def get_deployment(
+    deployment_id: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Obter deployment específico"""
+    deployment = await _get_deployment_or_404(session, deployment_id, current_user)
+    return {
+        **DeploymentService.to_dict(deployment),
+        "logs_url": f"/api/v1/deployments/{deployment_id}/logs",
+        "logs_stream_url": f"/api/v1/deployments/{deployment_id}/logs/stream"
+    }
+
+
+@router.post("/{deployment_id}/execute", status_code=202)
 async def execute_deployment(
     deployment_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
-    """Executar deployment"""
-    try:
-        # Mock de execução
-        return {
-            "message": "Deployment iniciado com sucesso",
-            "deployment_id": deployment_id,
-            "status": "in_progress",
-            "started_at": datetime.now().isoformat(),
-            "started_by": current_user.name
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao executar deployment: {str(e)}")
-
-@router.post("/{deployment_id}/rollback")
+    """Executar deployment em estágios (canário e lotes); o progresso chega pelo job"""
+    deployment = await _get_deployment_or_404(session, deployment_id, current_user)
+    response = await _start(session, deployment, current_user, "deploy")
+    logger.info("Deployment queued", deployment_id=deployment_id, targets=len(deployment.targets or []), job_id=response["job_id"])
+    return {"message": "Deployment iniciado com sucesso", **response}
+
+
+@router.post("/{deployment_id}/stage", status_code=202)
+async def stage_deployment(
+    deployment_id: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Pré-carregar o artefato nos hosts antes da janela de troca (só os blocos que faltam)"""
+    deployment = await _get_deployment_or_404(session, deployment_id, current_user)
+    if not (deployment.artifact or {}).get("id"):
+        raise HTTPException(status_code=409, detail="Pré-carga requer artefato do artifact store")
+    response = await _start(session, deployment, current_user, "stage")
+    logger.info("Deployment staging queued", deployment_id=deployment_id, job_id=response["job_id"])
+    return {"message": "Pré-carga iniciada com sucesso", **response}
+
+
+@router.post("/{deployment_id}/rollback", status_code=202)
 async def rollback_deployment(
     deployment_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
-    """Fazer rollback do deployment"""
-    try:
-        # Mock de rollback
-        return {
-            "message": "Rollback iniciado com sucesso",
-            "deployment_id": deployment_id,
-            "status": "rollback_in_progress",
-            "started_at": datetime.now().isoformat(),
-            "started_by": current_user.name
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao fazer rollback: {str(e)}")
+    """Fazer rollback do deployment em todos os hosts"""
+    deployment = await _get_deployment_or_404(session, deployment_id, current_user)
+    if not deployment.previous_version and not deployment.result:
+        raise HTTPException(status_code=409, detail="Nenhuma versão anterior para rollback")
+    response = await _start(session, deployment, current_user, "rollback")
+    logger.info("Deployment rollback queued", deployment_id=deployment_id, job_id=response["job_id"])
+    return {"message": "Rollback iniciado com sucesso", **response}
+
 
 @router.put("/{deployment_id}")
 async def update_deployment(
     deployment_id: str,
-    description: Optional[str] = None,
-    current_user: User = Depends(get_current_user)
+    payload: DeploymentUpdate,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
     """Atualizar deployment"""
+    deployment = await _get_deployment_or_404(session, deployment_id, current_user)
     try:
-        # Mock de atualização
-        return {
-            "message": "Deployment atualizado com sucesso",
-            "deployment_id": deployment_id
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao atualizar deployment: {str(e)}")
+        deployment = await DeploymentService.update(session, deployment, **payload.model_dump())
+    except DeploymentConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "message": "Deployment atualizado com sucesso",
+        "deployment": DeploymentService.to_dict(deployment)
+    }
+
 
 @router.delete("/{deployment_id}")
 async def delete_deployment(
     deployment_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
     """Deletar deployment"""
+    deployment = await _get_deployment_or_404(session, deployment_id, current_user)
     try:
-        # Mock de deleção
-        return {
-            "message": "Deployment deletado com sucesso",
-            "deployment_id": deployment_id
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao deletar deployment: {str(e)}")
+        await DeploymentService.delete(session, deployment)
+    except DeploymentConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
-@router.get("/environments")
-async def get_environments(
-    current_user: User = Depends(get_current_user)
-):
-    """Listar ambientes disponíveis"""
     return {
-        "environments": [
-            {"id": "development", "name": "Desenvolvimento"},
-            {"id": "staging", "name": "Homologação"},
-            {"id": "production", "name": "Produção"},
-            {"id": "testing", "name": "Testes"}
-        ]
+        "message": "Deployment deletado com sucesso",
+        "deployment_id": deployment_id
     }
 
+
 @router.get("/{deployment_id}/logs")
 async def get_deployment_logs(
     deployment_id: str,
-    current_user: User = Depends(get_current_user)
+    after: int = 0,
+    limit: int = 500,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
-    """Obter logs do deployment"""
+    """Obter logs do deployment a partir de um offset (paginar com `next_after`)"""
+    await _get_deployment_or_404(session, deployment_id, current_user)
+    logs = await DeploymentLogStore.read(deployment_id, after=max(after, 0), limit=min(max(limit, 1), 1000))
+    return {
+        "deployment_id": deployment_id,
+        "logs": logs,
+        "next_after": logs[-1]["offset"] if logs else after
+    }
+
+
+@router.get("/{deployment_id}/logs/stream")
+async def stream_deployment_logs(
+    deployment_id: str,
+    request: Request,
+    after: int = 0,
+    current_user: User = Depends(get_current_user),
+    last_event_id: Optional[str] = Header(None)
+):
+    """Acompanhar logs via Server-Sent Events, retomando do Last-Event-ID (offset da última linha)"""
+    # Sessão só para a verificação: a conexão não fica presa durante o stream
+    async with AsyncSessionLocal() as session:
+        await _get_deployment_or_404(session, deployment_id, current_user)
     try:
-        # Mock de logs
-        return {
-            "deployment_id": deployment_id,
-            "logs": [
-                {"timestamp": "2025-01-15T10:30:00Z", "level": "INFO", "message": "Iniciando deployment"},
-                {"timestamp": "2025-01-15T10:35:00Z", "level": "INFO", "message": "Backup realizado com sucesso"},
-                {"timestamp": "2025-01-15T10:40:00Z", "level": "INFO", "message": "Arquivos atualizados"},
-                {"timestamp": "2025-01-15T10:45:00Z", "level": "INFO", "message": "Testes de integração executados"},
-                {"timestamp": "2025-01-15T11:00:00Z", "level": "INFO", "message": "Deployment concluído com sucesso"}
-            ]
-        }
-    except Exception as e:
-        raise HTTPException(status_code=404, detail="Deployment não encontrado") 
\ No newline at end of file
+        offset = int(last_event_id) if last_event_id else max(after, 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Last-Event-ID inválido")
+
+    async def event_generator():
+        async for event, data in DeploymentLogStore.follow(deployment_id, after=offset):
+            if await request.is_disconnected():
+                break
+            event_id = str(data["offset"]) if event == "log" else None
+            yield format_sse(event_id, data, event=event)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
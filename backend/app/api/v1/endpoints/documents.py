@@ -3,19 +3,86 @@ Endpoints para gerenciamento de documentos
 """
 
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
-from datetime import datetime
+from urllib.parse import quote
 import uuid
 
 from app.core.database import get_session
 from app.core.security import get_current_user
+from app.models.document import Document
 from app.models.user import User
-from app.models.project import Project
+from app.services.document_service import DocumentService
+from app.services.project_service import ProjectService
+from app.services.storage_service import (
+    StorageService,
+    UploadTooLargeError,
+    RangeNotSatisfiableError,
+    parse_range_header
+)
+from app.workers.maintenance import enqueue_version_compaction
 
 router = APIRouter()
 
+
+class DirectUploadCreate(BaseModel):
+    """Schema para upload direto ao bucket via URL pré-assinada"""
+    name: str
+    project_id: str
+    document_type: str
+    filename: str
+    content_type: Optional[str] = None
+    description: Optional[str] = None
+
+
+async def _owns_project(session: AsyncSession, project_id, user: User) -> bool:
+    try:
+        uuid.UUID(str(project_id))
+    except ValueError:
+        return False
+    return await ProjectService.get_project(session, str(project_id), user.id) is not None
+
+
+async def _ensure_project(session: AsyncSession, project_id: str, user: User):
+    if not await _owns_project(session, project_id, user):
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+
+
+async def _get_document_or_404(
+    session: AsyncSession,
+    document_id: str,
+    user: User,
+    include_uploading: bool = False
+) -> Document:
+    """Documento de um projeto do usuário (404 também para projetos de terceiros)"""
+    document = await DocumentService.get(session, document_id)
+    if (
+        not document
+        or (document.status == "uploading" and not include_uploading)
+        or not await _owns_project(session, document.project_id, user)
+    ):
+        raise HTTPException(status_code=404, detail="Documento não encontrado")
+    return document
+
+
+@router.get("/types")
+async def get_document_types(
+    current_user: User = Depends(get_current_user)
+):
+    """Listar tipos de documentos disponíveis"""
+    return {
+        "types": [
+            {"id": "technical_spec", "name": "Especificação Técnica"},
+            {"id": "user_manual", "name": "Manual do Usuário"},
+            {"id": "test_report", "name": "Relatório de Testes"},
+            {"id": "process_map", "name": "Mapa de Processo"},
+            {"id": "sop", "name": "Procedimento Operacional Padrão"},
+            {"id": "training_material", "name": "Material de Treinamento"}
+        ]
+    }
+
 @router.get("/")
 async def get_documents(
     skip: int = 0,
@@ -25,59 +92,24 @@ async def get_documents(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session)
 ):
-    """Listar documentos"""
+    """Listar documentos dos projetos do usuário"""
     try:
-        # Mock data para demonstração
-        documents = [
-            {
-                "id": "doc-001",
-                "name": "Especificação Técnica - Automação RH",
-                "type": "technical_spec",
-                "project_id": "proj-001",
-                "project_name": "Automação RH",
-                "size": "2.5 MB",
-                "uploaded_at": "2025-01-15T10:30:00Z",
-                "uploaded_by": "João Silva",
-                "status": "approved"
-            },
-            {
-                "id": "doc-002", 
-                "name": "Manual de Usuário - Sistema Financeiro",
-                "type": "user_manual",
-                "project_id": "proj-002",
-                "project_name": "Automação Financeira",
-                "size": "1.8 MB",
-                "uploaded_at": "2025-01-14T14:20:00Z",
-                "uploaded_by": "Maria Santos",
-                "status": "pending"
-            },
-            {
-                "id": "doc-003",
-                "name": "Relatório de Testes - E-commerce",
-                "type": "test_report",
-                "project_id": "proj-003", 
-                "project_name": "Automação E-commerce",
-                "size": "3.2 MB",
-                "uploaded_at": "2025-01-13T09:15:00Z",
-                "uploaded_by": "Carlos Oliveira",
-                "status": "approved"
-            }
-        ]
-        
-        # Filtrar por projeto se especificado
-        if project_id:
-            documents = [doc for doc in documents if doc["project_id"] == project_id]
-            
-        # Filtrar por tipo se especificado
-        if document_type:
-            documents = [doc for doc in documents if doc["type"] == document_type]
-            
+        documents, total = await DocumentService.list_documents(
+            session,
+            user_id=current_user.id,
+            project_id=project_id,
+            document_type=document_type,
+            skip=skip,
+            limit=limit
+        )
         return {
-            "documents": documents[skip:skip + limit],
-            "total": len(documents),
+            "documents": [DocumentService.to_dict(d) for d in documents],
+            "total": total,
             "skip": skip,
             "limit": limit
         }
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Projeto inválido")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar documentos: {str(e)}")
 
@@ -88,27 +120,8 @@ async def get_document(
     session: AsyncSession = Depends(get_session)
 ):
     """Obter documento específico"""
-    try:
-        # Mock data para demonstração
-        document = {
-            "id": document_id,
-            "name": "Especificação Técnica - Automação RH",
-            "type": "technical_spec",
-            "project_id": "proj-001",
-            "project_name": "Automação RH",
-            "size": "2.5 MB",
-            "uploaded_at": "2025-01-15T10:30:00Z",
-            "uploaded_by": "João Silva",
-            "status": "approved",
-            "description": "Documento técnico detalhando a automação do processo de RH",
-            "tags": ["rpa", "rh", "automação"],
-            "version": "1.0",
-            "download_url": f"/api/v1/documents/{document_id}/download"
-        }
-        
-        return document
-    except Exception as e:
-        raise HTTPException(status_code=404, detail="Documento não encontrado")
+    document = await _get_document_or_404(session, document_id, current_user)
+    return DocumentService.to_dict(document)
 
 @router.post("/")
 async def create_document(
@@ -120,29 +133,94 @@ async def create_document(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session)
 ):
-    """Criar novo documento"""
+    """Criar novo documento (arquivo enviado pela API)"""
+    await _ensure_project(session, project_id, current_user)
+    spooled = None
     try:
-        # Mock de criação
-        document_id = f"doc-{uuid.uuid4().hex[:8]}"
-        
-        document = {
-            "id": document_id,
-            "name": name,
-            "type": document_type,
-            "project_id": project_id,
-            "size": f"{len(file.file.read()) / 1024 / 1024:.1f} MB",
-            "uploaded_at": datetime.now().isoformat(),
-            "uploaded_by": current_user.name,
-            "status": "pending",
-            "description": description
-        }
-        
+        # Gravar arquivo em blocos; o serviço persiste no prefixo do documento
+        spooled = await StorageService.spool_upload(file)
+
+        document = await DocumentService.create_from_upload(
+            session,
+            spooled,
+            name=name,
+            project_id=project_id,
+            document_type=document_type,
+            uploaded_by=current_user.id,
+            description=description
+        )
+        DocumentService.schedule_indexing(document)
+
         return {
             "message": "Documento criado com sucesso",
-            "document": document
+            "document": {**DocumentService.to_dict(document), "deduplicated": spooled.deduplicated}
         }
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao criar documento: {str(e)}")
+    finally:
+        if spooled:
+            spooled.cleanup()
+
+@router.post("/uploads")
+async def create_direct_upload(
+    upload: DirectUploadCreate,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Reservar documento e devolver URL pré-assinada para envio direto ao bucket"""
+    if not StorageService.supports_presigned_urls():
+        raise HTTPException(status_code=409, detail="Upload direto requer armazenamento de objetos")
+    await _ensure_project(session, upload.project_id, current_user)
+
+    try:
+        document, upload_url = await DocumentService.create_pending_upload(
+            session,
+            name=upload.name,
+            project_id=upload.project_id,
+            document_type=upload.document_type,
+            uploaded_by=current_user.id,
+            filename=upload.filename,
+            content_type=upload.content_type,
+            description=upload.description
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao preparar upload: {str(e)}")
+
+    return {
+        "document_id": str(document.id),
+        "upload_url": upload_url,
+        "method": "PUT",
+        "headers": {"Content-Type": document.content_type},
+        "complete_url": f"/api/v1/documents/{document.id}/complete"
+    }
+
+@router.post("/{document_id}/complete")
+async def complete_direct_upload(
+    document_id: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Confirmar que o arquivo foi enviado ao bucket"""
+    document = await _get_document_or_404(session, document_id, current_user, include_uploading=True)
+    if str(document.uploaded_by) != str(current_user.id):
+        raise HTTPException(status_code=404, detail="Documento não encontrado")
+    if document.status != "uploading":
+        return {"message": "Upload já confirmado", "document": DocumentService.to_dict(document)}
+
+    try:
+        completed = await DocumentService.complete_upload(session, document)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    if completed is None:
+        raise HTTPException(status_code=409, detail="Arquivo ainda não foi enviado")
+
+    DocumentService.schedule_indexing(completed)
+    return {
+        "message": "Documento criado com sucesso",
+        "document": DocumentService.to_dict(completed)
+    }
 
 @router.put("/{document_id}")
 async def update_document(
@@ -154,11 +232,12 @@ async def update_document(
     session: AsyncSession = Depends(get_session)
 ):
     """Atualizar documento"""
+    document = await _get_document_or_404(session, document_id, current_user)
     try:
-        # Mock de atualização
+        document = await DocumentService.update(session, document, name=name, description=description, status=status)
         return {
             "message": "Documento atualizado com sucesso",
-            "document_id": document_id
+            "document": DocumentService.to_dict(document)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao atualizar documento: {str(e)}")
@@ -170,8 +249,9 @@ async def delete_document(
     session: AsyncSession = Depends(get_session)
 ):
     """Deletar documento"""
+    document = await _get_document_or_404(session, document_id, current_user, include_uploading=True)
     try:
-        # Mock de deleção
+        await DocumentService.delete(session, document)
         return {
             "message": "Documento deletado com sucesso",
             "document_id": document_id
@@ -185,28 +265,125 @@ async def download_document(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session)
 ):
-    """Download do documento"""
+    """URL de download do documento (o conteúdo não passa pela API quando em bucket)"""
+    document = await _get_document_or_404(session, document_id, current_user)
     try:
-        # Mock de download
+        return await DocumentService.download_url(document)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao gerar URL de download: {str(e)}")
+
+def _ranged_response(range_header: Optional[str], size: int, content_type: str, filename: str, open_body) -> StreamingResponse:
+    """Resposta 200/206 conforme o cabeçalho Range; open_body(start, end) gera o conteúdo"""
+    try:
+        byte_range = parse_range_header(range_header, size)
+    except RangeNotSatisfiableError as e:
+        raise HTTPException(status_code=416, detail=str(e), headers={"Content-Range": f"bytes */{size}"})
+
+    start, end = byte_range or (0, size - 1)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(max(end - start + 1, 0)),
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    return StreamingResponse(
+        open_body(start, end) if size else iter(()),
+        status_code=206 if byte_range else 200,
+        media_type=content_type,
+        headers=headers
+    )
+
+@router.get("/{document_id}/content")
+async def get_document_content(
+    document_id: str,
+    range: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Conteúdo do documento com suporte a requisições Range"""
+    document = await _get_document_or_404(session, document_id, current_user)
+    return _ranged_response(
+        range,
+        document.size_bytes or 0,
+        document.content_type,
+        document.filename or document.name,
+        lambda start, end: StorageService.iter_object(document.storage_key, start, end)
+    )
+
+@router.get("/{document_id}/versions")
+async def get_document_versions(
+    document_id: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Histórico de versões do documento"""
+    document = await _get_document_or_404(session, document_id, current_user)
+    versions = await DocumentService.list_versions(session, document)
+    return {
+        "document_id": document_id,
+        "current_version": document.version,
+        "versions": [DocumentService.version_to_dict(v) for v in versions]
+    }
+
+@router.post("/{document_id}/versions")
+async def create_document_version(
+    document_id: str,
+    file: UploadFile = File(...),
+    comment: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Enviar novo conteúdo para o documento (a versão anterior vira delta em background)"""
+    document = await _get_document_or_404(session, document_id, current_user)
+    spooled = None
+    try:
+        spooled = await StorageService.spool_upload(file)
+
+        document, version = await DocumentService.add_version(
+            session,
+            document,
+            spooled,
+            created_by=current_user.id,
+            comment=comment
+        )
+        enqueue_version_compaction(str(document.id))
+        DocumentService.schedule_indexing(document)
+
         return {
-            "download_url": f"https://storage.example.com/documents/{document_id}",
-            "expires_at": "2025-02-01T00:00:00Z"
+            "message": "Nova versão registrada com sucesso",
+            "document": DocumentService.to_dict(document),
+            "version": DocumentService.version_to_dict(version)
         }
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=404, detail="Documento não encontrado")
+        raise HTTPException(status_code=500, detail=f"Erro ao registrar versão: {str(e)}")
+    finally:
+        if spooled:
+            spooled.cleanup()
 
-@router.get("/types")
-async def get_document_types(
-    current_user: User = Depends(get_current_user)
+@router.get("/{document_id}/versions/{version}/content")
+async def get_document_version_content(
+    document_id: str,
+    version: int,
+    range: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
-    """Listar tipos de documentos disponíveis"""
-    return {
-        "types": [
-            {"id": "technical_spec", "name": "Especificação Técnica"},
-            {"id": "user_manual", "name": "Manual do Usuário"},
-            {"id": "test_report", "name": "Relatório de Testes"},
-            {"id": "process_map", "name": "Mapa de Processo"},
-            {"id": "sop", "name": "Procedimento Operacional Padrão"},
-            {"id": "training_material", "name": "Material de Treinamento"}
-        ]
-    } 
\ No newline at end of file
+    """Conteúdo de uma versão (remontado em streaming), com suporte a Range"""
+    document = await _get_document_or_404(session, document_id, current_user)
+    document_version = await DocumentService.get_version(session, document, version)
+    if not document_version:
+        raise HTTPException(status_code=404, detail="Versão não encontrada")
+
+    return _ranged_response(
+        range,
+        document_version.size_bytes or 0,
+        document_version.content_type,
+        document_version.filename or document.name,
+        lambda start, end: DocumentService.iter_version(document_version, start, end)
+    )
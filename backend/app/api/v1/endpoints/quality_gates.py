@@ -2,250 +2,332 @@
 Endpoints para gerenciamento de Quality Gates
 """
 
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
 from datetime import datetime
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 import uuid
+import structlog
 
+from app.core.database import get_session
 from app.core.security import get_current_user
+from app.models.quality_gate import QualityGate
 from app.models.user import User
+from app.services.event_stream import EventStream, format_sse
+from app.services.job_service import JobService
+from app.services.project_service import ProjectService
+from app.services.quality_gate_service import QualityGateService
+from app.workers.quality_gates import QUALITY_GATE_JOB_TYPE, enqueue_quality_gate_job
+
+logger = structlog.get_logger()
 
 router = APIRouter()
 
+
+class QualityGateCreate(BaseModel):
+    """Schema para criação de quality gate"""
+    name: str
+    project_id: str
+    quality_gate_type: str
+    threshold: float = 90.0
+    description: Optional[str] = None
+    criteria: List[Dict] = []
+    config: Dict = {}
+
+
+class QualityGateUpdate(BaseModel):
+    """Schema para atualização de quality gate"""
+    name: Optional[str] = None
+    threshold: Optional[float] = None
+    description: Optional[str] = None
+    criteria: Optional[List[Dict]] = None
+    config: Optional[Dict] = None
+
+
+class QualityGateExecuteRequest(BaseModel):
+    """Entradas da execução: hashes de artefatos (ex.: build, dataset) e reexecução forçada"""
+    artifacts: Dict[str, str] = {}
+    force: bool = False
+
+
+async def _owns_project(session: AsyncSession, project_id, user: User) -> bool:
+    try:
+        uuid.UUID(str(project_id))
+    except ValueError:
+        return False
+    return await ProjectService.get_project(session, str(project_id), user.id) is not None
+
+
+async def _ensure_project(session: AsyncSession, project_id: str, user: User):
+    if not await _owns_project(session, project_id, user):
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+
+
+async def _get_quality_gate_or_404(session: AsyncSession, quality_gate_id: str, user: User) -> QualityGate:
+    """Quality gate de um projeto do usuário (404 também para projetos de terceiros)"""
+    quality_gate = await QualityGateService.get(session, quality_gate_id)
+    if not quality_gate or not await _owns_project(session, quality_gate.project_id, user):
+        raise HTTPException(status_code=404, detail="Quality gate não encontrado")
+    return quality_gate
+
+
+def _job_response(job: Dict, gate_ids: List[str]) -> Dict:
+    return {
+        "status": "queued",
+        "job_id": job["id"],
+        "quality_gate_ids": gate_ids,
+        "status_url": f"/api/v1/quality-gates/jobs/{job['id']}",
+        "events_url": f"/api/v1/quality-gates/jobs/{job['id']}/events"
+    }
+
+
+@router.get("/types")
+async def get_quality_gate_types(
+    current_user: User = Depends(get_current_user)
+):
+    """Listar tipos de quality gates disponíveis"""
+    return {
+        "types": [
+            {"id": "data_validation", "name": "Validação de Dados"},
+            {"id": "performance_test", "name": "Teste de Performance"},
+            {"id": "security_test", "name": "Teste de Segurança"},
+            {"id": "code_review", "name": "Revisão de Código"},
+            {"id": "integration_test", "name": "Teste de Integração"},
+            {"id": "user_acceptance", "name": "Teste de Aceitação do Usuário"}
+        ]
+    }
+
+
 @router.get("/")
 async def get_quality_gates(
-    skip: int = 0,
+    before: Optional[datetime] = None,
+    before_id: Optional[str] = None,
     limit: int = 100,
     project_id: Optional[str] = None,
     status: Optional[str] = None,
-    current_user: User = Depends(get_current_user)
+    include_total: bool = False,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
-    """Listar quality gates"""
+    """Listar quality gates dos projetos do usuário, mais recentes primeiro
+
+    Projeção compacta (critérios e configuração em /{quality_gate_id}); paginar
+    com `before` e `before_id` da resposta anterior. `total` só com `include_total=true`.
+    """
+    limit = min(max(limit, 1), 500)
     try:
-        # Mock data para demonstração
-        quality_gates = [
-            {
-                "id": "qg-001",
-                "name": "Validação de Dados - Automação RH",
-                "project_id": "proj-001",
-                "project_name": "Automação RH",
-                "type": "data_validation",
-                "status": "passed",
-                "created_at": "2025-01-15T10:30:00Z",
-                "executed_at": "2025-01-15T11:00:00Z",
-                "executed_by": "João Silva",
-                "score": 95,
-                "threshold": 90
-            },
-            {
-                "id": "qg-002",
-                "name": "Teste de Performance - Sistema Financeiro",
-                "project_id": "proj-002",
-                "project_name": "Automação Financeira",
-                "type": "performance_test",
-                "status": "failed",
-                "created_at": "2025-01-14T14:20:00Z",
-                "executed_at": "2025-01-14T15:00:00Z",
-                "executed_by": "Maria Santos",
-                "score": 75,
-                "threshold": 85
-            },
-            {
-                "id": "qg-003",
-                "name": "Validação de Segurança - E-commerce",
-                "project_id": "proj-003",
-                "project_name": "Automação E-commerce",
-                "type": "security_test",
-                "status": "passed",
-                "created_at": "2025-01-13T09:15:00Z",
-                "executed_at": "2025-01-13T10:00:00Z",
-                "executed_by": "Carlos Oliveira",
-                "score": 98,
-                "threshold": 90
-            }
-        ]
-        
-        # Filtrar por projeto se especificado
-        if project_id:
-            quality_gates = [qg for qg in quality_gates if qg["project_id"] == project_id]
-            
-        # Filtrar por status se especificado
-        if status:
-            quality_gates = [qg for qg in quality_gates if qg["status"] == status]
-            
-        return {
-            "quality_gates": quality_gates[skip:skip + limit],
-            "total": len(quality_gates),
-            "skip": skip,
-            "limit": limit
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao listar quality gates: {str(e)}")
+        quality_gates, total = await QualityGateService.list_gates(
+            session,
+            user_id=current_user.id,
+            project_id=project_id,
+            status=status,
+            before=before,
+            before_id=before_id,
+            limit=limit,
+            with_total=include_total
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Filtro inválido")
+
+    last = quality_gates[-1] if len(quality_gates) == limit else None
+    return {
+        "quality_gates": [QualityGateService.summary_to_dict(qg) for qg in quality_gates],
+        "total": total,
+        "limit": limit,
+        "next_before": last.created_at.isoformat() if last else None,
+        "next_before_id": str(last.id) if last else None
+    }
+
+
+@router.post("/", status_code=201)
+async def create_quality_gate(
+    payload: QualityGateCreate,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Criar novo quality gate"""
+    await _ensure_project(session, payload.project_id, current_user)
+    if not 0 <= payload.threshold <= 100:
+        raise HTTPException(status_code=400, detail="threshold deve estar entre 0 e 100")
+
+    quality_gate = await QualityGateService.create(
+        session,
+        created_by=current_user.id,
+        name=payload.name,
+        project_id=payload.project_id,
+        type=payload.quality_gate_type,
+        threshold=payload.threshold,
+        description=payload.description,
+        criteria=payload.criteria,
+        config=payload.config
+    )
+
+    return {
+        "message": "Quality gate criado com sucesso",
+        "quality_gate": QualityGateService.to_dict(quality_gate)
+    }
+
+
+@router.post("/execute", status_code=202)
+async def execute_project_quality_gates(
+    project_id: str,
+    payload: Optional[QualityGateExecuteRequest] = None,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Executar os quality gates de um projeto em paralelo (inalterados reaproveitam o resultado)"""
+    await _ensure_project(session, project_id, current_user)
+    gate_ids = await QualityGateService.project_gate_ids(session, project_id)
+    if not gate_ids:
+        raise HTTPException(status_code=404, detail="Projeto não possui quality gates")
+
+    payload = payload or QualityGateExecuteRequest()
+    job = await enqueue_quality_gate_job(
+        gate_ids, current_user.id, project_id=project_id, artifacts=payload.artifacts, force=payload.force
+    )
+    logger.info("Project quality gates queued", project_id=project_id, gates=len(gate_ids), job_id=job["id"])
+    return _job_response(job, gate_ids)
+
+
+@router.get("/jobs/{job_id}")
+async def get_execution_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Consultar status e resultado de uma execução de quality gates"""
+    job = await JobService.get_job(job_id)
+    if not job or job.get("type") != QUALITY_GATE_JOB_TYPE or job.get("user_id") != str(current_user.id):
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+
+    return job
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_execution_events(
+    job_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    last_event_id: Optional[str] = Header(None)
+):
+    """Acompanhar logs e status da execução via Server-Sent Events"""
+    job = await JobService.get_job(job_id)
+    if not job or job.get("type") != QUALITY_GATE_JOB_TYPE or job.get("user_id") != str(current_user.id):
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+
+    async def event_generator():
+        async for event_id, event in EventStream.follow(
+            JobService.events_stream(job_id),
+            last_id=last_event_id or "0",
+            until=JobService.is_terminal_event
+        ):
+            if await request.is_disconnected():
+                break
+            yield format_sse(event_id, event, event=event["type"] if event else None)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
 @router.get("/{quality_gate_id}")
 async def get_quality_gate(
     quality_gate_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
     """Obter quality gate específico"""
-    try:
-        # Mock data para demonstração
-        quality_gate = {
-            "id": quality_gate_id,
-            "name": "Validação de Dados - Automação RH",
-            "project_id": "proj-001",
-            "project_name": "Automação RH",
-            "type": "data_validation",
-            "status": "passed",
-            "created_at": "2025-01-15T10:30:00Z",
-            "executed_at": "2025-01-15T11:00:00Z",
-            "executed_by": "João Silva",
-            "score": 95,
-            "threshold": 90,
-            "description": "Validação de integridade dos dados do processo de RH",
-            "criteria": [
-                {"name": "Completude dos dados", "status": "passed", "score": 100},
-                {"name": "Consistência dos dados", "status": "passed", "score": 95},
-                {"name": "Validação de formato", "status": "passed", "score": 90}
-            ],
-            "logs": [
-                {"timestamp": "2025-01-15T11:00:00Z", "level": "INFO", "message": "Iniciando validação de dados"},
-                {"timestamp": "2025-01-15T11:00:30Z", "level": "INFO", "message": "Validação de completude concluída"},
-                {"timestamp": "2025-01-15T11:01:00Z", "level": "INFO", "message": "Validação de consistência concluída"},
-                {"timestamp": "2025-01-15T11:01:30Z", "level": "INFO", "message": "Quality gate aprovado"}
-            ]
-        }
-        
-        return quality_gate
-    except Exception as e:
-        raise HTTPException(status_code=404, detail="Quality gate não encontrado")
+    quality_gate = await _get_quality_gate_or_404(session, quality_gate_id, current_user)
+    return QualityGateService.to_dict(quality_gate)
 
-@router.post("/")
-async def create_quality_gate(
-    name: str,
-    project_id: str,
-    quality_gate_type: str,
-    threshold: float,
-    description: Optional[str] = None,
-    current_user: User = Depends(get_current_user)
-):
-    """Criar novo quality gate"""
-    try:
-        quality_gate_id = f"qg-{uuid.uuid4().hex[:8]}"
-        
-        quality_gate = {
-            "id": quality_gate_id,
-            "name": name,
-            "project_id": project_id,
-            "type": quality_gate_type,
-            "threshold": threshold,
-            "description": description,
-            "status": "pending",
-            "created_at": datetime.now().isoformat(),
-            "created_by": current_user.name
-        }
-        
-        return {
-            "message": "Quality gate criado com sucesso",
-            "quality_gate": quality_gate
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao criar quality gate: {str(e)}")
-
-@router.post("/{quality_gate_id}/execute")
+
+@router.post("/{quality_gate_id}/execute", status_code=202)
 async def execute_quality_gate(
     quality_gate_id: str,
-    current_user: User = Depends(get_current_user)
+    payload: Optional[QualityGateExecuteRequest] = None,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
-    """Executar quality gate"""
-    try:
-        # Mock de execução
-        score = 95  # Simular score
-        threshold = 90
-        status = "passed" if score >= threshold else "failed"
-        
-        return {
-            "message": "Quality gate executado com sucesso",
-            "quality_gate_id": quality_gate_id,
-            "result": {
-                "score": score,
-                "threshold": threshold,
-                "status": status,
-                "executed_at": datetime.now().isoformat(),
-                "executed_by": current_user.name
-            }
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao executar quality gate: {str(e)}")
+    """Executar quality gate; o resultado e os logs chegam pelo job"""
+    quality_gate = await _get_quality_gate_or_404(session, quality_gate_id, current_user)
+    gate_ids = [str(quality_gate.id)]
+
+    payload = payload or QualityGateExecuteRequest()
+    job = await enqueue_quality_gate_job(
+        gate_ids,
+        current_user.id,
+        project_id=str(quality_gate.project_id),
+        artifacts=payload.artifacts,
+        force=payload.force
+    )
+    logger.info("Quality gate queued", quality_gate_id=quality_gate_id, job_id=job["id"])
+    return _job_response(job, gate_ids)
+
 
 @router.put("/{quality_gate_id}")
 async def update_quality_gate(
     quality_gate_id: str,
-    name: Optional[str] = None,
-    threshold: Optional[float] = None,
-    description: Optional[str] = None,
-    current_user: User = Depends(get_current_user)
+    payload: QualityGateUpdate,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
     """Atualizar quality gate"""
-    try:
-        # Mock de atualização
-        return {
-            "message": "Quality gate atualizado com sucesso",
-            "quality_gate_id": quality_gate_id
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao atualizar quality gate: {str(e)}")
+    quality_gate = await _get_quality_gate_or_404(session, quality_gate_id, current_user)
+    if payload.threshold is not None and not 0 <= payload.threshold <= 100:
+        raise HTTPException(status_code=400, detail="threshold deve estar entre 0 e 100")
+
+    quality_gate = await QualityGateService.update(session, quality_gate, **payload.model_dump())
+    return {
+        "message": "Quality gate atualizado com sucesso",
+        "quality_gate": QualityGateService.to_dict(quality_gate)
+    }
+
 
 @router.delete("/{quality_gate_id}")
 async def delete_quality_gate(
     quality_gate_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
     """Deletar quality gate"""
-    try:
-        # Mock de deleção
-        return {
-            "message": "Quality gate deletado com sucesso",
-            "quality_gate_id": quality_gate_id
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao deletar quality gate: {str(e)}")
+    quality_gate = await _get_quality_gate_or_404(session, quality_gate_id, current_user)
+    await QualityGateService.delete(session, quality_gate)
+    return {
+        "message": "Quality gate deletado com sucesso",
+        "quality_gate_id": quality_gate_id
+    }
 
-@router.get("/types")
-async def get_quality_gate_types(
-    current_user: User = Depends(get_current_user)
+
+@router.get("/{quality_gate_id}/executions")
+async def get_quality_gate_executions(
+    quality_gate_id: str,
+    before: Optional[datetime] = None,
+    limit: int = 50,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
-    """Listar tipos de quality gates disponíveis"""
+    """Histórico de execuções, mais recentes primeiro (paginar com `before`)"""
+    quality_gate = await _get_quality_gate_or_404(session, quality_gate_id, current_user)
+    executions = await QualityGateService.list_executions(session, quality_gate, before=before, limit=min(max(limit, 1), 200))
     return {
-        "types": [
-            {"id": "data_validation", "name": "Validação de Dados"},
-            {"id": "performance_test", "name": "Teste de Performance"},
-            {"id": "security_test", "name": "Teste de Segurança"},
-            {"id": "code_review", "name": "Revisão de Código"},
-            {"id": "integration_test", "name": "Teste de Integração"},
-            {"id": "user_acceptance", "name": "Teste de Aceitação do Usuário"}
-        ]
+        "quality_gate_id": quality_gate_id,
+        "executions": [QualityGateService.execution_to_dict(e) for e in executions],
+        "next_before": executions[-1].executed_at.isoformat() if executions else None
     }
 
+
 @router.get("/{quality_gate_id}/metrics")
 async def get_quality_gate_metrics(
     quality_gate_id: str,
-    current_user: User = Depends(get_current_user)
+    days: int = 30,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
-    """Obter métricas do quality gate"""
-    try:
-        # Mock de métricas
-        return {
-            "quality_gate_id": quality_gate_id,
-            "metrics": {
-                "total_executions": 15,
-                "passed_executions": 12,
-                "failed_executions": 3,
-                "success_rate": 80.0,
-                "average_score": 87.5,
-                "last_execution": "2025-01-15T11:00:00Z",
-                "trend": "improving"
-            }
-        }
-    except Exception as e:
-        raise HTTPException(status_code=404, detail="Quality gate não encontrado") 
\ No newline at end of file
+    """Obter métricas do quality gate (agregados incrementais e série diária)"""
+    if not 1 <= days <= 365:
+        raise HTTPException(status_code=400, detail="days deve estar entre 1 e 365")
+    quality_gate = await _get_quality_gate_or_404(session, quality_gate_id, current_user)
+    return await QualityGateService.metrics(session, quality_gate, days=days)
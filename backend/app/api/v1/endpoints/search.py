@@ -0,0 +1,73 @@
+"""
+Endpoints de busca semântica em conversas e documentos
+"""
+
+import time
+import uuid
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+import structlog
+
+from app.core.config import settings
+from app.core.database import get_session
+from app.core.security import get_current_user
+from app.models.user import User
+from app.services.conversation_service import ConversationService
+from app.services.embedding_service import EmbeddingService
+from app.services.project_service import ProjectService
+
+logger = structlog.get_logger()
+
+router = APIRouter()
+
+
+@router.get("/")
+async def semantic_search(
+    q: str = Query(..., min_length=2, description="Texto da consulta"),
+    k: int = Query(10, ge=1, description="Quantidade de resultados"),
+    project_id: Optional[str] = None,
+    type: Optional[List[str]] = Query(None, description="message, document ou file"),
+    conversation_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Buscar trechos semanticamente próximos da consulta (só conversas e projetos do usuário)"""
+    if not EmbeddingService.is_available():
+        raise HTTPException(status_code=503, detail="Busca semântica indisponível")
+
+    if project_id:
+        try:
+            uuid.UUID(project_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Filtro inválido")
+        if not await ProjectService.get_project(session, project_id, current_user.id):
+            raise HTTPException(status_code=404, detail="Projeto não encontrado")
+    if conversation_id and not await ConversationService.get(session, conversation_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Conversa não encontrada")
+
+    started = time.perf_counter()
+    try:
+        results = await EmbeddingService.search(
+            q,
+            k=min(k, settings.SEARCH_MAX_K),
+            project_id=project_id,
+            source_types=type,
+            conversation_id=conversation_id,
+            user_id=str(current_user.id)
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Filtro inválido")
+    except Exception as e:
+        logger.error("Semantic search failed", error=str(e))
+        raise HTTPException(status_code=500, detail="Erro ao executar busca")
+
+    took_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("Semantic search", results=len(results), took_ms=took_ms, user_id=current_user.id)
+
+    return {
+        "query": q,
+        "results": results,
+        "total": len(results),
+        "took_ms": took_ms
+    }
@@ -11,7 +11,8 @@ from app.api.v1.endpoints import (
     documents,
     quality_gates,
     deployments,
-    dashboards
+    dashboards,
+    search
 )
 
 # Criar router principal
@@ -58,4 +59,10 @@ api_router.include_router(
     dashboards.router,
     prefix="/dashboards",
     tags=["Dashboards"]
+)
+
+api_router.include_router(
+    search.router,
+    prefix="/search",
+    tags=["Search"]
 ) 
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+Carregamento sob demanda das dependências pesadas do MILAPP
+
+Bibliotecas de IA e mídia só são importadas no primeiro uso da capacidade que
+as exige (ou no prewarm opcional), mantendo rápido o cold start e baixo o
+consumo de memória de processos que nunca processam mídia.
+"""
+
+import asyncio
+import importlib
+import threading
+import time
+from types import ModuleType
+from typing import Dict, Iterable, List
+import structlog
+from prometheus_client import Gauge
+
+logger = structlog.get_logger()
+
+# Módulos importados por capacidade
+CAPABILITY_MODULES = {
+    "openai": ("openai",),
+    "anthropic": ("anthropic",),
+    "tokenizer": ("tiktoken",),
+    "image": ("PIL.Image", "PIL.ImageOps"),
+    "ocr": ("pytesseract",),
+    "audio": ("numpy", "soundfile", "librosa"),
+    "pdf": ("PyPDF2",),
+    "object_storage": ("minio", "minio.error"),
+    "dataframe": ("numpy", "pandas"),
+    "parquet": ("pyarrow", "pyarrow.parquet"),
+    "spreadsheet": ("openpyxl",)
+}
+
+CAPABILITY_IMPORT_SECONDS = Gauge(
+    'capability_import_seconds', 'Time spent importing a capability on first use', ['capability']
+)
+
+_loaded: Dict[str, Dict[str, ModuleType]] = {}
+_lock = threading.Lock()
+
+
+def load_capability(name: str) -> Dict[str, ModuleType]:
+    """Importar os módulos da capacidade (uma vez por processo) e medir o tempo"""
+    modules = _loaded.get(name)
+    if modules is not None:
+        return modules
+
+    with _lock:
+        if name not in _loaded:
+            started = time.perf_counter()
+            loaded = {module: importlib.import_module(module) for module in CAPABILITY_MODULES[name]}
+            elapsed = time.perf_counter() - started
+
+            CAPABILITY_IMPORT_SECONDS.labels(name).set(elapsed)
+            logger.info("Capability loaded", capability=name, import_seconds=round(elapsed, 3))
+            _loaded[name] = loaded
+
+    return _loaded[name]
+
+
+def loaded_capabilities() -> List[str]:
+    """Capacidades já importadas neste processo"""
+    return list(_loaded)
+
+
+async def prewarm(capabilities: Iterable[str]):
+    """Importar capacidades antecipadamente fora do event loop; falhas apenas registram aviso"""
+    for name in capabilities:
+        try:
+            await asyncio.to_thread(load_capability, name)
+        except Exception as e:
+            logger.warning("Capability prewarm failed", capability=name, error=str(e))
@@ -0,0 +1,77 @@
+"""
+Configuração do Celery (workers de processamento em background)
+"""
+
+import asyncio
+from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+celery_app = Celery(
+    "milapp",
+    broker=settings.REDIS_URL,
+    backend=settings.REDIS_URL,
+    include=["app.workers.file_processing", "app.workers.maintenance", "app.workers.quality_gates", "app.workers.deployments"]
+)
+
+celery_app.conf.update(
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    task_track_started=True,
+    result_expires=settings.JOB_TTL,
+    timezone="UTC",
+    beat_schedule={
+        "ensure-message-partitions": {
+            "task": "milapp.ensure_message_partitions",
+            "schedule": 24 * 3600
+        },
+        "collect-orphaned-chunks": {
+            "task": "milapp.collect_orphaned_chunks",
+            "schedule": settings.CHUNK_GC_INTERVAL
+        }
+    }
+)
+
+# Event loop persistente por processo worker (clientes async ficam ligados a ele)
+_worker_loop: asyncio.AbstractEventLoop = None
+
+
+def run_async(coro):
+    """Executar corrotina no event loop do processo worker"""
+    global _worker_loop
+    if _worker_loop is None:
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop.run_until_complete(coro)
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Inicializar serviços em cada processo worker"""
+    from app.services.cache_service import CacheService
+    from app.services.ai_service import AIService
+
+    from app.core.capabilities import prewarm
+
+    run_async(CacheService.initialize())
+    run_async(AIService.initialize())
+    # Workers processam mídia: importar dependências antes da primeira task
+    run_async(prewarm(settings.WORKER_PREWARM_CAPABILITIES))
+    logger.info("Celery worker process initialized")
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """Liberar recursos do processo worker"""
+    from app.services.cache_service import CacheService
+    from app.services.ai_service import AIService
+
+    run_async(AIService.cleanup())
+    run_async(CacheService.cleanup())
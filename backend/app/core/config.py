@@ -3,7 +3,7 @@ Configurações do MILAPP Backend
 """
 
 import os
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -19,6 +19,10 @@ class Settings(BaseSettings):
     # Redis Configuration
     REDIS_URL: str = "redis://localhost:6379/0"
     
+    # Background Jobs (Celery)
+    JOBS_USE_CELERY: bool = True
+    JOB_TTL: int = 24 * 3600
+    
     # Security
     SECRET_KEY: str = "your-secret-key-here"
     ALGORITHM: str = "HS256"
@@ -32,6 +36,78 @@ class Settings(BaseSettings):
     # AI Services
     OPENAI_API_KEY: Optional[str] = None
     LANGCHAIN_API_KEY: Optional[str] = None
+    ANTHROPIC_API_KEY: Optional[str] = None
+    AI_MODEL_NAME: str = "gpt-4"
+    AI_TEMPERATURE: float = 0.2
+    AI_MAX_TOKENS: int = 2000
+    AI_EXTRACTION_MODEL: str = "gpt-3.5-turbo-1106"
+    AI_STRUCTURED_EXTRACTION_ENABLED: bool = True
+    AI_ANALYSIS_CACHE_TTL: int = 30 * 24 * 3600  # 30 dias
+    AI_SUMMARY_MODEL: str = "gpt-3.5-turbo"
+    AI_CLASSIFICATION_MODEL: str = "gpt-3.5-turbo"
+    AI_VISION_MODEL: str = "gpt-4-vision-preview"
+    AI_TRANSCRIPTION_MODEL: str = "whisper-1"
+    AI_TASK_ROUTES: Dict[str, List[str]] = {}  # sobrescreve modelos adequados por tarefa
+    AI_ROUTING_STRATEGY: str = "cost"  # cost, latency ou ordered
+    AI_GATEWAY_TIMEOUT: float = 120.0
+    AI_GATEWAY_FAILURE_COOLDOWN: int = 60
+    AI_STUB_PROVIDER_ENABLED: bool = False
+    # Capacidades importadas em background na inicialização (ex.: ["openai", "tokenizer"])
+    AI_PREWARM_CAPABILITIES: List[str] = []
+    WORKER_PREWARM_CAPABILITIES: List[str] = ["openai", "tokenizer", "image", "ocr", "audio", "pdf"]
+    AI_TOKENIZER_ENCODING: str = "cl100k_base"
+    AI_CONTEXT_TOKEN_BUDGET: int = 3000
+    AI_CONTEXT_SUMMARY_MAX_TOKENS: int = 500
+    AI_CONTEXT_MAX_TURN_TOKENS: int = 1000
+    AI_CONTEXT_MIN_RECENT_TURNS: int = 2
+    AI_CONTEXT_MEMORY_TTL: int = 30 * 24 * 3600
+    AI_CONTEXT_REBUILD_MESSAGES: int = 20  # mensagens lidas do banco se a memória expirar
+    AI_CONTEXT_MEMORY_LOCK_TIMEOUT: float = 180.0  # segundos (cobre a chamada de resumo)
+    AI_BATCH_MAX_ITEMS: int = 500
+    AI_BATCH_CONCURRENCY: int = 8
+    AI_BATCH_PACK_MAX_ITEMS: int = 5  # itens curtos agrupados por chamada
+    AI_BATCH_PACK_ITEM_MAX_TOKENS: int = 400  # acima disso o item vai sozinho
+    AI_BATCH_PACK_TOKEN_BUDGET: int = 2000
+    AI_BATCH_MAX_OUTPUT_TOKENS: int = 4000
+
+    # Conversas (mensagens particionadas por mês)
+    CONVERSATION_PARTITION_MONTHS_AHEAD: int = 3
+    CONVERSATION_HISTORY_PAGE_SIZE: int = 50
+    CONVERSATION_HISTORY_MAX_PAGE_SIZE: int = 200
+
+    # Busca semântica
+    EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    EMBEDDING_DIMENSIONS: int = 1536
+    EMBEDDING_CHUNK_TOKENS: int = 400
+    EMBEDDING_CHUNK_OVERLAP_TOKENS: int = 50
+    EMBEDDING_BATCH_SIZE: int = 64
+    SEARCH_DEFAULT_K: int = 10
+    SEARCH_MAX_K: int = 50
+    SEARCH_HNSW_EF: int = 64  # candidatos explorados no índice HNSW por consulta
+    SEARCH_EXACT_MAX_ROWS: int = 20000  # escopos filtrados até esse tamanho usam busca exata (sem o HNSW)
+    SEARCH_HNSW_ITERATIVE_SCAN: bool = True  # pgvector >= 0.8: com filtros, varredura continua até preencher k
+    SEARCH_HNSW_MAX_SCAN_TUPLES: int = 20000  # limite da varredura iterativa por consulta
+
+    # Contexto recuperado (RAG) nas análises
+    AI_RETRIEVAL_ENABLED: bool = True
+    AI_RETRIEVAL_TOP_K: int = 8
+    AI_RETRIEVAL_MIN_SCORE: float = 0.78
+    AI_RETRIEVAL_TOKEN_BUDGET: int = 1500
+    AI_PDF_DIRECT_MAX_TOKENS: int = 3000  # PDFs até esse tamanho vão inteiros
+    AI_PDF_CONTEXT_TOKEN_BUDGET: int = 3000  # trechos selecionados de PDFs maiores
+    AI_AUDIO_DIRECT_MAX_BYTES: int = 24 * 1024 * 1024  # limite de upload do Whisper
+    AI_AUDIO_SEGMENT_SECONDS: int = 600  # 10 min em WAV 16 kHz mono ~ 19 MB
+    AI_AUDIO_SILENCE_TOP_DB: int = 35
+    AI_AUDIO_TRANSCRIPTION_CONCURRENCY: int = 4
+    AI_AUDIO_ANALYSIS_WINDOW_SECONDS: int = 1800
+    AI_IMAGE_MAX_SIDE: int = 2048
+    AI_IMAGE_SHORT_SIDE: int = 768
+    AI_IMAGE_JPEG_QUALITY: int = 85
+    AI_IMAGE_MAX_TILES: int = 6
+    AI_IMAGE_OCR_ENABLED: bool = True
+    AI_IMAGE_OCR_LANG: str = "por+eng"
+    AI_IMAGE_TEXT_ONLY_MIN_WORDS: int = 30
+    AI_IMAGE_TEXT_ONLY_COVERAGE: float = 0.5
     
     # External Integrations
     N8N_BASE_URL: Optional[str] = None
@@ -42,6 +118,9 @@ class Settings(BaseSettings):
     SMTP_PORT: int = 587
     SMTP_USERNAME: Optional[str] = None
     SMTP_PASSWORD: Optional[str] = None
+    TEAMS_WEBHOOK_URL: Optional[str] = None
+    WHATSAPP_API_KEY: Optional[str] = None
+    WHATSAPP_PHONE_NUMBER: Optional[str] = None
     
     # File Storage (MinIO/S3)
     MINIO_ENDPOINT: str = "localhost:9000"
@@ -49,7 +128,63 @@ class Settings(BaseSettings):
     MINIO_SECRET_KEY: str = "minioadmin"
     MINIO_BUCKET_NAME: str = "milapp-files"
     MINIO_SECURE: bool = False
-    
+    MINIO_REGION: str = "us-east-1"
+    MINIO_PUBLIC_ENDPOINT: Optional[str] = None  # host:porta usado nas URLs pré-assinadas
+    STORAGE_PRESIGNED_URL_EXPIRES: int = 900  # segundos
+    STORAGE_MULTIPART_PART_SIZE: int = 16 * 1024 * 1024
+
+    # Blocos definidos por conteúdo (FastCDC) para versões e deduplicação
+    CHUNK_MIN_SIZE: int = 16 * 1024
+    CHUNK_AVG_SIZE: int = 64 * 1024
+    CHUNK_MAX_SIZE: int = 256 * 1024
+    CHUNK_TRANSFER_CONCURRENCY: int = 8
+    CHUNK_GC_BATCH: int = 1000  # blocos sem referência removidos por transação
+    CHUNK_GC_INTERVAL: int = 3600  # segundos entre coletas periódicas de blocos órfãos
+
+    # Quality gates
+    QUALITY_GATE_CONCURRENCY: int = 200  # verificações simultâneas por execução
+    QUALITY_GATE_CHECK_TIMEOUT: float = 300.0  # segundos por verificação
+    QUALITY_GATE_HTTP_TIMEOUT: float = 10.0
+    QUALITY_GATE_ALLOWED_HOSTS: List[str] = []  # destinos das verificações HTTP (nome, *.sufixo ou rede); vazio = hosts públicos
+    QUALITY_GATE_DENIED_HOSTS: List[str] = [  # sempre recusados, mesmo se liberados acima
+        "localhost", "backend", "worker", "redis", "minio", "prometheus", "grafana",
+        "metadata.google.internal", "169.254.0.0/16", "fd00:ec2::/32"
+    ]
+    DATA_VALIDATION_CHUNK_ROWS: int = 100_000  # linhas por lote na validação de dados
+    DATA_VALIDATION_MAX_KEYS: int = 50_000_000  # valores distintos por coluna em unicidade/referência (8 bytes cada)
+    PERFORMANCE_TEST_MAX_USERS: int = 500
+    QUALITY_GATE_CACHE_TTL: int = 7 * 24 * 3600  # validade do resultado por fingerprint (0 = sem expiração)
+    QUALITY_GATE_TREND_SHORT_ALPHA: float = 0.3  # peso da média móvel curta da nota
+    QUALITY_GATE_TREND_LONG_ALPHA: float = 0.05  # peso da média móvel longa da nota
+    QUALITY_GATE_TREND_TOLERANCE: float = 1.0  # pontos de diferença para sair de "stable"
+    PERFORMANCE_TEST_MAX_DURATION: int = 600  # segundos
+    PERFORMANCE_TEST_TIMEOUT_MARGIN: float = 60.0  # segundos além da duração planejada (perfil e requisições em andamento)
+
+    # Deployments
+    DEPLOYMENT_MAX_PARALLEL: int = 50  # hosts atualizados simultaneamente
+    DEPLOYMENT_HEALTH_RETRIES: int = 3
+    DEPLOYMENT_HEALTH_INTERVAL: float = 5.0  # segundos entre tentativas do health check
+    DEPLOYMENT_TARGET_TIMEOUT: float = 300.0  # segundos por host (publicação + health check)
+    DEPLOYMENT_HTTP_TIMEOUT: float = 30.0
+    DEPLOYMENT_HEARTBEAT_INTERVAL: float = 30.0  # segundos entre renovações do claim pelo worker
+    DEPLOYMENT_CLAIM_LEASE: float = 300.0  # claim sem renovação por esse tempo pode ser retomado
+    DEPLOYMENT_RUNNER_TOKENS: Dict[str, str] = {}  # credencial -> token dos agentes (targets[].credential)
+    DEPLOYMENT_RUNNER_ADDRESSES: Dict[str, List[str]] = {}  # credencial -> endereços (scheme://host:porta) dos agentes que a usam
+    DEPLOYMENT_ALLOW_SIMULATED_TARGETS: bool = False  # hosts em memória (driver 'simulated'), só para testes
+    DEPLOYMENT_CHUNK_CACHE_BYTES: int = 256 * 1024 * 1024  # blocos mantidos em memória durante a transferência
+    DEPLOYMENT_LOG_FLUSH_INTERVAL: float = 0.5  # segundos entre gravações em lote dos logs
+    DEPLOYMENT_LOG_BATCH_SIZE: int = 200  # linhas que forçam gravação imediata
+    DEPLOYMENT_LOG_BUFFER_MAX: int = 10000  # linhas retidas enquanto a gravação falha (as mais antigas saem)
+    DEPLOYMENT_LOG_STREAM_MAXLEN: int = 1000  # notificações mantidas para acompanhamento ao vivo
+    DORA_ENVIRONMENT: str = "production"  # ambiente considerado nas métricas DORA do dashboard
+    DORA_WINDOW_DAYS: int = 30  # janela da frequência de deploy
+
+    # Uploads
+    UPLOAD_SPOOL_DIR: str = "/app/uploads"
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 1 MB por leitura
+    UPLOAD_MAX_SIZE: int = 500 * 1024 * 1024  # 500 MB
+    UPLOAD_TO_OBJECT_STORAGE: bool = False
+
     # Monitoring
     PROMETHEUS_URL: Optional[str] = None
     GRAFANA_URL: Optional[str] = None
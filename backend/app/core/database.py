@@ -4,6 +4,7 @@ Configuração do banco de dados MILAPP
 
 import logging
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
@@ -26,6 +27,27 @@ engine = create_engine(
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _async_database_url(url: str) -> str:
+    """Mesma base com o driver asyncpg"""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+# Engine assíncrono usado pelos endpoints e serviços async
+async_engine = create_async_engine(
+    _async_database_url(DATABASE_URL),
+    pool_pre_ping=True,
+    pool_recycle=300,
+    pool_size=10,
+    max_overflow=20,
+    echo=settings.DEBUG
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
 # Create Base class
 Base = declarative_base()
 
@@ -41,11 +63,22 @@ def get_db():
     finally:
         db.close()
 
+async def get_session():
+    """Dependency to get async database session"""
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+        except Exception as e:
+            logger.error(f"Database session error: {e}")
+            await session.rollback()
+            raise
+
+
 def init_db():
     """Initialize database tables"""
     try:
         # Import all models to ensure they are registered
-        from app.models import user, project
+        from app.models import user, project, conversation, document, chunk, quality_gate, deployment, embedding
         
         # Create all tables
         Base.metadata.create_all(bind=engine)
@@ -3,7 +3,13 @@ MILAPP - Centro de Excelência em Automação RPA
 Backend API Principal
 """
 
+import time
+
+# Referência para medir o tempo de importação e de inicialização
+_STARTED_AT = time.perf_counter()
+
 import os
+import asyncio
 from contextlib import asynccontextmanager
 from typing import List
 
@@ -11,14 +17,18 @@ from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import text
 import structlog
 
+from app.core.capabilities import prewarm
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import async_engine, Base
 from app.core.security import get_current_user
 from app.api.v1.router import api_router
 from app.services.ai_service import AIService
+from app.services.cache_service import CacheService
+from app.services.conversation_service import ConversationService
 from app.services.notification_service import NotificationService
 
 # Configuração de logging
@@ -27,6 +37,11 @@ logger = structlog.get_logger()
 # Métricas Prometheus
 REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP requests', ['method', 'endpoint', 'status'])
 REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency')
+APP_IMPORT_SECONDS = Gauge('app_import_seconds', 'Time to import the application module')
+APP_STARTUP_SECONDS = Gauge('app_startup_seconds', 'Time from application import until ready to serve')
+
+# Prewarm em background (referência evita coleta prematura da task)
+_prewarm_tasks = set()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -35,14 +50,24 @@ async def lifespan(app: FastAPI):
     logger.info("Iniciando MILAPP Backend")
     
     # Criar tabelas se não existirem
-    async with engine.begin() as conn:
+    async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    await ConversationService.ensure_partitions()
     
     # Inicializar serviços
+    await CacheService.initialize()
     await AIService.initialize()
     await NotificationService.initialize()
     
-    logger.info("MILAPP Backend iniciado com sucesso")
+    # Dependências pesadas carregam no primeiro uso; prewarm opcional fora do caminho crítico
+    if settings.AI_PREWARM_CAPABILITIES:
+        task = asyncio.create_task(prewarm(settings.AI_PREWARM_CAPABILITIES))
+        _prewarm_tasks.add(task)
+        task.add_done_callback(_prewarm_tasks.discard)
+    
+    startup_seconds = time.perf_counter() - _STARTED_AT
+    APP_STARTUP_SECONDS.set(startup_seconds)
+    logger.info("MILAPP Backend iniciado com sucesso", startup_seconds=round(startup_seconds, 3))
     
     yield
     
@@ -50,6 +75,8 @@ async def lifespan(app: FastAPI):
     logger.info("Encerrando MILAPP Backend")
     await AIService.cleanup()
     await NotificationService.cleanup()
+    await CacheService.cleanup()
+    await async_engine.dispose()
 
 # Criação da aplicação FastAPI
 app = FastAPI(
@@ -79,7 +106,6 @@ app.add_middleware(
 # Middleware de métricas
 @app.middleware("http")
 async def metrics_middleware(request, call_next):
-    import time
     start_time = time.time()
     
     response = await call_next(request)
@@ -119,6 +145,8 @@ async def logging_middleware(request, call_next):
 # Incluir rotas da API
 app.include_router(api_router, prefix="/api/v1")
 
+APP_IMPORT_SECONDS.set(time.perf_counter() - _STARTED_AT)
+
 # Health check
 @app.get("/health")
 async def health_check():
@@ -135,8 +163,8 @@ async def ready_check():
     """Ready check para Kubernetes"""
     try:
         # Verificar conexão com banco
-        async with engine.begin() as conn:
-            await conn.execute("SELECT 1")
+        async with async_engine.begin() as conn:
+            await conn.execute(text("SELECT 1"))
         
         # Verificar serviços críticos
         ai_status = await AIService.check_health()
@@ -4,5 +4,11 @@ Database models for MILAPP
 
 from .user import User
 from .project import Project
+from .conversation import Conversation, Message
+from .document import Document, DocumentVersion
+from .chunk import ContentChunk
+from .quality_gate import QualityGate, QualityGateExecution, QualityGateMetrics, QualityGateDailyStats
+from .deployment import Deployment, DeploymentLog, DeploymentArtifact, DeploymentTargetState, DeploymentDoraStats, DeploymentDoraDaily
+from .embedding import EmbeddingChunk
 
-__all__ = ["User", "Project"] 
\ No newline at end of file
+__all__ = ["User", "Project", "Conversation", "Message", "Document", "DocumentVersion", "ContentChunk", "QualityGate", "QualityGateExecution", "QualityGateMetrics", "QualityGateDailyStats", "Deployment", "DeploymentLog", "DeploymentArtifact", "DeploymentTargetState", "DeploymentDoraStats", "DeploymentDoraDaily", "EmbeddingChunk"] 
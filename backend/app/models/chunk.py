@@ -0,0 +1,23 @@
+"""
+Modelo de blocos de conteúdo deduplicados
+"""
+
+from sqlalchemy import Column, String, DateTime, Integer
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class ContentChunk(Base):
+    """Bloco definido por conteúdo (FastCDC), gravado uma única vez no armazenamento"""
+
+    __tablename__ = "content_chunks"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=False)
+    # Quantos manifestos (versões/artefatos) usam o bloco; em zero ele é removido
+    ref_count = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ContentChunk(sha256={self.sha256[:12]}, size={self.size}, refs={self.ref_count})>"
@@ -0,0 +1,133 @@
+"""
+Modelos de Conversa e Mensagem
+
+Mensagens são gravadas em sequência (append) e lidas por faixa de `seq`:
+a tabela `messages` é particionada por mês em `created_at` e a chave
+primária começa por (conversation_id, seq), de modo que o histórico de uma
+conversa é uma varredura de índice já ordenada, sem sort.
+"""
+
+import uuid
+from datetime import date, datetime, timezone
+from typing import List, Tuple
+
+from sqlalchemy import (
+    Column, String, Text, DateTime, Integer, BigInteger, Float, ForeignKey,
+    Index, PrimaryKeyConstraint, DDL, event, text
+)
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class Conversation(Base):
+    """Conversa com a IA (cabeçalho; mensagens ficam em `messages`)"""
+
+    __tablename__ = "conversations"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    title = Column(String(255), nullable=False)
+    status = Column(String(30), nullable=False, default="active")
+
+    # Relacionamentos
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="SET NULL"), nullable=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+
+    # Resultado das análises
+    ai_summary = Column(Text, nullable=True)
+    extracted_requirements = Column(JSONB, nullable=False, default=list)
+    confidence_score = Column(Float, nullable=False, default=0.0)
+
+    # Último `seq` alocado: contador monotônico das mensagens da conversa
+    message_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relacionamentos
+    project = relationship("Project", back_populates="conversations")
+    user = relationship("User", back_populates="conversations")
+
+    __table_args__ = (
+        Index("ix_conversations_user_updated", "user_id", "updated_at"),
+        Index("ix_conversations_project", "project_id"),
+    )
+
+    def __repr__(self):
+        return f"<Conversation(id={self.id}, title='{self.title}', status='{self.status}')>"
+
+
+class Message(Base):
+    """Mensagem de uma conversa (tabela particionada por mês)"""
+
+    __tablename__ = "messages"
+
+    conversation_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("conversations.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    seq = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    # Identificador público (referência externa e índice semântico)
+    id = Column(UUID(as_uuid=True), nullable=False, default=uuid.uuid4)
+
+    type = Column(String(20), nullable=False)  # user, assistant, system
+    content = Column(Text, nullable=False)
+    ai_analysis = Column(JSONB, nullable=True)
+    token_count = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        # A chave de partição precisa estar na PK; (conversation_id, seq) na
+        # frente serve de índice para as leituras por faixa
+        PrimaryKeyConstraint("conversation_id", "seq", "created_at", name="pk_messages"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    def __repr__(self):
+        return f"<Message(conversation_id={self.conversation_id}, seq={self.seq}, type='{self.type}')>"
+
+
+def _month_start(value: date, offset: int = 0) -> date:
+    """Primeiro dia do mês `offset` meses depois de `value`"""
+    month = value.month - 1 + offset
+    return date(value.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"messages_{month:%Y_%m}"
+
+
+def message_partition_ddl(months_ahead: int, today: date = None) -> List[Tuple[str, str]]:
+    """(nome, comando idempotente) das partições do mês atual em diante"""
+    start = _month_start(today or datetime.now(timezone.utc).date())
+    statements = []
+    for offset in range(months_ahead + 1):
+        lower, upper = _month_start(start, offset), _month_start(start, offset + 1)
+        name = partition_name(lower)
+        statements.append((
+            name,
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF messages "
+            f"FOR VALUES FROM ('{lower.isoformat()} 00:00:00+00') TO ('{upper.isoformat()} 00:00:00+00')"
+        ))
+    return statements
+
+
+def ensure_message_partitions(connection, months_ahead: int) -> List[str]:
+    """Criar partições mensais que ainda não existem (conexão síncrona)"""
+    statements = message_partition_ddl(months_ahead)
+    for _, statement in statements:
+        connection.execute(text(statement))
+    return [name for name, _ in statements]
+
+
+# Partição default recebe linhas fora das faixas criadas (ex.: relógio adiantado)
+event.listen(
+    Message.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS messages_default PARTITION OF messages DEFAULT")
+)
@@ -0,0 +1,190 @@
+"""
+Modelo de Deployment
+"""
+
+import uuid
+from sqlalchemy import Column, String, Text, DateTime, Date, Integer, BigInteger, Float, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class Deployment(Base):
+    """Implantação de uma versão do projeto nos runners de um ambiente
+
+    `targets` lista os hosts ({"id", "driver", "address", ...}) e `strategy`
+    define estágios e verificações, por exemplo:
+    {"canary": 1, "batch_size": "25%", "max_parallel": 20,
+     "health_check": {"retries": 3, "interval": 5}, "auto_rollback": true}
+    """
+
+    __tablename__ = "deployments"
+    __table_args__ = (
+        # Filtros da listagem (projeto, status, ambiente) já na ordem de created_at
+        Index("ix_deployments_project_status_env_created", "project_id", "status", "environment", "created_at"),
+        # Listagem por projeto sem outros filtros (paginação por created_at, id)
+        Index("ix_deployments_project_created", "project_id", "created_at", "id"),
+        Index("ix_deployments_created_at", "created_at"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+
+    name = Column(String(255), nullable=False)
+    version = Column(String(100), nullable=False)
+    previous_version = Column(String(100), nullable=True)
+    environment = Column(String(50), nullable=False)
+    description = Column(Text, nullable=True)
+    changes = Column(JSONB, nullable=False, default=list)
+
+    artifact = Column(JSONB, nullable=False, default=dict)  # {"url", "sha256", "size"}
+    targets = Column(JSONB, nullable=False, default=list)
+    strategy = Column(JSONB, nullable=False, default=dict)
+
+    # pending, in_progress, completed, failed, rollback_in_progress, rolled_back
+    status = Column(String(30), nullable=False, default="pending")
+    result = Column(JSONB, nullable=True)  # estágios e estado de cada host
+    error = Column(Text, nullable=True)
+    job_id = Column(String(64), nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    deployed_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # renovado pelo worker durante a execução
+    deployed_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relacionamentos
+    project = relationship("Project", back_populates="deployments")
+
+    def __repr__(self):
+        return f"<Deployment(id={self.id}, version='{self.version}', status='{self.status}')>"
+
+
+class DeploymentLog(Base):
+    """Linha de log de um deployment (append-only)
+
+    O id é sequencial e serve de offset para retomar a leitura (Last-Event-ID).
+    """
+
+    __tablename__ = "deployment_logs"
+    __table_args__ = (
+        Index("ix_deployment_logs_deployment_offset", "deployment_id", "id"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    deployment_id = Column(UUID(as_uuid=True), ForeignKey("deployments.id", ondelete="CASCADE"), nullable=False)
+    job_id = Column(String(64), nullable=True)
+
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    level = Column(String(10), nullable=False, default="INFO")
+    stage = Column(String(50), nullable=True)
+    target = Column(String(255), nullable=True)
+    message = Column(Text, nullable=False)
+
+    def __repr__(self):
+        return f"<DeploymentLog(id={self.id}, deployment_id={self.deployment_id}, level='{self.level}')>"
+
+
+class DeploymentArtifact(Base):
+    """Pacote implantável endereçado por conteúdo
+
+    O conteúdo fica no ChunkStore como manifesto de blocos (FastCDC): versões
+    próximas do mesmo bot compartilham a maior parte dos blocos, tanto no
+    armazenamento quanto na transferência para os runners.
+    """
+
+    __tablename__ = "deployment_artifacts"
+    __table_args__ = (
+        UniqueConstraint("project_id", "sha256", name="uq_deployment_artifacts_project_sha256"),
+        Index("ix_deployment_artifacts_project_created", "project_id", "created_at"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    version = Column(String(100), nullable=False)
+    filename = Column(String(255), nullable=True)
+    sha256 = Column(String(64), nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    manifest = Column(JSONB, nullable=False)  # [[sha256, tamanho], ...]
+    stored_bytes = Column(BigInteger, nullable=False, default=0)  # bytes de blocos novos no armazenamento
+
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<DeploymentArtifact(id={self.id}, version='{self.version}', sha256={self.sha256[:12]})>"
+
+
+class DeploymentTargetState(Base):
+    """Versão ativa e artefato pré-carregado de cada runner por ambiente
+
+    Base do cálculo de delta: só os blocos ausentes do artefato que o host já
+    tem (ativo ou pré-carregado) são enviados.
+    """
+
+    __tablename__ = "deployment_target_states"
+
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    environment = Column(String(50), primary_key=True)
+    target_id = Column(String(255), primary_key=True)
+
+    version = Column(String(100), nullable=True)
+    artifact_sha256 = Column(String(64), nullable=True)  # artefato ativo
+    staged_sha256 = Column(String(64), nullable=True)  # artefato pronto para a troca
+    staged_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<DeploymentTargetState(target_id='{self.target_id}', version='{self.version}')>"
+
+
+class DeploymentDoraStats(Base):
+    """Métricas DORA acumuladas por projeto e ambiente (leitura O(1))
+
+    Atualizadas a cada transição final de deployment, sem reler o histórico.
+    `incident_started_at` marca a falha ainda não recuperada; o próximo
+    deploy concluído (ou rollback) fecha o incidente e soma o tempo de
+    recuperação.
+    """
+
+    __tablename__ = "deployment_dora_stats"
+
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    environment = Column(String(50), primary_key=True)
+
+    deployments = Column(BigInteger, nullable=False, default=0)
+    successful_deployments = Column(BigInteger, nullable=False, default=0)
+    change_failures = Column(BigInteger, nullable=False, default=0)
+    duration_ms_sum = Column(BigInteger, nullable=False, default=0)
+    lead_time_seconds_sum = Column(Float, nullable=False, default=0.0)
+    lead_time_count = Column(BigInteger, nullable=False, default=0)
+    restore_seconds_sum = Column(Float, nullable=False, default=0.0)
+    restores = Column(BigInteger, nullable=False, default=0)
+    incident_started_at = Column(DateTime(timezone=True), nullable=True)
+    last_deployed_at = Column(DateTime(timezone=True), nullable=True)
+    last_healthy_at = Column(DateTime(timezone=True), nullable=True)  # última troca concluída ou rollback bem-sucedido
+
+    def __repr__(self):
+        return f"<DeploymentDoraStats(project_id={self.project_id}, environment='{self.environment}', deployments={self.deployments})>"
+
+
+class DeploymentDoraDaily(Base):
+    """Série diária de deployments por projeto e ambiente (UTC), base da frequência"""
+
+    __tablename__ = "deployment_dora_daily"
+
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    environment = Column(String(50), primary_key=True)
+    day = Column(Date, primary_key=True)
+    deployments = Column(Integer, nullable=False, default=0)
+    successful_deployments = Column(Integer, nullable=False, default=0)
+    change_failures = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DeploymentDoraDaily(project_id={self.project_id}, environment='{self.environment}', day={self.day})>"
@@ -0,0 +1,90 @@
+"""
+Modelo de Documento
+"""
+
+import uuid
+from sqlalchemy import Column, String, Text, DateTime, Integer, BigInteger, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class Document(Base):
+    """Documento de projeto (metadados; o conteúdo fica no armazenamento de objetos)"""
+
+    __tablename__ = "documents"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    # Informações básicas
+    name = Column(String(255), nullable=False)
+    type = Column(String(50), nullable=False)
+    description = Column(Text, nullable=True)
+    tags = Column(JSONB, nullable=False, default=list)
+    status = Column(String(30), nullable=False, default="pending")  # uploading, pending, approved, rejected
+
+    # Relacionamentos
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    uploaded_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+
+    # Conteúdo
+    filename = Column(String(255), nullable=True)
+    content_type = Column(String(255), nullable=False, default="application/octet-stream")
+    size_bytes = Column(BigInteger, nullable=True)
+    sha256 = Column(String(64), nullable=True)
+    storage_key = Column(String(512), nullable=False)
+    version = Column(Integer, nullable=False, default=1)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relacionamentos
+    project = relationship("Project", back_populates="documents")
+    uploader = relationship("User")
+
+    __table_args__ = (
+        Index("ix_documents_project_type", "project_id", "type"),
+        Index("ix_documents_storage_key", "storage_key"),
+    )
+
+    def __repr__(self):
+        return f"<Document(id={self.id}, name='{self.name}', status='{self.status}')>"
+
+
+class DocumentVersion(Base):
+    """Versão de um documento
+
+    A versão atual fica inteira em `storage_key`; depois de substituída ela é
+    convertida em background para manifesto de blocos (ver ChunkStore), que
+    compartilha os blocos iguais com as demais versões.
+    """
+
+    __tablename__ = "document_versions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False)
+
+    filename = Column(String(255), nullable=True)
+    content_type = Column(String(255), nullable=False, default="application/octet-stream")
+    size_bytes = Column(BigInteger, nullable=True)
+    sha256 = Column(String(64), nullable=True)
+
+    # Objeto inteiro (versão atual) ou lista [sha256, tamanho] dos blocos
+    storage_key = Column(String(512), nullable=True)
+    manifest = Column(JSONB, nullable=True)
+    stored_bytes = Column(BigInteger, nullable=True)  # bytes de blocos novos gravados por esta versão
+
+    comment = Column(Text, nullable=True)
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("document_id", "version", name="uq_document_versions_version"),
+        Index("ix_document_versions_storage_key", "storage_key"),
+    )
+
+    def __repr__(self):
+        return f"<DocumentVersion(document_id={self.document_id}, version={self.version})>"
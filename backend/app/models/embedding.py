@@ -0,0 +1,61 @@
+"""
+Modelo de trechos indexados para busca semântica
+"""
+
+import uuid
+from sqlalchemy import Column, String, Text, DateTime, Integer, Index, UniqueConstraint, DDL, event
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.sql import func
+from pgvector.sqlalchemy import Vector
+
+from app.core.config import settings
+from app.core.database import Base
+
+
+class EmbeddingChunk(Base):
+    """Trecho de conversa ou documento com seu vetor de embedding"""
+
+    __tablename__ = "embedding_chunks"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    # Origem do trecho
+    source_type = Column(String(30), nullable=False)  # message, document, file
+    source_id = Column(String(255), nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+
+    # Filtros de busca
+    project_id = Column(UUID(as_uuid=True), nullable=True)
+    conversation_id = Column(String(255), nullable=True)
+
+    # Conteúdo
+    title = Column(String(255), nullable=True)
+    content = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    extra = Column(JSONB, nullable=True)
+    embedding = Column(Vector(settings.EMBEDDING_DIMENSIONS), nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("source_type", "source_id", "chunk_index", name="uq_embedding_chunks_source"),
+        # Índice HNSW para k-NN por distância de cosseno
+        Index(
+            "ix_embedding_chunks_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"}
+        ),
+        Index("ix_embedding_chunks_project_type", "project_id", "source_type"),
+        Index("ix_embedding_chunks_conversation", "conversation_id"),
+    )
+
+
+# Extensão pgvector precisa existir antes da tabela
+event.listen(
+    EmbeddingChunk.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS vector")
+)
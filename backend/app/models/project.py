@@ -32,7 +32,7 @@ class Project(Base):
     
     # Relacionamentos
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    team_id = Column(UUID(as_uuid=True), ForeignKey("teams.id"), nullable=True)
+    team_id = Column(UUID(as_uuid=True), nullable=True)  # FK para teams quando o modelo existir
     
     # Métricas de negócio
     roi_target = Column(Numeric(10, 2), nullable=True)
@@ -51,12 +51,14 @@ class Project(Base):
     
     # Relacionamentos
     user = relationship("User", back_populates="projects")
-    team = relationship("Team", back_populates="projects")
     conversations = relationship("Conversation", back_populates="project")
     documents = relationship("Document", back_populates="project")
-    tickets = relationship("Ticket", back_populates="project")
     quality_gates = relationship("QualityGate", back_populates="project")
     deployments = relationship("Deployment", back_populates="project")
+    # Modelos ainda não implementados (relacionamentos para classes inexistentes
+    # impedem a configuração dos mappers):
+    # team = relationship("Team", back_populates="projects")
+    # tickets = relationship("Ticket", back_populates="project")
     
     def __repr__(self):
         return f"<Project(id={self.id}, name='{self.name}', status='{self.status}')>"
@@ -0,0 +1,140 @@
+"""
+Modelos de Quality Gate e execuções
+"""
+
+import uuid
+from sqlalchemy import Column, String, Text, DateTime, Date, Float, Integer, BigInteger, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class QualityGate(Base):
+    """Quality gate de um projeto
+
+    `criteria` lista as verificações executadas pelo motor, por exemplo:
+    {"name": "Completude dos dados", "check": "data_validation",
+     "config": {...}, "weight": 1, "threshold": 90, "required": true, "timeout": 120}
+    """
+
+    __tablename__ = "quality_gates"
+    __table_args__ = (
+        # Filtros da listagem (projeto, status) já na ordem de created_at
+        Index("ix_quality_gates_project_status_created", "project_id", "status", "created_at"),
+        # Listagem por projeto sem outros filtros (paginação por created_at, id)
+        Index("ix_quality_gates_project_created", "project_id", "created_at", "id"),
+        Index("ix_quality_gates_created_at", "created_at"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+
+    name = Column(String(255), nullable=False)
+    type = Column(String(50), nullable=False)  # data_validation, performance_test, security_test, ...
+    description = Column(Text, nullable=True)
+    threshold = Column(Float, nullable=False, default=90.0)
+    criteria = Column(JSONB, nullable=False, default=list)
+    config = Column(JSONB, nullable=False, default=dict)  # ex.: {"fail_fast": true}
+
+    # Resultado da última execução
+    status = Column(String(30), nullable=False, default="pending")  # pending, running, passed, failed, error
+    score = Column(Float, nullable=True)
+    last_execution_id = Column(UUID(as_uuid=True), nullable=True)
+    executed_at = Column(DateTime(timezone=True), nullable=True)
+    executed_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relacionamentos
+    project = relationship("Project", back_populates="quality_gates")
+
+    def __repr__(self):
+        return f"<QualityGate(id={self.id}, name='{self.name}', status='{self.status}')>"
+
+
+class QualityGateExecution(Base):
+    """Resultado de uma execução de quality gate
+
+    Tabela somente de inserção: linhas entram em ordem de executed_at, por isso
+    o índice BRIN (poucos KB mesmo com milhões de linhas) atende consultas por
+    período. Métricas vêm das tabelas de agregados, não de varreduras aqui.
+    """
+
+    __tablename__ = "quality_gate_executions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    quality_gate_id = Column(UUID(as_uuid=True), ForeignKey("quality_gates.id", ondelete="CASCADE"), nullable=False)
+    project_id = Column(UUID(as_uuid=True), nullable=False)
+    job_id = Column(String(64), nullable=True)
+
+    status = Column(String(30), nullable=False)  # passed, failed, error
+    score = Column(Float, nullable=True)
+    threshold = Column(Float, nullable=False)
+    results = Column(JSONB, nullable=False, default=list)  # resultado de cada critério
+    logs = Column(JSONB, nullable=False, default=list)
+    duration_ms = Column(Integer, nullable=True)
+
+    # Hash das entradas (definição do gate, documentos e artefatos); execuções
+    # reaproveitadas apontam para a execução que calculou o resultado
+    input_fingerprint = Column(String(64), nullable=True)
+    cached_from_id = Column(UUID(as_uuid=True), nullable=True)
+
+    executed_by = Column(UUID(as_uuid=True), nullable=True)
+    executed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_quality_gate_executions_gate", "quality_gate_id", "executed_at"),
+        Index("ix_quality_gate_executions_executed_at_brin", "executed_at", postgresql_using="brin"),
+        Index("ix_quality_gate_executions_fingerprint", "quality_gate_id", "input_fingerprint"),
+    )
+
+    def __repr__(self):
+        return f"<QualityGateExecution(id={self.id}, status='{self.status}', score={self.score})>"
+
+
+class QualityGateMetrics(Base):
+    """Agregado acumulado por gate, atualizado a cada execução (leitura O(1))
+
+    A tendência compara duas médias móveis exponenciais da nota: uma curta
+    (reage às últimas execuções) e uma longa (histórico).
+    """
+
+    __tablename__ = "quality_gate_metrics"
+
+    quality_gate_id = Column(UUID(as_uuid=True), ForeignKey("quality_gates.id", ondelete="CASCADE"), primary_key=True)
+    total_executions = Column(BigInteger, nullable=False, default=0)
+    passed_executions = Column(BigInteger, nullable=False, default=0)
+    failed_executions = Column(BigInteger, nullable=False, default=0)
+    error_executions = Column(BigInteger, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    score_ewma_short = Column(Float, nullable=True)
+    score_ewma_long = Column(Float, nullable=True)
+    last_status = Column(String(30), nullable=True)
+    last_score = Column(Float, nullable=True)
+    last_execution_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<QualityGateMetrics(quality_gate_id={self.quality_gate_id}, total={self.total_executions})>"
+
+
+class QualityGateDailyStats(Base):
+    """Série diária de execuções por gate (UTC)"""
+
+    __tablename__ = "quality_gate_daily_stats"
+
+    quality_gate_id = Column(UUID(as_uuid=True), ForeignKey("quality_gates.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    executions = Column(Integer, nullable=False, default=0)
+    passed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    errors = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    duration_ms_sum = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<QualityGateDailyStats(quality_gate_id={self.quality_gate_id}, day={self.day})>"
@@ -33,10 +33,11 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Relacionamentos
-    projects = relationship("Project", back_populates="created_by_user")
+    projects = relationship("Project", back_populates="user")
     conversations = relationship("Conversation", back_populates="user")
-    tickets = relationship("Ticket", back_populates="assigned_user")
-    audit_logs = relationship("AuditLog", back_populates="user")
+    # Modelos ainda não implementados:
+    # tickets = relationship("Ticket", back_populates="assigned_user")
+    # audit_logs = relationship("AuditLog", back_populates="user")
     
     @classmethod
     async def get_by_id(cls, user_id: str):
@@ -7,11 +7,37 @@ from .auth_service import AuthService
 from .notification_service import NotificationService
 from .project_service import ProjectService
 from .analytics_service import AnalyticsService
+from .storage_service import StorageService
+from .cache_service import CacheService
+from .llm_gateway import LLMGateway
+from .batch_service import BatchService
+from .embedding_service import EmbeddingService
+from .conversation_service import ConversationService
+from .document_service import DocumentService
+from .chunk_store import ChunkStore
+from .quality_gate_engine import QualityGateEngine
+from .quality_gate_service import QualityGateService
+from .deployment_engine import DeploymentEngine
+from .deployment_service import DeploymentService
+from .dora_metrics import DoraMetricsService
 
 __all__ = [
     "AIService",
     "AuthService", 
     "NotificationService",
     "ProjectService",
-    "AnalyticsService"
+    "AnalyticsService",
+    "StorageService",
+    "CacheService",
+    "LLMGateway",
+    "BatchService",
+    "EmbeddingService",
+    "ConversationService",
+    "DocumentService",
+    "ChunkStore",
+    "QualityGateEngine",
+    "QualityGateService",
+    "DeploymentEngine",
+    "DeploymentService",
+    "DoraMetricsService"
 ] 
\ No newline at end of file
@@ -2,47 +2,110 @@
 Serviço de IA do MILAPP
 """
 
+import os
 import asyncio
 import json
 import base64
-from typing import List, Dict, Optional, Any
+import math
+import hashlib
+import mimetypes
+from typing import List, Dict, Optional, Any, Callable, Awaitable
 from datetime import datetime
 import structlog
 
 from app.core.config import settings
+from app.services.cache_service import CacheService
+from app.services.conversation_memory import count_tokens, truncate_to_tokens
+from app.services.embedding_service import EmbeddingService, SOURCE_FILE, file_source_id
+from app.services.extraction_service import ExtractionService
+from app.services.llm_gateway import (
+    LLMGateway,
+    TASK_ANALYSIS,
+    TASK_CLASSIFICATION,
+    TASK_SUMMARIZATION,
+    TASK_VISION
+)
+from app.services.image_processing import prepare_image, is_text_only
+from app.services.audio_processing import AudioSegment, TranscriptAssembler, iter_segments, probe_duration
+from app.services.storage_service import StorageService, SpooledUpload
 
 logger = structlog.get_logger()
 
+# Callback de progresso: (fração 0..1, mensagem opcional)
+ProgressCallback = Callable[[float, Optional[str]], Awaitable[None]]
+
+# Limite de texto extraído de PDFs e arquivos texto enviados para análise
+MAX_EXTRACTED_TEXT_CHARS = 200_000
+
+# Campos estruturados extraídos por tipo de análise
+TEXT_ANALYSIS_FIELDS = (
+    "automation_opportunities",
+    "technical_requirements",
+    "complexity_estimate",
+    "tool_recommendations",
+    "next_steps"
+)
+IMAGE_ANALYSIS_FIELDS = (
+    "ui_elements",
+    "process_flow",
+    "automation_opportunities",
+    "technical_requirements",
+    "complexity_estimate"
+)
+PDF_ANALYSIS_FIELDS = (
+    "business_processes",
+    "functional_requirements",
+    "technical_requirements",
+    "stakeholders",
+    "automation_opportunities",
+    "acceptance_criteria",
+    "complexity_estimate"
+)
+
+TEXT_ANALYSIS_SYSTEM_PROMPT = """
+Você é um assistente especializado em automação RPA (Robotic Process Automation).
+Sua função é ajudar a identificar oportunidades de automação e extrair requisitos
+de processos de negócio.
+
+Analise a mensagem do usuário e forneça:
+1. Identificação de processos candidatos à automação
+2. Requisitos técnicos identificados
+3. Estimativa de complexidade
+4. Recomendações de ferramentas RPA
+5. Próximos passos sugeridos
+"""
+
+# Versão dos prompts de análise; alterar invalida análises em cache
+ANALYSIS_CACHE_VERSION = "v3"
+
+# Consulta usada para escolher os trechos mais relevantes de PDFs longos
+PDF_RETRIEVAL_QUERY = (
+    "processos de negócio, etapas e regras; requisitos funcionais e técnicos; "
+    "sistemas envolvidos; stakeholders e responsabilidades; critérios de aceite; "
+    "volumes, frequência e oportunidades de automação"
+)
+
+# Limite de tokens do texto usado como consulta de busca
+RETRIEVAL_QUERY_MAX_TOKENS = 2000
+
 
 class AIService:
     """Serviço de IA para processamento multimodal"""
     
-    def __init__(self):
-        self.openai_client = None
-        self.langchain_llm = None
-        self.whisper_model = None
-        self.initialized = False
+    # Análises em andamento por chave de cache (evita análises duplicadas concorrentes)
+    _inflight_analyses: Dict[str, asyncio.Future] = {}
+    
+    initialized = False
     
     @classmethod
     async def initialize(cls):
         """Inicializar serviço de IA"""
         try:
-            import openai
-            from langchain_openai import ChatOpenAI
-            from langchain.schema import HumanMessage, SystemMessage
-            
-            # Configurar cliente OpenAI
-            openai.api_key = settings.OPENAI_API_KEY
-            cls.openai_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-            
-            # Configurar LangChain
-            cls.langchain_llm = ChatOpenAI(
-                model_name=settings.AI_MODEL_NAME,
-                temperature=settings.AI_TEMPERATURE,
-                max_tokens=settings.AI_MAX_TOKENS
-            )
+            # Provedores e roteamento de modelos ficam no gateway
+            cls.initialized = await LLMGateway.initialize()
+            if not cls.initialized:
+                raise Exception("Nenhum provedor de IA configurado")
             
-            cls.initialized = True
             logger.info("AI Service initialized successfully")
             
         except Exception as e:
@@ -53,8 +116,7 @@ class AIService:
     async def cleanup(cls):
         """Limpar recursos do serviço de IA"""
         try:
-            if cls.openai_client:
-                await cls.openai_client.close()
+            await LLMGateway.cleanup()
             logger.info("AI Service cleaned up")
         except Exception as e:
             logger.error("AI Service cleanup failed", error=str(e))
@@ -66,10 +128,10 @@ class AIService:
             if not cls.initialized:
                 return False
             
-            # Testar conexão com OpenAI
-            response = await cls.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": "Hello"}],
+            # Testar o modelo mais barato disponível
+            response = await LLMGateway.complete(
+                TASK_CLASSIFICATION,
+                [{"role": "user", "content": "Hello"}],
                 max_tokens=10
             )
             
@@ -80,56 +142,52 @@ class AIService:
             return False
     
     @classmethod
-    async def process_text_message(cls, message: str, context: Dict = None) -> Dict:
-        """Processar mensagem de texto"""
+    async def process_text_message(
+        cls,
+        message: str,
+        context: Dict = None,
+        history: Optional[List[Dict]] = None,
+        project_id: Optional[str] = None,
+        conversation_id: Optional[str] = None
+    ) -> Dict:
+        """Processar mensagem de texto (history: turnos anteriores já dentro do orçamento).
+        
+        Com project_id (ou conversation_id), trechos relevantes de documentos e
+        conversas anteriores são recuperados e incluídos no prompt.
+        """
         try:
             if not cls.initialized:
                 raise Exception("AI Service not initialized")
             
-            # Construir prompt com contexto
-            system_prompt = """
-            Você é um assistente especializado em automação RPA (Robotic Process Automation).
-            Sua função é ajudar a identificar oportunidades de automação e extrair requisitos
-            de processos de negócio.
-            
-            Analise a mensagem do usuário e forneça:
-            1. Identificação de processos candidatos à automação
-            2. Requisitos técnicos identificados
-            3. Estimativa de complexidade
-            4. Recomendações de ferramentas RPA
-            5. Próximos passos sugeridos
-            """
+            retrieved = await cls._retrieve_related(message, project_id, conversation_id)
             
+            # Construir prompt com contexto
             user_prompt = f"""
             Mensagem do usuário: {message}
             
             Contexto adicional: {json.dumps(context) if context else 'Nenhum'}
-            
+            {cls._retrieved_block(retrieved)}
             Por favor, analise e forneça uma resposta estruturada.
             """
             
-            # Processar com OpenAI
-            response = await cls.openai_client.chat.completions.create(
-                model=settings.AI_MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": system_prompt},
+            response = await LLMGateway.complete(
+                TASK_ANALYSIS,
+                [
+                    {"role": "system", "content": TEXT_ANALYSIS_SYSTEM_PROMPT},
+                    *(history or []),
                     {"role": "user", "content": user_prompt}
-                ],
-                temperature=settings.AI_TEMPERATURE,
-                max_tokens=settings.AI_MAX_TOKENS
+                ]
             )
             
-            ai_response = response.choices[0].message.content
+            ai_response = response.content
             
-            # Estruturar resposta
+            # Estruturar resposta (todos os campos em uma única extração)
+            structured = await ExtractionService.extract(ai_response, TEXT_ANALYSIS_FIELDS)
             structured_response = {
                 "raw_response": ai_response,
-                "automation_opportunities": cls._extract_automation_opportunities(ai_response),
-                "technical_requirements": cls._extract_technical_requirements(ai_response),
-                "complexity_estimate": cls._extract_complexity_estimate(ai_response),
-                "tool_recommendations": cls._extract_tool_recommendations(ai_response),
-                "next_steps": cls._extract_next_steps(ai_response),
-                "confidence_score": cls._calculate_confidence_score(ai_response),
+                **structured,
+                "retrieved_sources": EmbeddingService.describe_sources(retrieved),
+                "model": response.model,
                 "processing_timestamp": datetime.utcnow().isoformat()
             }
             
@@ -148,14 +206,150 @@ class AIService:
             }
     
     @classmethod
-    async def process_image(cls, image_data: bytes, description: str = None) -> Dict:
-        """Processar imagem com análise visual"""
+    async def process_text_batch(cls, items: List[Dict], context: Dict = None) -> Dict[str, Dict]:
+        """Analisar várias mensagens curtas em uma única chamada (análise e campos estruturados).
+        
+        items: [{"id": ..., "content": ..., "context": ...}]. Retorna as análises por id; itens
+        ausentes na resposta do modelo ficam de fora e devem ser reprocessados.
+        """
+        if not cls.initialized:
+            raise Exception("AI Service not initialized")
+        
+        listing = "\n\n".join(
+            f"### Item {item['id']}\n"
+            + (f"Contexto do item: {json.dumps(item['context'])}\n" if item.get("context") else "")
+            + item["content"]
+            for item in items
+        )
+        user_prompt = f"""
+        Analise separadamente cada item abaixo, como se fosse uma mensagem independente.
+        
+        Contexto adicional: {json.dumps(context) if context else 'Nenhum'}
+        
+        {listing}
+        
+        Registre um resultado por item, usando o mesmo item_id.
+        """
+        
+        response = await LLMGateway.complete(
+            TASK_ANALYSIS,
+            [
+                {"role": "system", "content": TEXT_ANALYSIS_SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            max_tokens=settings.AI_BATCH_MAX_OUTPUT_TOKENS,
+            tool={
+                "name": "registrar_analises",
+                "description": "Registra a análise de cada item do lote",
+                "parameters": ExtractionService.batch_schema(TEXT_ANALYSIS_FIELDS)
+            }
+        )
+        
+        expected = {str(item["id"]) for item in items}
+        results: Dict[str, Dict] = {}
+        for entry in (response.tool_arguments or {}).get("resultados", []):
+            item_id = str(entry.get("item_id", ""))
+            analysis = entry.get("analise") or ""
+            if item_id not in expected or item_id in results or not analysis:
+                continue
+            results[item_id] = {
+                "raw_response": analysis,
+                **ExtractionService.validate(entry, TEXT_ANALYSIS_FIELDS, analysis),
+                "model": response.model,
+                "batched": True,
+                "processing_timestamp": datetime.utcnow().isoformat()
+            }
+        
+        logger.info("Text batch processed",
+                   items=len(items),
+                   returned=len(results),
+                   model=response.model)
+        
+        return results
+    
+    @classmethod
+    async def summarize_conversation(
+        cls,
+        previous_summary: str,
+        turns: List[Dict],
+        max_tokens: int
+    ) -> str:
+        """Atualizar o resumo da conversa incorporando turnos antigos"""
+        transcript = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+        
         try:
             if not cls.initialized:
                 raise Exception("AI Service not initialized")
             
-            # Converter imagem para base64
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
+            response = await LLMGateway.complete(
+                TASK_SUMMARIZATION,
+                [
+                    {
+                        "role": "system",
+                        "content": "Atualize o resumo de uma conversa sobre automação de processos. "
+                                   "Preserve processos, sistemas, requisitos, decisões e pendências. "
+                                   "Responda apenas com o novo resumo, de forma concisa."
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Resumo atual:\n{previous_summary or 'Nenhum'}\n\n"
+                                   f"Novos trechos da conversa:\n{transcript}"
+                    }
+                ],
+                max_tokens=max_tokens,
+                temperature=0
+            )
+            return response.content.strip()
+        
+        except Exception as e:
+            # Sem LLM: manter o final do resumo anterior + trechos, dentro do limite
+            logger.warning("Conversation summarization failed, truncating", error=str(e))
+            combined = f"{previous_summary}\n{transcript}".strip()
+            return combined[-max_tokens * 4:]
+    
+    @classmethod
+    async def process_image(cls, image_path: str, description: str = None) -> Dict:
+        """Processar imagem com pré-processamento local e análise visual"""
+        try:
+            if not cls.initialized:
+                raise Exception("AI Service not initialized")
+            
+            # Reduzir à resolução útil do modelo, recomprimir e fatiar; OCR local opcional
+            prepared = await asyncio.to_thread(
+                prepare_image,
+                image_path,
+                max_side=settings.AI_IMAGE_MAX_SIDE,
+                short_side=settings.AI_IMAGE_SHORT_SIDE,
+                jpeg_quality=settings.AI_IMAGE_JPEG_QUALITY,
+                max_tiles=settings.AI_IMAGE_MAX_TILES,
+                run_ocr=settings.AI_IMAGE_OCR_ENABLED,
+                ocr_lang=settings.AI_IMAGE_OCR_LANG
+            )
+            preprocessing = {
+                "original_size": prepared["original_size"],
+                "tiles": prepared["tile_sizes"],
+                "encoded_bytes": prepared["encoded_bytes"],
+                "ocr_word_count": prepared["ocr_word_count"]
+            }
+            
+            # Imagens só com texto (documentos, planilhas) dispensam a chamada de visão
+            if is_text_only(
+                prepared,
+                min_words=settings.AI_IMAGE_TEXT_ONLY_MIN_WORDS,
+                min_coverage=settings.AI_IMAGE_TEXT_ONLY_COVERAGE
+            ):
+                text_analysis = await cls.process_text_message(
+                    prepared["ocr_text"],
+                    context={"source": "image_ocr", "description": description}
+                )
+                logger.info("Image processed with local OCR only",
+                           ocr_words=prepared["ocr_word_count"])
+                return {
+                    **text_analysis,
+                    "ocr_text": prepared["ocr_text"],
+                    "vision_skipped": True,
+                    "image_preprocessing": preprocessing
+                }
             
             # Construir prompt para análise de imagem
             system_prompt = """
@@ -168,51 +362,59 @@ class AIService:
             5. Estimativa de complexidade
             """
             
+            ocr_hint = ""
+            if prepared["ocr_text"]:
+                ocr_hint = f"\nTexto extraído por OCR (pode conter erros): {prepared['ocr_text'][:2000]}\n"
+            
             user_prompt = f"""
             Analise esta imagem de interface/processo:
             
             Descrição adicional: {description if description else 'Nenhuma'}
-            
+            {ocr_hint}
+            A imagem foi dividida em {len(prepared['tiles'])} parte(s) sequenciais.
             Forneça uma análise detalhada dos elementos visíveis e oportunidades de automação.
             """
             
-            # Processar com OpenAI Vision
-            response = await cls.openai_client.chat.completions.create(
-                model="gpt-4-vision-preview",
-                messages=[
+            image_parts = [
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{base64.b64encode(tile).decode('utf-8')}",
+                        "detail": "high"
+                    }
+                }
+                for tile in prepared["tiles"]
+            ]
+            
+            response = await LLMGateway.complete(
+                TASK_VISION,
+                [
                     {"role": "system", "content": system_prompt},
                     {
                         "role": "user",
-                        "content": [
-                            {"type": "text", "text": user_prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_base64}"
-                                }
-                            }
-                        ]
+                        "content": [{"type": "text", "text": user_prompt}, *image_parts]
                     }
                 ],
                 max_tokens=1000
             )
             
-            vision_analysis = response.choices[0].message.content
+            vision_analysis = response.content
             
-            # Estruturar resposta
+            # Estruturar resposta (todos os campos em uma única extração)
+            structured = await ExtractionService.extract(vision_analysis, IMAGE_ANALYSIS_FIELDS)
             structured_response = {
                 "raw_response": vision_analysis,
-                "ui_elements": cls._extract_ui_elements(vision_analysis),
-                "process_flow": cls._extract_process_flow(vision_analysis),
-                "automation_opportunities": cls._extract_automation_opportunities(vision_analysis),
-                "technical_requirements": cls._extract_technical_requirements(vision_analysis),
-                "complexity_estimate": cls._extract_complexity_estimate(vision_analysis),
-                "confidence_score": cls._calculate_confidence_score(vision_analysis),
+                **structured,
+                "model": response.model,
+                "ocr_text": prepared["ocr_text"],
+                "vision_skipped": False,
+                "image_preprocessing": preprocessing,
                 "processing_timestamp": datetime.utcnow().isoformat()
             }
             
             logger.info("Image processed successfully", 
-                       image_size=len(image_data),
+                       original_size=prepared["original_size"],
+                       encoded_bytes=prepared["encoded_bytes"],
                        confidence_score=structured_response["confidence_score"])
             
             return structured_response
@@ -226,12 +428,33 @@ class AIService:
             }
     
     @classmethod
-    async def process_pdf(cls, pdf_content: str, filename: str = None) -> Dict:
-        """Processar documento PDF"""
+    async def process_pdf(
+        cls,
+        pdf_content: str,
+        filename: str = None,
+        description: str = None,
+        source_id: Optional[str] = None,
+        project_id: Optional[str] = None,
+        conversation_id: Optional[str] = None
+    ) -> Dict:
+        """Processar documento PDF.
+        
+        Documentos curtos vão inteiros; nos longos, apenas os trechos mais
+        relevantes (recuperados do índice vetorial) entram no prompt.
+        """
         try:
             if not cls.initialized:
                 raise Exception("AI Service not initialized")
             
+            document_excerpt, excerpt_method = await cls._select_pdf_content(
+                pdf_content, filename, description, source_id, project_id, conversation_id
+            )
+            retrieved = await cls._retrieve_related(
+                description or document_excerpt,
+                project_id,
+                exclude_source_ids=[source_id] if source_id else None
+            )
+            
             # Construir prompt para análise de PDF
             system_prompt = """
             Você é um especialista em análise de documentos de negócio.
@@ -248,35 +471,31 @@ class AIService:
             Analise este documento PDF:
             
             Nome do arquivo: {filename if filename else 'Documento'}
-            Conteúdo: {pdf_content[:4000]}  # Limitar tamanho
-            
+            Descrição adicional: {description if description else 'Nenhuma'}
+            Conteúdo{' (trechos mais relevantes, em ordem)' if excerpt_method == 'retrieval' else ''}:
+            {document_excerpt}
+            {cls._retrieved_block(retrieved)}
             Extraia informações estruturadas sobre processos e requisitos.
             """
             
-            # Processar com OpenAI
-            response = await cls.openai_client.chat.completions.create(
-                model=settings.AI_MODEL_NAME,
-                messages=[
+            response = await LLMGateway.complete(
+                TASK_ANALYSIS,
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
-                ],
-                temperature=settings.AI_TEMPERATURE,
-                max_tokens=settings.AI_MAX_TOKENS
+                ]
             )
             
-            pdf_analysis = response.choices[0].message.content
+            pdf_analysis = response.content
             
-            # Estruturar resposta
+            # Estruturar resposta (todos os campos em uma única extração)
+            structured = await ExtractionService.extract(pdf_analysis, PDF_ANALYSIS_FIELDS)
             structured_response = {
                 "raw_response": pdf_analysis,
-                "business_processes": cls._extract_business_processes(pdf_analysis),
-                "functional_requirements": cls._extract_functional_requirements(pdf_analysis),
-                "technical_requirements": cls._extract_technical_requirements(pdf_analysis),
-                "stakeholders": cls._extract_stakeholders(pdf_analysis),
-                "automation_opportunities": cls._extract_automation_opportunities(pdf_analysis),
-                "acceptance_criteria": cls._extract_acceptance_criteria(pdf_analysis),
-                "complexity_estimate": cls._extract_complexity_estimate(pdf_analysis),
-                "confidence_score": cls._calculate_confidence_score(pdf_analysis),
+                **structured,
+                "content_selection": excerpt_method,
+                "retrieved_sources": EmbeddingService.describe_sources(retrieved),
+                "model": response.model,
                 "processing_timestamp": datetime.utcnow().isoformat()
             }
             
@@ -296,37 +515,161 @@ class AIService:
             }
     
     @classmethod
-    async def process_audio(cls, audio_data: bytes, filename: str = None) -> Dict:
-        """Processar áudio com transcrição e análise"""
+    async def _select_pdf_content(
+        cls,
+        pdf_content: str,
+        filename: Optional[str],
+        description: Optional[str],
+        source_id: Optional[str],
+        project_id: Optional[str],
+        conversation_id: Optional[str] = None
+    ) -> tuple:
+        """Texto do PDF que entra no prompt: inteiro, trechos recuperados ou início"""
+        budget = settings.AI_PDF_CONTEXT_TOKEN_BUDGET
+        if count_tokens(pdf_content) <= settings.AI_PDF_DIRECT_MAX_TOKENS:
+            return pdf_content, "full"
+        
+        if not source_id or not EmbeddingService.is_available():
+            return truncate_to_tokens(pdf_content, budget), "head"
+        
         try:
-            if not cls.initialized:
-                raise Exception("AI Service not initialized")
-            
-            # Transcrição com Whisper
-            transcript = await cls.openai_client.audio.transcriptions.create(
-                model="whisper-1",
-                file=("audio.wav", audio_data, "audio/wav")
+            # Indexar antes de analisar; o estágio de indexação do job encontra os
+            # trechos já gravados e não gera embeddings de novo
+            await EmbeddingService.index_source(
+                SOURCE_FILE,
+                source_id,
+                pdf_content,
+                project_id=project_id,
+                conversation_id=conversation_id,
+                title=filename
             )
             
-            transcribed_text = transcript.text
-            
-            # Análise do conteúdo transcrito
-            analysis_response = await cls.process_text_message(
-                transcribed_text,
-                context={"source": "audio", "filename": filename}
+            # Início do documento (objetivo, escopo) sempre entra
+            opening = truncate_to_tokens(pdf_content, settings.EMBEDDING_CHUNK_TOKENS)
+            chunks = await EmbeddingService.retrieve_context(
+                f"{description}\n{PDF_RETRIEVAL_QUERY}" if description else PDF_RETRIEVAL_QUERY,
+                token_budget=budget - count_tokens(opening),
+                k=settings.SEARCH_MAX_K,
+                source_ids=[source_id]
+            )
+            chunks = sorted(
+                (c for c in chunks if c["chunk_index"] > 0),
+                key=lambda c: c["chunk_index"]
             )
+            return "\n\n[...]\n\n".join([opening, *(c["content"] for c in chunks)]), "retrieval"
+        
+        except Exception as e:
+            logger.warning("PDF chunk retrieval failed, using document head", error=str(e))
+            return truncate_to_tokens(pdf_content, budget), "head"
+    
+    @classmethod
+    async def _retrieve_related(
+        cls,
+        query: str,
+        project_id: Optional[str] = None,
+        conversation_id: Optional[str] = None,
+        exclude_source_ids: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """Trechos relevantes de documentos e conversas anteriores do projeto (ou da conversa)"""
+        if (
+            not settings.AI_RETRIEVAL_ENABLED
+            or not query
+            or not (project_id or conversation_id)
+            or not EmbeddingService.is_available()
+        ):
+            return []
+        
+        filters = {"project_id": project_id} if project_id else {"conversation_id": conversation_id}
+        try:
+            return await EmbeddingService.retrieve_context(
+                truncate_to_tokens(query, RETRIEVAL_QUERY_MAX_TOKENS),
+                token_budget=settings.AI_RETRIEVAL_TOKEN_BUDGET,
+                min_score=settings.AI_RETRIEVAL_MIN_SCORE,
+                exclude_source_ids=exclude_source_ids,
+                **filters
+            )
+        except Exception as e:
+            logger.warning("Context retrieval failed", error=str(e))
+            return []
+    
+    @staticmethod
+    def _retrieved_block(retrieved: List[Dict]) -> str:
+        """Seção do prompt com os trechos recuperados (vazia quando não há)"""
+        if not retrieved:
+            return ""
+        return (
+            "\nTrechos relevantes de documentos e conversas anteriores "
+            "(cite pelo número quando usar):\n"
+            f"{EmbeddingService.format_context(retrieved)}\n"
+        )
+    
+    @classmethod
+    async def process_audio(
+        cls,
+        audio_path: str,
+        filename: str = None,
+        progress: Optional[ProgressCallback] = None,
+        content_type: Optional[str] = None
+    ) -> Dict:
+        """Processar áudio com transcrição segmentada e análise incremental"""
+        analysis_tasks: List[asyncio.Task] = []
+        try:
+            if not cls.initialized:
+                raise Exception("AI Service not initialized")
+            
+            audio_size = os.path.getsize(audio_path)
+            assembler = TranscriptAssembler(settings.AI_AUDIO_ANALYSIS_WINDOW_SECONDS)
+            
+            def start_window_analysis(window: Dict):
+                # Analisar janelas já transcritas enquanto as seguintes ainda transcrevem
+                analysis_tasks.append(asyncio.create_task(cls.process_text_message(
+                    window["text"],
+                    context={
+                        "source": "audio",
+                        "filename": filename,
+                        "start_seconds": window["start"],
+                        "end_seconds": window["end"]
+                    }
+                )))
+            
+            if audio_size <= settings.AI_AUDIO_DIRECT_MAX_BYTES:
+                # Arquivo pequeno: uma única chamada, sem decodificação local (formato original)
+                name = filename or "audio.wav"
+                content_type = content_type or mimetypes.guess_type(name)[0] or "application/octet-stream"
+                with open(audio_path, "rb") as audio_file:
+                    result = await cls._transcribe_segment((name, audio_file, content_type), offset=0.0)
+                for window in assembler.add(0, result):
+                    start_window_analysis(window)
+                total_segments = 1
+            else:
+                total_segments = await cls._transcribe_in_segments(
+                    audio_path,
+                    assembler,
+                    start_window_analysis,
+                    progress
+                )
+            
+            last_window = assembler.finish()
+            if last_window and last_window["text"]:
+                start_window_analysis(last_window)
+            
+            analyses = await asyncio.gather(*analysis_tasks)
+            transcribed_text = assembler.text
             
             # Estruturar resposta
             structured_response = {
                 "transcription": transcribed_text,
-                "audio_analysis": analysis_response,
+                "segments": assembler.segments,
+                "audio_analysis": cls._merge_analyses(analyses),
                 "confidence_score": cls._calculate_confidence_score(transcribed_text),
                 "processing_timestamp": datetime.utcnow().isoformat()
             }
             
             logger.info("Audio processed successfully", 
                        filename=filename,
-                       audio_size=len(audio_data),
+                       audio_size=audio_size,
+                       segments=total_segments,
+                       analysis_windows=len(analyses),
                        confidence_score=structured_response["confidence_score"])
             
             return structured_response
@@ -338,73 +681,258 @@ class AIService:
                 "transcription": "Erro na transcrição do áudio",
                 "confidence_score": 0.0
             }
+        finally:
+            # Falha ou cancelamento da transcrição: janelas em análise não têm mais uso
+            for task in analysis_tasks:
+                task.cancel()
     
-    # Métodos auxiliares para extração de informações
-    @staticmethod
-    def _extract_automation_opportunities(text: str) -> List[Dict]:
-        """Extrair oportunidades de automação do texto"""
-        # Implementar lógica de extração
-        return []
-    
-    @staticmethod
-    def _extract_technical_requirements(text: str) -> List[Dict]:
-        """Extrair requisitos técnicos do texto"""
-        # Implementar lógica de extração
-        return []
-    
-    @staticmethod
-    def _extract_complexity_estimate(text: str) -> Dict:
-        """Extrair estimativa de complexidade"""
-        # Implementar lógica de extração
-        return {"level": "medium", "score": 5}
-    
-    @staticmethod
-    def _extract_tool_recommendations(text: str) -> List[str]:
-        """Extrair recomendações de ferramentas"""
-        # Implementar lógica de extração
-        return ["n8n", "Python", "Playwright"]
-    
-    @staticmethod
-    def _extract_next_steps(text: str) -> List[str]:
-        """Extrair próximos passos"""
-        # Implementar lógica de extração
-        return ["Criar PDD", "Definir escopo", "Iniciar desenvolvimento"]
+    @classmethod
+    async def _transcribe_in_segments(
+        cls,
+        audio_path: str,
+        assembler: TranscriptAssembler,
+        on_window: Callable[[Dict], None],
+        progress: Optional[ProgressCallback] = None
+    ) -> int:
+        """Transcrever segmentos cortados em silêncios com paralelismo limitado"""
+        duration = await asyncio.to_thread(probe_duration, audio_path)
+        expected_segments = max(1, math.ceil(duration / settings.AI_AUDIO_SEGMENT_SECONDS))
+        
+        # O semáforo também limita quantos segmentos decodificados ficam em memória
+        semaphore = asyncio.Semaphore(settings.AI_AUDIO_TRANSCRIPTION_CONCURRENCY)
+        segments = iter_segments(
+            audio_path,
+            max_segment_seconds=settings.AI_AUDIO_SEGMENT_SECONDS,
+            top_db=settings.AI_AUDIO_SILENCE_TOP_DB
+        )
+        tasks = []
+        completed = 0
+        
+        async def transcribe(segment: AudioSegment):
+            nonlocal completed
+            try:
+                result = await cls._transcribe_segment(
+                    (f"segment-{segment.index}.wav", segment.wav_bytes, "audio/wav"),
+                    offset=segment.start
+                )
+                result["end"] = max(result["end"], segment.end)
+            finally:
+                semaphore.release()
+            
+            for window in assembler.add(segment.index, result):
+                on_window(window)
+            
+            completed += 1
+            if progress:
+                await progress(
+                    completed / max(expected_segments, completed),
+                    f"Segmento {completed} de ~{expected_segments} transcrito"
+                )
+        
+        try:
+            while True:
+                await semaphore.acquire()
+                segment = await asyncio.to_thread(next, segments, None)
+                if segment is None:
+                    semaphore.release()
+                    break
+                tasks.append(asyncio.create_task(transcribe(segment)))
+            
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        
+        return len(tasks)
     
-    @staticmethod
-    def _extract_ui_elements(text: str) -> List[Dict]:
-        """Extrair elementos de UI"""
-        # Implementar lógica de extração
-        return []
+    @classmethod
+    async def _transcribe_segment(cls, file_payload: tuple, offset: float) -> Dict:
+        """Transcrever um trecho e deslocar timestamps para o áudio original"""
+        transcript = await LLMGateway.transcribe(file_payload)
+        
+        timed_segments = [
+            {
+                "start": round(offset + item["start"], 3),
+                "end": round(offset + item["end"], 3),
+                "text": item["text"]
+            }
+            for item in transcript.segments
+        ]
+        
+        if not timed_segments and transcript.content:
+            timed_segments.append({"start": offset, "end": offset, "text": transcript.content})
+        
+        return {
+            "start": offset,
+            "end": timed_segments[-1]["end"] if timed_segments else offset,
+            "text": transcript.content,
+            "segments": timed_segments
+        }
     
     @staticmethod
-    def _extract_process_flow(text: str) -> Dict:
-        """Extrair fluxo de processo"""
-        # Implementar lógica de extração
-        return {"steps": [], "decision_points": []}
+    def _merge_analyses(analyses: List[Dict]) -> Dict:
+        """Combinar análises de janelas consecutivas em uma única análise"""
+        analyses = [a for a in analyses if a and "error" not in a]
+        if not analyses:
+            return {"raw_response": "", "confidence_score": 0.0}
+        if len(analyses) == 1:
+            return analyses[0]
+        
+        merged: Dict[str, Any] = {}
+        for analysis in analyses:
+            for key, value in analysis.items():
+                if isinstance(value, list):
+                    items = merged.setdefault(key, [])
+                    items.extend(v for v in value if v not in items)
+                elif key == "complexity_estimate" and isinstance(value, dict):
+                    current = merged.get(key)
+                    if not current or value.get("score", 0) > current.get("score", 0):
+                        merged[key] = value
+                elif key == "raw_response":
+                    merged[key] = f"{merged[key]}\n\n{value}" if key in merged else value
+                else:
+                    merged.setdefault(key, value)
+        
+        merged["confidence_score"] = round(
+            sum(a.get("confidence_score", 0.0) for a in analyses) / len(analyses), 3
+        )
+        merged["processing_timestamp"] = datetime.utcnow().isoformat()
+        return merged
     
-    @staticmethod
-    def _extract_business_processes(text: str) -> List[Dict]:
-        """Extrair processos de negócio"""
-        # Implementar lógica de extração
-        return []
+    @classmethod
+    async def process_file(
+        cls,
+        spooled: SpooledUpload,
+        description: str = None,
+        progress: Optional[ProgressCallback] = None,
+        project_id: Optional[str] = None,
+        conversation_id: Optional[str] = None
+    ) -> Dict:
+        """Processar arquivo enviado, reutilizando a análise de conteúdo idêntico"""
+        kind = cls._file_kind(spooled.content_type)
+        cache_key = cls._analysis_cache_key(kind, spooled.sha256, description, project_id)
+        
+        cached = await CacheService.get_json(cache_key)
+        if cached:
+            logger.info("Reusing cached analysis", sha256=spooled.sha256, kind=kind)
+            if progress:
+                await progress(1.0, "Análise reutilizada do cache")
+            return {**cached, "cache_hit": True}
+        
+        # Upload idêntico já em análise: aguardar o mesmo resultado
+        while cache_key in cls._inflight_analyses:
+            inflight = cls._inflight_analyses[cache_key]
+            try:
+                result = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Só a análise original foi cancelada: este chamador a refaz
+                if not inflight.cancelled():
+                    raise
+                continue
+            return {**result, "cache_hit": True}
+        
+        future = asyncio.get_running_loop().create_future()
+        cls._inflight_analyses[cache_key] = future
+        try:
+            if progress:
+                await progress(0.0, f"Analisando arquivo ({kind})")
+            ai_response = await cls._analyze_file(
+                kind, spooled, description, progress, project_id, conversation_id
+            )
+            if progress:
+                await progress(1.0, "Análise concluída")
+            if "error" not in ai_response:
+                await CacheService.set_json(
+                    cache_key,
+                    ai_response,
+                    ttl=settings.AI_ANALYSIS_CACHE_TTL
+                )
+            future.set_result(ai_response)
+            return {**ai_response, "cache_hit": False}
+        except Exception as e:
+            future.set_exception(e)
+            # Evitar aviso de exceção não consumida quando não há aguardando
+            future.exception()
+            raise
+        finally:
+            cls._inflight_analyses.pop(cache_key, None)
+            # Cancelamento não passa pelo except: liberar quem aguarda o resultado
+            if not future.done():
+                future.cancel()
     
-    @staticmethod
-    def _extract_functional_requirements(text: str) -> List[Dict]:
-        """Extrair requisitos funcionais"""
-        # Implementar lógica de extração
-        return []
+    @classmethod
+    async def _analyze_file(
+        cls,
+        kind: str,
+        spooled: SpooledUpload,
+        description: str = None,
+        progress: Optional[ProgressCallback] = None,
+        project_id: Optional[str] = None,
+        conversation_id: Optional[str] = None
+    ) -> Dict:
+        """Despachar arquivo para o processador do seu tipo"""
+        if kind == "image":
+            return await cls.process_image(
+                image_path=spooled.path,
+                description=description
+            )
+        
+        if kind == "pdf":
+            pdf_text = await asyncio.to_thread(
+                StorageService.extract_pdf_text,
+                spooled.path,
+                MAX_EXTRACTED_TEXT_CHARS
+            )
+            return await cls.process_pdf(
+                pdf_content=pdf_text,
+                filename=spooled.filename,
+                description=description,
+                source_id=file_source_id(spooled.sha256, project_id, conversation_id),
+                project_id=project_id,
+                conversation_id=conversation_id
+            )
+        
+        if kind == "audio":
+            return await cls.process_audio(
+                audio_path=spooled.path,
+                filename=spooled.filename,
+                progress=progress,
+                content_type=spooled.content_type
+            )
+        
+        text_content = spooled.read_text(MAX_EXTRACTED_TEXT_CHARS)
+        return await cls.process_text_message(
+            message=text_content,
+            context={"filename": spooled.filename, "description": description},
+            project_id=project_id
+        )
     
     @staticmethod
-    def _extract_stakeholders(text: str) -> List[Dict]:
-        """Extrair stakeholders"""
-        # Implementar lógica de extração
-        return []
+    def _file_kind(content_type: str) -> str:
+        """Classificar arquivo pelo content type"""
+        if content_type.startswith("image/"):
+            return "image"
+        if content_type == "application/pdf":
+            return "pdf"
+        if content_type.startswith("audio/"):
+            return "audio"
+        return "text"
     
     @staticmethod
-    def _extract_acceptance_criteria(text: str) -> List[str]:
-        """Extrair critérios de aceite"""
-        # Implementar lógica de extração
-        return []
+    def _analysis_cache_key(
+        kind: str,
+        sha256: str,
+        description: str = None,
+        project_id: Optional[str] = None
+    ) -> str:
+        """Chave de cache da análise: tipo + hash do conteúdo + hash da descrição e do projeto.
+        
+        O projeto entra na chave porque o contexto recuperado depende dele.
+        """
+        scope = f"{description or ''}|{project_id or ''}"
+        scope_hash = hashlib.sha256(scope.encode("utf-8")).hexdigest()[:16]
+        return f"analysis:{ANALYSIS_CACHE_VERSION}:{kind}:{sha256}:{scope_hash}"
     
     @staticmethod
     def _calculate_confidence_score(text: str) -> float:
@@ -8,8 +8,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, or_
 from sqlalchemy.orm import selectinload
 
+from app.core.config import settings
 from app.models.project import Project
 from app.models.user import User
+from app.services.dora_metrics import DoraMetricsService
 
 class AnalyticsService:
     """Serviço de analytics e dashboards"""
@@ -605,14 +607,16 @@ class AnalyticsService:
     
     @staticmethod
     async def _get_deployment_metrics(db: AsyncSession, user_id: str) -> Dict[str, Any]:
-        """Obter métricas de deploy"""
-        # Mock data
-        return {
-            "deployments": 45,
-            "success_rate": 96,
-            "rollback_rate": 4,
-            "deployment_time": 15
-        }
+        """Obter métricas de deploy (DORA, a partir dos agregados incrementais)"""
+        try:
+            return await DoraMetricsService.summary(
+                db,
+                environment=settings.DORA_ENVIRONMENT,
+                days=settings.DORA_WINDOW_DAYS,
+                user_id=user_id
+            )
+        except Exception as e:
+            raise e
     
     @staticmethod
     async def _get_performance_metrics(db: AsyncSession, user_id: str) -> Dict[str, Any]:
@@ -0,0 +1,138 @@
+"""
+Segmentação de áudio e montagem de transcrições do MILAPP
+"""
+
+import io
+from typing import Dict, Iterator, List, Optional
+import structlog
+
+from app.core.capabilities import load_capability
+
+logger = structlog.get_logger()
+
+# Whisper trabalha internamente em 16 kHz mono
+TRANSCRIPTION_SAMPLE_RATE = 16000
+
+
+class AudioSegment:
+    """Trecho de áudio codificado em WAV, com posição no arquivo original"""
+
+    def __init__(self, index: int, start: float, end: float, wav_bytes: bytes):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.wav_bytes = wav_bytes
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def probe_duration(path: str) -> float:
+    """Duração do áudio em segundos (sem decodificar o arquivo inteiro)"""
+    librosa = load_capability("audio")["librosa"]
+
+    return float(librosa.get_duration(path=path))
+
+
+def iter_segments(
+    path: str,
+    max_segment_seconds: float,
+    top_db: float = 35,
+    sample_rate: int = TRANSCRIPTION_SAMPLE_RATE
+) -> Iterator[AudioSegment]:
+    """Dividir áudio em segmentos cortados em silêncios.
+
+    Carrega uma janela de no máximo max_segment_seconds por vez, de modo que a
+    memória fica limitada ao tamanho de um segmento. O corte é feito no último
+    silêncio do terço final da janela; segmentos inteiramente silenciosos são
+    descartados.
+    """
+    audio = load_capability("audio")
+    librosa, soundfile = audio["librosa"], audio["soundfile"]
+
+    duration = probe_duration(path)
+    offset = 0.0
+    index = 0
+
+    while offset < duration - 0.05:
+        window = min(max_segment_seconds, duration - offset)
+        samples, _ = librosa.load(path, sr=sample_rate, mono=True, offset=offset, duration=window)
+        if len(samples) == 0:
+            break
+
+        voiced = librosa.effects.split(samples, top_db=top_db)
+        is_last_window = offset + window >= duration - 0.05
+        cut = len(samples) if is_last_window else _find_silence_cut(voiced, len(samples))
+
+        if len(voiced) and voiced[0][0] < cut:
+            buffer = io.BytesIO()
+            soundfile.write(buffer, samples[:cut], sample_rate, format="WAV", subtype="PCM_16")
+
+            yield AudioSegment(
+                index=index,
+                start=round(offset, 3),
+                end=round(offset + cut / sample_rate, 3),
+                wav_bytes=buffer.getvalue()
+            )
+            index += 1
+
+        offset += cut / sample_rate
+
+
+def _find_silence_cut(voiced_intervals, total_samples: int) -> int:
+    """Posição de corte no último silêncio que alcança o terço final da janela"""
+    min_cut = int(total_samples * 2 / 3)
+    best = None
+
+    # Silêncios entre trechos com voz, incluindo o silêncio após o último trecho
+    bounds = [(int(start), int(end)) for start, end in voiced_intervals] + [(total_samples, total_samples)]
+    for (_, previous_end), (next_start, _) in zip(bounds[:-1], bounds[1:]):
+        if next_start > previous_end and next_start > min_cut:
+            best = max((previous_end + next_start) // 2, min_cut)
+
+    return best if best is not None else total_samples
+
+
+class TranscriptAssembler:
+    """Reordena transcrições concluídas fora de ordem e libera janelas contíguas"""
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self.segments: List[Dict] = []
+        self._pending: Dict[int, Dict] = {}
+        self._next_index = 0
+        self._window: List[Dict] = []
+
+    def add(self, index: int, result: Dict) -> List[Dict]:
+        """Registrar transcrição do segmento; retorna janelas prontas para análise"""
+        self._pending[index] = result
+        ready = []
+
+        while self._next_index in self._pending:
+            item = self._pending.pop(self._next_index)
+            self._next_index += 1
+            self.segments.extend(item["segments"])
+            self._window.append(item)
+
+            if self._window[-1]["end"] - self._window[0]["start"] >= self.window_seconds:
+                ready.append(self._flush())
+
+        return ready
+
+    def finish(self) -> Optional[Dict]:
+        """Liberar a janela restante ao final da transcrição"""
+        return self._flush() if self._window else None
+
+    @property
+    def text(self) -> str:
+        return " ".join(s["text"].strip() for s in self.segments if s["text"].strip())
+
+    def _flush(self) -> Dict:
+        window = {
+            "start": self._window[0]["start"],
+            "end": self._window[-1]["end"],
+            "text": " ".join(item["text"].strip() for item in self._window).strip()
+        }
+        self._window = []
+        return window
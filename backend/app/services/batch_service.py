@@ -0,0 +1,145 @@
+"""
+Processamento em lote de mensagens do MILAPP
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Optional
+import structlog
+
+from app.core.config import settings
+from app.services.ai_service import AIService
+from app.services.conversation_memory import count_tokens
+
+logger = structlog.get_logger()
+
+
+class BatchService:
+    """Análise de muitos itens: itens curtos agrupados por chamada, paralelismo limitado"""
+
+    @staticmethod
+    def plan(items: List[Dict]) -> List[List[Dict]]:
+        """Agrupar itens curtos em pacotes; itens longos formam pacotes de um item"""
+        units: List[List[Dict]] = []
+        pack: List[Dict] = []
+        pack_tokens = 0
+
+        for item in items:
+            tokens = count_tokens(item["content"])
+            if tokens > settings.AI_BATCH_PACK_ITEM_MAX_TOKENS or settings.AI_BATCH_PACK_MAX_ITEMS <= 1:
+                units.append([item])
+                continue
+
+            if pack and (
+                len(pack) >= settings.AI_BATCH_PACK_MAX_ITEMS
+                or pack_tokens + tokens > settings.AI_BATCH_PACK_TOKEN_BUDGET
+            ):
+                units.append(pack)
+                pack, pack_tokens = [], 0
+
+            pack.append(item)
+            pack_tokens += tokens
+
+        if pack:
+            units.append(pack)
+        return units
+
+    @classmethod
+    async def process(
+        cls,
+        items: List[Dict],
+        context: Optional[Dict] = None
+    ) -> AsyncIterator[Dict]:
+        """Processar itens e emitir cada resultado assim que fica pronto.
+
+        items: [{"id": ..., "content": ..., "context": ...}]. Cada item é
+        analisado de forma independente, sem histórico da conversa. Ao final
+        emite um registro de resumo.
+        """
+        started = time.perf_counter()
+        units = cls.plan(items)
+        semaphore = asyncio.Semaphore(settings.AI_BATCH_CONCURRENCY)
+        stats = {"analysis_calls": 0, "packed_items": 0, "fallback_items": 0}
+
+        async def run(unit: List[Dict]) -> List[Dict]:
+            async with semaphore:
+                return await cls._process_unit(unit, context, stats)
+
+        tasks = [asyncio.create_task(run(unit)) for unit in units]
+        succeeded = failed = 0
+
+        try:
+            for finished in asyncio.as_completed(tasks):
+                for result in await finished:
+                    if result["status"] == "completed":
+                        succeeded += 1
+                    else:
+                        failed += 1
+                    yield result
+        finally:
+            # Cliente desconectado ou erro: não deixar chamadas órfãs
+            for task in tasks:
+                task.cancel()
+
+        elapsed_ms = round((time.perf_counter() - started) * 1000)
+        logger.info("Batch processed",
+                   items=len(items),
+                   units=len(units),
+                   succeeded=succeeded,
+                   failed=failed,
+                   elapsed_ms=elapsed_ms,
+                   **stats)
+
+        yield {
+            "type": "summary",
+            "total": len(items),
+            "succeeded": succeeded,
+            "failed": failed,
+            "elapsed_ms": elapsed_ms,
+            **stats
+        }
+
+    @classmethod
+    async def _process_unit(cls, unit: List[Dict], context: Optional[Dict], stats: Dict) -> List[Dict]:
+        """Processar um pacote; itens que o modelo não devolveu são refeitos individualmente"""
+        results: Dict[str, Dict] = {}
+
+        if len(unit) > 1:
+            stats["analysis_calls"] += 1
+            try:
+                results = await AIService.process_text_batch(unit, context=context)
+                stats["packed_items"] += len(results)
+            except Exception as e:
+                logger.warning("Packed batch call failed, processing items individually",
+                              items=len(unit), error=str(e))
+
+        missing = [item for item in unit if str(item["id"]) not in results]
+        if len(unit) > 1:
+            stats["fallback_items"] += len(missing)
+
+        async def single(item: Dict):
+            stats["analysis_calls"] += 1
+            results[str(item["id"])] = await AIService.process_text_message(
+                item["content"],
+                context={**(context or {}), **(item.get("context") or {})} or None
+            )
+
+        await asyncio.gather(*(single(item) for item in missing))
+
+        return [cls._item_result(item, results[str(item["id"])]) for item in unit]
+
+    @staticmethod
+    def _item_result(item: Dict, analysis: Dict) -> Dict:
+        failed = "error" in analysis
+        return {
+            "type": "item",
+            "id": item["id"],
+            "status": "failed" if failed else "completed",
+            "content": analysis.get("raw_response"),
+            "ai_analysis": analysis,
+            "error": analysis.get("error") if failed else None
+        }
+
+
+# Instância global do serviço
+batch_service = BatchService()
@@ -0,0 +1,130 @@
+"""
+Serviço de cache do MILAPP (Redis com fallback em memória)
+"""
+
+import asyncio
+import json
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+
+class CacheService:
+    """Cache chave/valor JSON sobre Redis, com fallback local em memória"""
+
+    redis_client = None
+    _local: Dict[str, Tuple[Optional[float], str]] = {}
+    _local_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    @classmethod
+    async def initialize(cls):
+        """Conectar ao Redis; em caso de falha usa cache local do processo"""
+        try:
+            import redis.asyncio as redis
+
+            cls.redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+            await cls.redis_client.ping()
+            logger.info("Cache Service initialized successfully")
+
+        except Exception as e:
+            logger.warning("Redis unavailable, using in-process cache", error=str(e))
+            cls.redis_client = None
+
+    @classmethod
+    async def cleanup(cls):
+        """Fechar conexão com o Redis"""
+        try:
+            if cls.redis_client:
+                await cls.redis_client.close()
+            logger.info("Cache Service cleaned up")
+        except Exception as e:
+            logger.error("Cache Service cleanup failed", error=str(e))
+
+    @classmethod
+    async def get_json(cls, key: str) -> Optional[Any]:
+        """Obter valor JSON do cache"""
+        try:
+            if cls.redis_client:
+                raw = await cls.redis_client.get(key)
+            else:
+                entry = cls._local.get(key)
+                raw = None
+                if entry:
+                    expires_at, raw = entry
+                    if expires_at and expires_at < time.monotonic():
+                        cls._local.pop(key, None)
+                        raw = None
+
+            return json.loads(raw) if raw else None
+
+        except Exception as e:
+            logger.warning("Cache read failed", key=key, error=str(e))
+            return None
+
+    @classmethod
+    async def set_json(cls, key: str, value: Any, ttl: Optional[int] = None):
+        """Gravar valor JSON no cache (ttl em segundos)"""
+        try:
+            raw = json.dumps(value, default=str)
+            if cls.redis_client:
+                await cls.redis_client.set(key, raw, ex=ttl)
+            else:
+                expires_at = time.monotonic() + ttl if ttl else None
+                cls._local[key] = (expires_at, raw)
+
+        except Exception as e:
+            logger.warning("Cache write failed", key=key, error=str(e))
+
+    @classmethod
+    async def delete(cls, key: str):
+        """Remover chave do cache"""
+        try:
+            if cls.redis_client:
+                await cls.redis_client.delete(key)
+            else:
+                cls._local.pop(key, None)
+        except Exception as e:
+            logger.warning("Cache delete failed", key=key, error=str(e))
+
+    @classmethod
+    @asynccontextmanager
+    async def lock(cls, name: str, timeout: float, blocking_timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Exclusão mútua por nome: entre processos no Redis, entre tasks no fallback local
+
+        `timeout` expira o lock de um dono que morreu; `blocking_timeout`
+        limita a espera (TimeoutError ao esgotar).
+        """
+        if cls.redis_client:
+            from redis.exceptions import LockError
+
+            redis_lock = cls.redis_client.lock(f"lock:{name}", timeout=timeout, blocking_timeout=blocking_timeout)
+            if not await redis_lock.acquire():
+                raise TimeoutError(f"Lock '{name}' ocupado")
+            try:
+                yield
+            finally:
+                try:
+                    await redis_lock.release()
+                except LockError:
+                    logger.warning("Cache lock expired before release", name=name)
+            return
+
+        local_lock = cls._local_locks.get(name)
+        if local_lock is None:
+            local_lock = asyncio.Lock()
+            cls._local_locks[name] = local_lock
+        await asyncio.wait_for(local_lock.acquire(), timeout=blocking_timeout)
+        try:
+            yield
+        finally:
+            local_lock.release()
+
+
+# Instância global do serviço
+cache_service = CacheService()
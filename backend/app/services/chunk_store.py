@@ -0,0 +1,294 @@
+"""
+Armazenamento deduplicado por blocos definidos por conteúdo (FastCDC)
+
+Arquivos são cortados em blocos cujas fronteiras dependem do conteúdo (hash
+"gear" rolante), então uma edição pequena altera só os blocos vizinhos e o
+restante é reaproveitado entre versões. Cada bloco é gravado uma vez em
+`chunks/<sha256>` e contado em `content_chunks.ref_count`. Blocos que chegam a
+zero referências só são apagados depois do commit de quem os soltou
+(`collect_garbage`); um bloco reaproveitado antes disso é regravado.
+"""
+
+import asyncio
+import hashlib
+import random
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+import structlog
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.chunk import ContentChunk
+from app.services.storage_service import StorageService
+
+logger = structlog.get_logger()
+
+_MASK_64 = (1 << 64) - 1
+
+# Tabela gear fixa: fronteiras precisam ser as mesmas entre processos e versões
+_gear_rng = random.Random(0x4D494C41)
+_GEAR = tuple(_gear_rng.getrandbits(64) for _ in range(256))
+del _gear_rng
+
+# Linhas por comando ao registrar referências
+_REF_BATCH = 1000
+
+# Manifesto: lista de [sha256, tamanho] na ordem do arquivo
+Manifest = List[List]
+
+
+def _cut_masks(avg_size: int) -> Tuple[int, int]:
+    """Máscaras do chunking normalizado: mais difícil antes da média, mais fácil depois"""
+    bits = max(avg_size.bit_length() - 1, 1)
+    strict = ((1 << (bits + 2)) - 1) << (64 - bits - 2)
+    loose = ((1 << max(bits - 2, 1)) - 1) << (64 - max(bits - 2, 1))
+    return strict, loose
+
+
+def cut_point(data, start: int, end: int, min_size: int, avg_size: int, max_size: int) -> int:
+    """Tamanho do próximo bloco em data[start:end]"""
+    length = end - start
+    if length <= min_size:
+        return length
+
+    strict, loose = _cut_masks(avg_size)
+    normal = start + min(avg_size, length)
+    limit = start + min(max_size, length)
+    gear = _GEAR
+    h = 0
+
+    # Os primeiros min_size bytes nunca são fronteira: o hash começa depois deles
+    i = start + min_size
+    while i < normal:
+        h = ((h << 1) + gear[data[i]]) & _MASK_64
+        if not h & strict:
+            return i - start + 1
+        i += 1
+    while i < limit:
+        h = ((h << 1) + gear[data[i]]) & _MASK_64
+        if not h & loose:
+            return i - start + 1
+        i += 1
+    return limit - start
+
+
+def chunk_file(
+    path: str,
+    min_size: int = None,
+    avg_size: int = None,
+    max_size: int = None
+) -> Manifest:
+    """Cortar arquivo em blocos e retornar o manifesto (lido em janelas, sem carregar tudo)"""
+    min_size = min_size or settings.CHUNK_MIN_SIZE
+    avg_size = avg_size or settings.CHUNK_AVG_SIZE
+    max_size = max_size or settings.CHUNK_MAX_SIZE
+    window = max(settings.UPLOAD_CHUNK_SIZE, max_size * 4)
+
+    manifest: Manifest = []
+    buffer = b""
+    with open(path, "rb") as f:
+        eof = False
+        while True:
+            if not eof and len(buffer) < max_size:
+                data = f.read(window)
+                eof = not data
+                buffer += data
+            if not buffer:
+                break
+            if not eof and len(buffer) < max_size:
+                continue
+
+            position = 0
+            # Só corta enquanto há um bloco máximo inteiro à frente (ou no fim do arquivo)
+            while len(buffer) - position >= max_size or (eof and position < len(buffer)):
+                size = cut_point(buffer, position, len(buffer), min_size, avg_size, max_size)
+                block = buffer[position:position + size]
+                manifest.append([hashlib.sha256(block).hexdigest(), size])
+                position += size
+            buffer = buffer[position:]
+
+    return manifest
+
+
+def manifest_size(manifest: Manifest) -> int:
+    return sum(size for _, size in manifest)
+
+
+class ChunkStore:
+    """Blocos deduplicados com contagem de referências"""
+
+    @staticmethod
+    def chunk_key(sha256: str) -> str:
+        return f"chunks/{sha256[:2]}/{sha256}"
+
+    @classmethod
+    async def store_file(cls, db: AsyncSession, path: str) -> Dict:
+        """Cortar arquivo, registrar referências e enviar só os blocos que ainda não existem
+
+        Deve rodar dentro da transação de quem cria o manifesto: se algo falhar
+        antes do commit, as referências são desfeitas junto.
+        """
+        manifest = await asyncio.to_thread(chunk_file, path)
+
+        # Posição de cada bloco distinto no arquivo (para ler os novos)
+        offsets: Dict[str, Tuple[int, int]] = {}
+        position = 0
+        for sha256, size in manifest:
+            offsets.setdefault(sha256, (position, size))
+            position += size
+
+        # Ordem fixa de travamento das linhas evita deadlock entre uploads concorrentes
+        new_chunks = await cls._add_refs(db, sorted((h, size) for h, (_, size) in offsets.items()))
+
+        semaphore = asyncio.Semaphore(settings.CHUNK_TRANSFER_CONCURRENCY)
+
+        def read(offset: int, size: int) -> bytes:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                return f.read(size)
+
+        async def upload(sha256: str):
+            async with semaphore:
+                offset, size = offsets[sha256]
+                data = await asyncio.to_thread(read, offset, size)
+                await StorageService.put_bytes(cls.chunk_key(sha256), data)
+
+        await asyncio.gather(*(upload(h) for h in new_chunks))
+
+        stored_bytes = sum(offsets[h][1] for h in new_chunks)
+        logger.info("File stored as chunks",
+                   chunks=len(manifest),
+                   new_chunks=len(new_chunks),
+                   size=position,
+                   stored_bytes=stored_bytes)
+
+        return {"manifest": manifest, "size": position, "stored_bytes": stored_bytes}
+
+    @staticmethod
+    async def _add_refs(db: AsyncSession, chunks: Sequence[Tuple[str, int]]) -> List[str]:
+        """Incrementar referências; retorna os blocos a gravar
+
+        São os recém-criados e os que voltam de zero referências: o objeto
+        destes pode já ter sido apagado pela coleta.
+        """
+        created = []
+        for start in range(0, len(chunks), _REF_BATCH):
+            batch = chunks[start:start + _REF_BATCH]
+            stmt = insert(ContentChunk).values(
+                [{"sha256": h, "size": size, "ref_count": 1} for h, size in batch]
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ContentChunk.sha256],
+                set_={"ref_count": func.greatest(ContentChunk.ref_count, 0) + 1}
+            ).returning(ContentChunk.sha256, ContentChunk.ref_count)
+            result = await db.execute(stmt)
+            created.extend(row.sha256 for row in result if row.ref_count == 1)
+        return created
+
+    @staticmethod
+    async def release(db: AsyncSession, manifest: Optional[Manifest]) -> List[str]:
+        """Soltar as referências de um manifesto na transação de quem o descarta
+
+        Nada é apagado aqui (um rollback devolve as referências); retorna os
+        blocos que ficaram sem uso, para `collect_garbage` depois do commit.
+        """
+        if not manifest:
+            return []
+        hashes = sorted({h for h, _ in manifest})
+        orphaned = []
+        for start in range(0, len(hashes), _REF_BATCH):
+            batch = hashes[start:start + _REF_BATCH]
+            result = await db.execute(
+                update(ContentChunk)
+                .where(ContentChunk.sha256.in_(batch))
+                .values(ref_count=func.greatest(ContentChunk.ref_count - 1, 0))
+                .returning(ContentChunk.sha256, ContentChunk.ref_count)
+            )
+            orphaned.extend(row.sha256 for row in result if row.ref_count == 0)
+        return orphaned
+
+    @classmethod
+    async def collect_garbage(cls, hashes: Optional[Sequence[str]] = None, limit: int = None) -> int:
+        """Apagar blocos sem referências (os indicados ou, sem eles, um lote qualquer)
+
+        As linhas ficam travadas enquanto os objetos são removidos: quem for
+        reaproveitar o bloco espera e, depois, o recria. Se a remoção das
+        linhas falhar, o bloco volta de zero referências e é regravado no
+        próximo uso.
+        """
+        if hashes is not None and not hashes:
+            return 0
+        limit = limit or settings.CHUNK_GC_BATCH
+        statement = select(ContentChunk.sha256).where(ContentChunk.ref_count <= 0)
+        if hashes is not None:
+            statement = statement.where(ContentChunk.sha256.in_(sorted(set(hashes))))
+
+        removed = 0
+        async with AsyncSessionLocal() as db:
+            while True:
+                result = await db.execute(
+                    statement.order_by(ContentChunk.sha256).limit(limit).with_for_update(skip_locked=True)
+                )
+                orphaned = list(result.scalars().all())
+                if not orphaned:
+                    break
+
+                semaphore = asyncio.Semaphore(settings.CHUNK_TRANSFER_CONCURRENCY)
+
+                async def remove(sha256: str):
+                    async with semaphore:
+                        await StorageService.delete_object(cls.chunk_key(sha256))
+
+                await asyncio.gather(*(remove(h) for h in orphaned))
+                await db.execute(
+                    delete(ContentChunk).where(ContentChunk.sha256.in_(orphaned), ContentChunk.ref_count <= 0)
+                )
+                await db.commit()
+                removed += len(orphaned)
+                if len(orphaned) < limit:
+                    break
+
+        if removed:
+            logger.info("Orphaned chunks removed", chunks=removed)
+        return removed
+
+    @classmethod
+    async def iter_manifest(
+        cls,
+        manifest: Manifest,
+        start: int = 0,
+        end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Remontar o conteúdo (ou a faixa [start, end]) buscando blocos à frente em paralelo"""
+        end = manifest_size(manifest) - 1 if end is None else end
+
+        # Blocos que cruzam a faixa, com o recorte de cada um
+        parts = []
+        position = 0
+        for sha256, size in manifest:
+            chunk_start, chunk_end = position, position + size - 1
+            position += size
+            if chunk_end < start:
+                continue
+            if chunk_start > end:
+                break
+            parts.append((sha256, max(start - chunk_start, 0), min(end, chunk_end) - chunk_start + 1))
+
+        read_ahead = settings.CHUNK_TRANSFER_CONCURRENCY
+        pending: List[asyncio.Task] = []
+        try:
+            for index, (sha256, cut_from, cut_to) in enumerate(parts):
+                while len(pending) < read_ahead and index + len(pending) < len(parts):
+                    next_hash = parts[index + len(pending)][0]
+                    pending.append(asyncio.create_task(StorageService.get_bytes(cls.chunk_key(next_hash))))
+                data = await pending.pop(0)
+                yield data[cut_from:cut_to]
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+# Instância global do serviço
+chunk_store = ChunkStore()
@@ -0,0 +1,190 @@
+"""
+Memória de conversas com orçamento de tokens e resumo incremental
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Optional
+import structlog
+
+from app.core.capabilities import load_capability
+from app.core.config import settings
+from app.services.cache_service import CacheService
+
+logger = structlog.get_logger()
+
+# Tokens extras por mensagem no formato de chat (papel e delimitadores)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Tokenizer local (tiktoken); None se indisponível"""
+    try:
+        tiktoken = load_capability("tokenizer")["tiktoken"]
+        return tiktoken.get_encoding(settings.AI_TOKENIZER_ENCODING)
+    except Exception as e:
+        logger.warning("tiktoken unavailable, using approximate token count", error=str(e))
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Contar tokens localmente (aproximação de 4 caracteres por token sem tiktoken)"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cortar texto para caber em max_tokens"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+class ConversationMemory:
+    """Turnos recentes literais + resumo dos turnos antigos"""
+
+    def __init__(self, summary: str = "", turns: Optional[List[Dict]] = None, summarized_turns: int = 0):
+        self.summary = summary
+        self.turns = turns or []
+        self.summarized_turns = summarized_turns
+
+    @property
+    def summary_tokens(self) -> int:
+        return count_tokens(self.summary)
+
+    @property
+    def turn_tokens(self) -> int:
+        return sum(t["tokens"] for t in self.turns)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.summary_tokens + self.turn_tokens
+
+    def messages(self) -> List[Dict]:
+        """Histórico no formato de mensagens de chat"""
+        history = []
+        if self.summary:
+            history.append({
+                "role": "system",
+                "content": f"Resumo da conversa até aqui:\n{self.summary}"
+            })
+        history.extend({"role": t["role"], "content": t["content"]} for t in self.turns)
+        return history
+
+    def to_dict(self) -> Dict:
+        return {
+            "summary": self.summary,
+            "turns": self.turns,
+            "summarized_turns": self.summarized_turns
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "ConversationMemory":
+        return cls(**data) if data else cls()
+
+
+class ConversationMemoryManager:
+    """Mantém o histórico de cada conversa dentro do orçamento de tokens"""
+
+    @staticmethod
+    def _key(conversation_id: str) -> str:
+        return f"conversation:{conversation_id}:memory"
+
+    @classmethod
+    async def load(cls, conversation_id: str) -> ConversationMemory:
+        """Carregar memória da conversa"""
+        return ConversationMemory.from_dict(await CacheService.get_json(cls._key(conversation_id)))
+
+    @classmethod
+    async def save(cls, conversation_id: str, memory: ConversationMemory):
+        """Gravar memória da conversa"""
+        await CacheService.set_json(
+            cls._key(conversation_id),
+            memory.to_dict(),
+            ttl=settings.AI_CONTEXT_MEMORY_TTL
+        )
+
+    @staticmethod
+    def lock(conversation_id: str):
+        """Serializa leitura-alteração-gravação da memória entre mensagens simultâneas"""
+        return CacheService.lock(
+            f"conversation:{conversation_id}:memory",
+            timeout=settings.AI_CONTEXT_MEMORY_LOCK_TIMEOUT,
+            blocking_timeout=settings.AI_CONTEXT_MEMORY_LOCK_TIMEOUT
+        )
+
+    @classmethod
+    async def clear(cls, conversation_id: str):
+        """Descartar memória da conversa"""
+        await CacheService.delete(cls._key(conversation_id))
+
+    @classmethod
+    async def record_exchange(
+        cls,
+        conversation_id: str,
+        user_content: str,
+        assistant_content: Optional[str]
+    ) -> ConversationMemory:
+        """Registrar pergunta e resposta e compactar a memória se exceder o orçamento
+
+        A atualização inteira roda sob lock: duas mensagens simultâneas na
+        mesma conversa não sobrescrevem os turnos uma da outra.
+        """
+        async with cls.lock(conversation_id):
+            memory = await cls.load(conversation_id)
+            cls.append_turn(memory, "user", user_content)
+            if assistant_content:
+                cls.append_turn(memory, "assistant", assistant_content)
+
+            await cls.compact(memory)
+            await cls.save(conversation_id, memory)
+        return memory
+
+    @staticmethod
+    def append_turn(memory: ConversationMemory, role: str, content: str):
+        """Adicionar turno (turnos muito longos são cortados ao limite por turno)"""
+        content = truncate_to_tokens(content, settings.AI_CONTEXT_MAX_TURN_TOKENS)
+        memory.turns.append({
+            "role": role,
+            "content": content,
+            "tokens": count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+        })
+
+    @classmethod
+    async def compact(cls, memory: ConversationMemory):
+        """Dobrar os turnos mais antigos no resumo até caber no orçamento"""
+        budget = settings.AI_CONTEXT_TOKEN_BUDGET
+        if memory.total_tokens <= budget:
+            return
+
+        # Espaço reservado ao resumo; os turnos recentes ficam com o restante
+        turns_budget = budget - settings.AI_CONTEXT_SUMMARY_MAX_TOKENS
+        evicted = []
+        while (
+            len(memory.turns) > settings.AI_CONTEXT_MIN_RECENT_TURNS
+            and memory.turn_tokens > turns_budget
+        ):
+            evicted.append(memory.turns.pop(0))
+
+        if not evicted:
+            return
+
+        from app.services.ai_service import AIService
+
+        memory.summary = await AIService.summarize_conversation(
+            memory.summary,
+            evicted,
+            max_tokens=settings.AI_CONTEXT_SUMMARY_MAX_TOKENS
+        )
+        memory.summarized_turns += len(evicted)
+
+        logger.info("Conversation memory compacted",
+                   evicted_turns=len(evicted),
+                   summary_tokens=memory.summary_tokens,
+                   total_tokens=memory.total_tokens)
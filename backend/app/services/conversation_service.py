@@ -0,0 +1,203 @@
+"""
+Serviço de persistência de conversas e mensagens
+"""
+
+import uuid
+from typing import Dict, List, Optional
+from sqlalchemy import select, update, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession
+import structlog
+
+from app.core.config import settings
+from app.core.database import async_engine
+from app.models.conversation import Conversation, Message, ensure_message_partitions
+from app.services.conversation_memory import (
+    ConversationMemory,
+    ConversationMemoryManager,
+    count_tokens
+)
+
+logger = structlog.get_logger()
+
+
+class ConversationService:
+    """Conversas e histórico de mensagens (append + leitura por faixa de seq)"""
+
+    @staticmethod
+    async def create(
+        db: AsyncSession,
+        user_id: str,
+        title: str,
+        project_id: Optional[str] = None
+    ) -> Conversation:
+        """Criar conversa"""
+        conversation = Conversation(
+            title=title,
+            user_id=user_id,
+            project_id=uuid.UUID(project_id) if project_id else None,
+            status="active",
+            extracted_requirements=[],
+            confidence_score=0.0
+        )
+        db.add(conversation)
+        await db.commit()
+        await db.refresh(conversation)
+        return conversation
+
+    @staticmethod
+    async def get(db: AsyncSession, conversation_id: str, user_id: str) -> Optional[Conversation]:
+        """Obter conversa do usuário (None se não existir ou não pertencer a ele)"""
+        try:
+            key = uuid.UUID(conversation_id)
+        except ValueError:
+            return None
+        result = await db.execute(
+            select(Conversation).where(Conversation.id == key, Conversation.user_id == user_id)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def list_for_user(
+        db: AsyncSession,
+        user_id: str,
+        project_id: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Conversation]:
+        """Listar conversas do usuário, mais recentes primeiro"""
+        query = select(Conversation).where(Conversation.user_id == user_id)
+        if project_id:
+            query = query.where(Conversation.project_id == uuid.UUID(project_id))
+        if status:
+            query = query.where(Conversation.status == status)
+        result = await db.execute(query.order_by(Conversation.updated_at.desc()).limit(limit))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def delete(db: AsyncSession, conversation: Conversation):
+        """Remover conversa (mensagens saem por ON DELETE CASCADE)"""
+        await db.delete(conversation)
+        await db.commit()
+
+    @staticmethod
+    async def append_messages(
+        db: AsyncSession,
+        conversation: Conversation,
+        messages: List[Dict]
+    ) -> List[Message]:
+        """Gravar mensagens no fim da conversa com `seq` consecutivos
+
+        A faixa de `seq` é reservada com um UPDATE ... RETURNING na linha da
+        conversa: o lock da linha serializa escritas concorrentes na mesma
+        conversa e os números nunca se repetem.
+        """
+        if not messages:
+            return []
+
+        result = await db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation.id)
+            .values(
+                message_count=Conversation.message_count + len(messages),
+                last_message_at=func.now(),
+                updated_at=func.now()
+            )
+            .returning(Conversation.message_count)
+        )
+        last_seq = result.scalar_one()
+        first_seq = last_seq - len(messages) + 1
+
+        rows = [
+            {
+                "conversation_id": conversation.id,
+                "seq": first_seq + offset,
+                "id": uuid.uuid4(),
+                "type": message["type"],
+                "content": message["content"],
+                "ai_analysis": message.get("ai_analysis"),
+                "token_count": count_tokens(message["content"])
+            }
+            for offset, message in enumerate(messages)
+        ]
+        stored = await db.scalars(insert(Message).returning(Message), rows)
+        stored = sorted(stored.all(), key=lambda m: m.seq)
+        await db.commit()
+        return stored
+
+    @staticmethod
+    async def history(
+        db: AsyncSession,
+        conversation: Conversation,
+        after_seq: int = 0,
+        limit: int = None
+    ) -> List[Message]:
+        """Mensagens com seq > after_seq em ordem (varredura do índice da PK)
+
+        O filtro em created_at a partir da criação da conversa descarta as
+        partições de meses anteriores.
+        """
+        limit = min(limit or settings.CONVERSATION_HISTORY_PAGE_SIZE,
+                    settings.CONVERSATION_HISTORY_MAX_PAGE_SIZE)
+        query = (
+            select(Message)
+            .where(Message.conversation_id == conversation.id, Message.seq > after_seq)
+            .order_by(Message.seq)
+            .limit(limit)
+        )
+        if conversation.created_at is not None:
+            query = query.where(Message.created_at >= conversation.created_at)
+        result = await db.execute(query)
+        return list(result.scalars().all())
+
+    @classmethod
+    async def recent(cls, db: AsyncSession, conversation: Conversation, limit: int) -> List[Message]:
+        """Últimas `limit` mensagens, também como faixa crescente de seq"""
+        after_seq = max((conversation.message_count or 0) - limit, 0)
+        return await cls.history(db, conversation, after_seq=after_seq, limit=limit)
+
+    @classmethod
+    async def load_memory(cls, db: AsyncSession, conversation: Conversation) -> ConversationMemory:
+        """Memória da conversa; reconstruída das mensagens gravadas se expirou no cache"""
+        conversation_id = str(conversation.id)
+        memory = await ConversationMemoryManager.load(conversation_id)
+        if memory.turns or memory.summary or not conversation.message_count:
+            return memory
+
+        messages = await cls.recent(db, conversation, settings.AI_CONTEXT_REBUILD_MESSAGES)
+        for message in messages:
+            if message.type in ("user", "assistant"):
+                ConversationMemoryManager.append_turn(memory, message.type, message.content)
+
+        # Sem resumo disponível: descartar os turnos mais antigos que excedem o orçamento
+        while (
+            len(memory.turns) > settings.AI_CONTEXT_MIN_RECENT_TURNS
+            and memory.total_tokens > settings.AI_CONTEXT_TOKEN_BUDGET
+        ):
+            memory.turns.pop(0)
+        memory.summarized_turns = max(conversation.message_count - len(memory.turns), 0)
+
+        async with ConversationMemoryManager.lock(conversation_id):
+            # Outra mensagem pode ter gravado a memória enquanto as mensagens eram lidas
+            current = await ConversationMemoryManager.load(conversation_id)
+            if current.turns or current.summary:
+                return current
+            await ConversationMemoryManager.save(conversation_id, memory)
+        logger.info("Conversation memory rebuilt",
+                   conversation_id=conversation_id,
+                   turns=len(memory.turns))
+        return memory
+
+    @staticmethod
+    async def ensure_partitions(months_ahead: int = None) -> List[str]:
+        """Garantir partições mensais de `messages` para os próximos meses"""
+        months_ahead = (
+            settings.CONVERSATION_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+        )
+        async with async_engine.begin() as conn:
+            partitions = await conn.run_sync(ensure_message_partitions, months_ahead)
+        logger.info("Message partitions ensured", partitions=partitions)
+        return partitions
+
+
+# Instância global do serviço
+conversation_service = ConversationService()
@@ -0,0 +1,414 @@
+"""
+Validação vetorizada de conjuntos de dados (CSV, XLSX, Parquet)
+
+O arquivo é lido em lotes de linhas e cada regra é aplicada à coluna inteira
+do lote com operações NumPy/pandas, então a memória depende do tamanho do
+lote e não do arquivo. Unicidade e integridade referencial guardam apenas
+hashes de 64 bits dos valores distintos (8 bytes por valor, no máximo
+DATA_VALIDATION_MAX_KEYS por coluna).
+
+Regras por coluna (`columns` na configuração do critério):
+    {"required": true, "type": "integer|float|date|boolean|string",
+     "format": "%d/%m/%Y", "pattern": "^\\d{11}$", "min_length": 1,
+     "max_length": 120, "min": 0, "max": 100, "allowed": ["A", "B"],
+     "unique": true, "references": {"source": {...}, "column": "id"}}
+"""
+
+import os
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+import structlog
+
+from app.core.capabilities import load_capability
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# Dimensões avaliadas e seus rótulos (os mesmos exibidos no gate)
+DIMENSIONS = {
+    "completeness": "Completude dos dados",
+    "types": "Validação de tipos",
+    "formats": "Validação de formato",
+    "consistency": "Consistência dos dados"
+}
+
+SUPPORTED_FORMATS = ("csv", "xlsx", "parquet")
+
+# Linhas com falha guardadas como amostra por coluna e dimensão
+MAX_SAMPLES = 5
+
+_TRUE_VALUES = {"true", "1", "sim", "s", "yes", "y", "t"}
+_FALSE_VALUES = {"false", "0", "nao", "não", "n", "no", "f"}
+
+
+class DataValidationError(Exception):
+    """Conjunto de dados ilegível ou configuração inválida"""
+
+
+def detect_format(filename: Optional[str], declared: Optional[str] = None) -> str:
+    """Formato declarado ou inferido pela extensão"""
+    data_format = (declared or os.path.splitext(filename or "")[1].lstrip(".")).lower()
+    if data_format in ("xls", "xlsm"):
+        data_format = "xlsx"
+    if data_format not in SUPPORTED_FORMATS:
+        raise DataValidationError(f"Formato '{data_format or filename}' não suportado")
+    return data_format
+
+
+def read_columns(path: str, data_format: str, options: Optional[Dict] = None) -> List[str]:
+    """Nomes das colunas sem ler os dados"""
+    options = options or {}
+    if data_format == "csv":
+        pd = load_capability("dataframe")["pandas"]
+        return list(pd.read_csv(path, nrows=0, sep=options.get("sep", ","), encoding=options.get("encoding", "utf-8")).columns)
+    if data_format == "parquet":
+        pq = load_capability("parquet")["pyarrow.parquet"]
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    return list(next(_iter_xlsx_rows(path, options.get("sheet")), ()))
+
+
+def _iter_xlsx_rows(path: str, sheet: Optional[str]):
+    openpyxl = load_capability("spreadsheet")["openpyxl"]
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.active
+        for row in worksheet.iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def iter_frames(
+    path: str,
+    data_format: str,
+    columns: Optional[List[str]] = None,
+    chunk_rows: Optional[int] = None,
+    options: Optional[Dict] = None
+) -> Iterator:
+    """Ler o arquivo em DataFrames de até chunk_rows linhas"""
+    pd = load_capability("dataframe")["pandas"]
+    chunk_rows = chunk_rows or settings.DATA_VALIDATION_CHUNK_ROWS
+    options = options or {}
+
+    if data_format == "csv":
+        # Tudo como texto: a conversão de tipos faz parte da validação
+        yield from pd.read_csv(
+            path,
+            usecols=columns,
+            dtype=str,
+            keep_default_na=False,
+            na_values=[""],
+            chunksize=chunk_rows,
+            sep=options.get("sep", ","),
+            encoding=options.get("encoding", "utf-8")
+        )
+
+    elif data_format == "parquet":
+        pq = load_capability("parquet")["pyarrow.parquet"]
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+
+    else:
+        # openpyxl lê célula a célula: mais lento que CSV/Parquet, mas em streaming
+        rows = _iter_xlsx_rows(path, options.get("sheet"))
+        header = [str(name) for name in next(rows, ())]
+        wanted = [header.index(c) for c in columns] if columns else list(range(len(header)))
+        names = [header[i] for i in wanted]
+        buffer = []
+        for row in rows:
+            buffer.append([row[i] if i < len(row) else None for i in wanted])
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame(buffer, columns=names, dtype=object)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=names, dtype=object)
+
+
+def _is_text(values) -> bool:
+    """Coluna de texto (object no pandas 2, "str" quando lida com dtype=str em versões novas)"""
+    pd = load_capability("dataframe")["pandas"]
+    return values.dtype == object or pd.api.types.is_string_dtype(values.dtype)
+
+
+def hash_values(series):
+    """Hashes uint64 dos valores (normalizados como texto) para unicidade e referências"""
+    pd = load_capability("dataframe")["pandas"]
+    normalized = series.astype(str).str.strip().to_numpy(dtype=object)
+    return pd.util.hash_array(normalized, categorize=False)
+
+
+def sorted_keys(hashes):
+    """Hashes distintos em ordem crescente"""
+    np = load_capability("dataframe")["numpy"]
+    ordered = np.sort(hashes)
+    if len(ordered) < 2:
+        return ordered
+    return ordered[np.concatenate(([True], ordered[1:] != ordered[:-1]))]
+
+
+def merge_keys(keys, hashes, known=None):
+    """Incluir em keys (ordenado) os hashes que ainda não estão lá
+
+    Só os valores novos são ordenados; `known` é a máscara de contains_keys,
+    quando já calculada. Acima de DATA_VALIDATION_MAX_KEYS a validação é
+    interrompida em vez de crescer sem limite.
+    """
+    np = load_capability("dataframe")["numpy"]
+    if known is None:
+        known = contains_keys(keys, hashes)
+    new = np.unique(hashes[~known])
+    if not len(new):
+        return keys
+    if len(keys) + len(new) > settings.DATA_VALIDATION_MAX_KEYS:
+        raise DataValidationError(
+            f"Mais de {settings.DATA_VALIDATION_MAX_KEYS} valores distintos em uma coluna de unicidade ou referência"
+        )
+    return np.union1d(keys, new)
+
+
+def contains_keys(keys, hashes):
+    """Máscara de hashes presentes em keys (ordenado) por busca binária"""
+    np = load_capability("dataframe")["numpy"]
+    if not len(keys):
+        return np.zeros(len(hashes), dtype=bool)
+    positions = np.minimum(np.searchsorted(keys, hashes), len(keys) - 1)
+    return keys[positions] == hashes
+
+
+def load_reference_keys(path: str, data_format: str, column: str, options: Optional[Dict] = None):
+    """Hashes distintos (ordenados) de uma coluna de outro conjunto de dados"""
+    np = load_capability("dataframe")["numpy"]
+    keys = np.empty(0, dtype=np.uint64)
+    for frame in iter_frames(path, data_format, columns=[column], options=options):
+        values = frame[column]
+        values = values[values.notna()]
+        keys = merge_keys(keys, hash_values(values))
+    return keys
+
+
+class _Tally:
+    """Contadores de uma coluna em uma dimensão"""
+
+    __slots__ = ("checked", "failed", "samples")
+
+    def __init__(self):
+        self.checked = 0
+        self.failed = 0
+        self.samples: List[int] = []
+
+    def add(self, mask, checked: int, offset: int):
+        """Somar lote: mask marca as linhas com falha"""
+        np = load_capability("dataframe")["numpy"]
+        failed = int(mask.sum())
+        self.checked += checked
+        self.failed += failed
+        if failed and len(self.samples) < MAX_SAMPLES:
+            rows = np.flatnonzero(np.asarray(mask))[:MAX_SAMPLES - len(self.samples)]
+            self.samples.extend(int(row) + offset + 1 for row in rows)
+
+    def to_dict(self) -> Dict:
+        return {"checked": self.checked, "failed": self.failed, "sample_rows": self.samples}
+
+
+class DataValidator:
+    """Aplica as regras de coluna a um arquivo em streaming e calcula a nota"""
+
+    def __init__(self, columns: Dict[str, Dict], references: Optional[Dict[str, object]] = None, options: Optional[Dict] = None):
+        if not columns:
+            raise DataValidationError("Nenhuma coluna configurada para validação")
+        self.rules = columns
+        self.references = references or {}
+        self.options = options or {}
+        self.tallies = {name: {dim: _Tally() for dim in DIMENSIONS} for name in columns}
+        self.missing_columns: List[str] = []
+        self._seen: Dict[str, object] = {}
+        self.rows = 0
+
+    def validate_file(
+        self,
+        path: str,
+        data_format: str,
+        chunk_rows: Optional[int] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> Dict:
+        """Validar arquivo inteiro e retornar nota e detalhes"""
+        started = time.perf_counter()
+        available = set(read_columns(path, data_format, self.options))
+        self.missing_columns = [name for name in self.rules if name not in available]
+        present = [name for name in self.rules if name in available]
+
+        for frame in iter_frames(path, data_format, columns=present or None, chunk_rows=chunk_rows, options=self.options):
+            self.validate_frame(frame)
+            if progress:
+                progress(self.rows)
+
+        elapsed = time.perf_counter() - started
+        result = self.result()
+        result["details"]["duration_s"] = round(elapsed, 3)
+        result["details"]["rows_per_second"] = round(self.rows / elapsed) if elapsed else None
+        return result
+
+    def validate_frame(self, frame):
+        """Aplicar todas as regras a um lote"""
+        offset = self.rows
+        size = len(frame)
+        self.rows += size
+
+        for name, rule in self.rules.items():
+            tallies = self.tallies[name]
+            if name not in frame.columns:
+                # Coluna ausente: todas as linhas incompletas
+                if rule.get("required", True):
+                    tallies["completeness"].checked += size
+                    tallies["completeness"].failed += size
+                continue
+
+            values = frame[name]
+            present = self._present_mask(values)
+            if rule.get("required", True):
+                tallies["completeness"].add(~present, size, offset)
+
+            typed, type_ok = self._convert(values, present, rule)
+            if rule.get("type") and rule["type"] != "string":
+                tallies["types"].add(present & ~type_ok, int(present.sum()), offset)
+
+            valid = present & type_ok
+            self._check_formats(values, typed, valid, rule, tallies["formats"], offset)
+            self._check_consistency(name, values, valid, rule, tallies["consistency"], offset)
+
+    @staticmethod
+    def _present_mask(values):
+        """Células preenchidas (nem nulas nem só espaços)"""
+        present = values.notna().to_numpy()
+        if _is_text(values):
+            present = present & values.astype(str).str.strip().ne("").to_numpy()
+        return present
+
+    def _convert(self, values, present, rule):
+        """Converter coluna ao tipo declarado; retorna (valores convertidos, máscara de sucesso)"""
+        np = load_capability("dataframe")["numpy"]
+        pd = load_capability("dataframe")["pandas"]
+        expected = rule.get("type", "string")
+
+        if expected in ("integer", "float", "number"):
+            source = values
+            decimal = rule.get("decimal", self.options.get("decimal"))
+            if _is_text(values) and decimal and decimal != ".":
+                source = values.str.replace(".", "", regex=False).str.replace(decimal, ".", regex=False)
+            typed = pd.to_numeric(source, errors="coerce")
+            ok = typed.notna().to_numpy()
+            if expected == "integer":
+                ok = ok & (np.mod(typed.fillna(0).to_numpy(dtype=float), 1) == 0)
+            return typed, ok
+
+        if expected in ("date", "datetime"):
+            if pd.api.types.is_datetime64_any_dtype(values):
+                return values, values.notna().to_numpy()
+            typed = pd.to_datetime(values, format=rule.get("format", "ISO8601"), errors="coerce")
+            return typed, typed.notna().to_numpy()
+
+        if expected == "boolean":
+            if pd.api.types.is_bool_dtype(values):
+                return values, np.ones(len(values), dtype=bool)
+            lowered = values.astype(str).str.strip().str.lower()
+            ok = lowered.isin(_TRUE_VALUES | _FALSE_VALUES).to_numpy()
+            return lowered.isin(_TRUE_VALUES), ok
+
+        return values, present
+
+    @staticmethod
+    def _check_formats(values, typed, valid, rule, tally: _Tally, offset: int):
+        """Padrão, tamanho, valores permitidos e faixa (só em células válidas)"""
+        rules = [key for key in ("pattern", "min_length", "max_length", "allowed", "min", "max") if key in rule]
+        if not rules:
+            return
+
+        np = load_capability("dataframe")["numpy"]
+        failed = np.zeros(len(values), dtype=bool)
+        text = values.astype(str) if any(k in rule for k in ("pattern", "min_length", "max_length", "allowed")) else None
+
+        if "pattern" in rule:
+            failed |= ~text.str.fullmatch(rule["pattern"]).fillna(False).to_numpy(dtype=bool)
+        if "min_length" in rule or "max_length" in rule:
+            lengths = text.str.len().to_numpy()
+            if "min_length" in rule:
+                failed |= lengths < rule["min_length"]
+            if "max_length" in rule:
+                failed |= lengths > rule["max_length"]
+        if "allowed" in rule:
+            failed |= ~text.isin([str(v) for v in rule["allowed"]]).to_numpy()
+        if ("min" in rule or "max" in rule) and rule.get("type") in ("integer", "float", "number", "date", "datetime"):
+            # Datas são comparadas com limites convertidos pelo próprio pandas
+            if rule.get("type") in ("date", "datetime"):
+                pd = load_capability("dataframe")["pandas"]
+                bound = pd.to_datetime
+            else:
+                bound = float
+            comparable = typed.to_numpy()
+            with np.errstate(invalid="ignore"):
+                if "min" in rule:
+                    failed |= valid & ~(comparable >= bound(rule["min"]))
+                if "max" in rule:
+                    failed |= valid & ~(comparable <= bound(rule["max"]))
+
+        tally.add(valid & failed, int(valid.sum()), offset)
+
+    def _check_consistency(self, name: str, values, valid, rule, tally: _Tally, offset: int):
+        """Unicidade entre lotes e integridade referencial"""
+        if not (rule.get("unique") or name in self.references):
+            return
+
+        np = load_capability("dataframe")["numpy"]
+        pd = load_capability("dataframe")["pandas"]
+        indexes = np.flatnonzero(valid)
+        hashes = hash_values(values.iloc[indexes])
+        failed = np.zeros(len(indexes), dtype=bool)
+
+        if rule.get("unique"):
+            seen = self._seen.get(name, np.empty(0, dtype=np.uint64))
+            known = contains_keys(seen, hashes)
+            failed |= pd.Series(hashes).duplicated().to_numpy() | known
+            self._seen[name] = merge_keys(seen, hashes, known)
+
+        if name in self.references:
+            failed |= ~contains_keys(self.references[name], hashes)
+
+        mask = np.zeros(len(values), dtype=bool)
+        mask[indexes[failed]] = True
+        tally.add(mask, len(indexes), offset)
+
+    def result(self) -> Dict:
+        """Nota ponderada das dimensões e detalhes por coluna"""
+        weights = self.options.get("weights") or {}
+        dimensions = {}
+        for dimension, label in DIMENSIONS.items():
+            checked = sum(self.tallies[name][dimension].checked for name in self.rules)
+            failed = sum(self.tallies[name][dimension].failed for name in self.rules)
+            if checked:
+                dimensions[dimension] = {
+                    "label": label,
+                    "checked": checked,
+                    "failed": failed,
+                    "score": round(100.0 * (checked - failed) / checked, 2)
+                }
+
+        total_weight = sum(float(weights.get(d, 1)) for d in dimensions)
+        score = (
+            sum(float(weights.get(d, 1)) * info["score"] for d, info in dimensions.items()) / total_weight
+            if total_weight else 0.0
+        )
+
+        columns = {
+            name: {d: t.to_dict() for d, t in self.tallies[name].items() if t.checked}
+            for name in self.rules
+        }
+        return {
+            "score": round(score, 2),
+            "message": f"{self.rows} linhas validadas",
+            "details": {
+                "rows": self.rows,
+                "dimensions": dimensions,
+                "columns": columns,
+                "missing_columns": self.missing_columns
+            }
+        }
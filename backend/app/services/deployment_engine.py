@@ -0,0 +1,716 @@
+"""
+Motor de implantação em múltiplos runners
+
+Os hosts de um deployment são divididos em estágios (canário e lotes). Cada
+estágio publica o artefato em todos os seus hosts em paralelo, limitado por
+um semáforo, e só libera o próximo depois que os health checks passam; se as
+falhas passarem do limite, todos os hosts já alterados voltam à versão
+anterior. O tempo total cresce com o número de estágios, não de hosts.
+
+Os hosts são acessados por drivers plugáveis (`register_target_driver`):
+"http" conversa com o agente do runner e "simulated" mantém hosts em memória
+para exercitar o motor localmente.
+
+Artefatos do artifact store chegam como manifesto de blocos: cada host
+recebe só os blocos que faltam em relação ao artefato que já tem, e pode
+recebê-los antes da janela de troca (pré-carga), deixando para o rollout
+apenas a ativação.
+"""
+
+import asyncio
+import math
+import random
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Type
+from urllib.parse import urlsplit
+import httpx
+from prometheus_client import Histogram
+import structlog
+
+from app.core.config import settings
+from app.services.chunk_store import ChunkStore
+from app.services.storage_service import StorageService
+
+logger = structlog.get_logger()
+
+DEPLOYMENT_TARGET_LATENCY = Histogram(
+    'deployment_target_duration_seconds',
+    'Deployment duration per target (push + health check)',
+    ['driver', 'status']
+)
+
+# Status de cada host
+TARGET_DEPLOYED = "deployed"
+TARGET_FAILED = "failed"
+TARGET_ROLLED_BACK = "rolled_back"
+TARGET_ROLLBACK_FAILED = "rollback_failed"
+TARGET_SKIPPED = "skipped"
+
+# Status finais do deployment
+DEPLOYMENT_STAGED = "staged"
+DEPLOYMENT_COMPLETED = "completed"
+DEPLOYMENT_FAILED = "failed"
+DEPLOYMENT_ROLLED_BACK = "rolled_back"
+
+LogCallback = Callable[[Dict], Awaitable[None]]
+
+# Leitura do conteúdo de um bloco pelo sha256
+ChunkFetcher = Callable[[str], Awaitable[bytes]]
+
+TARGET_DRIVERS: Dict[str, Type["TargetDriver"]] = {}
+
+# Campos de credencial que não podem ficar gravados nos hosts do deployment;
+# o host referencia um nome em DEPLOYMENT_RUNNER_TOKENS (`credential`)
+TARGET_SECRET_KEYS = {"token", "password", "secret", "api_key", "authorization"}
+
+
+class TargetError(Exception):
+    """Falha ao operar um host"""
+    pass
+
+
+def register_target_driver(name: str):
+    """Registrar driver de hosts disponível para `targets[].driver` (decorator)"""
+    def decorator(cls: Type["TargetDriver"]) -> Type["TargetDriver"]:
+        TARGET_DRIVERS[name] = cls
+        return cls
+    return decorator
+
+
+class TargetDriver:
+    """Operações de um tipo de host; uma instância é compartilhada por execução"""
+
+    async def put_chunk(self, target: Dict, sha256: str, data: bytes):
+        """Enviar um bloco para o cache do host"""
+        raise NotImplementedError
+
+    async def stage(self, target: Dict, artifact: Dict, manifest: List[List]) -> List[str]:
+        """Montar o artefato com os blocos do host; retorna os blocos que ainda faltam"""
+        raise NotImplementedError
+
+    async def deploy(self, target: Dict, version: str, artifact: Dict) -> Optional[str]:
+        """Publicar e ativar a versão; retorna a versão que estava ativa"""
+        raise NotImplementedError
+
+    async def health(self, target: Dict, version: str) -> bool:
+        """Host saudável executando a versão"""
+        raise NotImplementedError
+
+    async def rollback(self, target: Dict, version: Optional[str]):
+        """Reativar a versão anterior"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+# Estado dos hosts simulados: id -> {"version", "history", "chunks", "staged", "received_bytes"}
+SIMULATED_TARGETS: Dict[str, Dict] = {}
+
+
+@register_target_driver("simulated")
+class SimulatedTargetDriver(TargetDriver):
+    """Hosts em memória com latência e falhas configuráveis (testes locais)
+
+    Opções do target: latency_ms, jitter_ms, health_latency_ms,
+    bandwidth_mbps, fail_deploy, unhealthy, failure_rate e seed.
+    """
+
+    def __init__(self):
+        self._rng: Dict[str, random.Random] = {}
+
+    def _random(self, target: Dict) -> random.Random:
+        if target["id"] not in self._rng:
+            self._rng[target["id"]] = random.Random(target.get("seed"))
+        return self._rng[target["id"]]
+
+    async def _delay(self, target: Dict, key: str):
+        latency = float(target.get(key, 0))
+        jitter = float(target.get("jitter_ms", 0))
+        await asyncio.sleep(max(0.0, self._random(target).gauss(latency, jitter) if jitter else latency) / 1000)
+
+    @staticmethod
+    def _state(target: Dict) -> Dict:
+        return SIMULATED_TARGETS.setdefault(target["id"], {
+            "version": target.get("version"),
+            "history": [],
+            "chunks": set(),
+            "staged": set(),
+            "received_bytes": 0
+        })
+
+    async def put_chunk(self, target: Dict, sha256: str, data: bytes):
+        state = self._state(target)
+        bandwidth = float(target.get("bandwidth_mbps", 0))
+        if bandwidth:
+            await asyncio.sleep(len(data) * 8 / (bandwidth * 1_000_000))
+        state["chunks"].add(sha256)
+        state["received_bytes"] += len(data)
+
+    async def stage(self, target: Dict, artifact: Dict, manifest: List[List]) -> List[str]:
+        state = self._state(target)
+        missing = sorted({sha256 for sha256, _ in manifest} - state["chunks"])
+        if not missing:
+            state["staged"].add(artifact["sha256"])
+        return missing
+
+    async def deploy(self, target: Dict, version: str, artifact: Dict) -> Optional[str]:
+        state = self._state(target)
+        await self._delay(target, "latency_ms")
+        if target.get("fail_deploy") or self._random(target).random() < float(target.get("failure_rate", 0)):
+            raise TargetError("falha simulada ao publicar o artefato")
+        if artifact.get("sha256") and artifact["sha256"] not in state["staged"]:
+            raise TargetError("artefato não montado no host")
+        previous = state["version"]
+        state["history"].append(previous)
+        state["version"] = version
+        return previous
+
+    async def health(self, target: Dict, version: str) -> bool:
+        await self._delay(target, "health_latency_ms")
+        state = SIMULATED_TARGETS.get(target["id"], {})
+        return not target.get("unhealthy") and state.get("version") == version
+
+    async def rollback(self, target: Dict, version: Optional[str]):
+        state = self._state(target)
+        await self._delay(target, "latency_ms")
+        if state["history"]:
+            state["history"].pop()
+        state["version"] = version
+
+
+def _origin(url: str) -> Optional[str]:
+    """scheme://host:porta de uma URL http(s), sem credenciais embutidas"""
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    if parts.scheme not in ("http", "https") or not parts.hostname or parts.username or parts.password:
+        return None
+    port = port or (443 if parts.scheme == "https" else 80)
+    return f"{parts.scheme}://{parts.hostname.lower()}:{port}"
+
+
+def runner_address_allowed(credential: Optional[str], url: str) -> bool:
+    """A URL aponta para um agente registrado em DEPLOYMENT_RUNNER_ADDRESSES para a credencial"""
+    if not credential or not isinstance(url, str):
+        return False
+    origin = _origin(url)
+    allowed = {_origin(address) for address in settings.DEPLOYMENT_RUNNER_ADDRESSES.get(credential, [])}
+    return origin is not None and origin in allowed
+
+
+@register_target_driver("http")
+class HttpTargetDriver(TargetDriver):
+    """Agente HTTP do runner
+
+    PUT  {address}/chunks/{sha256} (bytes do bloco)
+    POST {address}/artifacts {"sha256", "version", "manifest"} -> {"missing": [...]}
+    POST {address}/deployments {"version", "artifact"} -> {"previous_version"}
+    GET  {address}/health -> 200 {"version"}
+    POST {address}/rollback {"version"}
+    """
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(timeout=settings.DEPLOYMENT_HTTP_TIMEOUT)
+
+    @staticmethod
+    def _url(target: Dict, path: str) -> str:
+        """URL no agente, só para endereços liberados para a credencial do host"""
+        url = f"{target['address'].rstrip('/')}{path}"
+        if not runner_address_allowed(target.get("credential"), url):
+            raise TargetError("endereço do agente não liberado para a credencial")
+        return url
+
+    @staticmethod
+    def _headers(target: Dict) -> Dict:
+        """Token do agente resolvido no servidor pelo nome da credencial"""
+        token = settings.DEPLOYMENT_RUNNER_TOKENS.get(target.get("credential"))
+        return {"Authorization": f"Bearer {token}"} if token else {}
+
+    async def put_chunk(self, target: Dict, sha256: str, data: bytes):
+        try:
+            response = await self.client.put(
+                self._url(target, f"/chunks/{sha256}"),
+                content=data,
+                headers={**self._headers(target), "Content-Type": "application/octet-stream"}
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise TargetError(f"falha ao enviar bloco: {e}")
+
+    async def stage(self, target: Dict, artifact: Dict, manifest: List[List]) -> List[str]:
+        try:
+            response = await self.client.post(
+                self._url(target, "/artifacts"),
+                json={"sha256": artifact["sha256"], "version": artifact.get("version"), "manifest": manifest},
+                headers=self._headers(target)
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise TargetError(f"falha ao montar artefato: {e}")
+        return (response.json() or {}).get("missing") or []
+
+    async def deploy(self, target: Dict, version: str, artifact: Dict) -> Optional[str]:
+        try:
+            response = await self.client.post(
+                self._url(target, "/deployments"),
+                json={"version": version, "artifact": artifact},
+                headers=self._headers(target)
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise TargetError(f"falha ao publicar: {e}")
+        return (response.json() or {}).get("previous_version")
+
+    async def health(self, target: Dict, version: str) -> bool:
+        try:
+            response = await self.client.get(
+                self._url(target, target.get("health_path", "/health")),
+                headers=self._headers(target)
+            )
+        except httpx.HTTPError:
+            return False
+        if response.status_code != 200:
+            return False
+        try:
+            reported = response.json().get("version")
+        except ValueError:
+            reported = None
+        return reported in (None, version)
+
+    async def rollback(self, target: Dict, version: Optional[str]):
+        try:
+            response = await self.client.post(
+                self._url(target, "/rollback"),
+                json={"version": version},
+                headers=self._headers(target)
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise TargetError(f"falha no rollback: {e}")
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def _count(value, total: int, default: int) -> int:
+    """Quantidade de hosts: número absoluto ou percentual ("25%")"""
+    if value is None:
+        return default
+    if isinstance(value, str) and value.endswith("%"):
+        return math.ceil(total * float(value[:-1]) / 100)
+    return int(value)
+
+
+class DeploymentEngine:
+    """Executa rollouts em estágios com health checks e rollback automático"""
+
+    @staticmethod
+    def plan(targets: List[Dict], strategy: Dict) -> List[Dict]:
+        """Dividir os hosts em estágio canário seguido de lotes"""
+        total = len(targets)
+        canary = min(_count(strategy.get("canary"), total, 1 if total > 1 else 0), total)
+        batch_size = max(_count(strategy.get("batch_size"), total, total - canary), 1)
+
+        stages = []
+        if canary:
+            stages.append({"name": "canary", "targets": targets[:canary]})
+        remaining = targets[canary:]
+        for number, start in enumerate(range(0, len(remaining), batch_size), start=1):
+            stages.append({"name": f"batch-{number}", "targets": remaining[start:start + batch_size]})
+        return stages
+
+    @staticmethod
+    def validate(targets: List[Dict]):
+        """Conferir ids únicos e drivers conhecidos"""
+        if not targets:
+            raise ValueError("Deployment sem hosts de destino")
+        ids = [target.get("id") for target in targets]
+        if None in ids or len(set(ids)) != len(ids):
+            raise ValueError("Todo host precisa de um id único")
+        for target in targets:
+            driver = target.get("driver", "http")
+            if driver not in TARGET_DRIVERS:
+                raise ValueError(f"Driver '{driver}' não suportado")
+            if driver == "http" and not target.get("address"):
+                raise ValueError(f"Host {target['id']} sem address")
+
+    @staticmethod
+    def authorize_targets(targets: List[Dict]):
+        """
+        Política de cadastro dos hosts: sem credenciais gravadas, hosts simulados
+        só quando liberados e agentes HTTP apenas nos endereços registrados para
+        a credencial escolhida (o token nunca segue para endereços arbitrários)
+        """
+        for target in targets:
+            inline = TARGET_SECRET_KEYS & {key.lower() for key in target}
+            if inline:
+                raise ValueError(
+                    f"Host {target.get('id')}: credenciais ({', '.join(sorted(inline))}) não podem ser "
+                    "gravadas no deployment; use 'credential' com um nome configurado no servidor"
+                )
+            driver = target.get("driver", "http")
+            if driver == "simulated" and not settings.DEPLOYMENT_ALLOW_SIMULATED_TARGETS:
+                raise ValueError(f"Host {target.get('id')}: driver 'simulated' não habilitado")
+            if driver != "http":
+                continue
+            credential = target.get("credential")
+            if credential not in settings.DEPLOYMENT_RUNNER_TOKENS:
+                raise ValueError(f"Host {target.get('id')}: credencial '{credential}' não configurada")
+            health_path = target.get("health_path", "/health")
+            if not isinstance(health_path, str) or not health_path.startswith("/"):
+                raise ValueError(f"Host {target.get('id')}: health_path deve começar com '/'")
+            if not runner_address_allowed(credential, target["address"]):
+                raise ValueError(
+                    f"Host {target.get('id')}: endereço não registrado para a credencial '{credential}'"
+                )
+
+    @staticmethod
+    def public_target(target: Dict) -> Dict:
+        """Host sem campos de credencial (registros antigos podem ter o token gravado)"""
+        return {key: value for key, value in target.items() if key.lower() not in TARGET_SECRET_KEYS}
+
+    @classmethod
+    async def deploy(
+        cls,
+        deployment: Dict,
+        on_log: Optional[LogCallback] = None,
+        fetch_chunk: Optional[ChunkFetcher] = None
+    ) -> Dict:
+        """Implantar a versão em todos os hosts, estágio por estágio"""
+        run = _Rollout(deployment, on_log, fetch_chunk)
+        try:
+            return await run.deploy()
+        finally:
+            await run.close()
+
+    @classmethod
+    async def stage(
+        cls,
+        deployment: Dict,
+        on_log: Optional[LogCallback] = None,
+        fetch_chunk: Optional[ChunkFetcher] = None
+    ) -> Dict:
+        """Pré-carregar o artefato em todos os hosts, sem ativar"""
+        run = _Rollout(deployment, on_log, fetch_chunk)
+        try:
+            return await run.stage_all()
+        finally:
+            await run.close()
+
+    @classmethod
+    async def rollback(cls, deployment: Dict, on_log: Optional[LogCallback] = None) -> Dict:
+        """Voltar todos os hosts à versão anterior em paralelo"""
+        run = _Rollout(deployment, on_log)
+        try:
+            return await run.rollback_all()
+        finally:
+            await run.close()
+
+
+class _Rollout:
+    """Estado de uma execução do motor"""
+
+    def __init__(self, deployment: Dict, on_log: Optional[LogCallback], fetch_chunk: Optional[ChunkFetcher] = None):
+        self.deployment = deployment
+        self.version = deployment["version"]
+        self.previous_version = deployment.get("previous_version")
+        artifact = deployment.get("artifact") or {}
+        # O manifesto vai para a montagem; a ativação recebe só a referência
+        self.manifest = artifact.get("manifest")
+        self.artifact = {key: value for key, value in artifact.items() if key != "manifest"}
+        self.targets = deployment.get("targets") or []
+        self.strategy = deployment.get("strategy") or {}
+        self._on_log = on_log
+
+        DeploymentEngine.validate(self.targets)
+        health = self.strategy.get("health_check") or {}
+        self.health_retries = int(health.get("retries", settings.DEPLOYMENT_HEALTH_RETRIES))
+        self.health_interval = float(health.get("interval", settings.DEPLOYMENT_HEALTH_INTERVAL))
+        self.target_timeout = float(self.strategy.get("target_timeout", settings.DEPLOYMENT_TARGET_TIMEOUT))
+        self.max_failure_ratio = float(self.strategy.get("max_failure_ratio", 0.0))
+        self.auto_rollback = self.strategy.get("auto_rollback", True)
+        self.semaphore = asyncio.Semaphore(int(self.strategy.get("max_parallel", settings.DEPLOYMENT_MAX_PARALLEL)))
+
+        self.drivers = {
+            name: TARGET_DRIVERS[name]()
+            for name in {target.get("driver", "http") for target in self.targets}
+        }
+        # Artefato ativo/pré-carregado de cada host e manifestos desses artefatos (base do delta)
+        self.target_state: Dict[str, Dict] = deployment.get("target_state") or {}
+        self.base_manifests: Dict[str, List[List]] = deployment.get("base_manifests") or {}
+        self._fetch = fetch_chunk or self._fetch_from_store
+        self._chunks: Dict[str, asyncio.Task] = {}
+        self._cached_bytes = 0
+
+        # Versões anteriores registradas na execução original (usadas no rollback manual)
+        recorded = (deployment.get("result") or {}).get("targets") or {}
+        self.state: Dict[str, Dict] = {}
+        for target in self.targets:
+            known = self.target_state.get(target["id"]) or {}
+            previous = recorded.get(target["id"]) or {}
+            self.state[target["id"]] = {
+                "status": "pending",
+                "version": known.get("version") or target.get("version"),
+                "previous_version": previous.get("previous_version"),
+                "artifact_sha256": known.get("artifact_sha256"),
+                "previous_artifact": previous.get("previous_artifact"),
+                "staged_sha256": known.get("staged_sha256"),
+                "transferred_bytes": 0
+            }
+
+    def _driver(self, target: Dict) -> TargetDriver:
+        return self.drivers[target.get("driver", "http")]
+
+    @staticmethod
+    async def _fetch_from_store(sha256: str) -> bytes:
+        return await StorageService.get_bytes(ChunkStore.chunk_key(sha256))
+
+    async def _chunk(self, sha256: str) -> bytes:
+        """Bloco lido uma vez do armazenamento e reaproveitado para todos os hosts (até o limite de memória)"""
+        task = self._chunks.get(sha256)
+        if task is None:
+            task = asyncio.create_task(self._fetch(sha256))
+            self._chunks[sha256] = task
+            data = await task
+            if self._cached_bytes + len(data) > settings.DEPLOYMENT_CHUNK_CACHE_BYTES:
+                self._chunks.pop(sha256, None)
+            else:
+                self._cached_bytes += len(data)
+            return data
+        return await task
+
+    def _known_chunks(self, target: Dict) -> Set[str]:
+        """Blocos que o host já tem: os do artefato ativo e os do pré-carregado"""
+        state = self.state[target["id"]]
+        known = set()
+        for sha256 in (state.get("artifact_sha256"), state.get("staged_sha256")):
+            for chunk_hash, _ in self.base_manifests.get(sha256) or []:
+                known.add(chunk_hash)
+        return known
+
+    async def _send_chunks(self, target: Dict, hashes: List[str]) -> int:
+        sizes = {sha256: size for sha256, size in self.manifest}
+        semaphore = asyncio.Semaphore(settings.CHUNK_TRANSFER_CONCURRENCY)
+        driver = self._driver(target)
+
+        async def send(sha256: str):
+            async with semaphore:
+                await driver.put_chunk(target, sha256, await self._chunk(sha256))
+
+        await asyncio.gather(*(send(sha256) for sha256 in hashes))
+        return sum(sizes[sha256] for sha256 in hashes)
+
+    async def _transfer(self, target: Dict, stage: str):
+        """Enviar ao host só os blocos que faltam e montar o artefato"""
+        state = self.state[target["id"]]
+        if not self.manifest or state.get("staged_sha256") == self.artifact.get("sha256"):
+            return
+
+        known = self._known_chunks(target)
+        missing = sorted({sha256 for sha256, _ in self.manifest} - known)
+        sent = await self._send_chunks(target, missing)
+        driver = self._driver(target)
+        # O host confere o próprio cache: blocos perdidos são reenviados uma vez
+        reported = await driver.stage(target, self.artifact, self.manifest)
+        if reported:
+            sent += await self._send_chunks(target, reported)
+            if await driver.stage(target, self.artifact, self.manifest):
+                raise TargetError("blocos ausentes após reenvio")
+
+        state["transferred_bytes"] += sent
+        state["staged_sha256"] = self.artifact["sha256"]
+        await self.log(
+            f"Artefato montado: {sent} de {self.artifact.get('size', 0)} bytes transferidos",
+            target=target["id"], stage=stage
+        )
+
+    async def log(self, message: str, level: str = "INFO", target: Optional[str] = None, stage: Optional[str] = None):
+        """Registrar linha de log; falha ao gravar não interrompe o rollout nem o rollback"""
+        if not self._on_log:
+            return
+        try:
+            await self._on_log({
+                "timestamp": datetime.utcnow().isoformat(),
+                "level": level,
+                "deployment_id": self.deployment.get("id"),
+                "stage": stage,
+                "target": target,
+                "message": message
+            })
+        except Exception as e:
+            logger.warning("Deployment log write failed", deployment_id=self.deployment.get("id"), error=str(e))
+
+    async def close(self):
+        for driver in self.drivers.values():
+            await driver.close()
+
+    async def _healthy(self, target: Dict) -> bool:
+        for attempt in range(self.health_retries + 1):
+            if await self._driver(target).health(target, self.version):
+                return True
+            if attempt < self.health_retries:
+                await asyncio.sleep(self.health_interval)
+        return False
+
+    async def _deploy_target(self, target: Dict, stage: str):
+        state = self.state[target["id"]]
+        driver_name = target.get("driver", "http")
+
+        async with self.semaphore:
+            started = time.perf_counter()
+            state["previous_version"] = state["version"] or self.previous_version
+            state["previous_artifact"] = state["artifact_sha256"]
+            try:
+                await asyncio.wait_for(self._transfer(target, stage), self.target_timeout)
+                previous = await asyncio.wait_for(
+                    self._driver(target).deploy(target, self.version, self.artifact), self.target_timeout
+                )
+                state["previous_version"] = previous or state["previous_version"]
+                state["version"] = self.version
+                state["artifact_sha256"] = self.artifact.get("sha256")
+                if not await asyncio.wait_for(self._healthy(target), self.target_timeout):
+                    raise TargetError("health check não aprovado")
+                state["status"] = TARGET_DEPLOYED
+                state.pop("error", None)
+            except asyncio.TimeoutError:
+                state["status"], state["error"] = TARGET_FAILED, f"tempo limite de {self.target_timeout}s excedido"
+            except Exception as e:
+                state["status"], state["error"] = TARGET_FAILED, str(e)
+            duration = time.perf_counter() - started
+
+        state["duration_ms"] = round(duration * 1000)
+        DEPLOYMENT_TARGET_LATENCY.labels(driver=driver_name, status=state["status"]).observe(duration)
+        if state["status"] == TARGET_FAILED:
+            await self.log(f"Falha: {state['error']}", level="WARNING", target=target["id"], stage=stage)
+        else:
+            await self.log(f"Versão {self.version} ativa e saudável", target=target["id"], stage=stage)
+
+    async def _rollback_target(self, target: Dict):
+        state = self.state[target["id"]]
+        version = state.get("previous_version") or self.previous_version
+        async with self.semaphore:
+            try:
+                await asyncio.wait_for(self._driver(target).rollback(target, version), self.target_timeout)
+                state["status"], state["version"] = TARGET_ROLLED_BACK, version
+                state["artifact_sha256"] = state.get("previous_artifact")
+                await self.log(f"Revertido para {version}", target=target["id"], stage="rollback")
+            except Exception as e:
+                state["status"], state["error"] = TARGET_ROLLBACK_FAILED, str(e) or type(e).__name__
+                await self.log(f"Rollback falhou: {state['error']}", level="ERROR", target=target["id"], stage="rollback")
+
+    async def _rollback(self, targets: List[Dict]) -> bool:
+        """Reverter hosts em paralelo; True se todos voltaram"""
+        await asyncio.gather(*(self._rollback_target(target) for target in targets))
+        return all(self.state[target["id"]]["status"] == TARGET_ROLLED_BACK for target in targets)
+
+    def _result(self, status: str, stages: List[Dict], started: float, error: Optional[str] = None) -> Dict:
+        transferred = sum(state["transferred_bytes"] for state in self.state.values())
+        full = (self.artifact.get("size") or 0) * sum(1 for state in self.state.values() if state["transferred_bytes"])
+        return {
+            "status": status,
+            "version": self.version,
+            "artifact_sha256": self.artifact.get("sha256"),
+            "stages": stages,
+            "targets": self.state,
+            "transfer": {"bytes": transferred, "full_bytes": full, "saved_bytes": max(full - transferred, 0)},
+            "error": error,
+            "duration_ms": round((time.perf_counter() - started) * 1000)
+        }
+
+    async def deploy(self) -> Dict:
+        started = time.perf_counter()
+        plan = DeploymentEngine.plan(self.targets, self.strategy)
+        pause = float(self.strategy.get("pause", 0))
+        touched: List[Dict] = []
+        stages: List[Dict] = []
+
+        await self.log(f"Implantando {self.version} em {len(self.targets)} hosts ({len(plan)} estágios)")
+        for number, stage in enumerate(plan):
+            stage_started = time.perf_counter()
+            await self.log(f"Estágio {stage['name']}: {len(stage['targets'])} hosts", stage=stage["name"])
+            await asyncio.gather(*(self._deploy_target(target, stage["name"]) for target in stage["targets"]))
+            touched.extend(stage["targets"])
+
+            failed = [t["id"] for t in stage["targets"] if self.state[t["id"]]["status"] == TARGET_FAILED]
+            stages.append({
+                "name": stage["name"],
+                "targets": len(stage["targets"]),
+                "failed": len(failed),
+                "duration_ms": round((time.perf_counter() - stage_started) * 1000)
+            })
+
+            # O canário não tolera falhas; os lotes aceitam até max_failure_ratio
+            allowed = 0.0 if stage["name"] == "canary" else self.max_failure_ratio
+            if failed and len(failed) / len(stage["targets"]) > allowed:
+                error = f"Estágio {stage['name']} reprovado: {len(failed)}/{len(stage['targets'])} hosts com falha"
+                await self.log(error, level="ERROR", stage=stage["name"])
+                for pending in plan[number + 1:]:
+                    for target in pending["targets"]:
+                        self.state[target["id"]]["status"] = TARGET_SKIPPED
+
+                if not self.auto_rollback:
+                    return self._result(DEPLOYMENT_FAILED, stages, started, error)
+                await self.log(f"Rollback automático de {len(touched)} hosts", level="WARNING", stage="rollback")
+                if await self._rollback(touched):
+                    return self._result(DEPLOYMENT_ROLLED_BACK, stages, started, error)
+                return self._result(DEPLOYMENT_FAILED, stages, started, error + "; rollback incompleto")
+
+            if pause and number < len(plan) - 1:
+                await asyncio.sleep(pause)
+
+        failed = sum(1 for state in self.state.values() if state["status"] == TARGET_FAILED)
+        await self.log(f"Versão {self.version} implantada em {len(self.targets) - failed}/{len(self.targets)} hosts")
+        return self._result(DEPLOYMENT_COMPLETED, stages, started)
+
+    async def _stage_target(self, target: Dict):
+        state = self.state[target["id"]]
+        async with self.semaphore:
+            try:
+                await asyncio.wait_for(self._transfer(target, "stage"), self.target_timeout)
+                state["status"] = DEPLOYMENT_STAGED
+            except Exception as e:
+                state["status"], state["error"] = TARGET_FAILED, str(e) or type(e).__name__
+                await self.log(f"Pré-carga falhou: {state['error']}", level="WARNING", target=target["id"], stage="stage")
+
+    async def stage_all(self) -> Dict:
+        started = time.perf_counter()
+        if not self.manifest:
+            raise ValueError("Pré-carga requer artefato do artifact store")
+        await self.log(f"Pré-carregando {self.version} em {len(self.targets)} hosts", stage="stage")
+        await asyncio.gather(*(self._stage_target(target) for target in self.targets))
+
+        failed = sum(1 for state in self.state.values() if state["status"] == TARGET_FAILED)
+        result = self._result(
+            DEPLOYMENT_FAILED if failed else DEPLOYMENT_STAGED,
+            [{"name": "stage", "targets": len(self.targets), "failed": failed,
+              "duration_ms": round((time.perf_counter() - started) * 1000)}],
+            started,
+            f"{failed}/{len(self.targets)} hosts não pré-carregados" if failed else None
+        )
+        await self.log(
+            f"Pré-carga concluída: {len(self.targets) - failed}/{len(self.targets)} hosts, "
+            f"{result['transfer']['bytes']} bytes transferidos",
+            stage="stage"
+        )
+        return result
+
+    async def rollback_all(self) -> Dict:
+        started = time.perf_counter()
+        await self.log(f"Rollback de {len(self.targets)} hosts para {self.previous_version}", stage="rollback")
+        ok = await self._rollback(self.targets)
+        return self._result(
+            DEPLOYMENT_ROLLED_BACK if ok else DEPLOYMENT_FAILED,
+            [{"name": "rollback", "targets": len(self.targets),
+              "failed": sum(1 for s in self.state.values() if s["status"] != TARGET_ROLLED_BACK),
+              "duration_ms": round((time.perf_counter() - started) * 1000)}],
+            started,
+            None if ok else "Rollback incompleto"
+        )
+
+
+# Instância global do serviço
+deployment_engine = DeploymentEngine()
@@ -0,0 +1,229 @@
+"""
+Logs de deployment append-only com acompanhamento ao vivo
+
+As linhas ficam na tabela deployment_logs, cujo id sequencial é o offset
+usado para retomar a leitura (Last-Event-ID). Cada gravação em lote publica
+as linhas novas em um stream de notificação por deployment; quem acompanha
+lê o histórico pendente no banco e depois só recebe o que chega pelo stream.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy import select, insert
+import structlog
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.deployment import Deployment, DeploymentLog
+from app.services.event_stream import EventStream
+
+logger = structlog.get_logger()
+
+# Status em que ainda podem chegar linhas novas
+ACTIVE_STATUSES = ("in_progress", "staging", "rollback_in_progress")
+
+# Linhas lidas do banco por consulta ao reenviar o histórico
+READ_PAGE_SIZE = 500
+
+
+def _timestamp(value) -> datetime:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    parsed = datetime.fromisoformat(value) if value else datetime.now(timezone.utc)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class DeploymentLogStore:
+    """Gravação, leitura paginada e tail -f dos logs de deployment"""
+
+    @staticmethod
+    def stream_name(deployment_id: str) -> str:
+        """Stream de notificação das linhas novas do deployment"""
+        return f"deployment:{deployment_id}:logs"
+
+    @staticmethod
+    def to_dict(log: DeploymentLog) -> Dict:
+        return {
+            "offset": log.id,
+            "timestamp": log.timestamp.isoformat() if log.timestamp else None,
+            "level": log.level,
+            "stage": log.stage,
+            "target": log.target,
+            "message": log.message,
+            "job_id": log.job_id
+        }
+
+    @classmethod
+    async def append(cls, deployment_id: str, entries: List[Dict], job_id: Optional[str] = None) -> List[Dict]:
+        """Gravar linhas em lote e notificar quem acompanha; retorna as linhas com offset"""
+        if not entries:
+            return []
+
+        key = uuid.UUID(str(deployment_id))
+        rows = [
+            {
+                "deployment_id": key,
+                "job_id": job_id,
+                "timestamp": _timestamp(entry.get("timestamp")),
+                "level": entry.get("level", "INFO"),
+                "stage": entry.get("stage"),
+                "target": entry.get("target"),
+                "message": entry["message"]
+            }
+            for entry in entries
+        ]
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(insert(DeploymentLog).values(rows).returning(DeploymentLog.id))
+            await session.commit()
+
+        # Os ids saem da sequência na ordem do VALUES
+        stored = [
+            {
+                "offset": offset,
+                "timestamp": row["timestamp"].isoformat(),
+                "level": row["level"],
+                "stage": row["stage"],
+                "target": row["target"],
+                "message": row["message"],
+                "job_id": job_id
+            }
+            for offset, row in zip(sorted(result.scalars().all()), rows)
+        ]
+        await EventStream.publish(
+            cls.stream_name(deployment_id),
+            {"type": "log", "entries": stored},
+            maxlen=settings.DEPLOYMENT_LOG_STREAM_MAXLEN
+        )
+        return stored
+
+    @classmethod
+    async def publish_end(cls, deployment_id: str, status: str):
+        """Avisar quem acompanha que o rollout terminou"""
+        await EventStream.publish(
+            cls.stream_name(deployment_id),
+            {"type": "end", "status": status},
+            maxlen=settings.DEPLOYMENT_LOG_STREAM_MAXLEN
+        )
+
+    @staticmethod
+    async def read(deployment_id: str, after: int = 0, limit: int = READ_PAGE_SIZE) -> List[Dict]:
+        """Linhas com offset maior que `after`, em ordem"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(DeploymentLog)
+                .where(DeploymentLog.deployment_id == uuid.UUID(str(deployment_id)), DeploymentLog.id > after)
+                .order_by(DeploymentLog.id)
+                .limit(limit)
+            )
+            return [DeploymentLogStore.to_dict(log) for log in result.scalars().all()]
+
+    @classmethod
+    async def follow(cls, deployment_id: str, after: int = 0) -> AsyncIterator[Tuple[Optional[str], Optional[Dict]]]:
+        """Histórico a partir de `after` seguido das linhas novas (tail -f)
+
+        Emite (event, dados): "log" com a linha, "end" com o status final e
+        (None, None) como heartbeat. A posição do stream é capturada antes de
+        ler o banco, então nenhuma linha gravada no meio do caminho se perde;
+        as repetidas são descartadas pelo offset.
+        """
+        stream = cls.stream_name(deployment_id)
+        cursor = await EventStream.last_id(stream)
+
+        # Status lido antes do histórico: se já terminou, todas as linhas estão no banco
+        async with AsyncSessionLocal() as session:
+            status = await session.scalar(
+                select(Deployment.status).where(Deployment.id == uuid.UUID(str(deployment_id)))
+            )
+
+        while True:
+            page = await cls.read(deployment_id, after=after)
+            for entry in page:
+                after = entry["offset"]
+                yield "log", entry
+            if len(page) < READ_PAGE_SIZE:
+                break
+
+        if status not in ACTIVE_STATUSES:
+            yield "end", {"status": status}
+            return
+
+        async for _, event in EventStream.follow(stream, last_id=cursor, until=lambda e: e["type"] == "end"):
+            if event is None:
+                yield None, None
+            elif event["type"] == "end":
+                yield "end", {"status": event["status"]}
+            else:
+                for entry in event["entries"]:
+                    if entry["offset"] > after:
+                        after = entry["offset"]
+                        yield "log", entry
+
+
+class DeploymentLogWriter:
+    """Acumula linhas e grava em lotes (por tempo ou quantidade)
+
+    Um único escritor por deployment grava em ordem, então os offsets
+    ficam visíveis sempre crescentes para quem acompanha.
+    """
+
+    def __init__(self, deployment_id: str, job_id: Optional[str] = None):
+        self.deployment_id = deployment_id
+        self.job_id = job_id
+        self._buffer: List[Dict] = []
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "DeploymentLogWriter":
+        self._task = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning("Deployment log flush failed", deployment_id=self.deployment_id, error=str(e))
+
+    async def write(self, entry: Dict):
+        """Enfileirar linha (grava na hora se o lote encheu)
+
+        Falha ao gravar não chega a quem escreve: as linhas ficam no buffer
+        para a próxima tentativa, até um limite em que as mais antigas saem.
+        """
+        self._buffer.append(entry)
+        if len(self._buffer) < settings.DEPLOYMENT_LOG_BATCH_SIZE:
+            return
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning("Deployment log flush failed", deployment_id=self.deployment_id, error=str(e))
+            overflow = len(self._buffer) - settings.DEPLOYMENT_LOG_BUFFER_MAX
+            if overflow > 0:
+                del self._buffer[:overflow]
+
+    async def flush(self):
+        async with self._lock:
+            entries, self._buffer = self._buffer, []
+            if not entries:
+                return
+            try:
+                await DeploymentLogStore.append(self.deployment_id, entries, job_id=self.job_id)
+            except Exception:
+                # Mantém a ordem para a próxima tentativa
+                self._buffer[:0] = entries
+                raise
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(settings.DEPLOYMENT_LOG_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("Deployment log flush failed", deployment_id=self.deployment_id, error=str(e))
+
+
+# Instância global do serviço
+deployment_log_store = DeploymentLogStore()
@@ -0,0 +1,705 @@
+"""
+Serviço de deployments (cadastro, artifact store e execução pelo DeploymentEngine)
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, update, func, and_, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+import structlog
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.deployment import Deployment, DeploymentArtifact, DeploymentTargetState
+from app.models.project import Project
+from app.services.chunk_store import ChunkStore
+from app.services.deployment_engine import DeploymentEngine
+from app.services.deployment_log_store import DeploymentLogStore, DeploymentLogWriter
+from app.services.dora_metrics import DoraMetricsService
+from app.services.storage_service import SpooledUpload, StorageService
+
+logger = structlog.get_logger()
+
+# Status de onde cada ação pode partir
+EXECUTABLE_STATUSES = ("pending", "staged", "failed")
+STAGEABLE_STATUSES = ("pending", "staged", "failed")
+ROLLBACK_STATUSES = ("completed", "failed")
+EDITABLE_STATUSES = ("pending", "staged")
+RUNNING_STATUSES = ("in_progress", "staging", "rollback_in_progress")
+
+# Status intermediário de cada ação
+ACTION_STATUSES = {"deploy": "in_progress", "stage": "staging", "rollback": "rollback_in_progress"}
+
+
+def _parse_uuid(value: str) -> Optional[uuid.UUID]:
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+class DeploymentConflictError(Exception):
+    """Deployment em estado que não permite a ação"""
+    pass
+
+
+class DeploymentService:
+    """Deployments persistidos e rollouts em múltiplos hosts
+
+    Um rollout em andamento é do job que o assumiu (`job_id`), que renova
+    `heartbeat_at` enquanto executa. Se o worker morrer, o claim expira depois
+    de DEPLOYMENT_CLAIM_LEASE segundos e o deployment pode ser executado,
+    revertido ou removido de novo; o resultado de um worker que perdeu o
+    claim é descartado.
+    """
+
+    @staticmethod
+    def is_stale(deployment: Deployment) -> bool:
+        """Execução sem renovação do claim dentro do prazo (worker interrompido)"""
+        if deployment.status not in RUNNING_STATUSES:
+            return False
+        last_seen = deployment.heartbeat_at or deployment.started_at
+        lease = timedelta(seconds=settings.DEPLOYMENT_CLAIM_LEASE)
+        return last_seen is None or last_seen < datetime.now(timezone.utc) - lease
+
+    @staticmethod
+    def _stale_clause():
+        """Mesma condição de is_stale, avaliada no banco"""
+        return and_(
+            Deployment.status.in_(RUNNING_STATUSES),
+            func.coalesce(Deployment.heartbeat_at, Deployment.started_at)
+            < func.now() - timedelta(seconds=settings.DEPLOYMENT_CLAIM_LEASE)
+        )
+
+    @staticmethod
+    def to_dict(deployment: Deployment) -> Dict:
+        """Representação pública do deployment"""
+        return {
+            "id": str(deployment.id),
+            "name": deployment.name,
+            "project_id": str(deployment.project_id),
+            "version": deployment.version,
+            "previous_version": deployment.previous_version,
+            "environment": deployment.environment,
+            "description": deployment.description,
+            "changes": deployment.changes or [],
+            "artifact": deployment.artifact or {},
+            "targets": [DeploymentEngine.public_target(target) for target in deployment.targets or []],
+            "strategy": deployment.strategy or {},
+            "status": deployment.status,
+            "result": deployment.result,
+            "error": deployment.error,
+            "job_id": deployment.job_id,
+            "duration_ms": deployment.duration_ms,
+            "rollback_available": deployment.status in ROLLBACK_STATUSES,
+            "stale": DeploymentService.is_stale(deployment),
+            "created_by": str(deployment.created_by),
+            "deployed_by": str(deployment.deployed_by) if deployment.deployed_by else None,
+            "created_at": deployment.created_at.isoformat() if deployment.created_at else None,
+            "started_at": deployment.started_at.isoformat() if deployment.started_at else None,
+            "heartbeat_at": deployment.heartbeat_at.isoformat() if deployment.heartbeat_at else None,
+            "deployed_at": deployment.deployed_at.isoformat() if deployment.deployed_at else None,
+            "finished_at": deployment.finished_at.isoformat() if deployment.finished_at else None,
+            "updated_at": deployment.updated_at.isoformat() if deployment.updated_at else None
+        }
+
+    @staticmethod
+    def summary_to_dict(row) -> Dict:
+        """Projeção compacta usada nas listagens"""
+        return {
+            "id": str(row.id),
+            "name": row.name,
+            "project_id": str(row.project_id),
+            "version": row.version,
+            "previous_version": row.previous_version,
+            "environment": row.environment,
+            "status": row.status,
+            "error": row.error,
+            "target_count": row.target_count or 0,
+            "duration_ms": row.duration_ms,
+            "rollback_available": row.status in ROLLBACK_STATUSES,
+            "created_by": str(row.created_by),
+            "deployed_by": str(row.deployed_by) if row.deployed_by else None,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "deployed_at": row.deployed_at.isoformat() if row.deployed_at else None,
+            "finished_at": row.finished_at.isoformat() if row.finished_at else None
+        }
+
+    @staticmethod
+    async def list_deployments(
+        db: AsyncSession,
+        user_id: str,
+        project_id: Optional[str] = None,
+        status: Optional[str] = None,
+        environment: Optional[str] = None,
+        before: Optional[datetime] = None,
+        before_id: Optional[str] = None,
+        limit: int = 100,
+        with_total: bool = False
+    ) -> Tuple[List, Optional[int]]:
+        """Listar deployments com filtros, mais recentes primeiro (paginação por created_at, id)
+
+        Só as colunas da projeção compacta são lidas (hosts, estratégia,
+        resultado e artefato ficam no detalhe). Só entram projetos do usuário.
+        A contagem exata só é feita quando pedida.
+        """
+        filters = [Deployment.project_id.in_(select(Project.id).where(Project.created_by == user_id))]
+        if project_id:
+            filters.append(Deployment.project_id == uuid.UUID(project_id))
+        if status:
+            filters.append(Deployment.status == status)
+        if environment:
+            filters.append(Deployment.environment == environment)
+
+        total = await db.scalar(select(func.count()).select_from(Deployment).where(*filters)) if with_total else None
+        if before and before_id:
+            filters.append(tuple_(Deployment.created_at, Deployment.id) < tuple_(before, uuid.UUID(before_id)))
+        elif before:
+            filters.append(Deployment.created_at < before)
+        result = await db.execute(
+            select(
+                Deployment.id,
+                Deployment.name,
+                Deployment.project_id,
+                Deployment.version,
+                Deployment.previous_version,
+                Deployment.environment,
+                Deployment.status,
+                Deployment.error,
+                func.jsonb_array_length(Deployment.targets).label("target_count"),
+                Deployment.duration_ms,
+                Deployment.created_by,
+                Deployment.deployed_by,
+                Deployment.created_at,
+                Deployment.deployed_at,
+                Deployment.finished_at
+            )
+            .where(*filters)
+            .order_by(Deployment.created_at.desc(), Deployment.id.desc())
+            .limit(limit)
+        )
+        return list(result.all()), total
+
+    @staticmethod
+    async def get(db: AsyncSession, deployment_id: str) -> Optional[Deployment]:
+        """Obter deployment (None para id inválido ou inexistente)"""
+        key = _parse_uuid(deployment_id)
+        return await db.get(Deployment, key) if key else None
+
+    @staticmethod
+    async def create(db: AsyncSession, created_by: str, **fields) -> Deployment:
+        """Criar deployment; sem previous_version, usa a última versão concluída no ambiente"""
+        DeploymentEngine.validate(fields.get("targets") or [])
+        DeploymentEngine.authorize_targets(fields["targets"])
+        project_id = uuid.UUID(fields["project_id"])
+
+        artifact = fields.get("artifact") or {}
+        if fields.get("artifact_id"):
+            stored = await DeploymentService.get_artifact(db, fields["artifact_id"])
+            if not stored or stored.project_id != project_id:
+                raise ValueError("Artefato não encontrado no projeto")
+            artifact = DeploymentService.artifact_ref(stored)
+
+        previous_version = fields.get("previous_version")
+        if not previous_version:
+            previous_version = await db.scalar(
+                select(Deployment.version)
+                .where(
+                    Deployment.project_id == project_id,
+                    Deployment.environment == fields["environment"],
+                    Deployment.status == "completed"
+                )
+                .order_by(Deployment.finished_at.desc())
+                .limit(1)
+            )
+
+        deployment = Deployment(
+            name=fields.get("name") or f"Deploy {fields['version']}",
+            project_id=project_id,
+            version=fields["version"],
+            previous_version=previous_version,
+            environment=fields["environment"],
+            description=fields.get("description"),
+            changes=fields.get("changes") or [],
+            artifact=artifact,
+            targets=fields["targets"],
+            strategy=fields.get("strategy") or {},
+            status="pending",
+            created_by=created_by
+        )
+        db.add(deployment)
+        await db.commit()
+        await db.refresh(deployment)
+        return deployment
+
+    @staticmethod
+    async def update(db: AsyncSession, deployment: Deployment, **fields) -> Deployment:
+        """Atualizar campos (valores None são ignorados); hosts e estratégia só antes da execução"""
+        if deployment.status not in EDITABLE_STATUSES and any(
+            fields.get(field) is not None for field in ("targets", "strategy", "artifact")
+        ):
+            raise DeploymentConflictError("Hosts, estratégia e artefato só podem mudar antes da execução")
+        if fields.get("targets") is not None:
+            DeploymentEngine.validate(fields["targets"])
+            DeploymentEngine.authorize_targets(fields["targets"])
+
+        for field, value in fields.items():
+            if value is not None:
+                setattr(deployment, field, value)
+        await db.commit()
+        await db.refresh(deployment)
+        return deployment
+
+    @classmethod
+    async def delete(cls, db: AsyncSession, deployment: Deployment):
+        """Remover deployment (não durante um rollout, a não ser que o worker tenha parado)"""
+        if deployment.status in RUNNING_STATUSES and not cls.is_stale(deployment):
+            raise DeploymentConflictError("Deployment em execução")
+        await db.delete(deployment)
+        await db.commit()
+
+    @classmethod
+    async def claim(
+        cls,
+        db: AsyncSession,
+        deployment: Deployment,
+        from_statuses: Tuple[str, ...],
+        status: str
+    ) -> Deployment:
+        """Mudar o status atomicamente (um único rollout por deployment)
+
+        Execuções abandonadas (claim expirado) também podem ser retomadas.
+        """
+        claimed = await db.scalar(
+            update(Deployment)
+            .where(
+                Deployment.id == deployment.id,
+                or_(Deployment.status.in_(from_statuses), cls._stale_clause())
+            )
+            .values(status=status, job_id=None, error=None, started_at=func.now(), heartbeat_at=func.now())
+            .returning(Deployment.id)
+        )
+        if not claimed:
+            await db.rollback()
+            raise DeploymentConflictError(f"Deployment com status '{deployment.status}' não permite a operação")
+        await db.commit()
+        await db.refresh(deployment)
+        return deployment
+
+    @staticmethod
+    async def release(db: AsyncSession, deployment: Deployment, status: str):
+        """Desfazer um claim cujo job não pôde ser enfileirado"""
+        await db.execute(update(Deployment).where(Deployment.id == deployment.id).values(status=status))
+        await db.commit()
+
+    @staticmethod
+    def engine_payload(deployment: Deployment) -> Dict:
+        """Definição do deployment entregue ao motor (desacoplada da sessão)"""
+        return {
+            "id": str(deployment.id),
+            "project_id": str(deployment.project_id),
+            "environment": deployment.environment,
+            "version": deployment.version,
+            "previous_version": deployment.previous_version,
+            "artifact": deployment.artifact or {},
+            "targets": deployment.targets or [],
+            "strategy": deployment.strategy or {},
+            "result": deployment.result
+        }
+
+    @staticmethod
+    async def _delta_inputs(db: AsyncSession, deployment: Deployment) -> Dict:
+        """Manifesto do artefato, estado conhecido de cada host e manifestos que eles já têm"""
+        target_ids = [target["id"] for target in deployment.targets or []]
+        result = await db.execute(
+            select(DeploymentTargetState).where(
+                DeploymentTargetState.project_id == deployment.project_id,
+                DeploymentTargetState.environment == deployment.environment,
+                DeploymentTargetState.target_id.in_(target_ids)
+            )
+        )
+        target_state = {
+            state.target_id: {
+                "version": state.version,
+                "artifact_sha256": state.artifact_sha256,
+                "staged_sha256": state.staged_sha256
+            }
+            for state in result.scalars().all()
+        }
+
+        sha256 = (deployment.artifact or {}).get("sha256")
+        wanted = {sha256} | {
+            value for state in target_state.values()
+            for value in (state["artifact_sha256"], state["staged_sha256"]) if value
+        }
+        wanted.discard(None)
+        manifests = {}
+        if wanted:
+            # Poucos artefatos distintos entre os hosts: cada manifesto é lido uma vez
+            result = await db.execute(
+                select(DeploymentArtifact.sha256, DeploymentArtifact.manifest).where(
+                    DeploymentArtifact.project_id == deployment.project_id,
+                    DeploymentArtifact.sha256.in_(wanted)
+                )
+            )
+            manifests = {row.sha256: row.manifest for row in result}
+
+        inputs = {"target_state": target_state, "base_manifests": manifests}
+        if sha256 in manifests:
+            inputs["artifact"] = {**(deployment.artifact or {}), "manifest": manifests[sha256]}
+        return inputs
+
+    @staticmethod
+    async def _record_target_states(db: AsyncSession, deployment: Dict, result: Dict, action: str):
+        """Gravar versão ativa e artefato pré-carregado de cada host tocado"""
+        rows = [
+            {
+                "project_id": uuid.UUID(deployment["project_id"]),
+                "environment": deployment["environment"],
+                "target_id": target_id,
+                "version": state.get("version"),
+                "artifact_sha256": state.get("artifact_sha256"),
+                "staged_sha256": state.get("staged_sha256")
+            }
+            for target_id, state in sorted(result["targets"].items())
+            if state["status"] not in ("pending", "skipped")
+        ]
+        if not rows:
+            return
+        if action == "stage":
+            staged_at = datetime.now(timezone.utc)
+            for row in rows:
+                row["staged_at"] = staged_at
+
+        stmt = insert(DeploymentTargetState).values(rows)
+        set_ = {
+            "version": stmt.excluded.version,
+            "artifact_sha256": stmt.excluded.artifact_sha256,
+            "staged_sha256": stmt.excluded.staged_sha256,
+            "updated_at": func.now()
+        }
+        if action == "stage":
+            set_["staged_at"] = stmt.excluded.staged_at
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[
+                DeploymentTargetState.project_id,
+                DeploymentTargetState.environment,
+                DeploymentTargetState.target_id
+            ],
+            set_=set_
+        ))
+
+    @staticmethod
+    async def _heartbeat(key: uuid.UUID, job_id: str):
+        """Renovar o claim enquanto o motor executa (para quando o claim é perdido)"""
+        while True:
+            await asyncio.sleep(settings.DEPLOYMENT_HEARTBEAT_INTERVAL)
+            try:
+                async with AsyncSessionLocal() as session:
+                    alive = await session.scalar(
+                        update(Deployment)
+                        .where(Deployment.id == key, Deployment.job_id == job_id)
+                        .values(heartbeat_at=func.now())
+                        .returning(Deployment.id)
+                    )
+                    await session.commit()
+            except Exception as e:
+                # Falha momentânea do banco não interrompe o rollout
+                logger.warning("Deployment heartbeat failed", deployment_id=str(key), job_id=job_id, error=str(e))
+                continue
+            if not alive:
+                logger.warning("Deployment claim lost", deployment_id=str(key), job_id=job_id)
+                return
+
+    @staticmethod
+    async def _finish(db: AsyncSession, key: uuid.UUID, job_id: str, **values) -> bool:
+        """Gravar o desfecho só se o job ainda for dono do claim"""
+        updated = await db.scalar(
+            update(Deployment)
+            .where(Deployment.id == key, Deployment.job_id == job_id)
+            .values(**values)
+            .returning(Deployment.id)
+        )
+        if not updated:
+            await db.rollback()
+            logger.warning("Deployment result discarded after claim was lost",
+                           deployment_id=str(key), job_id=job_id, status=values.get("status"))
+        return bool(updated)
+
+    @classmethod
+    async def run(cls, job_id: str, deployment_id: str, user_id: Optional[str] = None, action: str = "deploy") -> Dict:
+        """Executar rollout, pré-carga ou rollback, gravando logs no log store e o resultado no deployment"""
+        key = uuid.UUID(deployment_id)
+        async with AsyncSessionLocal() as session:
+            # Assumir o claim: se outro job já assumiu ou o claim foi retomado, não executa
+            claimed = await session.scalar(
+                update(Deployment)
+                .where(
+                    Deployment.id == key,
+                    Deployment.status == ACTION_STATUSES[action],
+                    Deployment.job_id.is_(None)
+                )
+                .values(job_id=job_id, heartbeat_at=func.now())
+                .returning(Deployment.id)
+            )
+            if not claimed:
+                raise DeploymentConflictError("Deployment assumido por outra execução")
+            deployment = await session.get(Deployment, key)
+            payload = {**cls.engine_payload(deployment), **await cls._delta_inputs(session, deployment)}
+            # Instantes anteriores à transição, base do incremento das métricas DORA
+            timeline = {
+                "project_id": deployment.project_id,
+                "environment": deployment.environment,
+                "created_at": deployment.created_at,
+                "started_at": deployment.started_at,
+                "deployed_at": deployment.deployed_at,
+                "finished_at": deployment.finished_at
+            }
+            await session.commit()
+
+        heartbeat = asyncio.create_task(cls._heartbeat(key, job_id))
+        try:
+            async with DeploymentLogWriter(deployment_id, job_id=job_id) as writer:
+                if action == "rollback":
+                    result = await DeploymentEngine.rollback(payload, on_log=writer.write)
+                elif action == "stage":
+                    result = await DeploymentEngine.stage(payload, on_log=writer.write)
+                else:
+                    result = await DeploymentEngine.deploy(payload, on_log=writer.write)
+        except Exception as e:
+            finished_at = datetime.now(timezone.utc)
+            async with AsyncSessionLocal() as session:
+                if await cls._finish(session, key, job_id, status="failed", error=str(e), finished_at=finished_at):
+                    await DoraMetricsService.record(
+                        session, DoraMetricsService.transition(timeline, action, "failed", finished_at)
+                    )
+                    await session.commit()
+                    await DeploymentLogStore.publish_end(deployment_id, "failed")
+            raise
+        finally:
+            heartbeat.cancel()
+
+        finished_at = datetime.now(timezone.utc)
+        values = {
+            "status": result["status"],
+            "error": result["error"],
+            "duration_ms": result["duration_ms"],
+            "finished_at": finished_at
+        }
+        if action == "stage":
+            # Pré-carga não conclui o deployment: a troca ainda precisa ser executada
+            values.pop("finished_at")
+        elif action == "deploy":
+            # O rollback preserva as versões anteriores registradas no rollout
+            values["result"] = result
+            if result["status"] == "completed":
+                values["deployed_at"] = values["finished_at"]
+                values["deployed_by"] = _parse_uuid(user_id) if user_id else None
+
+        async with AsyncSessionLocal() as session:
+            recorded = await cls._finish(session, key, job_id, **values)
+            if recorded:
+                await cls._record_target_states(session, payload, result, action)
+                await DoraMetricsService.record(
+                    session,
+                    DoraMetricsService.transition(
+                        {
+                            **timeline,
+                            "duration_ms": result["duration_ms"],
+                            "canary_rejected": [stage["name"] for stage in result["stages"]] == ["canary"]
+                        },
+                        action,
+                        result["status"],
+                        finished_at
+                    )
+                )
+                await session.commit()
+        if recorded:
+            await DeploymentLogStore.publish_end(deployment_id, result["status"])
+
+        logger.info("Deployment finished",
+                   deployment_id=deployment_id,
+                   action=action,
+                   status=result["status"],
+                   targets=len(payload["targets"]),
+                   stages=len(result["stages"]),
+                   transferred_bytes=result["transfer"]["bytes"],
+                   duration_ms=result["duration_ms"])
+
+        return {
+            "deployment_id": deployment_id,
+            "status": result["status"],
+            "error": result["error"],
+            "stages": result["stages"],
+            "duration_ms": result["duration_ms"],
+            "transfer": result["transfer"],
+            "failed_targets": [
+                target_id for target_id, state in result["targets"].items()
+                if state["status"] not in ("deployed", "staged", "rolled_back")
+            ]
+        }
+
+    @staticmethod
+    def artifact_to_dict(artifact: DeploymentArtifact) -> Dict:
+        """Representação pública do artefato (sem o manifesto)"""
+        return {
+            "id": str(artifact.id),
+            "project_id": str(artifact.project_id),
+            "version": artifact.version,
+            "filename": artifact.filename,
+            "sha256": artifact.sha256,
+            "size_bytes": artifact.size_bytes,
+            "stored_bytes": artifact.stored_bytes,
+            "created_by": str(artifact.created_by),
+            "created_at": artifact.created_at.isoformat() if artifact.created_at else None
+        }
+
+    @staticmethod
+    def artifact_ref(artifact: DeploymentArtifact) -> Dict:
+        """Referência gravada no deployment e enviada aos hosts"""
+        return {
+            "id": str(artifact.id),
+            "sha256": artifact.sha256,
+            "size": artifact.size_bytes,
+            "version": artifact.version,
+            "filename": artifact.filename
+        }
+
+    @staticmethod
+    async def get_artifact(db: AsyncSession, artifact_id: str) -> Optional[DeploymentArtifact]:
+        key = _parse_uuid(artifact_id)
+        return await db.get(DeploymentArtifact, key) if key else None
+
+    @staticmethod
+    async def list_artifacts(
+        db: AsyncSession,
+        project_id: str,
+        skip: int = 0,
+        limit: int = 100
+    ) -> Tuple[List[DeploymentArtifact], int]:
+        """Artefatos do projeto, mais recentes primeiro (manifestos não são carregados)"""
+        query = select(DeploymentArtifact).where(DeploymentArtifact.project_id == uuid.UUID(project_id))
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        result = await db.execute(
+            query.options(defer(DeploymentArtifact.manifest))
+            .order_by(DeploymentArtifact.created_at.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        return list(result.scalars().all()), total
+
+    @staticmethod
+    async def find_artifact(db: AsyncSession, project_id: str, sha256: str) -> Optional[DeploymentArtifact]:
+        """Artefato do projeto com o mesmo conteúdo, se já enviado"""
+        return await db.scalar(
+            select(DeploymentArtifact).where(
+                DeploymentArtifact.project_id == uuid.UUID(str(project_id)),
+                DeploymentArtifact.sha256 == sha256
+            )
+        )
+
+    @staticmethod
+    def artifact_upload_key(upload_id: str, sha256: str) -> str:
+        """Chave temporária do pacote enquanto o job o corta em blocos"""
+        return f"artifact-uploads/{upload_id}/{sha256}"
+
+    @classmethod
+    async def ingest_artifact(cls, file_info: Dict, project_id: str, version: str, created_by: str) -> Dict:
+        """Guardar no artifact store o pacote deixado pelo upload (executado pelo job)
+
+        O objeto temporário é removido ao final, com ou sem sucesso.
+        """
+        spooled = None
+        try:
+            spooled = await StorageService.fetch_blob(
+                object_name=file_info["object_name"],
+                filename=file_info["filename"],
+                content_type=file_info["content_type"],
+                size=file_info["size"],
+                sha256=file_info["sha256"]
+            )
+            async with AsyncSessionLocal() as db:
+                artifact, deduplicated = await cls.create_artifact(
+                    db, spooled, project_id=project_id, version=version, created_by=created_by
+                )
+                return {**cls.artifact_to_dict(artifact), "deduplicated": deduplicated}
+        finally:
+            if spooled:
+                spooled.cleanup()
+            await StorageService.delete_object(file_info["object_name"])
+
+    @classmethod
+    async def create_artifact(
+        cls,
+        db: AsyncSession,
+        spooled: SpooledUpload,
+        project_id: str,
+        version: str,
+        created_by: str
+    ) -> Tuple[DeploymentArtifact, bool]:
+        """Guardar pacote como blocos deduplicados; conteúdo já enviado ao projeto é reaproveitado
+
+        Retorna (artefato, deduplicado).
+        """
+        key = uuid.UUID(project_id)
+        existing = await cls.find_artifact(db, project_id, spooled.sha256)
+        if existing:
+            return existing, True
+
+        stored = await ChunkStore.store_file(db, spooled.path)
+        artifact = DeploymentArtifact(
+            project_id=key,
+            version=version,
+            filename=spooled.filename,
+            sha256=spooled.sha256,
+            size_bytes=stored["size"],
+            manifest=stored["manifest"],
+            stored_bytes=stored["stored_bytes"],
+            created_by=created_by
+        )
+        db.add(artifact)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Mesmo conteúdo enviado em paralelo: as referências dos blocos são desfeitas junto
+            await db.rollback()
+            return await cls.find_artifact(db, project_id, spooled.sha256), True
+        await db.refresh(artifact)
+
+        logger.info("Deployment artifact stored",
+                   artifact_id=str(artifact.id),
+                   version=version,
+                   size=artifact.size_bytes,
+                   stored_bytes=artifact.stored_bytes,
+                   chunks=len(artifact.manifest))
+        return artifact, False
+
+    @staticmethod
+    async def delete_artifact(db: AsyncSession, artifact: DeploymentArtifact):
+        """Remover artefato e soltar seus blocos (não enquanto algum deployment pode usá-lo)
+
+        Deployments com falha contam: podem ser executados ou pré-carregados de novo.
+        """
+        in_use = await db.scalar(
+            select(func.count()).select_from(Deployment).where(
+                Deployment.project_id == artifact.project_id,
+                Deployment.artifact["sha256"].astext == artifact.sha256,
+                Deployment.status.in_(set(RUNNING_STATUSES + EXECUTABLE_STATUSES + STAGEABLE_STATUSES))
+            )
+        )
+        if in_use:
+            raise DeploymentConflictError("Artefato usado por deployment pendente, com falha ou em execução")
+        orphaned = await ChunkStore.release(db, artifact.manifest)
+        await db.delete(artifact)
+        await db.commit()
+
+        await ChunkStore.collect_garbage(orphaned)
+
+
+# Instância global do serviço
+deployment_service = DeploymentService()
@@ -0,0 +1,450 @@
+"""
+Serviço de documentos de projeto (metadados no banco, conteúdo no armazenamento de objetos)
+"""
+
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+import structlog
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.document import Document, DocumentVersion
+from app.models.project import Project
+from app.services.chunk_store import ChunkStore
+from app.services.embedding_service import EmbeddingService, SOURCE_DOCUMENT
+from app.services.storage_service import StorageService, SpooledUpload
+
+logger = structlog.get_logger()
+
+
+class DocumentService:
+    """Documentos: upload via API ou direto ao bucket, download por URL pré-assinada
+
+    Cada documento tem uma cadeia de versões. A versão atual fica inteira no
+    armazenamento; as anteriores viram manifestos de blocos deduplicados.
+    """
+
+    @staticmethod
+    def to_dict(document: Document) -> Dict:
+        """Representação pública do documento"""
+        return {
+            "id": str(document.id),
+            "name": document.name,
+            "type": document.type,
+            "project_id": str(document.project_id),
+            "description": document.description,
+            "tags": document.tags or [],
+            "status": document.status,
+            "filename": document.filename,
+            "content_type": document.content_type,
+            "size_bytes": document.size_bytes,
+            "sha256": document.sha256,
+            "version": document.version,
+            "uploaded_by": str(document.uploaded_by),
+            "uploaded_at": document.created_at.isoformat() if document.created_at else None,
+            "updated_at": document.updated_at.isoformat() if document.updated_at else None,
+            "download_url": f"/api/v1/documents/{document.id}/download"
+        }
+
+    @staticmethod
+    def storage_key(document_id: uuid.UUID, name: str) -> str:
+        """Chave do objeto no prefixo do documento (nunca compartilhada com outros uploads)"""
+        return f"documents/{document_id}/{name}"
+
+    @staticmethod
+    async def list_documents(
+        db: AsyncSession,
+        user_id: str,
+        project_id: Optional[str] = None,
+        document_type: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> Tuple[List[Document], int]:
+        """Listar documentos dos projetos do usuário com filtros e paginação"""
+        query = select(Document).where(
+            Document.status != "uploading",
+            Document.project_id.in_(select(Project.id).where(Project.created_by == user_id))
+        )
+        if project_id:
+            query = query.where(Document.project_id == uuid.UUID(project_id))
+        if document_type:
+            query = query.where(Document.type == document_type)
+
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        result = await db.execute(query.order_by(Document.created_at.desc()).offset(skip).limit(limit))
+        return list(result.scalars().all()), total
+
+    @staticmethod
+    async def get(db: AsyncSession, document_id: str) -> Optional[Document]:
+        """Obter documento (None para id inválido ou inexistente)"""
+        try:
+            key = uuid.UUID(document_id)
+        except ValueError:
+            return None
+        return await db.get(Document, key)
+
+    @staticmethod
+    async def create_from_upload(
+        db: AsyncSession,
+        spooled: SpooledUpload,
+        name: str,
+        project_id: str,
+        document_type: str,
+        uploaded_by: str,
+        description: Optional[str] = None
+    ) -> Document:
+        """Registrar documento enviado pela API, persistindo o conteúdo no prefixo dele"""
+        document_id = uuid.uuid4()
+        spooled = await StorageService.persist(
+            spooled, object_name=DocumentService.storage_key(document_id, spooled.sha256)
+        )
+        document = Document(
+            id=document_id,
+            name=name,
+            type=document_type,
+            description=description,
+            tags=[],
+            status="pending",
+            project_id=uuid.UUID(project_id),
+            uploaded_by=uploaded_by,
+            filename=spooled.filename,
+            content_type=spooled.content_type,
+            size_bytes=spooled.size,
+            sha256=spooled.sha256,
+            storage_key=spooled.object_name
+        )
+        db.add(document)
+        await db.flush()
+        db.add(DocumentService._version_from(document, created_by=uploaded_by))
+        await db.commit()
+        await db.refresh(document)
+        return document
+
+    @staticmethod
+    async def create_pending_upload(
+        db: AsyncSession,
+        name: str,
+        project_id: str,
+        document_type: str,
+        uploaded_by: str,
+        filename: str,
+        content_type: Optional[str] = None,
+        description: Optional[str] = None
+    ) -> Tuple[Document, str]:
+        """Reservar documento e gerar URL PUT para o cliente enviar o arquivo ao bucket"""
+        document_id = uuid.uuid4()
+        document = Document(
+            id=document_id,
+            name=name,
+            type=document_type,
+            description=description,
+            tags=[],
+            status="uploading",
+            project_id=uuid.UUID(project_id),
+            uploaded_by=uploaded_by,
+            filename=filename,
+            content_type=content_type or "application/octet-stream",
+            storage_key=DocumentService.storage_key(document_id, uuid.uuid4().hex)
+        )
+        upload_url = await StorageService.presigned_put_url(document.storage_key)
+
+        db.add(document)
+        await db.commit()
+        await db.refresh(document)
+        return document, upload_url
+
+    @staticmethod
+    async def complete_upload(db: AsyncSession, document: Document) -> Optional[Document]:
+        """Confirmar upload direto: o objeto precisa existir no bucket
+
+        O SHA-256 é calculado lendo o objeto enviado (em blocos), já que o
+        cliente não passa pela API; sem ele a próxima versão não detectaria
+        conteúdo idêntico.
+        """
+        info = await StorageService.stat(document.storage_key)
+        if info is None:
+            return None
+        if info["size"] > settings.UPLOAD_MAX_SIZE:
+            await StorageService.delete_object(document.storage_key)
+            raise ValueError(f"Arquivo excede o limite de {settings.UPLOAD_MAX_SIZE} bytes")
+
+        hasher = hashlib.sha256()
+        async for chunk in StorageService.iter_object(document.storage_key):
+            hasher.update(chunk)
+
+        document.size_bytes = info["size"]
+        document.sha256 = hasher.hexdigest()
+        document.status = "pending"
+        db.add(DocumentService._version_from(document, created_by=document.uploaded_by))
+        await db.commit()
+        await db.refresh(document)
+        return document
+
+    @staticmethod
+    async def update(db: AsyncSession, document: Document, **fields) -> Document:
+        """Atualizar metadados (campos None são ignorados)"""
+        for field, value in fields.items():
+            if value is not None:
+                setattr(document, field, value)
+        await db.commit()
+        await db.refresh(document)
+        return document
+
+    @classmethod
+    async def delete(cls, db: AsyncSession, document: Document):
+        """Remover documento e versões; objetos e blocos só são apagados se ninguém mais os usar"""
+        versions = await cls.list_versions(db, document)
+        blob_keys = {document.storage_key} | {v.storage_key for v in versions if v.storage_key}
+
+        orphaned = []
+        for version in versions:
+            orphaned.extend(await ChunkStore.release(db, version.manifest))
+        await db.delete(document)
+        await db.commit()
+
+        await ChunkStore.collect_garbage(orphaned)
+
+        for key in blob_keys:
+            await cls._release_blob(db, key)
+
+        if EmbeddingService.is_available():
+            EmbeddingService.schedule(EmbeddingService.delete_source(SOURCE_DOCUMENT, str(document.id)))
+
+    @staticmethod
+    def _version_from(document: Document, created_by, comment: Optional[str] = None) -> DocumentVersion:
+        """Registro de versão com o conteúdo atual do documento"""
+        return DocumentVersion(
+            document_id=document.id,
+            version=document.version,
+            filename=document.filename,
+            content_type=document.content_type,
+            size_bytes=document.size_bytes,
+            sha256=document.sha256,
+            storage_key=document.storage_key,
+            created_by=created_by,
+            comment=comment
+        )
+
+    @staticmethod
+    def version_to_dict(version: DocumentVersion) -> Dict:
+        return {
+            "version": version.version,
+            "filename": version.filename,
+            "content_type": version.content_type,
+            "size_bytes": version.size_bytes,
+            "sha256": version.sha256,
+            "stored_bytes": version.stored_bytes if version.manifest is not None else version.size_bytes,
+            "chunks": len(version.manifest) if version.manifest is not None else None,
+            "comment": version.comment,
+            "created_by": str(version.created_by),
+            "created_at": version.created_at.isoformat() if version.created_at else None
+        }
+
+    @staticmethod
+    async def list_versions(db: AsyncSession, document: Document) -> List[DocumentVersion]:
+        """Versões do documento, da mais recente para a mais antiga"""
+        result = await db.execute(
+            select(DocumentVersion)
+            .where(DocumentVersion.document_id == document.id)
+            .order_by(DocumentVersion.version.desc())
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_version(db: AsyncSession, document: Document, version: int) -> Optional[DocumentVersion]:
+        result = await db.execute(
+            select(DocumentVersion).where(
+                DocumentVersion.document_id == document.id,
+                DocumentVersion.version == version
+            )
+        )
+        return result.scalar_one_or_none()
+
+    @classmethod
+    async def add_version(
+        cls,
+        db: AsyncSession,
+        document: Document,
+        spooled: SpooledUpload,
+        created_by: str,
+        comment: Optional[str] = None
+    ) -> Tuple[Document, DocumentVersion]:
+        """Registrar novo conteúdo como próxima versão
+
+        A versão que deixa de ser atual continua inteira até `compact_versions`
+        (em background) cortá-la em blocos; blocos iguais aos de outras versões
+        não são regravados, então o armazenamento cresce com o tamanho das mudanças.
+        """
+        # Trava o documento: versões concorrentes do mesmo documento entram em fila
+        await db.refresh(document, with_for_update=True)
+        if spooled.sha256 and spooled.sha256 == document.sha256:
+            raise ValueError("Conteúdo idêntico à versão atual")
+
+        # Persistir só com a trava: outra versão poderia liberar a mesma chave
+        spooled = await StorageService.persist(
+            spooled, object_name=cls.storage_key(document.id, spooled.sha256)
+        )
+
+        previous = await cls.get_version(db, document, document.version)
+        if previous is None:
+            # Documento anterior ao histórico de versões
+            previous = cls._version_from(document, created_by=document.uploaded_by)
+            db.add(previous)
+
+        document.version += 1
+        document.filename = spooled.filename or document.filename
+        document.content_type = spooled.content_type
+        document.size_bytes = spooled.size
+        document.sha256 = spooled.sha256
+        document.storage_key = spooled.object_name
+        document.status = "pending"
+
+        current = cls._version_from(document, created_by=created_by, comment=comment)
+        db.add(current)
+        await db.commit()
+        await db.refresh(document)
+
+        logger.info("Document version added",
+                   document_id=str(document.id),
+                   version=document.version,
+                   previous_size=previous.size_bytes)
+
+        return document, current
+
+    @classmethod
+    async def compact_versions(cls, document_id: str) -> int:
+        """Guardar como manifesto de blocos as versões que deixaram de ser atuais
+
+        Roda fora da requisição (o corte FastCDC é CPU intensivo). O objeto
+        inteiro só é apagado com o documento travado: uma versão nova gravando
+        a mesma chave faz isso sob a mesma trava.
+        """
+        compacted = 0
+        async with AsyncSessionLocal() as db:
+            document = await db.get(Document, uuid.UUID(str(document_id)))
+            while document is not None:
+                result = await db.execute(
+                    select(DocumentVersion)
+                    .where(
+                        DocumentVersion.document_id == document.id,
+                        DocumentVersion.version < document.version,
+                        DocumentVersion.manifest.is_(None),
+                        DocumentVersion.storage_key.isnot(None)
+                    )
+                    .order_by(DocumentVersion.version)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                )
+                version = result.scalar_one_or_none()
+                if version is None:
+                    break
+
+                old_blob = version.storage_key
+                await cls._store_as_chunks(db, version)
+                await db.commit()
+
+                await db.refresh(document, with_for_update=True)
+                await cls._release_blob(db, old_blob)
+                await db.commit()
+                compacted += 1
+
+        if compacted:
+            logger.info("Document versions compacted", document_id=str(document_id), versions=compacted)
+        return compacted
+
+    @staticmethod
+    async def _store_as_chunks(db: AsyncSession, version: DocumentVersion):
+        """Converter versão guardada inteira em manifesto de blocos"""
+        if version.manifest is not None or not version.storage_key:
+            return
+        spooled = await StorageService.fetch_blob(
+            object_name=version.storage_key,
+            filename=version.filename,
+            content_type=version.content_type,
+            size=version.size_bytes,
+            sha256=version.sha256
+        )
+        try:
+            stored = await ChunkStore.store_file(db, spooled.path)
+        finally:
+            spooled.cleanup()
+
+        version.manifest = stored["manifest"]
+        version.stored_bytes = stored["stored_bytes"]
+        version.size_bytes = stored["size"]
+        version.storage_key = None
+
+    @staticmethod
+    async def _release_blob(db: AsyncSession, storage_key: Optional[str]):
+        """Apagar objeto inteiro se nenhum documento ou versão o referencia
+
+        Só objetos no prefixo `documents/` são apagados: chaves em `blobs/`
+        (documentos antigos) são endereçadas por conteúdo e podem estar em uso
+        por uploads de conversas, que não são contados aqui.
+        """
+        if not storage_key or not storage_key.startswith("documents/"):
+            return
+        in_use = await db.scalar(
+            select(func.count()).select_from(Document).where(Document.storage_key == storage_key)
+        ) or await db.scalar(
+            select(func.count()).select_from(DocumentVersion).where(DocumentVersion.storage_key == storage_key)
+        )
+        if not in_use:
+            await StorageService.delete_object(storage_key)
+
+    @staticmethod
+    def iter_version(
+        version: DocumentVersion,
+        start: int = 0,
+        end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Conteúdo de uma versão em streaming (remontado dos blocos se necessário)"""
+        if version.manifest is not None:
+            return ChunkStore.iter_manifest(version.manifest, start, end)
+        return StorageService.iter_object(version.storage_key, start, end)
+
+    @staticmethod
+    async def download_url(document: Document) -> Dict:
+        """URL de download: pré-assinada no bucket ou servida pela API quando em disco"""
+        if StorageService.supports_presigned_urls():
+            expires = settings.STORAGE_PRESIGNED_URL_EXPIRES
+            return {
+                "download_url": await StorageService.presigned_get_url(
+                    document.storage_key,
+                    filename=document.filename or document.name,
+                    content_type=document.content_type,
+                    expires=expires
+                ),
+                "expires_at": (datetime.now(timezone.utc) + timedelta(seconds=expires)).isoformat()
+            }
+        return {
+            "download_url": f"/api/v1/documents/{document.id}/content",
+            "expires_at": None
+        }
+
+    @staticmethod
+    def schedule_indexing(document: Document):
+        """Indexar o texto do documento para busca semântica em background"""
+        if not EmbeddingService.is_available():
+            return
+        EmbeddingService.schedule(EmbeddingService.index_blob(
+            {
+                "object_name": document.storage_key,
+                "filename": document.filename,
+                "content_type": document.content_type,
+                "size": document.size_bytes,
+                "sha256": document.sha256
+            },
+            source_type=SOURCE_DOCUMENT,
+            source_id=str(document.id),
+            project_id=str(document.project_id),
+            title=document.name
+        ))
+
+
+# Instância global do serviço
+document_service = DocumentService()
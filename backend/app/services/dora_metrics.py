@@ -0,0 +1,248 @@
+"""
+Métricas DORA de deployment (frequência, lead time, taxa de falha e MTTR)
+
+Cada transição final de deployment vira um incremento nos agregados por
+projeto e ambiente (upsert na mesma transação que grava o status), então a
+leitura do dashboard soma contadores em vez de percorrer o histórico.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from sqlalchemy import select, func, case, and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.deployment import DeploymentDoraStats, DeploymentDoraDaily
+from app.models.project import Project
+
+
+def _seconds(start: Optional[datetime], end: datetime) -> float:
+    return max((end - start).total_seconds(), 0.0) if start else 0.0
+
+
+class DoraMetricsService:
+    """Agregação incremental e leitura das métricas DORA"""
+
+    @staticmethod
+    def transition(deployment: Dict, action: str, status: str, at: datetime) -> Optional[Dict]:
+        """Incremento causado por uma transição final (None quando não afeta as métricas)
+
+        `deployment` traz project_id, environment e os instantes created_at,
+        started_at, deployed_at e finished_at lidos antes da transição.
+        - deploy concluído: conta o deployment, soma o lead time (cadastro até
+          a troca) e fecha o incidente aberto, se houver;
+        - deploy que falhou ou foi revertido: conta como falha de mudança e
+          abre incidente a partir do início do rollout (o rollback automático
+          já o fecha);
+        - deploy reprovado no canário e revertido automaticamente
+          (`canary_rejected`): a versão não chegou à produção, então conta só
+          como deployment, sem falha de mudança nem incidente;
+        - primeiro rollback manual de um deploy concluído: a mudança passa a
+          contar como falha, com incidente desde a troca.
+        """
+        if action not in ("deploy", "rollback"):
+            return None
+
+        delta = {
+            "deployments": 0,
+            "successful_deployments": 0,
+            "change_failures": 0,
+            "duration_ms_sum": 0,
+            "lead_time_seconds_sum": 0.0,
+            "lead_time_count": 0,
+            "incident_started_at": None,
+            "last_deployed_at": None,
+            "last_healthy_at": None
+        }
+        if action == "deploy":
+            delta["deployments"] = 1
+            delta["duration_ms_sum"] = deployment.get("duration_ms") or 0
+            if status == "completed":
+                delta["successful_deployments"] = 1
+                delta["lead_time_seconds_sum"] = _seconds(deployment.get("created_at"), at)
+                delta["lead_time_count"] = 1
+                delta["last_deployed_at"] = at
+                delta["last_healthy_at"] = at
+            elif not (status == "rolled_back" and deployment.get("canary_rejected")):
+                delta["change_failures"] = 1
+                delta["incident_started_at"] = deployment.get("started_at") or at
+                if status == "rolled_back":
+                    delta["last_healthy_at"] = at
+        else:
+            # Depois do primeiro rollback finished_at deixa de coincidir com deployed_at
+            deployed_at = deployment.get("deployed_at")
+            if deployed_at and deployment.get("finished_at") == deployed_at:
+                delta["change_failures"] = 1
+                delta["incident_started_at"] = deployed_at
+            if status == "rolled_back":
+                delta["last_healthy_at"] = at
+
+        if not delta["deployments"] and not delta["change_failures"] and not delta["last_healthy_at"]:
+            return None
+        delta["project_id"] = deployment["project_id"]
+        delta["environment"] = deployment["environment"]
+        delta["day"] = at.astimezone(timezone.utc).date()
+        return delta
+
+    @staticmethod
+    async def record(db: AsyncSession, delta: Optional[Dict]):
+        """Somar a transição aos agregados (upsert atômico, sem reler o histórico)
+
+        Com incidente aberto, a recuperação mede desde o início dele; sem
+        incidente, vale o que a própria transição abriu e fechou (rollback
+        automático ou manual).
+        """
+        if not delta:
+            return
+
+        opened = delta["incident_started_at"]
+        healthy = delta["last_healthy_at"]
+        restored = bool(opened and healthy)
+        row = {
+            "project_id": delta["project_id"],
+            "environment": delta["environment"],
+            "deployments": delta["deployments"],
+            "successful_deployments": delta["successful_deployments"],
+            "change_failures": delta["change_failures"],
+            "duration_ms_sum": delta["duration_ms_sum"],
+            "lead_time_seconds_sum": delta["lead_time_seconds_sum"],
+            "lead_time_count": delta["lead_time_count"],
+            "restore_seconds_sum": _seconds(opened, healthy) if restored else 0.0,
+            "restores": int(restored),
+            "incident_started_at": opened,
+            "last_deployed_at": delta["last_deployed_at"],
+            "last_healthy_at": healthy
+        }
+
+        stmt = insert(DeploymentDoraStats).values(row)
+        new = stmt.excluded
+        current = DeploymentDoraStats
+        closes_open = and_(current.incident_started_at.isnot(None), new.last_healthy_at.isnot(None))
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[current.project_id, current.environment],
+            set_={
+                "deployments": current.deployments + new.deployments,
+                "successful_deployments": current.successful_deployments + new.successful_deployments,
+                "change_failures": current.change_failures + new.change_failures,
+                "duration_ms_sum": current.duration_ms_sum + new.duration_ms_sum,
+                "lead_time_seconds_sum": current.lead_time_seconds_sum + new.lead_time_seconds_sum,
+                "lead_time_count": current.lead_time_count + new.lead_time_count,
+                "restore_seconds_sum": current.restore_seconds_sum + case(
+                    (closes_open, func.greatest(
+                        func.extract("epoch", new.last_healthy_at - current.incident_started_at), 0.0
+                    )),
+                    else_=new.restore_seconds_sum
+                ),
+                "restores": current.restores + case((closes_open, 1), else_=new.restores),
+                "incident_started_at": case(
+                    (new.last_healthy_at.isnot(None), None),
+                    else_=func.coalesce(current.incident_started_at, new.incident_started_at)
+                ),
+                "last_deployed_at": func.greatest(current.last_deployed_at, new.last_deployed_at),
+                "last_healthy_at": func.greatest(current.last_healthy_at, new.last_healthy_at)
+            }
+        ))
+
+        if not delta["deployments"] and not delta["change_failures"]:
+            return
+        stmt = insert(DeploymentDoraDaily).values({
+            "project_id": delta["project_id"],
+            "environment": delta["environment"],
+            "day": delta["day"],
+            "deployments": delta["deployments"],
+            "successful_deployments": delta["successful_deployments"],
+            "change_failures": delta["change_failures"]
+        })
+        new = stmt.excluded
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[DeploymentDoraDaily.project_id, DeploymentDoraDaily.environment, DeploymentDoraDaily.day],
+            set_={
+                "deployments": DeploymentDoraDaily.deployments + new.deployments,
+                "successful_deployments": DeploymentDoraDaily.successful_deployments + new.successful_deployments,
+                "change_failures": DeploymentDoraDaily.change_failures + new.change_failures
+            }
+        ))
+
+    @staticmethod
+    async def summary(
+        db: AsyncSession,
+        environment: str,
+        days: int = 30,
+        user_id: Optional[str] = None,
+        project_id: Optional[str] = None
+    ) -> Dict:
+        """Métricas do ambiente para um projeto ou para os projetos do usuário
+
+        Lê uma linha de agregado por projeto e no máximo `days` linhas de série
+        por projeto, independentemente do tamanho do histórico.
+        """
+        scope = [DeploymentDoraStats.environment == environment]
+        daily_scope = [
+            DeploymentDoraDaily.environment == environment,
+            DeploymentDoraDaily.day >= datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+        ]
+        if project_id:
+            scope.append(DeploymentDoraStats.project_id == project_id)
+            daily_scope.append(DeploymentDoraDaily.project_id == project_id)
+        if user_id:
+            owned = select(Project.id).where(Project.created_by == user_id)
+            scope.append(DeploymentDoraStats.project_id.in_(owned))
+            daily_scope.append(DeploymentDoraDaily.project_id.in_(owned))
+
+        totals = (await db.execute(
+            select(
+                func.coalesce(func.sum(DeploymentDoraStats.deployments), 0),
+                func.coalesce(func.sum(DeploymentDoraStats.successful_deployments), 0),
+                func.coalesce(func.sum(DeploymentDoraStats.change_failures), 0),
+                func.coalesce(func.sum(DeploymentDoraStats.duration_ms_sum), 0),
+                func.coalesce(func.sum(DeploymentDoraStats.lead_time_seconds_sum), 0.0),
+                func.coalesce(func.sum(DeploymentDoraStats.lead_time_count), 0),
+                func.coalesce(func.sum(DeploymentDoraStats.restore_seconds_sum), 0.0),
+                func.coalesce(func.sum(DeploymentDoraStats.restores), 0),
+                func.count(DeploymentDoraStats.incident_started_at),
+                func.max(DeploymentDoraStats.last_deployed_at)
+            ).where(*scope)
+        )).one()
+        # SUM de BIGINT volta como numeric (Decimal)
+        deployments, successful, failures, duration_ms, lead_time, lead_count, restore_time, restores = (
+            float(value) for value in totals[:8]
+        )
+        open_incidents, last_deployed_at = totals[8], totals[9]
+
+        window = (await db.execute(
+            select(
+                func.coalesce(func.sum(DeploymentDoraDaily.deployments), 0),
+                func.coalesce(func.sum(DeploymentDoraDaily.successful_deployments), 0),
+                func.coalesce(func.sum(DeploymentDoraDaily.change_failures), 0)
+            ).where(*daily_scope)
+        )).one()
+        window_deployments, window_successful, window_failures = (int(value) for value in window)
+
+        def ratio(part, whole, scale=1.0, digits=2):
+            return round(scale * part / whole, digits) if whole else None
+
+        return {
+            "environment": environment,
+            "window_days": days,
+            "deployments": int(deployments),
+            "success_rate": ratio(successful, deployments, 100.0),
+            # Mantido para o dashboard atual: mudanças que precisaram ser revertidas
+            "rollback_rate": ratio(failures, deployments, 100.0),
+            "deployment_time": ratio(duration_ms, deployments, 1 / 60000.0),  # minutos
+            # Frequência DORA: só deploys que chegaram à produção
+            "deployment_frequency": {
+                "deployments": window_successful,
+                "per_day": ratio(window_successful, days),
+                "per_week": ratio(window_successful * 7, days)
+            },
+            "lead_time_hours": ratio(lead_time, lead_count, 1 / 3600.0),
+            "change_failure_rate": ratio(failures, deployments, 100.0),
+            "change_failure_rate_window": ratio(window_failures, window_deployments, 100.0),
+            "mttr_hours": ratio(restore_time, restores, 1 / 3600.0),
+            "open_incidents": open_incidents,
+            "last_deployed_at": last_deployed_at.isoformat() if last_deployed_at else None
+        }
+
+
+# Instância global do serviço
+dora_metrics_service = DoraMetricsService()
@@ -0,0 +1,420 @@
+"""
+Indexação vetorial e busca semântica do MILAPP
+"""
+
+import asyncio
+import hashlib
+import re
+import uuid
+from typing import Dict, List, Optional, Sequence
+import structlog
+from sqlalchemy import String, and_, cast, delete, func, or_, select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.conversation import Conversation
+from app.models.embedding import EmbeddingChunk
+from app.models.project import Project
+from app.services.conversation_memory import count_tokens, truncate_to_tokens
+from app.services.llm_gateway import LLMGateway, TASK_EMBEDDING
+from app.services.storage_service import StorageService, SpooledUpload
+
+logger = structlog.get_logger()
+
+SOURCE_MESSAGE = "message"
+SOURCE_DOCUMENT = "document"
+SOURCE_FILE = "file"
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?;:])\s+")
+
+# Referências das indexações em background para evitar coleta prematura
+_background_tasks = set()
+
+
+def chunk_text(text: str, max_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """Dividir texto em trechos de até max_tokens respeitando parágrafos e frases"""
+    pieces: List[tuple] = []
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = count_tokens(paragraph)
+        if tokens <= max_tokens:
+            pieces.append((paragraph, tokens))
+        else:
+            pieces.extend(_split_long(paragraph, max_tokens))
+
+    chunks: List[str] = []
+    current: List[tuple] = []
+    current_tokens = 0
+
+    for piece, tokens in pieces:
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n\n".join(p for p, _ in current))
+
+            # Sobreposição: repetir o final do trecho anterior
+            tail: List[tuple] = []
+            tail_tokens = 0
+            for previous in reversed(current):
+                if tail_tokens + previous[1] > overlap_tokens:
+                    break
+                tail.insert(0, previous)
+                tail_tokens += previous[1]
+            current, current_tokens = tail, tail_tokens
+
+        current.append((piece, tokens))
+        current_tokens += tokens
+
+    if current:
+        chunks.append("\n\n".join(p for p, _ in current))
+    return chunks
+
+
+def _split_long(paragraph: str, max_tokens: int) -> List[tuple]:
+    """Quebrar parágrafo longo em frases; frases longas são cortadas no limite"""
+    pieces = []
+    for sentence in _SENTENCE_RE.split(paragraph):
+        while sentence:
+            tokens = count_tokens(sentence)
+            if tokens <= max_tokens:
+                pieces.append((sentence, tokens))
+                break
+            head = truncate_to_tokens(sentence, max_tokens)
+            pieces.append((head, count_tokens(head)))
+            sentence = sentence[len(head):].strip()
+    return pieces
+
+
+def file_source_id(sha256: str, project_id: Optional[str] = None, conversation_id: Optional[str] = None) -> str:
+    """Origem de um arquivo no índice: conteúdo idêntico em outro projeto ou conversa é outra origem"""
+    return f"{sha256}:{project_id or '-'}:{conversation_id or '-'}"
+
+
+class EmbeddingService:
+    """Pipeline de embeddings: trechos, vetores e upsert incremental no pgvector"""
+
+    @classmethod
+    async def index_source(
+        cls,
+        source_type: str,
+        source_id: str,
+        content: str,
+        project_id: Optional[str] = None,
+        conversation_id: Optional[str] = None,
+        title: Optional[str] = None,
+        extra: Optional[Dict] = None
+    ) -> Dict:
+        """Indexar (ou reindexar) uma origem; só trechos alterados geram novos embeddings"""
+        chunks = chunk_text(
+            content,
+            settings.EMBEDDING_CHUNK_TOKENS,
+            settings.EMBEDDING_CHUNK_OVERLAP_TOKENS
+        )
+        hashes = [hashlib.sha256(chunk.encode("utf-8")).hexdigest() for chunk in chunks]
+
+        async with AsyncSessionLocal() as session:
+            existing = dict((await session.execute(
+                select(EmbeddingChunk.chunk_index, EmbeddingChunk.content_hash).where(
+                    EmbeddingChunk.source_type == source_type,
+                    EmbeddingChunk.source_id == source_id
+                )
+            )).all())
+
+        # Embeddings gerados fora da sessão (sem segurar conexão durante a chamada externa)
+        changed = [i for i, digest in enumerate(hashes) if existing.get(i) != digest]
+        vectors = await cls._embed([chunks[i] for i in changed])
+
+        async with AsyncSessionLocal() as session:
+            rows = [
+                {
+                    "id": uuid.uuid4(),
+                    "source_type": source_type,
+                    "source_id": source_id,
+                    "chunk_index": i,
+                    "project_id": uuid.UUID(str(project_id)) if project_id else None,
+                    "conversation_id": conversation_id,
+                    "title": title,
+                    "content": chunks[i],
+                    "content_hash": hashes[i],
+                    "extra": extra,
+                    "embedding": vector
+                }
+                for i, vector in zip(changed, vectors)
+            ]
+            if rows:
+                statement = insert(EmbeddingChunk).values(rows)
+                await session.execute(statement.on_conflict_do_update(
+                    constraint="uq_embedding_chunks_source",
+                    set_={
+                        **{
+                            column: statement.excluded[column]
+                            for column in ("project_id", "conversation_id", "title", "content",
+                                           "content_hash", "extra", "embedding")
+                        },
+                        "updated_at": func.now()
+                    }
+                ))
+
+            # Origem encolheu: remover trechos que deixaram de existir
+            if len(existing) > len(chunks):
+                await session.execute(delete(EmbeddingChunk).where(
+                    EmbeddingChunk.source_type == source_type,
+                    EmbeddingChunk.source_id == source_id,
+                    EmbeddingChunk.chunk_index >= len(chunks)
+                ))
+
+            await session.commit()
+
+        logger.info("Source indexed",
+                   source_type=source_type,
+                   source_id=source_id,
+                   chunks=len(chunks),
+                   embedded=len(changed))
+
+        return {"chunks": len(chunks), "embedded": len(changed)}
+
+    @classmethod
+    async def delete_source(cls, source_type: str, source_id: str):
+        """Remover uma origem do índice"""
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(EmbeddingChunk).where(
+                EmbeddingChunk.source_type == source_type,
+                EmbeddingChunk.source_id == source_id
+            ))
+            await session.commit()
+
+    @classmethod
+    async def delete_conversation(cls, conversation_id: str):
+        """Remover do índice todos os trechos de uma conversa"""
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(EmbeddingChunk).where(
+                EmbeddingChunk.conversation_id == conversation_id
+            ))
+            await session.commit()
+
+    @classmethod
+    async def index_file(
+        cls,
+        spooled: SpooledUpload,
+        analysis: Optional[Dict] = None,
+        project_id: Optional[str] = None,
+        conversation_id: Optional[str] = None,
+        source_type: str = SOURCE_FILE,
+        source_id: Optional[str] = None,
+        title: Optional[str] = None
+    ) -> Dict:
+        """Indexar o texto de um arquivo (PDF, texto, OCR da imagem ou transcrição do áudio)"""
+        content = await cls._file_text(spooled, analysis or {})
+        if not content.strip():
+            return {"chunks": 0, "embedded": 0}
+
+        return await cls.index_source(
+            source_type,
+            source_id or file_source_id(spooled.sha256, project_id, conversation_id),
+            content,
+            project_id=project_id,
+            conversation_id=conversation_id,
+            title=title or spooled.filename,
+            extra={"filename": spooled.filename, "content_type": spooled.content_type, "sha256": spooled.sha256}
+        )
+
+    @classmethod
+    async def index_blob(cls, file_info: Dict, **kwargs) -> Dict:
+        """Buscar blob persistido e indexar seu texto (usado em background após o upload)"""
+        spooled = await StorageService.fetch_blob(
+            object_name=file_info["object_name"],
+            filename=file_info["filename"],
+            content_type=file_info["content_type"],
+            size=file_info["size"],
+            sha256=file_info["sha256"]
+        )
+        try:
+            return await cls.index_file(spooled, **kwargs)
+        finally:
+            spooled.cleanup()
+
+    @classmethod
+    async def search(
+        cls,
+        query: str,
+        k: int = None,
+        project_id: Optional[str] = None,
+        source_types: Optional[Sequence[str]] = None,
+        conversation_id: Optional[str] = None,
+        source_ids: Optional[Sequence[str]] = None,
+        exclude_source_ids: Optional[Sequence[str]] = None,
+        user_id: Optional[str] = None
+    ) -> List[Dict]:
+        """k vizinhos mais próximos por distância de cosseno, com filtros de metadados
+
+        Com `user_id` só entram trechos das conversas do usuário e, fora de
+        conversas, dos projetos dele. Escopos filtrados pequenos são buscados
+        de forma exata; nos grandes o HNSW continua a varredura até preencher k.
+        """
+        k = min(k or settings.SEARCH_DEFAULT_K, settings.SEARCH_MAX_K)
+        vector = (await cls._embed([query]))[0]
+
+        filters = []
+        if project_id:
+            filters.append(EmbeddingChunk.project_id == uuid.UUID(str(project_id)))
+        if source_types:
+            filters.append(EmbeddingChunk.source_type.in_(list(source_types)))
+        if conversation_id:
+            filters.append(EmbeddingChunk.conversation_id == conversation_id)
+        if source_ids:
+            filters.append(EmbeddingChunk.source_id.in_(list(source_ids)))
+        if exclude_source_ids:
+            filters.append(EmbeddingChunk.source_id.notin_(list(exclude_source_ids)))
+        if user_id:
+            owned_conversations = select(cast(Conversation.id, String)).where(Conversation.user_id == user_id)
+            owned_projects = select(Project.id).where(Project.created_by == user_id)
+            filters.append(or_(
+                EmbeddingChunk.conversation_id.in_(owned_conversations),
+                and_(EmbeddingChunk.conversation_id.is_(None), EmbeddingChunk.project_id.in_(owned_projects))
+            ))
+
+        distance = EmbeddingChunk.embedding.cosine_distance(vector)
+        statement = select(
+            EmbeddingChunk.source_type,
+            EmbeddingChunk.source_id,
+            EmbeddingChunk.chunk_index,
+            EmbeddingChunk.project_id,
+            EmbeddingChunk.conversation_id,
+            EmbeddingChunk.title,
+            EmbeddingChunk.content,
+            EmbeddingChunk.extra,
+            distance.label("distance")
+        ).where(*filters).order_by(distance).limit(k)
+
+        async with AsyncSessionLocal() as session:
+            exact = False
+            if filters:
+                # Tamanho do escopo, contado só até o limite da busca exata
+                probe = select(EmbeddingChunk.id).where(*filters).limit(settings.SEARCH_EXACT_MAX_ROWS + 1)
+                scoped = await session.scalar(select(func.count()).select_from(probe.subquery()))
+                exact = scoped <= settings.SEARCH_EXACT_MAX_ROWS
+
+            if exact:
+                # Poucas linhas no escopo: filtrar primeiro e ordenar todas (o HNSW
+                # filtraria depois da busca e devolveria menos de k trechos)
+                await session.execute(text("SET LOCAL enable_indexscan = off"))
+            else:
+                ef_search = max(settings.SEARCH_HNSW_EF, k * 4 if filters else k)
+                await session.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+                if filters and settings.SEARCH_HNSW_ITERATIVE_SCAN:
+                    await session.execute(text("SET LOCAL hnsw.iterative_scan = relaxed_order"))
+                    await session.execute(
+                        text(f"SET LOCAL hnsw.max_scan_tuples = {int(settings.SEARCH_HNSW_MAX_SCAN_TUPLES)}")
+                    )
+            rows = (await session.execute(statement)).all()
+
+        # relaxed_order pode devolver vizinhos levemente fora de ordem
+        rows = sorted(rows, key=lambda row: row.distance)
+        return [
+            {
+                "source_type": row.source_type,
+                "source_id": row.source_id,
+                "chunk_index": row.chunk_index,
+                "project_id": str(row.project_id) if row.project_id else None,
+                "conversation_id": row.conversation_id,
+                "title": row.title,
+                "content": row.content,
+                "metadata": row.extra or {},
+                "score": round(1.0 - float(row.distance), 4)
+            }
+            for row in rows
+        ]
+
+    @classmethod
+    async def retrieve_context(
+        cls,
+        query: str,
+        token_budget: int,
+        k: int = None,
+        min_score: float = 0.0,
+        **filters
+    ) -> List[Dict]:
+        """Trechos mais relevantes para a consulta que cabem no orçamento de tokens"""
+        results = await cls.search(query, k=k or settings.AI_RETRIEVAL_TOP_K, **filters)
+
+        selected = []
+        used = 0
+        for result in results:
+            if result["score"] < min_score:
+                continue
+            tokens = count_tokens(result["content"])
+            if used + tokens > token_budget:
+                continue
+            selected.append(result)
+            used += tokens
+
+        logger.info("Context retrieved",
+                   candidates=len(results),
+                   selected=len(selected),
+                   tokens=used)
+        return selected
+
+    @staticmethod
+    def format_context(chunks: List[Dict]) -> str:
+        """Trechos recuperados no formato citado no prompt"""
+        return "\n\n".join(
+            f"[{index}] {chunk['title'] or chunk['source_type']}\n{chunk['content']}"
+            for index, chunk in enumerate(chunks, start=1)
+        )
+
+    @staticmethod
+    def describe_sources(chunks: List[Dict]) -> List[Dict]:
+        """Referências dos trechos usados, para exibir a fundamentação da resposta"""
+        return [
+            {
+                "ref": index,
+                "source_type": chunk["source_type"],
+                "source_id": chunk["source_id"],
+                "title": chunk["title"],
+                "score": chunk["score"]
+            }
+            for index, chunk in enumerate(chunks, start=1)
+        ]
+
+    @classmethod
+    def schedule(cls, coro):
+        """Executar indexação em background sem bloquear a requisição"""
+        async def run():
+            try:
+                await coro
+            except Exception as e:
+                logger.error("Background indexing failed", error=str(e))
+
+        task = asyncio.create_task(run())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        return task
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Há modelo de embedding configurado"""
+        return LLMGateway.is_available(TASK_EMBEDDING)
+
+    @staticmethod
+    async def _embed(texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), settings.EMBEDDING_BATCH_SIZE):
+            response = await LLMGateway.embed(texts[start:start + settings.EMBEDDING_BATCH_SIZE])
+            vectors.extend(response.embeddings)
+        return vectors
+
+    @staticmethod
+    async def _file_text(spooled: SpooledUpload, analysis: Dict) -> str:
+        content_type = spooled.content_type or ""
+        if content_type == "application/pdf":
+            return await asyncio.to_thread(StorageService.extract_pdf_text, spooled.path)
+        if content_type.startswith("audio/"):
+            return analysis.get("transcription") or ""
+        if content_type.startswith("image/"):
+            return analysis.get("ocr_text") or analysis.get("raw_response") or ""
+        return spooled.read_text()
+
+
+# Instância global do serviço
+embedding_service = EmbeddingService()
@@ -0,0 +1,149 @@
+"""
+Streams de eventos append-only do MILAPP (Redis Streams com fallback em memória)
+"""
+
+import json
+import asyncio
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+import structlog
+
+from app.services.cache_service import CacheService
+
+logger = structlog.get_logger()
+
+# Tamanho máximo aproximado de cada stream no Redis
+DEFAULT_STREAM_MAXLEN = 10_000
+
+
+class EventStream:
+    """Publicação e leitura incremental de eventos com IDs retomáveis"""
+
+    _local_events: Dict[str, List[Tuple[str, Dict]]] = {}
+    _local_conditions: Dict[str, asyncio.Condition] = {}
+
+    @classmethod
+    async def publish(cls, stream: str, event: Dict, maxlen: int = DEFAULT_STREAM_MAXLEN) -> str:
+        """Publicar evento e retornar seu ID"""
+        payload = json.dumps(event, default=str)
+
+        if CacheService.redis_client:
+            return await CacheService.redis_client.xadd(
+                stream,
+                {"data": payload},
+                maxlen=maxlen,
+                approximate=True
+            )
+
+        events = cls._local_events.setdefault(stream, [])
+        event_id = f"{len(events) + 1}-0"
+        events.append((event_id, json.loads(payload)))
+        if len(events) > maxlen:
+            del events[:len(events) - maxlen]
+
+        condition = cls._condition(stream)
+        async with condition:
+            condition.notify_all()
+
+        return event_id
+
+    @classmethod
+    async def read(
+        cls,
+        stream: str,
+        last_id: str = "0",
+        count: int = 100,
+        block_ms: Optional[int] = None
+    ) -> List[Tuple[str, Dict]]:
+        """Ler eventos posteriores a last_id (opcionalmente bloqueando até chegar algum)"""
+        if CacheService.redis_client:
+            response = await CacheService.redis_client.xread(
+                {stream: last_id},
+                count=count,
+                block=block_ms
+            )
+            events = []
+            for _, entries in response or []:
+                for event_id, fields in entries:
+                    events.append((event_id, json.loads(fields["data"])))
+            return events
+
+        condition = cls._condition(stream)
+        async with condition:
+            events = cls._local_after(stream, last_id, count)
+            if events or not block_ms:
+                return events
+
+            try:
+                await asyncio.wait_for(condition.wait(), timeout=block_ms / 1000)
+            except asyncio.TimeoutError:
+                return []
+
+            return cls._local_after(stream, last_id, count)
+
+    @classmethod
+    async def follow(
+        cls,
+        stream: str,
+        last_id: str = "0",
+        until: Optional[Callable[[Dict], bool]] = None,
+        block_ms: int = 15_000
+    ) -> AsyncIterator[Tuple[Optional[str], Optional[Dict]]]:
+        """Acompanhar o stream (tail -f); emite (None, None) como heartbeat sem eventos"""
+        while True:
+            events = await cls.read(stream, last_id=last_id, block_ms=block_ms)
+            if not events:
+                yield None, None
+                continue
+
+            for event_id, event in events:
+                last_id = event_id
+                yield event_id, event
+                if until and until(event):
+                    return
+
+    @classmethod
+    async def last_id(cls, stream: str) -> str:
+        """ID do evento mais recente ("0" para stream vazio); leituras a partir dele só veem eventos novos"""
+        if CacheService.redis_client:
+            entries = await CacheService.redis_client.xrevrange(stream, count=1)
+            return entries[0][0] if entries else "0"
+
+        events = cls._local_events.get(stream)
+        return events[-1][0] if events else "0"
+
+    @classmethod
+    async def delete(cls, stream: str):
+        """Remover stream"""
+        if CacheService.redis_client:
+            await CacheService.redis_client.delete(stream)
+        else:
+            cls._local_events.pop(stream, None)
+            cls._local_conditions.pop(stream, None)
+
+    @classmethod
+    def _condition(cls, stream: str) -> asyncio.Condition:
+        condition = cls._local_conditions.get(stream)
+        if condition is None:
+            condition = asyncio.Condition()
+            cls._local_conditions[stream] = condition
+        return condition
+
+    @classmethod
+    def _local_after(cls, stream: str, last_id: str, count: int) -> List[Tuple[str, Dict]]:
+        events = cls._local_events.get(stream, [])
+        last_seq = int(str(last_id).split("-")[0] or 0) if last_id not in ("$", None) else len(events)
+        return [e for e in events if int(e[0].split("-")[0]) > last_seq][:count]
+
+
+def format_sse(event_id: Optional[str], data: Optional[Dict], event: Optional[str] = None) -> str:
+    """Formatar mensagem Server-Sent Events (heartbeat quando data é None)"""
+    if data is None:
+        return ": keep-alive\n\n"
+
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,352 @@
+"""
+Extração estruturada das análises de IA do MILAPP
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Sequence, Type
+from pydantic import BaseModel, Field, ValidationError, create_model
+import structlog
+
+from app.core.config import settings
+from app.services.llm_gateway import LLMGateway, TASK_EXTRACTION
+
+logger = structlog.get_logger()
+
+
+# Schemas dos campos estruturados
+class AutomationOpportunity(BaseModel):
+    """Oportunidade de automação identificada"""
+    name: str = Field(..., description="Nome curto do processo ou tarefa automatizável")
+    description: Optional[str] = Field(None, description="Por que e como automatizar")
+    priority: Optional[str] = Field(None, description="low, medium ou high")
+
+
+class Requirement(BaseModel):
+    """Requisito técnico ou funcional"""
+    description: str = Field(..., description="Descrição do requisito")
+    category: Optional[str] = Field(None, description="Ex.: integração, dados, segurança, infraestrutura")
+
+
+class ComplexityEstimate(BaseModel):
+    """Estimativa de complexidade"""
+    level: str = Field("medium", description="low, medium ou high")
+    score: int = Field(5, ge=1, le=10, description="Complexidade de 1 (trivial) a 10 (muito complexa)")
+
+
+class UIElement(BaseModel):
+    """Elemento de interface visível"""
+    type: str = Field(..., description="Ex.: botão, campo, menu, tabela")
+    label: Optional[str] = Field(None, description="Texto ou rótulo do elemento")
+
+
+class ProcessFlow(BaseModel):
+    """Fluxo de processo"""
+    steps: List[str] = Field(default_factory=list, description="Passos em ordem")
+    decision_points: List[str] = Field(default_factory=list, description="Pontos de decisão")
+
+
+class BusinessProcess(BaseModel):
+    """Processo de negócio descrito"""
+    name: str = Field(..., description="Nome do processo")
+    description: Optional[str] = None
+
+
+class Stakeholder(BaseModel):
+    """Stakeholder e responsabilidade"""
+    name: str = Field(..., description="Pessoa, área ou papel")
+    role: Optional[str] = Field(None, description="Responsabilidade no processo")
+
+
+FIELD_TYPES: Dict[str, Any] = {
+    "automation_opportunities": List[AutomationOpportunity],
+    "technical_requirements": List[Requirement],
+    "functional_requirements": List[Requirement],
+    "complexity_estimate": ComplexityEstimate,
+    "tool_recommendations": List[str],
+    "next_steps": List[str],
+    "ui_elements": List[UIElement],
+    "process_flow": ProcessFlow,
+    "business_processes": List[BusinessProcess],
+    "stakeholders": List[Stakeholder],
+    "acceptance_criteria": List[str]
+}
+
+FIELD_DEFAULTS: Dict[str, Any] = {
+    "complexity_estimate": {"level": "medium", "score": 5},
+    "process_flow": {"steps": [], "decision_points": []}
+}
+
+# Palavras-chave de seção usadas pelo extrator heurístico (ordem importa)
+SECTION_KEYWORDS = [
+    ("technical_requirements", ("requisitos técnicos", "requisito técnico", "requisitos tecnicos")),
+    ("functional_requirements", ("requisitos funcionais", "requisito funcional")),
+    ("acceptance_criteria", ("critérios de aceite", "criterios de aceite", "critérios de aceitação")),
+    ("automation_opportunities", ("oportunidades", "oportunidade", "candidatos", "candidato")),
+    ("tool_recommendations", ("ferramentas", "ferramenta", "tecnologias")),
+    ("next_steps", ("próximos passos", "proximos passos", "próximo passo")),
+    ("stakeholders", ("stakeholders", "stakeholder", "responsabilidades", "envolvidos")),
+    ("ui_elements", ("elementos de interface", "elementos de ui", "interface")),
+    ("process_flow", ("fluxo",)),
+    ("business_processes", ("processos de negócio", "processos de negocio", "processos")),
+    ("complexity_estimate", ("complexidade",))
+]
+
+KNOWN_TOOLS = (
+    "n8n", "UiPath", "Automation Anywhere", "Blue Prism", "Power Automate",
+    "Python", "Selenium", "Playwright", "Robot Framework", "Zapier", "Make",
+    "Airflow", "SAP GUI Scripting", "API REST"
+)
+
+_HEADER_RE = re.compile(r"^\s*(?:#{1,6}\s*)?(?:\d+[.)]\s*)?\*{0,2}([^*\n]{3,90}?)\*{0,2}\s*:?\s*$")
+_BULLET_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)]|[a-z][.)])\s+(.+?)\s*$")
+_SCORE_RE = re.compile(r"\b(10|[1-9])\s*(?:/|de)\s*10\b")
+_LEVELS = (
+    ("high", ("alta", "alto", "high", "complexa")),
+    ("low", ("baixa", "baixo", "low", "simples")),
+    ("medium", ("média", "media", "médio", "medio", "moderada", "medium"))
+)
+
+
+class ExtractionService:
+    """Preenche todos os campos estruturados em uma única chamada com function calling"""
+
+    _schema_models: Dict[tuple, Type[BaseModel]] = {}
+    _field_models: Dict[str, Type[BaseModel]] = {}
+
+    @classmethod
+    async def extract(cls, analysis_text: str, fields: Sequence[str]) -> Dict[str, Any]:
+        """Extrair campos estruturados; recorre à heurística local se a chamada falhar"""
+        heuristic = HeuristicExtractor.extract(analysis_text, fields)
+
+        if (
+            not settings.AI_STRUCTURED_EXTRACTION_ENABLED
+            or not analysis_text
+            or not LLMGateway.is_available(TASK_EXTRACTION)
+        ):
+            return {**heuristic, "extraction_method": "heuristic"}
+
+        try:
+            arguments = await cls._call_function(analysis_text, fields)
+            structured = cls._validate(arguments, fields, heuristic)
+            return {**structured, "extraction_method": "function_calling"}
+
+        except Exception as e:
+            logger.warning("Structured extraction failed, using heuristic", error=str(e))
+            return {**heuristic, "extraction_method": "heuristic"}
+
+    @classmethod
+    async def _call_function(cls, analysis_text: str, fields: Sequence[str]) -> Dict:
+        schema_model = cls._schema_model(fields)
+
+        response = await LLMGateway.complete(
+            TASK_EXTRACTION,
+            [
+                {
+                    "role": "system",
+                    "content": "Extraia as informações estruturadas da análise a seguir. "
+                               "Use somente o que está no texto; deixe listas vazias quando não houver dados."
+                },
+                {"role": "user", "content": analysis_text}
+            ],
+            temperature=0,
+            tool={
+                "name": "registrar_analise",
+                "description": "Registra os campos estruturados da análise",
+                "parameters": schema_model.model_json_schema()
+            }
+        )
+        return response.tool_arguments
+
+    @classmethod
+    def validate(cls, arguments: Dict, fields: Sequence[str], analysis_text: str) -> Dict[str, Any]:
+        """Validar campos já retornados pelo modelo (ex.: análise em lote)"""
+        heuristic = HeuristicExtractor.extract(analysis_text, fields)
+        return {**cls._validate(arguments, fields, heuristic), "extraction_method": "function_calling"}
+
+    @classmethod
+    def batch_schema(cls, fields: Sequence[str]) -> Dict:
+        """Esquema JSON para analisar vários itens em uma única chamada"""
+        key = ("batch", *fields)
+        if key not in cls._schema_models:
+            item_model = create_model(
+                "ItemAnalisado",
+                __base__=cls._schema_model(fields),
+                item_id=(str, Field(..., description="Identificador do item analisado")),
+                analise=(str, Field(..., description="Análise completa do item em texto"))
+            )
+            cls._schema_models[key] = create_model("AnaliseEmLote", resultados=(List[item_model], ...))
+        return cls._schema_models[key].model_json_schema()
+
+    @classmethod
+    def _schema_model(cls, fields: Sequence[str]) -> Type[BaseModel]:
+        key = tuple(fields)
+        if key not in cls._schema_models:
+            definitions = {
+                name: (FIELD_TYPES[name], FIELD_DEFAULTS.get(name, []))
+                for name in fields
+            }
+            definitions["confidence"] = (
+                float,
+                Field(0.5, ge=0.0, le=1.0, description="Confiança de 0 a 1 na análise")
+            )
+            cls._schema_models[key] = create_model("AnaliseEstruturada", **definitions)
+        return cls._schema_models[key]
+
+    @classmethod
+    def _field_model(cls, name: str) -> Type[BaseModel]:
+        if name not in cls._field_models:
+            cls._field_models[name] = create_model(f"Campo_{name}", value=(FIELD_TYPES[name], ...))
+        return cls._field_models[name]
+
+    @classmethod
+    def _validate(cls, arguments: Dict, fields: Sequence[str], fallback: Dict) -> Dict:
+        """Validar cada campo; campos inválidos usam o valor heurístico"""
+        result = {}
+        for name in fields:
+            model = cls._field_model(name)
+            try:
+                value = model(value=arguments.get(name, FIELD_DEFAULTS.get(name, []))).value
+                result[name] = (
+                    [v.model_dump() if isinstance(v, BaseModel) else v for v in value]
+                    if isinstance(value, list)
+                    else value.model_dump()
+                )
+            except ValidationError as e:
+                logger.warning("Invalid structured field", field=name, errors=e.error_count())
+                result[name] = fallback[name]
+
+        confidence = arguments.get("confidence")
+        result["confidence_score"] = (
+            round(float(confidence), 3)
+            if isinstance(confidence, (int, float)) and 0 <= confidence <= 1
+            else fallback["confidence_score"]
+        )
+        return result
+
+
+class HeuristicExtractor:
+    """Extração local por seções, listas e expressões regulares (custo linear no texto)"""
+
+    @classmethod
+    def extract(cls, text: str, fields: Sequence[str]) -> Dict[str, Any]:
+        sections = cls._split_sections(text or "")
+        result = {}
+
+        for name in fields:
+            items = sections.get(name, [])
+            parser = getattr(cls, f"_parse_{name}", None)
+            result[name] = parser(items, text or "") if parser else items
+
+        filled = sum(1 for name in fields if result[name] and result[name] != FIELD_DEFAULTS.get(name))
+        result["confidence_score"] = round(0.3 + 0.6 * filled / max(len(fields), 1), 3) if text else 0.0
+        return result
+
+    @staticmethod
+    def _split_sections(text: str) -> Dict[str, List[str]]:
+        """Agrupar itens de lista sob o campo correspondente ao cabeçalho da seção"""
+        sections: Dict[str, List[str]] = {}
+        current: Optional[str] = None
+
+        for line in text.splitlines():
+            stripped = line.strip()
+            if not stripped:
+                continue
+
+            bullet = _BULLET_RE.match(line)
+            header = _HEADER_RE.match(line)
+            is_header = header and (
+                stripped.startswith("#") or stripped.endswith(":") or stripped.startswith("**")
+            )
+
+            # Item numerado "Título: valor" cujo título nomeia uma seção também abre a seção
+            title, _, inline = (header.group(1) if is_header else stripped).partition(":")
+            section = HeuristicExtractor._match_section(title) if (is_header or bullet) and len(title) <= 60 else None
+
+            if is_header or section:
+                current = section
+                inline = inline.strip(" *")
+                if current and inline:
+                    sections.setdefault(current, []).append(inline)
+                continue
+
+            if current and bullet:
+                sections.setdefault(current, []).append(bullet.group(1).strip(" *"))
+
+        return sections
+
+    @staticmethod
+    def _match_section(title: str) -> Optional[str]:
+        title = re.sub(r"^[\s#*\-•]*(?:\d+[.)])?\s*", "", title).strip(" *").lower()
+        return next(
+            (field for field, keywords in SECTION_KEYWORDS if any(k in title for k in keywords)),
+            None
+        )
+
+    @staticmethod
+    def _split_item(item: str) -> tuple:
+        """Separar "Título: descrição" ou "Título - descrição" """
+        for separator in (":", " - ", " – "):
+            if separator in item:
+                head, tail = item.split(separator, 1)
+                return head.strip(" *"), tail.strip() or None
+        return item.strip(" *"), None
+
+    @classmethod
+    def _parse_automation_opportunities(cls, items: List[str], text: str) -> List[Dict]:
+        opportunities = []
+        for item in items:
+            name, description = cls._split_item(item)
+            opportunities.append({"name": name, "description": description, "priority": None})
+        return opportunities
+
+    @classmethod
+    def _parse_technical_requirements(cls, items: List[str], text: str) -> List[Dict]:
+        return [{"description": item, "category": None} for item in items]
+
+    _parse_functional_requirements = _parse_technical_requirements
+
+    @classmethod
+    def _parse_business_processes(cls, items: List[str], text: str) -> List[Dict]:
+        return [dict(zip(("name", "description"), cls._split_item(item))) for item in items]
+
+    @classmethod
+    def _parse_stakeholders(cls, items: List[str], text: str) -> List[Dict]:
+        return [dict(zip(("name", "role"), cls._split_item(item))) for item in items]
+
+    @classmethod
+    def _parse_ui_elements(cls, items: List[str], text: str) -> List[Dict]:
+        return [dict(zip(("type", "label"), cls._split_item(item))) for item in items]
+
+    @staticmethod
+    def _parse_process_flow(items: List[str], text: str) -> Dict:
+        decisions = [i for i in items if "?" in i or re.match(r"^(se|caso|quando)\b", i.lower())]
+        return {"steps": items, "decision_points": decisions}
+
+    @staticmethod
+    def _parse_tool_recommendations(items: List[str], text: str) -> List[str]:
+        if items:
+            return items
+        lowered = text.lower()
+        return [tool for tool in KNOWN_TOOLS if re.search(rf"\b{re.escape(tool.lower())}\b", lowered)]
+
+    @staticmethod
+    def _parse_complexity_estimate(items: List[str], text: str) -> Dict:
+        if items:
+            scope = " ".join(items).lower()
+        else:
+            scope = " ".join(s for s in re.split(r"[.\n]", text.lower()) if "complex" in s)
+        score_match = _SCORE_RE.search(scope)
+        score = int(score_match.group(1)) if score_match else None
+
+        level = next(
+            (level for level, words in _LEVELS if any(re.search(rf"\b{w}\b", scope) for w in words)),
+            None
+        )
+        if level is None and score is not None:
+            level = "low" if score <= 3 else "high" if score >= 7 else "medium"
+        if score is None and level is not None:
+            score = {"low": 3, "medium": 5, "high": 8}[level]
+
+        if level is None:
+            return dict(FIELD_DEFAULTS["complexity_estimate"])
+        return {"level": level, "score": score}
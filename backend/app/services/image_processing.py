@@ -0,0 +1,192 @@
+"""
+Pré-processamento de imagens antes da análise visual do MILAPP
+"""
+
+import io
+import math
+from typing import Dict, List, Optional, Tuple
+import structlog
+
+from app.core.capabilities import load_capability
+
+logger = structlog.get_logger()
+
+# Resolução acima da qual o modelo de visão não extrai mais detalhes
+# (a imagem é reduzida para caber em 2048x2048 e depois para 768 no menor lado)
+DEFAULT_MAX_SIDE = 2048
+DEFAULT_SHORT_SIDE = 768
+
+# Limite de pixels para OCR (evita decodificar imagens gigantes em resolução total)
+OCR_MAX_SIDE = 3000
+
+
+def prepare_image(
+    path: str,
+    max_side: int = DEFAULT_MAX_SIDE,
+    short_side: int = DEFAULT_SHORT_SIDE,
+    jpeg_quality: int = 85,
+    max_tiles: int = 6,
+    run_ocr: bool = False,
+    ocr_lang: str = "por+eng"
+) -> Dict:
+    """Reduzir, recomprimir e (se muito alongada) fatiar a imagem para o modelo de visão"""
+    pil = load_capability("image")
+    Image, ImageOps = pil["PIL.Image"], pil["PIL.ImageOps"]
+
+    with Image.open(path) as source:
+        original_format = source.format
+        original_size = source.size
+
+        # JPEG pode ser decodificado direto em escala reduzida
+        scale = _target_scale(original_size, max_side, short_side, max_tiles)
+        if original_format == "JPEG" and scale < 0.5 and not run_ocr:
+            source.draft("RGB", (math.ceil(original_size[0] * scale * 2), math.ceil(original_size[1] * scale * 2)))
+
+        image = ImageOps.exif_transpose(source)
+        image = _to_rgb(image)
+
+    ocr = _run_ocr(image, ocr_lang) if run_ocr else None
+
+    tiles = [
+        _encode_jpeg(_resize(tile, max_side, short_side), jpeg_quality)
+        for tile in _split_tiles(image, max_side, short_side, max_tiles)
+    ]
+
+    result = {
+        "tiles": [t[0] for t in tiles],
+        "tile_sizes": [t[1] for t in tiles],
+        "original_size": original_size,
+        "original_format": original_format,
+        "encoded_bytes": sum(len(t[0]) for t in tiles),
+        "ocr_text": ocr["text"] if ocr else None,
+        "ocr_word_count": ocr["word_count"] if ocr else 0,
+        "ocr_text_coverage": ocr["coverage"] if ocr else 0.0,
+        "ocr_mean_confidence": ocr["mean_confidence"] if ocr else 0.0
+    }
+
+    logger.info("Image prepared for vision",
+               original_size=original_size,
+               tiles=len(tiles),
+               encoded_bytes=result["encoded_bytes"],
+               ocr_words=result["ocr_word_count"])
+
+    return result
+
+
+def is_text_only(prepared: Dict, min_words: int, min_coverage: float, min_confidence: float = 70.0) -> bool:
+    """Heurística: imagem dominada por texto legível dispensa o modelo de visão"""
+    return (
+        prepared["ocr_word_count"] >= min_words
+        and prepared["ocr_text_coverage"] >= min_coverage
+        and prepared["ocr_mean_confidence"] >= min_confidence
+    )
+
+
+def _target_scale(size: Tuple[int, int], max_side: int, short_side: int, max_tiles: int) -> float:
+    """Menor escala aplicada a um tile (usada para decodificação reduzida de JPEG)"""
+    width, height = size
+    short, long = min(width, height), max(width, height)
+    tiles = _tile_count(short, long, max_side, short_side, max_tiles)
+    tile_long = long / tiles
+    return min(1.0, short_side / short, max_side / tile_long)
+
+
+def _tile_count(short: int, long: int, max_side: int, short_side: int, max_tiles: int) -> int:
+    max_aspect = max_side / short_side
+    if long / short <= max_aspect:
+        return 1
+    return min(max_tiles, math.ceil(long / (short * max_aspect)))
+
+
+def _split_tiles(image, max_side: int, short_side: int, max_tiles: int) -> List:
+    """Fatiar imagens muito alongadas (ex.: screenshots de página inteira) no eixo maior"""
+    width, height = image.size
+    short, long = min(width, height), max(width, height)
+    count = _tile_count(short, long, max_side, short_side, max_tiles)
+    if count == 1:
+        return [image]
+
+    step = long / count
+    overlap = int(step * 0.05)
+    vertical = height >= width
+    tiles = []
+
+    for index in range(count):
+        start = max(0, int(index * step) - overlap)
+        end = min(long, int((index + 1) * step) + overlap)
+        box = (0, start, width, end) if vertical else (start, 0, end, height)
+        tiles.append(image.crop(box))
+
+    return tiles
+
+
+def _resize(image, max_side: int, short_side: int):
+    width, height = image.size
+    scale = min(1.0, short_side / min(width, height), max_side / max(width, height))
+    if scale >= 1.0:
+        return image
+
+    Image = load_capability("image")["PIL.Image"]
+    new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return image.resize(new_size, Image.LANCZOS)
+
+
+def _to_rgb(image):
+    """Converter para RGB, compondo transparência sobre fundo branco"""
+    Image = load_capability("image")["PIL.Image"]
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+
+    return image.convert("RGB") if image.mode != "RGB" else image
+
+
+def _encode_jpeg(image, quality: int) -> Tuple[bytes, Tuple[int, int]]:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue(), image.size
+
+
+def _run_ocr(image, lang: str) -> Optional[Dict]:
+    """OCR local com Tesseract: texto, número de palavras, cobertura e confiança"""
+    try:
+        pytesseract = load_capability("ocr")["pytesseract"]
+
+        width, height = image.size
+        scale = min(1.0, OCR_MAX_SIDE / max(width, height))
+        if scale < 1.0:
+            image = _resize(image, OCR_MAX_SIDE, max(1, round(min(width, height) * scale)))
+            width, height = image.size
+
+        data = pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+
+        words = []
+        confidences = []
+        blocks: Dict[int, List[int]] = {}
+        for i, word in enumerate(data["text"]):
+            confidence = float(data["conf"][i])
+            if not word.strip() or confidence < 0:
+                continue
+            words.append(word)
+            confidences.append(confidence)
+
+            left, top = data["left"][i], data["top"][i]
+            right, bottom = left + data["width"][i], top + data["height"][i]
+            box = blocks.setdefault(data["block_num"][i], [left, top, right, bottom])
+            box[0], box[1] = min(box[0], left), min(box[1], top)
+            box[2], box[3] = max(box[2], right), max(box[3], bottom)
+
+        block_area = sum((b[2] - b[0]) * (b[3] - b[1]) for b in blocks.values())
+
+        return {
+            "text": " ".join(words),
+            "word_count": len(words),
+            "coverage": round(min(1.0, block_area / float(width * height)), 3),
+            "mean_confidence": round(sum(confidences) / len(confidences), 1) if confidences else 0.0
+        }
+
+    except Exception as e:
+        logger.warning("Local OCR failed", error=str(e))
+        return None
@@ -0,0 +1,167 @@
+"""
+Serviço de jobs assíncronos do MILAPP
+"""
+
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict, Optional
+import structlog
+
+from app.core.config import settings
+from app.services.cache_service import CacheService
+from app.services.event_stream import EventStream
+
+logger = structlog.get_logger()
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class JobService:
+    """Estado, progresso e eventos de jobs processados em background"""
+
+    @staticmethod
+    def _job_key(job_id: str) -> str:
+        return f"job:{job_id}"
+
+    @staticmethod
+    def events_stream(job_id: str) -> str:
+        """Nome do stream de eventos do job"""
+        return f"job:{job_id}:events"
+
+    @classmethod
+    async def create_job(cls, job_type: str, payload: Dict, user_id: Optional[str] = None) -> Dict:
+        """Criar job na fila"""
+        job = {
+            "id": str(uuid.uuid4()),
+            "type": job_type,
+            "status": "queued",
+            "stage": None,
+            "progress": 0.0,
+            "payload": payload,
+            "user_id": str(user_id) if user_id else None,
+            "stages": {},
+            "result": None,
+            "error": None,
+            "created_at": datetime.utcnow().isoformat(),
+            "updated_at": datetime.utcnow().isoformat()
+        }
+
+        await cls._save(job)
+        await EventStream.publish(cls.events_stream(job["id"]), {
+            "type": "status",
+            "status": "queued",
+            "progress": 0.0
+        })
+
+        logger.info("Job created", job_id=job["id"], job_type=job_type)
+        return job
+
+    @classmethod
+    async def get_job(cls, job_id: str) -> Optional[Dict]:
+        """Obter estado do job"""
+        return await CacheService.get_json(cls._job_key(job_id))
+
+    @classmethod
+    async def update_job(cls, job_id: str, event_type: str = "status", **fields) -> Dict:
+        """Atualizar campos do job e publicar evento"""
+        job = await cls.get_job(job_id)
+        if job is None:
+            raise KeyError(f"Job {job_id} não encontrado")
+
+        job.update(fields)
+        job["updated_at"] = datetime.utcnow().isoformat()
+        await cls._save(job)
+
+        event = {
+            "type": event_type,
+            "status": job["status"],
+            "stage": job["stage"],
+            "progress": job["progress"]
+        }
+        if "message" in fields:
+            event["message"] = fields["message"]
+        if job["status"] in TERMINAL_STATUSES:
+            event["stages"] = job["stages"]
+            event["error"] = job["error"]
+
+        await EventStream.publish(cls.events_stream(job_id), event)
+        return job
+
+    @classmethod
+    async def _save(cls, job: Dict):
+        await CacheService.set_json(cls._job_key(job["id"]), job, ttl=settings.JOB_TTL)
+
+    @staticmethod
+    def is_terminal_event(event: Dict) -> bool:
+        """Indica se o evento encerra o job"""
+        return event.get("status") in TERMINAL_STATUSES
+
+
+class JobReporter:
+    """Registra estágios, tempos e progresso de um job em execução"""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.stages: Dict[str, Dict] = {}
+        self.progress_value = 0.0
+        self._range = (0.0, 1.0)
+
+    @asynccontextmanager
+    async def stage(self, name: str, progress_start: float, progress_end: float):
+        """Executar um estágio registrando duração e progresso"""
+        started = time.perf_counter()
+        self.stages[name] = {"started_at": datetime.utcnow().isoformat()}
+        self._range = (progress_start, progress_end)
+        self.progress_value = progress_start
+
+        await JobService.update_job(
+            self.job_id,
+            status="running",
+            stage=name,
+            progress=progress_start,
+            stages=self.stages
+        )
+
+        try:
+            yield self
+        finally:
+            self.stages[name]["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+        self.progress_value = progress_end
+        await JobService.update_job(self.job_id, progress=progress_end, stages=self.stages)
+
+    async def progress(self, fraction: float, message: Optional[str] = None):
+        """Reportar progresso (0..1) dentro do estágio atual"""
+        start, end = self._range
+        self.progress_value = round(start + (end - start) * min(max(fraction, 0.0), 1.0), 3)
+
+        fields = {"progress": self.progress_value}
+        if message:
+            fields["message"] = message
+        await JobService.update_job(self.job_id, event_type="progress", **fields)
+
+    async def complete(self, result: Dict):
+        """Finalizar job com sucesso"""
+        await JobService.update_job(
+            self.job_id,
+            status="completed",
+            stage=None,
+            progress=1.0,
+            result=result,
+            stages=self.stages
+        )
+
+    async def fail(self, error: str):
+        """Finalizar job com erro"""
+        await JobService.update_job(
+            self.job_id,
+            status="failed",
+            error=error,
+            stages=self.stages
+        )
+
+
+# Instância global do serviço
+job_service = JobService()
@@ -0,0 +1,570 @@
+"""
+Gateway de modelos de linguagem do MILAPP
+
+Cada chamada informa a tarefa (classificação, extração, resumo, análise, visão,
+transcrição, embedding); o gateway escolhe o modelo adequado mais barato ou mais rápido
+entre os configurados para a tarefa e recorre ao próximo em caso de falha.
+"""
+
+import hashlib
+import json
+import math
+import time
+from typing import Any, Dict, List, Optional
+import structlog
+from prometheus_client import Counter, Histogram
+
+from app.core.capabilities import load_capability
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# Tarefas suportadas pelo gateway
+TASK_CLASSIFICATION = "classification"
+TASK_EXTRACTION = "extraction"
+TASK_SUMMARIZATION = "summarization"
+TASK_ANALYSIS = "analysis"
+TASK_VISION = "vision"
+TASK_TRANSCRIPTION = "transcription"
+TASK_EMBEDDING = "embedding"
+
+# Capacidade exigida do modelo por tarefa
+TASK_CAPABILITIES = {
+    TASK_CLASSIFICATION: "chat",
+    TASK_EXTRACTION: "chat",
+    TASK_SUMMARIZATION: "chat",
+    TASK_ANALYSIS: "chat",
+    TASK_VISION: "vision",
+    TASK_TRANSCRIPTION: "transcription",
+    TASK_EMBEDDING: "embedding"
+}
+
+# Catálogo de modelos: provedor, capacidades, preço em USD (por 1k tokens ou por
+# minuto de áudio) e latência típica em segundos usada antes de haver medições
+MODEL_CATALOG: Dict[str, Dict[str, Any]] = {
+    "gpt-4": {
+        "provider": "openai", "capabilities": {"chat", "tools"},
+        "input_cost": 0.03, "output_cost": 0.06, "latency_hint": 8.0
+    },
+    "gpt-4-1106-preview": {
+        "provider": "openai", "capabilities": {"chat", "tools"},
+        "input_cost": 0.01, "output_cost": 0.03, "latency_hint": 6.0
+    },
+    "gpt-4-vision-preview": {
+        "provider": "openai", "capabilities": {"chat", "vision"},
+        "input_cost": 0.01, "output_cost": 0.03, "latency_hint": 10.0
+    },
+    "gpt-3.5-turbo": {
+        "provider": "openai", "capabilities": {"chat", "tools"},
+        "input_cost": 0.0015, "output_cost": 0.002, "latency_hint": 2.0
+    },
+    "gpt-3.5-turbo-1106": {
+        "provider": "openai", "capabilities": {"chat", "tools"},
+        "input_cost": 0.001, "output_cost": 0.002, "latency_hint": 2.0
+    },
+    "text-embedding-ada-002": {
+        "provider": "openai", "capabilities": {"embedding"},
+        "input_cost": 0.0001, "output_cost": 0.0, "latency_hint": 0.5
+    },
+    "whisper-1": {
+        "provider": "openai", "capabilities": {"transcription"},
+        "minute_cost": 0.006, "latency_hint": 20.0
+    },
+    "claude-2.1": {
+        "provider": "anthropic", "capabilities": {"chat"},
+        "input_cost": 0.008, "output_cost": 0.024, "latency_hint": 8.0
+    },
+    "claude-instant-1.2": {
+        "provider": "anthropic", "capabilities": {"chat"},
+        "input_cost": 0.0008, "output_cost": 0.0024, "latency_hint": 2.0
+    },
+    "stub": {
+        "provider": "stub", "capabilities": {"chat", "tools", "vision", "transcription", "embedding"},
+        "input_cost": 0.0, "output_cost": 0.0, "latency_hint": 0.0
+    }
+}
+
+# Peso da última medição na média móvel de latência
+LATENCY_EWMA_ALPHA = 0.2
+
+LLM_REQUEST_COUNT = Counter(
+    'llm_requests_total', 'Total LLM requests', ['provider', 'model', 'task', 'status']
+)
+LLM_REQUEST_LATENCY = Histogram(
+    'llm_request_duration_seconds', 'LLM request latency', ['provider', 'model', 'task'],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+)
+LLM_TOKENS = Counter(
+    'llm_tokens_total', 'LLM tokens consumed', ['model', 'direction']
+)
+LLM_COST = Counter(
+    'llm_cost_usd_total', 'Estimated LLM cost in USD', ['provider', 'model', 'task']
+)
+
+
+class LLMGatewayError(Exception):
+    """Nenhum modelo disponível conseguiu atender a tarefa"""
+
+
+class LLMResponse:
+    """Resposta normalizada de qualquer provedor"""
+
+    def __init__(
+        self,
+        content: str = "",
+        tool_arguments: Optional[Dict] = None,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        audio_seconds: float = 0.0,
+        segments: Optional[List[Dict]] = None,
+        embeddings: Optional[List[List[float]]] = None,
+        raw: Any = None
+    ):
+        self.content = content
+        self.tool_arguments = tool_arguments
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.audio_seconds = audio_seconds
+        self.segments = segments or []
+        self.embeddings = embeddings or []
+        self.raw = raw
+        self.model: Optional[str] = None
+        self.provider: Optional[str] = None
+        self.latency: float = 0.0
+        self.cost: float = 0.0
+
+
+class OpenAIProvider:
+    """Chat, visão, function calling e transcrição via API da OpenAI"""
+
+    name = "openai"
+
+    def __init__(self):
+        self._client = None
+
+    async def initialize(self) -> bool:
+        # O SDK só é importado na primeira chamada (ou no prewarm)
+        return bool(settings.OPENAI_API_KEY)
+
+    @property
+    def client(self):
+        if self._client is None:
+            openai = load_capability("openai")["openai"]
+            self._client = openai.AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                timeout=settings.AI_GATEWAY_TIMEOUT,
+                max_retries=0
+            )
+        return self._client
+
+    async def cleanup(self):
+        if self._client:
+            await self._client.close()
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict],
+        max_tokens: int,
+        temperature: float,
+        tool: Optional[Dict] = None
+    ) -> LLMResponse:
+        params = {}
+        if tool:
+            params["tools"] = [{"type": "function", "function": tool}]
+            params["tool_choice"] = {"type": "function", "function": {"name": tool["name"]}}
+
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **params
+        )
+
+        message = response.choices[0].message
+        tool_arguments = None
+        if tool:
+            if not message.tool_calls:
+                raise ValueError("Modelo não retornou chamada de função")
+            tool_arguments = json.loads(message.tool_calls[0].function.arguments)
+
+        usage = response.usage
+        return LLMResponse(
+            content=message.content or "",
+            tool_arguments=tool_arguments,
+            input_tokens=usage.prompt_tokens if usage else 0,
+            output_tokens=usage.completion_tokens if usage else 0,
+            raw=response
+        )
+
+    async def transcribe(self, model: str, file_payload: tuple) -> LLMResponse:
+        transcript = await self.client.audio.transcriptions.create(
+            model=model,
+            file=file_payload,
+            response_format="verbose_json"
+        )
+        segments = []
+        for item in getattr(transcript, "segments", None) or []:
+            if not isinstance(item, dict):
+                item = {"start": item.start, "end": item.end, "text": item.text}
+            segments.append({"start": float(item["start"]), "end": float(item["end"]), "text": item["text"]})
+
+        return LLMResponse(
+            content=transcript.text,
+            audio_seconds=float(getattr(transcript, "duration", 0.0) or 0.0),
+            segments=segments,
+            raw=transcript
+        )
+
+    async def embed(self, model: str, texts: List[str]) -> LLMResponse:
+        response = await self.client.embeddings.create(model=model, input=texts)
+        return LLMResponse(
+            embeddings=[item.embedding for item in sorted(response.data, key=lambda d: d.index)],
+            input_tokens=response.usage.prompt_tokens if response.usage else 0,
+            raw=response
+        )
+
+
+class AnthropicProvider:
+    """Chat via Messages API da Anthropic (saída estruturada por JSON no prompt)
+
+    Sem transcrição nem embeddings: o catálogo só declara "chat" para estes
+    modelos, então o roteamento nunca os escolhe para essas tarefas.
+    """
+
+    name = "anthropic"
+
+    def __init__(self):
+        self._client = None
+
+    async def initialize(self) -> bool:
+        return bool(settings.ANTHROPIC_API_KEY)
+
+    @property
+    def client(self):
+        if self._client is None:
+            anthropic = load_capability("anthropic")["anthropic"]
+            self._client = anthropic.AsyncAnthropic(
+                api_key=settings.ANTHROPIC_API_KEY,
+                timeout=settings.AI_GATEWAY_TIMEOUT,
+                max_retries=0
+            )
+        return self._client
+
+    async def cleanup(self):
+        if self._client:
+            await self._client.close()
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict],
+        max_tokens: int,
+        temperature: float,
+        tool: Optional[Dict] = None
+    ) -> LLMResponse:
+        system_parts = [m["content"] for m in messages if m["role"] == "system"]
+        if tool:
+            system_parts.append(
+                "Responda somente com um objeto JSON válido para o esquema a seguir, sem texto adicional:\n"
+                + json.dumps(tool["parameters"], ensure_ascii=False)
+            )
+
+        response = await self.client.messages.create(
+            model=model,
+            system="\n\n".join(system_parts),
+            messages=self._merge_roles([m for m in messages if m["role"] != "system"]),
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+
+        content = "".join(block.text for block in response.content if getattr(block, "text", None))
+        return LLMResponse(
+            content=content,
+            tool_arguments=self._parse_json(content) if tool else None,
+            input_tokens=response.usage.input_tokens,
+            output_tokens=response.usage.output_tokens,
+            raw=response
+        )
+
+    @staticmethod
+    def _merge_roles(messages: List[Dict]) -> List[Dict]:
+        """A API exige alternância user/assistant começando por user"""
+        merged: List[Dict] = []
+        for message in messages:
+            if merged and merged[-1]["role"] == message["role"]:
+                merged[-1]["content"] = f"{merged[-1]['content']}\n\n{message['content']}"
+            else:
+                merged.append({"role": message["role"], "content": message["content"]})
+        if merged and merged[0]["role"] != "user":
+            merged.insert(0, {"role": "user", "content": "(continuação da conversa)"})
+        return merged
+
+    @staticmethod
+    def _parse_json(content: str) -> Dict:
+        start, end = content.find("{"), content.rfind("}")
+        if start < 0 or end <= start:
+            raise ValueError("Resposta sem objeto JSON")
+        return json.loads(content[start:end + 1])
+
+
+class StubProvider:
+    """Provedor local determinístico para testes e desenvolvimento sem chaves"""
+
+    name = "stub"
+
+    async def initialize(self) -> bool:
+        return settings.AI_STUB_PROVIDER_ENABLED
+
+    async def cleanup(self):
+        pass
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict],
+        max_tokens: int,
+        temperature: float,
+        tool: Optional[Dict] = None
+    ) -> LLMResponse:
+        last = messages[-1]["content"] if messages else ""
+        if isinstance(last, list):
+            last = " ".join(part.get("text", "") for part in last if part.get("type") == "text")
+        content = f"[stub] {last.strip()[:max_tokens * 4]}"
+        return LLMResponse(
+            content=content,
+            tool_arguments={} if tool else None,
+            input_tokens=sum(len(str(m["content"])) // 4 for m in messages),
+            output_tokens=len(content) // 4
+        )
+
+    async def transcribe(self, model: str, file_payload: tuple) -> LLMResponse:
+        return LLMResponse(content="[stub] transcrição")
+
+    async def embed(self, model: str, texts: List[str]) -> LLMResponse:
+        return LLMResponse(embeddings=[self._hash_vector(text) for text in texts])
+
+    @staticmethod
+    def _hash_vector(text: str) -> List[float]:
+        """Vetor determinístico por palavras (textos com palavras em comum ficam próximos)"""
+        vector = [0.0] * settings.EMBEDDING_DIMENSIONS
+        for word in text.lower().split():
+            digest = hashlib.sha256(word.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "big") % len(vector)
+            vector[index] += 1.0 if digest[4] % 2 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+
+class LLMGateway:
+    """Roteia cada tarefa para o modelo adequado, com fallback entre provedores"""
+
+    _providers: Dict[str, Any] = {}
+    _latency: Dict[str, float] = {}
+    _unhealthy_until: Dict[str, float] = {}
+    _stats: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    async def initialize(cls) -> bool:
+        """Inicializar provedores com credenciais configuradas"""
+        cls._providers = {}
+        for provider in (OpenAIProvider(), AnthropicProvider(), StubProvider()):
+            try:
+                if await provider.initialize():
+                    cls._providers[provider.name] = provider
+            except Exception as e:
+                logger.error("LLM provider initialization failed", provider=provider.name, error=str(e))
+
+        logger.info("LLM gateway initialized", providers=list(cls._providers))
+        return bool(cls._providers)
+
+    @classmethod
+    async def cleanup(cls):
+        """Fechar clientes dos provedores"""
+        for provider in cls._providers.values():
+            try:
+                await provider.cleanup()
+            except Exception as e:
+                logger.error("LLM provider cleanup failed", provider=provider.name, error=str(e))
+        cls._providers = {}
+
+    @classmethod
+    def is_available(cls, task: str) -> bool:
+        """Há algum modelo utilizável para a tarefa"""
+        return bool(cls.candidates(task))
+
+    @classmethod
+    def routes(cls) -> Dict[str, List[str]]:
+        """Modelos adequados por tarefa (AI_TASK_ROUTES sobrescreve o padrão)"""
+        routes = {
+            TASK_CLASSIFICATION: [settings.AI_CLASSIFICATION_MODEL, "claude-instant-1.2"],
+            TASK_EXTRACTION: [settings.AI_EXTRACTION_MODEL, "claude-instant-1.2"],
+            TASK_SUMMARIZATION: [settings.AI_SUMMARY_MODEL, "claude-instant-1.2"],
+            TASK_ANALYSIS: [settings.AI_MODEL_NAME, "claude-2.1"],
+            TASK_VISION: [settings.AI_VISION_MODEL],
+            TASK_TRANSCRIPTION: [settings.AI_TRANSCRIPTION_MODEL],
+            TASK_EMBEDDING: [settings.EMBEDDING_MODEL]
+        }
+        routes.update(settings.AI_TASK_ROUTES)
+        return routes
+
+    @classmethod
+    def candidates(cls, task: str, require_tools: bool = False) -> List[str]:
+        """Modelos da rota com provedor ativo, ordenados pela estratégia de roteamento"""
+        capability = TASK_CAPABILITIES[task]
+        models = list(cls.routes().get(task, []))
+
+        usable = []
+        for model in models:
+            spec = MODEL_CATALOG.get(model)
+            if not spec or spec["provider"] not in cls._providers:
+                continue
+            if capability not in spec["capabilities"]:
+                continue
+            usable.append(model)
+
+        strategy = settings.AI_ROUTING_STRATEGY
+        if strategy == "cost":
+            usable.sort(key=cls._unit_cost)
+        elif strategy == "latency":
+            usable.sort(key=lambda m: cls._latency.get(m, MODEL_CATALOG[m]["latency_hint"]))
+
+        # Saída estruturada: function calling nativo antes de JSON no prompt
+        if require_tools:
+            usable.sort(key=lambda m: "tools" not in MODEL_CATALOG[m]["capabilities"])
+
+        # Modelos que falharam recentemente vão para o fim da fila
+        now = time.monotonic()
+        usable.sort(key=lambda m: cls._unhealthy_until.get(m, 0) > now)
+
+        # Provedor local é sempre o último recurso; para embeddings só quando é o
+        # único, pois vetores de modelos diferentes não são comparáveis no índice
+        if "stub" in cls._providers and "stub" not in usable and (task != TASK_EMBEDDING or not usable):
+            usable.append("stub")
+        return usable
+
+    @classmethod
+    async def complete(
+        cls,
+        task: str,
+        messages: List[Dict],
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        tool: Optional[Dict] = None
+    ) -> LLMResponse:
+        """Completar mensagens de chat; tool força uma chamada de função (saída estruturada)"""
+        max_tokens = max_tokens or settings.AI_MAX_TOKENS
+        temperature = settings.AI_TEMPERATURE if temperature is None else temperature
+
+        async def call(provider, model):
+            return await provider.complete(model, messages, max_tokens, temperature, tool)
+
+        return await cls._run(task, call, require_tools=tool is not None)
+
+    @classmethod
+    async def transcribe(cls, file_payload: tuple) -> LLMResponse:
+        """Transcrever áudio (verbose_json com segmentos quando suportado)"""
+        async def call(provider, model):
+            return await provider.transcribe(model, file_payload)
+
+        return await cls._run(TASK_TRANSCRIPTION, call)
+
+    @classmethod
+    async def embed(cls, texts: List[str]) -> LLMResponse:
+        """Gerar embeddings (um vetor por texto, na mesma ordem)"""
+        async def call(provider, model):
+            return await provider.embed(model, texts)
+
+        return await cls._run(TASK_EMBEDDING, call)
+
+    @classmethod
+    def stats(cls) -> Dict[str, Dict[str, float]]:
+        """Resumo por modelo desde o início do processo (chamadas, erros, latência, custo)"""
+        return {
+            model: {
+                **values,
+                "latency_ewma": round(cls._latency.get(model, 0.0), 3)
+            }
+            for model, values in cls._stats.items()
+        }
+
+    @classmethod
+    async def _run(cls, task: str, call, require_tools: bool = False) -> LLMResponse:
+        candidates = cls.candidates(task, require_tools=require_tools)
+        if not candidates:
+            raise LLMGatewayError(f"Nenhum modelo disponível para a tarefa {task}")
+
+        errors = []
+        for model in candidates:
+            provider = cls._providers[MODEL_CATALOG[model]["provider"]]
+            started = time.perf_counter()
+            try:
+                response = await call(provider, model)
+            except Exception as e:
+                cls._record_failure(task, provider.name, model, time.perf_counter() - started)
+                errors.append(f"{model}: {e}")
+                logger.warning("LLM call failed, trying next model",
+                              task=task, model=model, error=str(e))
+                continue
+
+            response.model = model
+            response.provider = provider.name
+            response.latency = time.perf_counter() - started
+            response.cost = cls._cost(model, response)
+            cls._record_success(task, response)
+            return response
+
+        raise LLMGatewayError(f"Todos os modelos falharam para a tarefa {task}: {'; '.join(errors)}")
+
+    @staticmethod
+    def _unit_cost(model: str) -> float:
+        spec = MODEL_CATALOG[model]
+        return spec.get("input_cost", 0.0) + spec.get("output_cost", 0.0) + spec.get("minute_cost", 0.0)
+
+    @staticmethod
+    def _cost(model: str, response: LLMResponse) -> float:
+        spec = MODEL_CATALOG[model]
+        return (
+            response.input_tokens / 1000 * spec.get("input_cost", 0.0)
+            + response.output_tokens / 1000 * spec.get("output_cost", 0.0)
+            + response.audio_seconds / 60 * spec.get("minute_cost", 0.0)
+        )
+
+    @classmethod
+    def _record_success(cls, task: str, response: LLMResponse):
+        model = response.model
+        LLM_REQUEST_COUNT.labels(response.provider, model, task, "success").inc()
+        LLM_REQUEST_LATENCY.labels(response.provider, model, task).observe(response.latency)
+        LLM_TOKENS.labels(model, "input").inc(response.input_tokens)
+        LLM_TOKENS.labels(model, "output").inc(response.output_tokens)
+        LLM_COST.labels(response.provider, model, task).inc(response.cost)
+
+        previous = cls._latency.get(model)
+        cls._latency[model] = (
+            response.latency if previous is None
+            else previous + LATENCY_EWMA_ALPHA * (response.latency - previous)
+        )
+        cls._unhealthy_until.pop(model, None)
+
+        stats = cls._model_stats(model)
+        stats["requests"] += 1
+        stats["cost_usd"] = round(stats["cost_usd"] + response.cost, 6)
+
+    @classmethod
+    def _record_failure(cls, task: str, provider: str, model: str, latency: float):
+        LLM_REQUEST_COUNT.labels(provider, model, task, "error").inc()
+        LLM_REQUEST_LATENCY.labels(provider, model, task).observe(latency)
+        cls._unhealthy_until[model] = time.monotonic() + settings.AI_GATEWAY_FAILURE_COOLDOWN
+
+        stats = cls._model_stats(model)
+        stats["requests"] += 1
+        stats["errors"] += 1
+
+    @classmethod
+    def _model_stats(cls, model: str) -> Dict[str, float]:
+        return cls._stats.setdefault(model, {"requests": 0, "errors": 0, "cost_usd": 0.0})
+
+
+# Instância global do gateway
+llm_gateway = LLMGateway()
@@ -0,0 +1,334 @@
+"""
+Gerador de carga assíncrono para o quality gate performance_test
+
+Usuários virtuais repetem um perfil de requisições gravado (lista própria ou
+HAR exportado do navegador) seguindo estágios de rampa; cada latência entra
+em um histograma HDR (precisão relativa de ~0,1% em qualquer magnitude) e o
+resultado é comparado com os SLOs configurados para gerar a nota.
+"""
+
+import asyncio
+import json
+import random
+import time
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+import httpx
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# Percentis reportados
+PERCENTILES = (50.0, 90.0, 95.0, 99.0, 99.9)
+
+# SLOs em que valores menores são melhores (latências em ms e taxa de erro)
+_LOWER_IS_BETTER = {
+    "p50_ms": ("latency_ms", "p50"),
+    "p90_ms": ("latency_ms", "p90"),
+    "p95_ms": ("latency_ms", "p95"),
+    "p99_ms": ("latency_ms", "p99"),
+    "max_ms": ("latency_ms", "max"),
+    "mean_ms": ("latency_ms", "mean"),
+    "error_rate": ("error_rate",)
+}
+
+# Cabeçalhos do HAR que não devem ser reenviados
+_HAR_SKIP_HEADERS = {"host", "content-length", "connection", "accept-encoding"}
+
+
+class LatencyHistogram:
+    """Histograma HDR (log-linear) de latências em microssegundos
+
+    Valores abaixo de 2^bits são exatos; acima, cada potência de dois é
+    dividida em 2^(bits-1) faixas, então o erro relativo fica abaixo de
+    1/2^(bits-1) com memória proporcional às faixas ocupadas.
+    """
+
+    def __init__(self, significant_bits: int = 11):
+        self.bits = significant_bits
+        self.sub_buckets = 1 << significant_bits
+        self.half = self.sub_buckets >> 1
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.sum = 0
+        self.min: Optional[int] = None
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        if value < self.sub_buckets:
+            return value
+        shift = value.bit_length() - self.bits
+        return shift * self.half + (value >> shift)
+
+    def _highest_equivalent(self, index: int) -> int:
+        """Maior valor representado pela faixa"""
+        if index < self.sub_buckets:
+            return index
+        shift = (index - self.sub_buckets) // self.half + 1
+        return ((index - shift * self.half) << shift) + (1 << shift) - 1
+
+    def record(self, value_us: int):
+        value_us = max(int(value_us), 0)
+        index = self._index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += value_us
+        self.min = value_us if self.min is None else min(self.min, value_us)
+        self.max = max(self.max, value_us)
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentiles(self, percentiles=PERCENTILES) -> Dict[float, int]:
+        """Valores (µs) dos percentis pedidos, numa única passada"""
+        if not self.total:
+            return {p: 0 for p in percentiles}
+        targets = sorted((max(1, -(-p * self.total // 100)), p) for p in percentiles)
+        result = {}
+        seen = 0
+        position = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            while position < len(targets) and seen >= targets[position][0]:
+                result[targets[position][1]] = min(self._highest_equivalent(index), self.max)
+                position += 1
+            if position == len(targets):
+                break
+        return result
+
+    def summary_ms(self) -> Dict:
+        """Resumo em milissegundos"""
+        values = self.percentiles()
+        summary = {f"p{p:g}": round(values[p] / 1000, 3) for p in PERCENTILES}
+        summary.update({
+            "min": round((self.min or 0) / 1000, 3),
+            "max": round(self.max / 1000, 3),
+            "mean": round(self.sum / self.total / 1000, 3) if self.total else 0.0,
+            "count": self.total
+        })
+        return summary
+
+
+def stand_in_app(latency_ms: float = 20.0, jitter_ms: float = 5.0, error_rate: float = 0.0, seed: Optional[int] = None):
+    """Serviço ASGI substituto com latência e taxa de erro configuráveis (testes locais)"""
+    rng = random.Random(seed)
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        more_body = True
+        while more_body:
+            message = await receive()
+            more_body = message.get("more_body", False)
+
+        await asyncio.sleep(max(0.0, rng.gauss(latency_ms, jitter_ms)) / 1000)
+        status = 500 if rng.random() < error_rate else 200
+        body = json.dumps({"path": scope["path"], "status": status}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+def profile_from_har(har: Dict) -> List[Dict]:
+    """Converter gravação HAR em perfil de requisições"""
+    profile = []
+    for entry in har.get("log", {}).get("entries", []):
+        request = entry.get("request", {})
+        url = request.get("url")
+        if not url:
+            continue
+        profile.append({
+            "name": f"{request.get('method', 'GET')} {urlparse(url).path or '/'}",
+            "method": request.get("method", "GET"),
+            "url": url,
+            "headers": {
+                header["name"]: header["value"]
+                for header in request.get("headers", [])
+                if not header["name"].startswith(":") and header["name"].lower() not in _HAR_SKIP_HEADERS
+            },
+            "body": (request.get("postData") or {}).get("text"),
+            "expect_status": entry.get("response", {}).get("status") or 200
+        })
+    return profile
+
+
+def build_stages(config: Dict) -> List[Dict]:
+    """Estágios de carga: explícitos ou rampa até `users` seguida de `duration` segundos"""
+    stages = config.get("stages")
+    if not stages:
+        users = int(config.get("users", 10))
+        stages = [
+            {"duration": float(config.get("ramp_up", 0)), "users": users},
+            {"duration": float(config.get("duration", 30)), "users": users}
+        ]
+    stages = [{"duration": float(s["duration"]), "users": int(s["users"])} for s in stages if float(s["duration"]) > 0]
+
+    if not stages:
+        raise ValueError("Nenhum estágio de carga com duração positiva")
+    if max(s["users"] for s in stages) > settings.PERFORMANCE_TEST_MAX_USERS:
+        raise ValueError(f"Máximo de {settings.PERFORMANCE_TEST_MAX_USERS} usuários virtuais")
+    if sum(s["duration"] for s in stages) > settings.PERFORMANCE_TEST_MAX_DURATION:
+        raise ValueError(f"Duração máxima de {settings.PERFORMANCE_TEST_MAX_DURATION}s")
+    return stages
+
+
+def slo_score(results: Dict, slo: Dict) -> Dict:
+    """Nota 0-100 pela média do atendimento de cada SLO
+
+    SLO atendido vale 100; violado vale a razão alvo/medido (ou medido/alvo
+    para throughput), então violações maiores pesam mais.
+    """
+    evaluations = []
+    for key, target in slo.items():
+        if key == "min_rps":
+            actual = results["throughput_rps"]
+            met = actual >= target
+            ratio = 1.0 if met else (actual / target if target else 1.0)
+        elif key in _LOWER_IS_BETTER:
+            actual = results
+            for part in _LOWER_IS_BETTER[key]:
+                actual = actual[part]
+            met = actual <= target
+            ratio = 1.0 if met else (target / actual if target else 0.0)
+        else:
+            continue
+        evaluations.append({"slo": key, "target": target, "actual": actual, "met": met, "score": round(100 * ratio, 2)})
+
+    score = sum(e["score"] for e in evaluations) / len(evaluations) if evaluations else 0.0
+    return {"score": round(score, 2), "slos": evaluations}
+
+
+class LoadTest:
+    """Usuários virtuais repetindo o perfil em ordem, com rampa por estágios"""
+
+    def __init__(
+        self,
+        profile: List[Dict],
+        stages: List[Dict],
+        client: httpx.AsyncClient,
+        base_url: str = "",
+        think_time_ms: float = 0.0
+    ):
+        if not profile:
+            raise ValueError("Perfil de requisições vazio")
+        self.profile = profile
+        self.stages = stages
+        self.client = client
+        self.base_url = base_url
+        self.think_time = think_time_ms / 1000
+        self.duration = sum(stage["duration"] for stage in stages)
+
+        self.histogram = LatencyHistogram()
+        self.by_request: Dict[str, LatencyHistogram] = {}
+        self.errors: Dict[str, int] = {}
+        self.requests = 0
+        self.failed = 0
+        self._target_users = 0
+        self._stopping = False
+
+    def users_at(self, elapsed: float) -> int:
+        """Usuários alvo no instante (interpolação linear dentro do estágio)"""
+        previous = 0
+        for stage in self.stages:
+            if elapsed < stage["duration"]:
+                return round(previous + (stage["users"] - previous) * elapsed / stage["duration"])
+            elapsed -= stage["duration"]
+            previous = stage["users"]
+        return previous
+
+    async def _virtual_user(self, index: int):
+        position = index % len(self.profile)
+        while not self._stopping and index < self._target_users:
+            spec = self.profile[position]
+            position = (position + 1) % len(self.profile)
+            name = spec.get("name") or f"{spec.get('method', 'GET')} {spec['url']}"
+
+            started = time.perf_counter()
+            error = None
+            try:
+                response = await self.client.request(
+                    spec.get("method", "GET"),
+                    self.base_url + spec["url"] if spec["url"].startswith("/") else spec["url"],
+                    headers=spec.get("headers"),
+                    json=spec.get("json"),
+                    content=spec.get("body")
+                )
+                expected = spec.get("expect_status", 200)
+                if response.status_code not in (expected if isinstance(expected, list) else [expected]):
+                    error = f"status_{response.status_code}"
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+            elapsed_us = (time.perf_counter() - started) * 1_000_000
+
+            self.requests += 1
+            self.histogram.record(elapsed_us)
+            self.by_request.setdefault(name, LatencyHistogram()).record(elapsed_us)
+            if error:
+                self.failed += 1
+                self.errors[error] = self.errors.get(error, 0) + 1
+
+            if self.think_time:
+                await asyncio.sleep(self.think_time)
+
+    async def run(
+        self,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        progress_interval: float = 5.0,
+        tick: float = 0.1
+    ) -> Dict:
+        """Executar os estágios e retornar latências, throughput e taxa de erro"""
+        users: Dict[int, asyncio.Task] = {}
+        started = time.perf_counter()
+        last_progress = started
+        peak_users = 0
+
+        try:
+            while True:
+                elapsed = time.perf_counter() - started
+                if elapsed >= self.duration:
+                    break
+                self._target_users = self.users_at(elapsed)
+                for index in range(self._target_users):
+                    task = users.get(index)
+                    if task is None or task.done():
+                        users[index] = asyncio.create_task(self._virtual_user(index))
+                peak_users = max(peak_users, self._target_users)
+
+                now = time.perf_counter()
+                if on_progress and now - last_progress >= progress_interval:
+                    last_progress = now
+                    await on_progress(self._snapshot(now - started, self._target_users))
+                await asyncio.sleep(tick)
+        finally:
+            # Requisições em andamento terminam; nenhuma nova é iniciada
+            self._stopping = True
+            await asyncio.gather(*users.values(), return_exceptions=True)
+
+        result = self._snapshot(time.perf_counter() - started, peak_users)
+        result["requests_by_name"] = {name: h.summary_ms() for name, h in self.by_request.items()}
+        result["errors"] = self.errors
+        return result
+
+    def _snapshot(self, elapsed: float, users: int) -> Dict:
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "users": users,
+            "requests": self.requests,
+            "failed": self.failed,
+            "error_rate": round(self.failed / self.requests, 5) if self.requests else 0.0,
+            "throughput_rps": round(self.requests / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": self.histogram.summary_ms()
+        }
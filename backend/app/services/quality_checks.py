@@ -0,0 +1,394 @@
+"""
+Verificações embutidas dos quality gates
+
+Cada função é registrada pelo nome usado em `criteria[].check` e devolve
+{"score": 0-100, "message": ..., "details": ...}.
+"""
+
+import asyncio
+import ipaddress
+import json
+import socket
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urljoin, urlparse
+import httpx
+
+from app.core.capabilities import load_capability
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.services.data_validation import (
+    DataValidationError,
+    DataValidator,
+    detect_format,
+    hash_values,
+    load_reference_keys,
+    sorted_keys
+)
+from app.services.document_service import DocumentService
+from app.services.load_testing import LoadTest, build_stages, profile_from_har, slo_score, stand_in_app
+from app.services.quality_gate_engine import CheckContext, register_check
+from app.services.storage_service import SpooledUpload, StorageService
+
+# Cabeçalhos de segurança exigidos por padrão no security_test
+DEFAULT_SECURITY_HEADERS = [
+    "strict-transport-security",
+    "x-content-type-options",
+    "x-frame-options",
+    "content-security-policy"
+]
+
+# Cabeçalhos que expõem detalhes do servidor
+DEFAULT_FORBIDDEN_HEADERS = ["server", "x-powered-by"]
+
+
+class TargetNotAllowedError(Exception):
+    """Destino fora da política de hosts das verificações HTTP"""
+
+
+def _matches(host: str, addresses: List, patterns: List[str]) -> bool:
+    """Host por nome exato, sufixo (*.dominio) ou rede (10.0.0.0/8) de algum endereço resolvido"""
+    for pattern in patterns:
+        pattern = pattern.strip().lower()
+        if pattern.startswith("*."):
+            if host.endswith(pattern[1:]):
+                return True
+            continue
+        if host == pattern:
+            return True
+        try:
+            network = ipaddress.ip_network(pattern, strict=False)
+        except ValueError:
+            continue
+        if any(address in network for address in addresses):
+            return True
+    return False
+
+
+async def _resolve(host: str, port: int) -> List:
+    try:
+        return [ipaddress.ip_address(host)]
+    except ValueError:
+        pass
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        # Host inexistente: a própria requisição falha
+        return []
+    return [ipaddress.ip_address(info[4][0].split("%", 1)[0]) for info in infos]
+
+
+async def ensure_target_allowed(url) -> None:
+    """Recusar destinos das verificações fora da política de hosts
+
+    QUALITY_GATE_DENIED_HOSTS sempre prevalece. Com QUALITY_GATE_ALLOWED_HOSTS
+    preenchida só os hosts listados são aceitos (inclusive em rede interna);
+    sem ela, qualquer host cujos endereços sejam públicos.
+    """
+    parsed = httpx.URL(str(url))
+    host = (parsed.host or "").lower().rstrip(".")
+    if parsed.scheme not in ("http", "https") or not host:
+        raise TargetNotAllowedError(f"URL não suportada: {url}")
+
+    addresses = await _resolve(host, parsed.port or (443 if parsed.scheme == "https" else 80))
+    if _matches(host, addresses, settings.QUALITY_GATE_DENIED_HOSTS):
+        raise TargetNotAllowedError(f"Host não permitido: {host}")
+    if settings.QUALITY_GATE_ALLOWED_HOSTS:
+        if not _matches(host, addresses, settings.QUALITY_GATE_ALLOWED_HOSTS):
+            raise TargetNotAllowedError(f"Host fora da lista permitida: {host}")
+        return
+    internal = [str(address) for address in addresses if not address.is_global]
+    if internal:
+        raise TargetNotAllowedError(f"Host {host} resolve para endereço interno ({', '.join(internal)})")
+
+
+async def _check_request(request: httpx.Request):
+    # Também vale para redirecionamentos, que passam de novo pelos hooks
+    await ensure_target_allowed(request.url)
+
+
+def _http_client(config: Dict) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=config.get("http_timeout", settings.QUALITY_GATE_HTTP_TIMEOUT),
+        verify=config.get("verify_tls", True),
+        follow_redirects=config.get("follow_redirects", True),
+        headers=config.get("headers") or {},
+        event_hooks={"request": [_check_request]}
+    )
+
+
+@register_check("integration_test")
+async def integration_test(config: Dict, context: CheckContext) -> Dict:
+    """Chamadas HTTP com status, latência e conteúdo esperados
+
+    config: {"base_url": "...", "requests": [{"name", "method", "url", "json",
+    "headers", "expect_status": 200, "max_latency_ms": 500, "contains": "..."}]}
+    """
+    probes: List[Dict] = config.get("requests") or []
+    if not probes:
+        return {"score": 0, "passed": False, "message": "Nenhuma requisição configurada"}
+    base_url = config.get("base_url", "")
+    for spec in probes:
+        await ensure_target_allowed(urljoin(base_url, spec["url"]))
+
+    async with _http_client(config) as client:
+        async def probe(spec: Dict) -> Dict:
+            name = spec.get("name") or spec.get("url")
+            started = time.perf_counter()
+            try:
+                response = await client.request(
+                    spec.get("method", "GET"),
+                    urljoin(base_url, spec["url"]),
+                    json=spec.get("json"),
+                    headers=spec.get("headers")
+                )
+            except httpx.HTTPError as e:
+                await context.log(f"{name}: falha de conexão ({e})", level="WARNING")
+                return {"name": name, "passed": False, "error": str(e)}
+
+            latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            failures = []
+            expected = spec.get("expect_status", 200)
+            if response.status_code not in (expected if isinstance(expected, list) else [expected]):
+                failures.append(f"status {response.status_code}, esperado {expected}")
+            if spec.get("max_latency_ms") and latency_ms > spec["max_latency_ms"]:
+                failures.append(f"latência {latency_ms}ms acima de {spec['max_latency_ms']}ms")
+            if spec.get("contains") and spec["contains"] not in response.text:
+                failures.append("conteúdo esperado ausente")
+
+            if failures:
+                await context.log(f"{name}: " + "; ".join(failures), level="WARNING")
+            return {
+                "name": name,
+                "passed": not failures,
+                "status_code": response.status_code,
+                "latency_ms": latency_ms,
+                "failures": failures
+            }
+
+        results = await asyncio.gather(*(probe(spec) for spec in probes))
+
+    passed = sum(1 for r in results if r["passed"])
+    return {
+        "score": 100.0 * passed / len(results),
+        "message": f"{passed}/{len(results)} requisições aprovadas",
+        "details": {"requests": results}
+    }
+
+
+@register_check("security_test")
+async def security_test(config: Dict, context: CheckContext) -> Dict:
+    """Verificações passivas de segurança de um endpoint HTTP
+
+    config: {"url": "...", "require_https": true, "required_headers": [...],
+    "forbidden_headers": [...], "secure_cookies": true}
+    """
+    url = config.get("url")
+    if not url:
+        return {"score": 0, "passed": False, "message": "URL não configurada"}
+    await ensure_target_allowed(url)
+
+    async with _http_client(config) as client:
+        response = await client.get(url)
+
+    checks = []
+
+    if config.get("require_https", True):
+        checks.append(("https", urlparse(str(response.url)).scheme == "https"))
+
+    for header in config.get("required_headers", DEFAULT_SECURITY_HEADERS):
+        checks.append((f"header:{header}", header.lower() in response.headers))
+
+    for header in config.get("forbidden_headers", DEFAULT_FORBIDDEN_HEADERS):
+        checks.append((f"sem header:{header}", header.lower() not in response.headers))
+
+    if config.get("secure_cookies", True):
+        for cookie in response.headers.get_list("set-cookie"):
+            attributes = cookie.lower()
+            name = cookie.split("=", 1)[0]
+            checks.append((f"cookie:{name}", "secure" in attributes and "httponly" in attributes))
+
+    failed = [name for name, ok in checks if not ok]
+    for name in failed:
+        await context.log(f"Falhou: {name}", level="WARNING")
+
+    return {
+        "score": 100.0 * (len(checks) - len(failed)) / len(checks) if checks else 100.0,
+        "message": f"{len(checks) - len(failed)}/{len(checks)} verificações aprovadas",
+        "details": {"status_code": response.status_code, "failed": failed, "checks": len(checks)}
+    }
+
+
+async def _fetch_document(source: Optional[Dict], project_id: Optional[str]) -> SpooledUpload:
+    """Baixar documento do projeto usado como entrada da verificação"""
+    document_id = (source or {}).get("document_id")
+    if not document_id:
+        raise DataValidationError("Documento de entrada não configurado (document_id)")
+
+    async with AsyncSessionLocal() as session:
+        document = await DocumentService.get(session, document_id)
+    if not document or document.status == "uploading" or str(document.project_id) != str(project_id):
+        raise DataValidationError(f"Documento {document_id} não encontrado no projeto")
+
+    return await StorageService.fetch_blob(
+        object_name=document.storage_key,
+        filename=document.filename,
+        content_type=document.content_type,
+        size=document.size_bytes,
+        sha256=document.sha256
+    )
+
+
+def _reference_values(values: List):
+    """Hashes distintos de uma lista fixa de valores válidos"""
+    pd = load_capability("dataframe")["pandas"]
+    return sorted_keys(hash_values(pd.Series(values, dtype=object)))
+
+
+@register_check("data_validation", deterministic=True)
+async def data_validation(config: Dict, context: CheckContext) -> Dict:
+    """Completude, tipos, formatos e consistência de um conjunto de dados
+
+    config: {"source": {"document_id": "..."}, "format": "csv|xlsx|parquet",
+    "sep": ",", "encoding": "utf-8", "sheet": "...", "decimal": ",",
+    "weights": {"completeness": 2}, "columns": {...}} (regras em DataValidator)
+    """
+    project_id = context.gate.get("project_id")
+    columns = config.get("columns") or {}
+    fetched: List[SpooledUpload] = []
+
+    try:
+        dataset = await _fetch_document(config.get("source"), project_id)
+        fetched.append(dataset)
+        data_format = detect_format(dataset.filename, config.get("format"))
+
+        # Chaves de referência carregadas antes: cada coluna guarda só hashes distintos
+        references = {}
+        for name, rule in columns.items():
+            reference = rule.get("references")
+            if not reference:
+                continue
+            if "values" in reference:
+                references[name] = await context.run_blocking(_reference_values, reference["values"])
+                continue
+            reference_set = await _fetch_document(reference.get("source"), project_id)
+            fetched.append(reference_set)
+            references[name] = await context.run_blocking(
+                load_reference_keys,
+                reference_set.path,
+                detect_format(reference_set.filename, reference.get("format")),
+                reference["column"],
+                reference.get("options")
+            )
+            await context.log(f"Referência de '{name}' carregada ({len(references[name])} chaves)")
+
+        validator = DataValidator(columns, references, options=config)
+        await context.log(f"Validando {dataset.filename} ({data_format}, {dataset.size} bytes)")
+        result = await context.run_blocking(validator.validate_file, dataset.path, data_format)
+
+        details = result["details"]
+        for dimension in details["dimensions"].values():
+            await context.log(f"{dimension['label']}: {dimension['score']:.2f}% ({dimension['failed']} falhas)")
+        if details["missing_columns"]:
+            await context.log(f"Colunas ausentes: {', '.join(details['missing_columns'])}", level="WARNING")
+        await context.log(f"{details['rows']} linhas em {details['duration_s']}s ({details['rows_per_second']} linhas/s)")
+
+        return result
+    finally:
+        for spooled in fetched:
+            spooled.cleanup()
+
+
+def _read_json(path: str):
+    with open(path, "rb") as f:
+        return json.load(f)
+
+
+def _performance_test_timeout(config: Dict) -> Optional[float]:
+    """Duração planejada dos estágios mais a margem para terminar as requisições em andamento"""
+    try:
+        stages = build_stages(config)
+    except (ValueError, KeyError, TypeError):
+        # Configuração inválida falha dentro da própria verificação
+        return None
+    return (
+        sum(stage["duration"] for stage in stages)
+        + config.get("http_timeout", settings.QUALITY_GATE_HTTP_TIMEOUT)
+        + config.get("think_time_ms", 0) / 1000
+        + settings.PERFORMANCE_TEST_TIMEOUT_MARGIN
+    )
+
+
+@register_check("performance_test", timeout=_performance_test_timeout)
+async def performance_test(config: Dict, context: CheckContext) -> Dict:
+    """Teste de carga com rampa de usuários virtuais, avaliado por SLOs
+
+    config: {"base_url": "...", "requests": [...] ou "profile": {"document_id": "..."}
+    (HAR ou lista JSON), "users": 20, "ramp_up": 10, "duration": 60 ou
+    "stages": [{"duration": 30, "users": 50}], "think_time_ms": 0,
+    "slo": {"p95_ms": 500, "p99_ms": 1000, "error_rate": 0.01, "min_rps": 50},
+    "stand_in": {"latency_ms": 20, "jitter_ms": 5, "error_rate": 0.0}}
+
+    Com `stand_in` as requisições vão para um serviço simulado em processo,
+    sem rede, para exercitar o gate localmente.
+    """
+    profile = config.get("requests")
+    if not profile and config.get("profile"):
+        document = await _fetch_document(config["profile"], context.gate.get("project_id"))
+        try:
+            recorded = await context.run_blocking(_read_json, document.path)
+        finally:
+            document.cleanup()
+        profile = profile_from_har(recorded) if isinstance(recorded, dict) else recorded
+
+    slo = config.get("slo") or {}
+    if not slo:
+        return {"score": 0, "passed": False, "message": "SLOs não configurados"}
+    stages = build_stages(config)
+    max_users = max(stage["users"] for stage in stages)
+
+    transport, base_url, event_hooks = None, config.get("base_url", ""), {"request": [_check_request]}
+    if config.get("stand_in") is not None:
+        options = {k: v for k, v in config["stand_in"].items() if k in ("latency_ms", "jitter_ms", "error_rate", "seed")}
+        transport, base_url = httpx.ASGITransport(app=stand_in_app(**options)), "http://stand-in"
+        event_hooks = {}
+    else:
+        for spec in profile or []:
+            url = spec.get("url", "")
+            await ensure_target_allowed(base_url + url if url.startswith("/") else url)
+
+    async def progress(snapshot: Dict):
+        await context.log(
+            f"{snapshot['elapsed_s']:.0f}s: {snapshot['users']} usuários, "
+            f"{snapshot['throughput_rps']} req/s, p95 {snapshot['latency_ms']['p95']}ms, "
+            f"erros {snapshot['error_rate']:.2%}"
+        )
+
+    async with httpx.AsyncClient(
+        transport=transport,
+        timeout=config.get("http_timeout", settings.QUALITY_GATE_HTTP_TIMEOUT),
+        verify=config.get("verify_tls", True),
+        headers=config.get("headers") or {},
+        limits=httpx.Limits(max_connections=max_users, max_keepalive_connections=max_users),
+        event_hooks=event_hooks
+    ) as client:
+        test = LoadTest(profile or [], stages, client, base_url=base_url, think_time_ms=config.get("think_time_ms", 0))
+        await context.log(f"Carga de até {max_users} usuários por {test.duration:.0f}s ({len(test.profile)} requisições no perfil)")
+        results = await test.run(on_progress=progress)
+
+    evaluation = slo_score(results, slo)
+    for item in evaluation["slos"]:
+        await context.log(
+            f"SLO {item['slo']}: medido {item['actual']}, alvo {item['target']}",
+            level="INFO" if item["met"] else "WARNING"
+        )
+
+    latency = results["latency_ms"]
+    return {
+        "score": evaluation["score"],
+        "message": (
+            f"{results['requests']} requisições, {results['throughput_rps']} req/s, "
+            f"p95 {latency['p95']}ms, p99 {latency['p99']}ms, erros {results['error_rate']:.2%}"
+        ),
+        "details": {**results, "slos": evaluation["slos"]}
+    }
@@ -0,0 +1,288 @@
+"""
+Motor de execução de quality gates
+
+Cada critério de um gate é uma verificação plugável registrada por nome
+(`register_check`). Todas as verificações de todos os gates enviados rodam
+em paralelo, limitadas por um semáforo compartilhado, com timeout por
+verificação; um gate é interrompido assim que não puder mais ser aprovado.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+from prometheus_client import Histogram
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+QUALITY_CHECK_LATENCY = Histogram(
+    'quality_check_duration_seconds',
+    'Quality gate check duration',
+    ['check', 'status']
+)
+
+# Verificação: recebe a configuração do critério e o contexto, retorna
+# {"score": 0-100, "passed": opcional, "message": opcional, "details": opcional}
+CheckFunction = Callable[[Dict, "CheckContext"], Awaitable[Dict]]
+
+CHECK_REGISTRY: Dict[str, CheckFunction] = {}
+
+# Verificações cujo resultado depende só da configuração e dos documentos de
+# entrada (podem ser reaproveitadas pelo fingerprint das entradas)
+DETERMINISTIC_CHECKS = set()
+
+# Timeout calculado pela configuração do critério, para verificações cuja
+# duração é planejada (ex.: teste de carga); None usa o padrão
+CHECK_TIMEOUTS: Dict[str, Callable[[Dict], Optional[float]]] = {}
+
+# Status finais de critérios e gates
+STATUS_PASSED = "passed"
+STATUS_FAILED = "failed"
+STATUS_ERROR = "error"
+STATUS_CANCELLED = "cancelled"
+
+LogCallback = Callable[[Dict], Awaitable[None]]
+
+
+def register_check(
+    name: str,
+    deterministic: bool = False,
+    timeout: Optional[Callable[[Dict], Optional[float]]] = None
+):
+    """Registrar verificação disponível para os critérios (decorator)"""
+    def decorator(func: CheckFunction) -> CheckFunction:
+        CHECK_REGISTRY[name] = func
+        if deterministic:
+            DETERMINISTIC_CHECKS.add(name)
+        if timeout:
+            CHECK_TIMEOUTS[name] = timeout
+        return func
+    return decorator
+
+
+def _load_builtin_checks():
+    """Importar as verificações embutidas (registram-se ao serem importadas)"""
+    from app.services import quality_checks  # noqa: F401
+
+
+class CheckContext:
+    """Contexto entregue a cada verificação"""
+
+    def __init__(self, gate: Dict, criterion: Dict, on_log: Optional[LogCallback] = None):
+        self.gate = gate
+        self.criterion = criterion
+        self._on_log = on_log
+
+    async def log(self, message: str, level: str = "INFO"):
+        """Registrar linha de log da execução"""
+        if self._on_log:
+            await self._on_log({
+                "timestamp": datetime.utcnow().isoformat(),
+                "level": level,
+                "gate_id": self.gate.get("id"),
+                "criterion": self.criterion.get("name"),
+                "message": message
+            })
+
+    @staticmethod
+    async def run_blocking(func, *args, **kwargs):
+        """Executar trabalho bloqueante (CPU/IO síncrono) fora do event loop"""
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+
+class QualityGateEngine:
+    """Avalia gates executando seus critérios em paralelo"""
+
+    @staticmethod
+    def criteria_for(gate: Dict) -> List[Dict]:
+        """Critérios do gate; sem critérios, o próprio tipo do gate vira a verificação"""
+        criteria = gate.get("criteria") or [{"name": gate.get("name"), "check": gate.get("type")}]
+        return [
+            {**criterion, "check": criterion.get("check") or gate.get("type")}
+            for criterion in criteria
+        ]
+
+    @classmethod
+    def is_deterministic(cls, gate: Dict) -> bool:
+        """Todas as verificações do gate dependem apenas de configuração e documentos"""
+        _load_builtin_checks()
+        return all(criterion["check"] in DETERMINISTIC_CHECKS for criterion in cls.criteria_for(gate))
+
+    @classmethod
+    async def evaluate(
+        cls,
+        gates: List[Dict],
+        on_log: Optional[LogCallback] = None,
+        concurrency: Optional[int] = None
+    ) -> List[Dict]:
+        """Avaliar vários gates de uma vez (o tempo total é o da verificação mais lenta)"""
+        _load_builtin_checks()
+        semaphore = asyncio.Semaphore(concurrency or settings.QUALITY_GATE_CONCURRENCY)
+        return await asyncio.gather(*(cls.evaluate_gate(gate, semaphore, on_log) for gate in gates))
+
+    @classmethod
+    async def evaluate_gate(
+        cls,
+        gate: Dict,
+        semaphore: asyncio.Semaphore,
+        on_log: Optional[LogCallback] = None
+    ) -> Dict:
+        """Avaliar um gate, interrompendo critérios restantes quando a reprovação é certa"""
+        started = time.perf_counter()
+        threshold = float(gate.get("threshold", 0))
+        fail_fast = (gate.get("config") or {}).get("fail_fast", True)
+        criteria = cls.criteria_for(gate)
+
+        tasks = {
+            asyncio.create_task(cls._run_check(gate, criterion, semaphore, on_log)): index
+            for index, criterion in enumerate(criteria)
+        }
+        results: Dict[int, Dict] = {}
+        pending = set(tasks)
+        stop_reason = None
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                results[tasks[task]] = task.result()
+
+            if fail_fast and pending:
+                stop_reason = cls._stop_reason(criteria, results, threshold)
+                if stop_reason:
+                    for task in pending:
+                        task.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+                    for task in pending:
+                        criterion = criteria[tasks[task]]
+                        results[tasks[task]] = cls._result(criterion, STATUS_CANCELLED, 0.0, message=stop_reason)
+                    break
+
+        ordered = [results[index] for index in range(len(criteria))]
+        score = cls._score(criteria, ordered)
+        required_failed = any(
+            criterion.get("required") and result["status"] != STATUS_PASSED
+            for criterion, result in zip(criteria, ordered)
+        )
+        if all(result["status"] == STATUS_ERROR for result in ordered):
+            status = STATUS_ERROR
+        elif score >= threshold and not required_failed:
+            status = STATUS_PASSED
+        else:
+            status = STATUS_FAILED
+
+        duration_ms = round((time.perf_counter() - started) * 1000)
+        logger.info("Quality gate evaluated",
+                   gate_id=gate.get("id"),
+                   status=status,
+                   score=score,
+                   criteria=len(criteria),
+                   duration_ms=duration_ms,
+                   stopped_early=bool(stop_reason))
+
+        return {
+            "gate_id": gate.get("id"),
+            "status": status,
+            "score": score,
+            "threshold": threshold,
+            "results": ordered,
+            "duration_ms": duration_ms,
+            "stopped_early": stop_reason
+        }
+
+    @staticmethod
+    def _stop_reason(criteria: List[Dict], results: Dict[int, Dict], threshold: float) -> Optional[str]:
+        """Motivo para interromper o gate, se a reprovação já estiver garantida"""
+        for index, result in results.items():
+            if criteria[index].get("required") and result["status"] != STATUS_PASSED:
+                return f"Critério obrigatório '{criteria[index].get('name')}' não aprovado"
+
+        # Melhor nota possível: critérios pendentes com 100
+        total_weight = sum(float(c.get("weight", 1)) for c in criteria) or 1.0
+        best = sum(
+            float(c.get("weight", 1)) * (results[i]["score"] if i in results else 100.0)
+            for i, c in enumerate(criteria)
+        ) / total_weight
+        if best < threshold:
+            return f"Nota máxima alcançável ({best:.1f}) abaixo do limite ({threshold:.1f})"
+        return None
+
+    @staticmethod
+    def _score(criteria: List[Dict], results: List[Dict]) -> float:
+        """Média ponderada das notas dos critérios"""
+        total_weight = sum(float(c.get("weight", 1)) for c in criteria) or 1.0
+        weighted = sum(float(c.get("weight", 1)) * r["score"] for c, r in zip(criteria, results))
+        return round(weighted / total_weight, 2)
+
+    @staticmethod
+    def _result(
+        criterion: Dict,
+        status: str,
+        score: float,
+        duration_ms: Optional[int] = None,
+        message: Optional[str] = None,
+        details: Optional[Dict] = None
+    ) -> Dict:
+        return {
+            "name": criterion.get("name"),
+            "check": criterion.get("check"),
+            "status": status,
+            "score": round(score, 2),
+            "duration_ms": duration_ms,
+            "message": message,
+            "details": details or {}
+        }
+
+    @staticmethod
+    def _planned_timeout(criterion: Dict) -> Optional[float]:
+        """Timeout derivado da configuração (duração planejada mais margem), se a verificação define"""
+        planned = CHECK_TIMEOUTS.get(criterion["check"])
+        return planned(criterion.get("config") or {}) if planned else None
+
+    @classmethod
+    async def _run_check(
+        cls,
+        gate: Dict,
+        criterion: Dict,
+        semaphore: asyncio.Semaphore,
+        on_log: Optional[LogCallback]
+    ) -> Dict:
+        """Executar uma verificação com timeout, convertendo falhas em resultado"""
+        check = CHECK_REGISTRY.get(criterion["check"])
+        if check is None:
+            return cls._result(criterion, STATUS_ERROR, 0.0, message=f"Verificação '{criterion['check']}' não suportada")
+
+        context = CheckContext(gate, criterion, on_log)
+        timeout = criterion.get("timeout") or cls._planned_timeout(criterion) or settings.QUALITY_GATE_CHECK_TIMEOUT
+
+        async with semaphore:
+            started = time.perf_counter()
+            await context.log(f"Iniciando verificação '{criterion.get('name')}'")
+            try:
+                outcome = await asyncio.wait_for(check(criterion.get("config") or {}, context), timeout)
+                score = max(0.0, min(100.0, float(outcome.get("score", 0))))
+                minimum = float(criterion.get("threshold", gate.get("threshold", 0)))
+                passed = outcome.get("passed", True) and score >= minimum
+                status = STATUS_PASSED if passed else STATUS_FAILED
+                message, details = outcome.get("message"), outcome.get("details")
+            except asyncio.TimeoutError:
+                status, score, details = STATUS_ERROR, 0.0, None
+                message = f"Tempo limite de {timeout}s excedido"
+            except Exception as e:
+                status, score, details = STATUS_ERROR, 0.0, None
+                message = f"Erro na verificação: {e}"
+
+            duration = time.perf_counter() - started
+
+        QUALITY_CHECK_LATENCY.labels(check=criterion["check"], status=status).observe(duration)
+        await context.log(
+            f"Verificação '{criterion.get('name')}' {status} (nota {score:.1f})" + (f": {message}" if message else ""),
+            level="INFO" if status == STATUS_PASSED else "WARNING"
+        )
+        return cls._result(criterion, status, score, round(duration * 1000), message, details)
+
+
+# Instância global do serviço
+quality_gate_engine = QualityGateEngine()
@@ -0,0 +1,602 @@
+"""
+Serviço de quality gates (cadastro, execução e histórico)
+"""
+
+import hashlib
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import select, update, func, case, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+import structlog
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.document import Document
+from app.models.project import Project
+from app.models.quality_gate import (
+    QualityGate,
+    QualityGateExecution,
+    QualityGateMetrics,
+    QualityGateDailyStats
+)
+from app.services.event_stream import EventStream
+from app.services.job_service import JobService
+from app.services.quality_gate_engine import QualityGateEngine
+
+logger = structlog.get_logger()
+
+# Versão do cálculo de fingerprint: incrementar invalida os resultados reaproveitáveis
+FINGERPRINT_VERSION = 1
+
+# Só resultados conclusivos são reaproveitados (erros sempre executam de novo)
+CACHEABLE_STATUSES = ("passed", "failed")
+
+
+def _parse_uuid(value: str) -> Optional[uuid.UUID]:
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def _document_ids(value) -> Set[str]:
+    """Ids de documentos citados (chaves document_id) em qualquer nível da configuração"""
+    found = set()
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == "document_id" and isinstance(item, str):
+                found.add(item)
+            else:
+                found |= _document_ids(item)
+    elif isinstance(value, list):
+        for item in value:
+            found |= _document_ids(item)
+    return found
+
+
+class QualityGateService:
+    """Quality gates persistidos e execução pelo QualityGateEngine"""
+
+    @staticmethod
+    def to_dict(gate: QualityGate) -> Dict:
+        """Representação pública do quality gate"""
+        return {
+            "id": str(gate.id),
+            "name": gate.name,
+            "project_id": str(gate.project_id),
+            "type": gate.type,
+            "description": gate.description,
+            "threshold": gate.threshold,
+            "criteria": gate.criteria or [],
+            "config": gate.config or {},
+            "status": gate.status,
+            "score": gate.score,
+            "last_execution_id": str(gate.last_execution_id) if gate.last_execution_id else None,
+            "executed_at": gate.executed_at.isoformat() if gate.executed_at else None,
+            "executed_by": str(gate.executed_by) if gate.executed_by else None,
+            "created_by": str(gate.created_by),
+            "created_at": gate.created_at.isoformat() if gate.created_at else None,
+            "updated_at": gate.updated_at.isoformat() if gate.updated_at else None
+        }
+
+    @staticmethod
+    def execution_to_dict(execution: QualityGateExecution) -> Dict:
+        return {
+            "id": str(execution.id),
+            "quality_gate_id": str(execution.quality_gate_id),
+            "job_id": execution.job_id,
+            "status": execution.status,
+            "score": execution.score,
+            "threshold": execution.threshold,
+            "results": execution.results or [],
+            "logs": execution.logs or [],
+            "duration_ms": execution.duration_ms,
+            "input_fingerprint": execution.input_fingerprint,
+            "cached_from": str(execution.cached_from_id) if execution.cached_from_id else None,
+            "executed_by": str(execution.executed_by) if execution.executed_by else None,
+            "executed_at": execution.executed_at.isoformat() if execution.executed_at else None,
+            "finished_at": execution.finished_at.isoformat() if execution.finished_at else None
+        }
+
+    @staticmethod
+    def summary_to_dict(row) -> Dict:
+        """Projeção compacta usada nas listagens"""
+        return {
+            "id": str(row.id),
+            "name": row.name,
+            "project_id": str(row.project_id),
+            "type": row.type,
+            "threshold": row.threshold,
+            "criteria_count": row.criteria_count or 0,
+            "status": row.status,
+            "score": row.score,
+            "last_execution_id": str(row.last_execution_id) if row.last_execution_id else None,
+            "executed_at": row.executed_at.isoformat() if row.executed_at else None,
+            "created_at": row.created_at.isoformat() if row.created_at else None
+        }
+
+    @staticmethod
+    async def list_gates(
+        db: AsyncSession,
+        user_id: str,
+        project_id: Optional[str] = None,
+        status: Optional[str] = None,
+        before: Optional[datetime] = None,
+        before_id: Optional[str] = None,
+        limit: int = 100,
+        with_total: bool = False
+    ) -> Tuple[List, Optional[int]]:
+        """Listar quality gates dos projetos do usuário, mais recentes primeiro (sem critérios e configuração)
+
+        Paginação por (created_at, id); a contagem exata só é feita quando pedida.
+        """
+        filters = [QualityGate.project_id.in_(select(Project.id).where(Project.created_by == user_id))]
+        if project_id:
+            filters.append(QualityGate.project_id == uuid.UUID(project_id))
+        if status:
+            filters.append(QualityGate.status == status)
+
+        total = await db.scalar(select(func.count()).select_from(QualityGate).where(*filters)) if with_total else None
+        if before and before_id:
+            filters.append(tuple_(QualityGate.created_at, QualityGate.id) < tuple_(before, uuid.UUID(before_id)))
+        elif before:
+            filters.append(QualityGate.created_at < before)
+        result = await db.execute(
+            select(
+                QualityGate.id,
+                QualityGate.name,
+                QualityGate.project_id,
+                QualityGate.type,
+                QualityGate.threshold,
+                func.jsonb_array_length(QualityGate.criteria).label("criteria_count"),
+                QualityGate.status,
+                QualityGate.score,
+                QualityGate.last_execution_id,
+                QualityGate.executed_at,
+                QualityGate.created_at
+            )
+            .where(*filters)
+            .order_by(QualityGate.created_at.desc(), QualityGate.id.desc())
+            .limit(limit)
+        )
+        return list(result.all()), total
+
+    @staticmethod
+    async def get(db: AsyncSession, quality_gate_id: str) -> Optional[QualityGate]:
+        """Obter quality gate (None para id inválido ou inexistente)"""
+        key = _parse_uuid(quality_gate_id)
+        return await db.get(QualityGate, key) if key else None
+
+    @staticmethod
+    async def project_gate_ids(db: AsyncSession, project_id: str) -> List[str]:
+        """Ids dos quality gates de um projeto"""
+        result = await db.execute(
+            select(QualityGate.id).where(QualityGate.project_id == uuid.UUID(project_id))
+        )
+        return [str(gate_id) for gate_id in result.scalars().all()]
+
+    @staticmethod
+    async def create(db: AsyncSession, created_by: str, **fields) -> QualityGate:
+        """Criar quality gate"""
+        gate = QualityGate(
+            name=fields["name"],
+            project_id=uuid.UUID(fields["project_id"]),
+            type=fields["type"],
+            threshold=fields.get("threshold", 90.0),
+            description=fields.get("description"),
+            criteria=fields.get("criteria") or [],
+            config=fields.get("config") or {},
+            status="pending",
+            created_by=created_by
+        )
+        db.add(gate)
+        await db.commit()
+        await db.refresh(gate)
+        return gate
+
+    @staticmethod
+    async def update(db: AsyncSession, gate: QualityGate, **fields) -> QualityGate:
+        """Atualizar campos (valores None são ignorados)"""
+        for field, value in fields.items():
+            if value is not None:
+                setattr(gate, field, value)
+        await db.commit()
+        await db.refresh(gate)
+        return gate
+
+    @staticmethod
+    async def delete(db: AsyncSession, gate: QualityGate):
+        """Remover quality gate (execuções saem por ON DELETE CASCADE)"""
+        await db.delete(gate)
+        await db.commit()
+
+    @staticmethod
+    def engine_payload(gate: QualityGate) -> Dict:
+        """Definição do gate entregue ao motor (desacoplada da sessão)"""
+        return {
+            "id": str(gate.id),
+            "name": gate.name,
+            "type": gate.type,
+            "project_id": str(gate.project_id),
+            "threshold": gate.threshold,
+            "criteria": gate.criteria or [],
+            "config": gate.config or {}
+        }
+
+    @staticmethod
+    async def list_executions(
+        db: AsyncSession,
+        gate: QualityGate,
+        before: Optional[datetime] = None,
+        limit: int = 50
+    ) -> List[QualityGateExecution]:
+        """Histórico do gate, mais recentes primeiro (paginação por executed_at)"""
+        query = select(QualityGateExecution).where(QualityGateExecution.quality_gate_id == gate.id)
+        if before:
+            query = query.where(QualityGateExecution.executed_at < before)
+        result = await db.execute(query.order_by(QualityGateExecution.executed_at.desc()).limit(limit))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def _record_rollups(db: AsyncSession, executions: List[QualityGateExecution]):
+        """Somar execuções aos agregados acumulados e diários (upsert, sem reler o histórico)
+
+        Roda na mesma transação que grava as execuções; linhas em ordem de gate
+        para que jobs concorrentes travem os agregados sempre na mesma sequência.
+        """
+        if not executions:
+            return
+        short_alpha = settings.QUALITY_GATE_TREND_SHORT_ALPHA
+        long_alpha = settings.QUALITY_GATE_TREND_LONG_ALPHA
+        ordered = sorted(executions, key=lambda e: str(e.quality_gate_id))
+
+        rows = []
+        daily_rows = []
+        for execution in ordered:
+            score = execution.score or 0.0
+            passed = int(execution.status == "passed")
+            error = int(execution.status == "error")
+            rows.append({
+                "quality_gate_id": execution.quality_gate_id,
+                "total_executions": 1,
+                "passed_executions": passed,
+                "failed_executions": 1 - passed - error,
+                "error_executions": error,
+                "score_sum": score,
+                "score_ewma_short": score,
+                "score_ewma_long": score,
+                "last_status": execution.status,
+                "last_score": execution.score,
+                "last_execution_at": execution.finished_at
+            })
+            daily_rows.append({
+                "quality_gate_id": execution.quality_gate_id,
+                "day": execution.finished_at.astimezone(timezone.utc).date(),
+                "executions": 1,
+                "passed": passed,
+                "failed": 1 - passed - error,
+                "errors": error,
+                "score_sum": score,
+                "duration_ms_sum": execution.duration_ms or 0
+            })
+
+        stmt = insert(QualityGateMetrics).values(rows)
+        new = stmt.excluded
+        is_latest = new.last_execution_at >= func.coalesce(QualityGateMetrics.last_execution_at, new.last_execution_at)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[QualityGateMetrics.quality_gate_id],
+            set_={
+                "total_executions": QualityGateMetrics.total_executions + 1,
+                "passed_executions": QualityGateMetrics.passed_executions + new.passed_executions,
+                "failed_executions": QualityGateMetrics.failed_executions + new.failed_executions,
+                "error_executions": QualityGateMetrics.error_executions + new.error_executions,
+                "score_sum": QualityGateMetrics.score_sum + new.score_sum,
+                "score_ewma_short": QualityGateMetrics.score_ewma_short + short_alpha * (new.score_sum - QualityGateMetrics.score_ewma_short),
+                "score_ewma_long": QualityGateMetrics.score_ewma_long + long_alpha * (new.score_sum - QualityGateMetrics.score_ewma_long),
+                "last_status": case((is_latest, new.last_status), else_=QualityGateMetrics.last_status),
+                "last_score": case((is_latest, new.last_score), else_=QualityGateMetrics.last_score),
+                "last_execution_at": func.greatest(QualityGateMetrics.last_execution_at, new.last_execution_at)
+            }
+        ))
+
+        stmt = insert(QualityGateDailyStats).values(daily_rows)
+        new = stmt.excluded
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[QualityGateDailyStats.quality_gate_id, QualityGateDailyStats.day],
+            set_={
+                "executions": QualityGateDailyStats.executions + 1,
+                "passed": QualityGateDailyStats.passed + new.passed,
+                "failed": QualityGateDailyStats.failed + new.failed,
+                "errors": QualityGateDailyStats.errors + new.errors,
+                "score_sum": QualityGateDailyStats.score_sum + new.score_sum,
+                "duration_ms_sum": QualityGateDailyStats.duration_ms_sum + new.duration_ms_sum
+            }
+        ))
+
+    @staticmethod
+    def _trend(metrics: QualityGateMetrics) -> str:
+        """improving/declining/stable pela diferença entre as médias móveis curta e longa"""
+        if metrics.total_executions < 2:
+            return "insufficient_data"
+        delta = metrics.score_ewma_short - metrics.score_ewma_long
+        if delta > settings.QUALITY_GATE_TREND_TOLERANCE:
+            return "improving"
+        if delta < -settings.QUALITY_GATE_TREND_TOLERANCE:
+            return "declining"
+        return "stable"
+
+    @classmethod
+    async def metrics(cls, db: AsyncSession, gate: QualityGate, days: int = 30) -> Dict:
+        """Métricas do gate: uma linha de agregado e no máximo `days` linhas de série"""
+        metrics = await db.get(QualityGateMetrics, gate.id)
+        since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+        result = await db.execute(
+            select(QualityGateDailyStats)
+            .where(QualityGateDailyStats.quality_gate_id == gate.id, QualityGateDailyStats.day >= since)
+            .order_by(QualityGateDailyStats.day)
+        )
+        series = [
+            {
+                "day": stats.day.isoformat(),
+                "executions": stats.executions,
+                "passed": stats.passed,
+                "failed": stats.failed,
+                "errors": stats.errors,
+                "success_rate": round(100.0 * stats.passed / stats.executions, 2),
+                "average_score": round(stats.score_sum / stats.executions, 2),
+                "average_duration_ms": round(stats.duration_ms_sum / stats.executions)
+            }
+            for stats in result.scalars().all()
+        ]
+
+        if metrics is None or not metrics.total_executions:
+            summary = {
+                "total_executions": 0,
+                "passed_executions": 0,
+                "failed_executions": 0,
+                "error_executions": 0,
+                "success_rate": None,
+                "average_score": None,
+                "last_execution": None,
+                "last_status": None,
+                "last_score": None,
+                "trend": "insufficient_data"
+            }
+        else:
+            total = metrics.total_executions
+            summary = {
+                "total_executions": total,
+                "passed_executions": metrics.passed_executions,
+                "failed_executions": metrics.failed_executions,
+                "error_executions": metrics.error_executions,
+                "success_rate": round(100.0 * metrics.passed_executions / total, 2),
+                "average_score": round(metrics.score_sum / total, 2),
+                "last_execution": metrics.last_execution_at.isoformat() if metrics.last_execution_at else None,
+                "last_status": metrics.last_status,
+                "last_score": metrics.last_score,
+                "trend": cls._trend(metrics)
+            }
+
+        return {"quality_gate_id": str(gate.id), "metrics": summary, "series": series}
+
+    @staticmethod
+    async def _document_hashes(db: AsyncSession, payloads: List[Dict]) -> Dict[str, str]:
+        """Identidade do conteúdo atual de cada documento citado pelos gates"""
+        ids = set()
+        for payload in payloads:
+            ids |= _document_ids(payload["criteria"]) | _document_ids(payload["config"])
+        keys = [key for key in (_parse_uuid(document_id) for document_id in ids) if key]
+        if not keys:
+            return {}
+        result = await db.execute(
+            select(Document.id, Document.sha256, Document.storage_key, Document.version).where(Document.id.in_(keys))
+        )
+        # Uploads diretos não têm sha256: a chave do objeto muda a cada nova versão
+        return {str(row.id): f"{row.sha256 or row.storage_key}:{row.version}" for row in result}
+
+    @staticmethod
+    def fingerprint(payload: Dict, document_hashes: Dict[str, str], artifacts: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """Hash das entradas do gate; None quando o resultado não pode ser reaproveitado
+
+        Entram a definição do gate (tipo, limite, critérios, config), o conteúdo
+        dos documentos citados e os hashes de artefatos informados na execução
+        (restritos a config.inputs, se declarado). Verificações contra serviços
+        externos só são reaproveitadas quando há artefatos que as identifiquem.
+        Documento citado que não existe mais também impede o reaproveitamento.
+        """
+        config = payload["config"] or {}
+        if config.get("cache") is False:
+            return None
+
+        artifacts = artifacts or {}
+        complete = bool(artifacts)
+        if config.get("inputs") is not None:
+            complete = all(name in artifacts for name in config["inputs"])
+            artifacts = {name: artifacts.get(name) for name in config["inputs"]}
+        if not complete and not QualityGateEngine.is_deterministic(payload):
+            return None
+
+        documents = _document_ids(payload["criteria"]) | _document_ids(config)
+        if any(document_id not in document_hashes for document_id in documents):
+            return None
+        canonical = json.dumps(
+            {
+                "version": FINGERPRINT_VERSION,
+                "type": payload["type"],
+                "threshold": payload["threshold"],
+                "criteria": payload["criteria"],
+                "config": config,
+                "documents": {document_id: document_hashes[document_id] for document_id in documents},
+                "artifacts": artifacts
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    @staticmethod
+    async def _cached_executions(db: AsyncSession, fingerprints: Dict[str, str]) -> Dict[str, QualityGateExecution]:
+        """Execução conclusiva mais recente de cada gate com o mesmo fingerprint"""
+        if not fingerprints:
+            return {}
+        query = (
+            select(QualityGateExecution)
+            .distinct(QualityGateExecution.quality_gate_id)
+            .where(
+                tuple_(QualityGateExecution.quality_gate_id, QualityGateExecution.input_fingerprint).in_(
+                    [(uuid.UUID(gate_id), fingerprint) for gate_id, fingerprint in fingerprints.items()]
+                ),
+                QualityGateExecution.status.in_(CACHEABLE_STATUSES)
+            )
+            .order_by(QualityGateExecution.quality_gate_id, QualityGateExecution.executed_at.desc())
+        )
+        if settings.QUALITY_GATE_CACHE_TTL:
+            since = datetime.now(timezone.utc) - timedelta(seconds=settings.QUALITY_GATE_CACHE_TTL)
+            query = query.where(QualityGateExecution.executed_at >= since)
+        result = await db.execute(query)
+        return {str(execution.quality_gate_id): execution for execution in result.scalars().all()}
+
+    @classmethod
+    async def run(
+        cls,
+        job_id: str,
+        gate_ids: List[str],
+        user_id: Optional[str] = None,
+        artifacts: Optional[Dict[str, str]] = None,
+        force: bool = False
+    ) -> Dict:
+        """Executar gates em paralelo, transmitindo logs no stream do job e gravando o resultado
+
+        Gates cujas entradas não mudaram desde a última execução conclusiva
+        reaproveitam aquele resultado; só os invalidados vão para o motor.
+        """
+        keys = [key for key in (_parse_uuid(gate_id) for gate_id in gate_ids) if key]
+        executed_by = _parse_uuid(user_id) if user_id else None
+        started_at = datetime.now(timezone.utc)
+
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(QualityGate).where(QualityGate.id.in_(keys)))
+            payloads = [cls.engine_payload(gate) for gate in result.scalars().all()]
+
+            document_hashes = await cls._document_hashes(session, payloads)
+            fingerprints = {
+                payload["id"]: cls.fingerprint(payload, document_hashes, artifacts)
+                for payload in payloads
+            }
+            cached = {} if force else await cls._cached_executions(
+                session, {gate_id: fp for gate_id, fp in fingerprints.items() if fp}
+            )
+
+            pending = [payload for payload in payloads if payload["id"] not in cached]
+            await session.execute(
+                update(QualityGate)
+                .where(QualityGate.id.in_([uuid.UUID(payload["id"]) for payload in pending]))
+                .values(status="running")
+            )
+            await session.commit()
+
+        logs: Dict[str, List[Dict]] = {payload["id"]: [] for payload in payloads}
+        events_stream = JobService.events_stream(job_id)
+
+        async def on_log(entry: Dict):
+            logs[entry["gate_id"]].append(entry)
+            await EventStream.publish(events_stream, {"type": "log", **entry})
+
+        outcomes = []
+        for gate_id, execution in cached.items():
+            source_id = execution.cached_from_id or execution.id
+            await on_log({
+                "timestamp": datetime.utcnow().isoformat(),
+                "level": "INFO",
+                "gate_id": gate_id,
+                "criterion": None,
+                "message": f"Entradas inalteradas: resultado reaproveitado da execução {source_id}"
+            })
+            outcomes.append({
+                "gate_id": gate_id,
+                "status": execution.status,
+                "score": execution.score,
+                "threshold": execution.threshold,
+                "results": execution.results,
+                "duration_ms": 0,
+                "stopped_early": None,
+                "cached_from": str(source_id)
+            })
+
+        try:
+            outcomes.extend(await QualityGateEngine.evaluate(pending, on_log=on_log))
+        except Exception:
+            async with AsyncSessionLocal() as session:
+                await session.execute(
+                    update(QualityGate)
+                    .where(QualityGate.id.in_([uuid.UUID(payload["id"]) for payload in pending]))
+                    .values(status="error")
+                )
+                await session.commit()
+            raise
+
+        finished_at = datetime.now(timezone.utc)
+        project_by_gate = {payload["id"]: payload["project_id"] for payload in payloads}
+
+        async with AsyncSessionLocal() as session:
+            executions = [
+                QualityGateExecution(
+                    id=uuid.uuid4(),
+                    quality_gate_id=uuid.UUID(outcome["gate_id"]),
+                    project_id=uuid.UUID(project_by_gate[outcome["gate_id"]]),
+                    job_id=job_id,
+                    status=outcome["status"],
+                    score=outcome["score"],
+                    threshold=outcome["threshold"],
+                    results=outcome["results"],
+                    logs=logs[outcome["gate_id"]],
+                    duration_ms=outcome["duration_ms"],
+                    input_fingerprint=fingerprints[outcome["gate_id"]],
+                    cached_from_id=_parse_uuid(outcome["cached_from"]) if outcome.get("cached_from") else None,
+                    executed_by=executed_by,
+                    executed_at=started_at,
+                    finished_at=finished_at
+                )
+                for outcome in outcomes
+            ]
+            session.add_all(executions)
+            for execution in executions:
+                await session.execute(
+                    update(QualityGate)
+                    .where(QualityGate.id == execution.quality_gate_id)
+                    .values(
+                        status=execution.status,
+                        score=execution.score,
+                        last_execution_id=execution.id,
+                        executed_at=finished_at,
+                        executed_by=executed_by
+                    )
+                )
+            # Resultado reaproveitado não é uma nova avaliação: fica fora das tendências
+            await cls._record_rollups(session, [execution for execution in executions if not execution.cached_from_id])
+            await session.commit()
+
+        summary = {
+            "total": len(outcomes),
+            "passed": sum(1 for outcome in outcomes if outcome["status"] == "passed"),
+            "failed": sum(1 for outcome in outcomes if outcome["status"] != "passed"),
+            "cache_hits": len(cached),
+            "duration_ms": round((finished_at - started_at).total_seconds() * 1000)
+        }
+        logger.info("Quality gates executed", job_id=job_id, **summary)
+
+        return {
+            "summary": summary,
+            "executions": [
+                {**outcome, "execution_id": str(execution.id)}
+                for outcome, execution in zip(outcomes, executions)
+            ]
+        }
+
+
+# Instância global do serviço
+quality_gate_service = QualityGateService()
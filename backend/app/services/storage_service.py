@@ -0,0 +1,480 @@
+"""
+Serviço de armazenamento de arquivos do MILAPP
+"""
+
+import io
+import os
+import shutil
+import hashlib
+import asyncio
+import tempfile
+from datetime import timedelta
+from typing import AsyncIterator, BinaryIO, Dict, Optional, Tuple
+from urllib.parse import quote
+import structlog
+from fastapi import UploadFile
+
+from app.core.capabilities import load_capability
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+
+class UploadTooLargeError(Exception):
+    """Arquivo enviado excede UPLOAD_MAX_SIZE"""
+
+
+class RangeNotSatisfiableError(Exception):
+    """Faixa de bytes solicitada está fora do objeto"""
+
+
+def parse_range_header(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Interpretar cabeçalho Range (uma única faixa) como (início, fim inclusivo)
+
+    Retorna None quando o cabeçalho está ausente, malformado ou pede várias
+    faixas: nesses casos o objeto inteiro é devolvido.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            # Sufixo: últimos N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiableError(f"Faixa inválida para objeto de {size} bytes")
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or end < start:
+        raise RangeNotSatisfiableError(f"Faixa inválida para objeto de {size} bytes")
+    return start, min(end, size - 1)
+
+
+class SpooledUpload:
+    """Upload gravado em disco com hash e tamanho calculados durante o streaming"""
+
+    def __init__(
+        self,
+        path: str,
+        filename: Optional[str],
+        content_type: Optional[str],
+        size: int,
+        sha256: str
+    ):
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type or "application/octet-stream"
+        self.size = size
+        self.sha256 = sha256
+        self.object_name: Optional[str] = None
+        self.is_temporary = True
+        self.deduplicated = False
+
+    def open(self) -> BinaryIO:
+        """Abrir handle de leitura do arquivo em disco"""
+        return open(self.path, "rb")
+
+    def read_text(self, max_chars: Optional[int] = None) -> str:
+        """Ler conteúdo como texto, limitado a max_chars"""
+        with open(self.path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read(max_chars) if max_chars else f.read()
+
+    def cleanup(self):
+        """Remover arquivo temporário (blobs persistidos são preservados)"""
+        if not self.is_temporary:
+            return
+        try:
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+        except OSError as e:
+            logger.warning("Failed to remove spooled upload", path=self.path, error=str(e))
+
+    def to_dict(self):
+        """Converter para dicionário"""
+        return {
+            "filename": self.filename,
+            "content_type": self.content_type,
+            "size": self.size,
+            "sha256": self.sha256,
+            "object_name": self.object_name,
+            "deduplicated": self.deduplicated
+        }
+
+
+class StorageService:
+    """Serviço de armazenamento de uploads em disco e MinIO/S3"""
+
+    minio_client = None
+    presign_client = None
+
+    @classmethod
+    async def spool_upload(cls, upload: UploadFile) -> SpooledUpload:
+        """Gravar upload em disco em blocos, calculando SHA-256 e tamanho"""
+        spool_dir = os.path.join(settings.UPLOAD_SPOOL_DIR, "tmp")
+        os.makedirs(spool_dir, exist_ok=True)
+
+        hasher = hashlib.sha256()
+        size = 0
+        fd, path = tempfile.mkstemp(dir=spool_dir, prefix="upload-", suffix=".part")
+
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = await upload.read(settings.UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+
+                    size += len(chunk)
+                    if size > settings.UPLOAD_MAX_SIZE:
+                        raise UploadTooLargeError(
+                            f"Arquivo excede o limite de {settings.UPLOAD_MAX_SIZE} bytes"
+                        )
+
+                    hasher.update(chunk)
+                    await asyncio.to_thread(out.write, chunk)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+
+        spooled = SpooledUpload(
+            path=path,
+            filename=upload.filename,
+            content_type=upload.content_type,
+            size=size,
+            sha256=hasher.hexdigest()
+        )
+
+        logger.info("Upload spooled to disk",
+                   filename=upload.filename,
+                   size=size,
+                   sha256=spooled.sha256)
+
+        return spooled
+
+    @staticmethod
+    def blob_key(sha256: str) -> str:
+        """Chave endereçada por conteúdo de um blob"""
+        return f"blobs/{sha256[:2]}/{sha256}"
+
+    @classmethod
+    async def persist(cls, spooled: SpooledUpload, object_name: Optional[str] = None) -> SpooledUpload:
+        """Persistir upload endereçado por SHA-256 (conteúdo idêntico é gravado uma vez)
+
+        Sem `object_name` o upload vai para o espaço compartilhado `blobs/`, que
+        nunca é apagado; quem precisa remover o objeto depois passa uma chave própria.
+        """
+        object_name = object_name or cls.blob_key(spooled.sha256)
+
+        if settings.UPLOAD_TO_OBJECT_STORAGE:
+            if await cls.object_exists(object_name):
+                spooled.deduplicated = True
+            else:
+                await cls.put_file(spooled.path, object_name, spooled.content_type)
+            spooled.cleanup()
+            spooled.path = None
+        else:
+            target = os.path.join(settings.UPLOAD_SPOOL_DIR, object_name)
+            if os.path.exists(target):
+                spooled.deduplicated = True
+                spooled.cleanup()
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                await asyncio.to_thread(shutil.move, spooled.path, target)
+            spooled.path = target
+            spooled.is_temporary = False
+
+        spooled.object_name = object_name
+
+        logger.info("Upload persisted",
+                   object_name=object_name,
+                   deduplicated=spooled.deduplicated)
+
+        return spooled
+
+    @classmethod
+    async def fetch_blob(
+        cls,
+        object_name: str,
+        filename: Optional[str],
+        content_type: Optional[str],
+        size: int,
+        sha256: str
+    ) -> SpooledUpload:
+        """Obter blob persistido como arquivo local (baixado do bucket se necessário)"""
+        if not settings.UPLOAD_TO_OBJECT_STORAGE:
+            spooled = SpooledUpload(
+                path=os.path.join(settings.UPLOAD_SPOOL_DIR, object_name),
+                filename=filename,
+                content_type=content_type,
+                size=size,
+                sha256=sha256
+            )
+            spooled.is_temporary = False
+        else:
+            spool_dir = os.path.join(settings.UPLOAD_SPOOL_DIR, "tmp")
+            os.makedirs(spool_dir, exist_ok=True)
+            fd, path = tempfile.mkstemp(dir=spool_dir, prefix="blob-", suffix=".part")
+            os.close(fd)
+
+            client = await asyncio.to_thread(cls._get_minio_client)
+            await asyncio.to_thread(client.fget_object, settings.MINIO_BUCKET_NAME, object_name, path)
+
+            spooled = SpooledUpload(
+                path=path,
+                filename=filename,
+                content_type=content_type,
+                size=size,
+                sha256=sha256
+            )
+
+        spooled.object_name = object_name
+        return spooled
+
+    @classmethod
+    async def object_exists(cls, object_name: str) -> bool:
+        """Verificar se o objeto já existe no bucket"""
+        S3Error = load_capability("object_storage")["minio.error"].S3Error
+
+        client = await asyncio.to_thread(cls._get_minio_client)
+        try:
+            await asyncio.to_thread(client.stat_object, settings.MINIO_BUCKET_NAME, object_name)
+            return True
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject"):
+                return False
+            raise
+
+    @classmethod
+    def _get_minio_client(cls):
+        """Obter cliente MinIO (criado sob demanda)"""
+        if cls.minio_client is None:
+            Minio = load_capability("object_storage")["minio"].Minio
+            cls.minio_client = Minio(
+                settings.MINIO_ENDPOINT,
+                access_key=settings.MINIO_ACCESS_KEY,
+                secret_key=settings.MINIO_SECRET_KEY,
+                secure=settings.MINIO_SECURE,
+                region=settings.MINIO_REGION
+            )
+            if not cls.minio_client.bucket_exists(settings.MINIO_BUCKET_NAME):
+                cls.minio_client.make_bucket(settings.MINIO_BUCKET_NAME)
+
+        return cls.minio_client
+
+    @classmethod
+    def _get_presign_client(cls):
+        """Cliente que assina URLs com o endpoint visto pelos navegadores
+
+        Com a região fixada a assinatura é calculada localmente, sem chamadas
+        ao servidor.
+        """
+        if not settings.MINIO_PUBLIC_ENDPOINT:
+            return cls._get_minio_client()
+        if cls.presign_client is None:
+            Minio = load_capability("object_storage")["minio"].Minio
+            cls.presign_client = Minio(
+                settings.MINIO_PUBLIC_ENDPOINT,
+                access_key=settings.MINIO_ACCESS_KEY,
+                secret_key=settings.MINIO_SECRET_KEY,
+                secure=settings.MINIO_SECURE,
+                region=settings.MINIO_REGION
+            )
+        return cls.presign_client
+
+    @staticmethod
+    def supports_presigned_urls() -> bool:
+        """URLs pré-assinadas só existem com armazenamento em bucket"""
+        return settings.UPLOAD_TO_OBJECT_STORAGE
+
+    @classmethod
+    async def presigned_get_url(
+        cls,
+        object_name: str,
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None,
+        expires: Optional[int] = None
+    ) -> str:
+        """URL temporária de download direto do bucket (aceita Range)"""
+        response_headers = {}
+        if filename:
+            response_headers["response-content-disposition"] = (
+                f"attachment; filename*=UTF-8''{quote(filename)}"
+            )
+        if content_type:
+            response_headers["response-content-type"] = content_type
+
+        client = await asyncio.to_thread(cls._get_presign_client)
+        return await asyncio.to_thread(
+            client.presigned_get_object,
+            settings.MINIO_BUCKET_NAME,
+            object_name,
+            expires=timedelta(seconds=expires or settings.STORAGE_PRESIGNED_URL_EXPIRES),
+            response_headers=response_headers or None
+        )
+
+    @classmethod
+    async def presigned_put_url(cls, object_name: str, expires: Optional[int] = None) -> str:
+        """URL temporária para o cliente enviar o arquivo direto ao bucket"""
+        client = await asyncio.to_thread(cls._get_presign_client)
+        return await asyncio.to_thread(
+            client.presigned_put_object,
+            settings.MINIO_BUCKET_NAME,
+            object_name,
+            expires=timedelta(seconds=expires or settings.STORAGE_PRESIGNED_URL_EXPIRES)
+        )
+
+    @classmethod
+    async def stat(cls, object_name: str) -> Optional[Dict]:
+        """Tamanho e metadados de um objeto persistido (None se não existir)"""
+        if not settings.UPLOAD_TO_OBJECT_STORAGE:
+            path = os.path.join(settings.UPLOAD_SPOOL_DIR, object_name)
+            if not os.path.exists(path):
+                return None
+            return {"size": os.path.getsize(path), "etag": None, "content_type": None}
+
+        S3Error = load_capability("object_storage")["minio.error"].S3Error
+        client = await asyncio.to_thread(cls._get_minio_client)
+        try:
+            info = await asyncio.to_thread(client.stat_object, settings.MINIO_BUCKET_NAME, object_name)
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject"):
+                return None
+            raise
+        return {"size": info.size, "etag": info.etag, "content_type": info.content_type}
+
+    @classmethod
+    async def iter_object(
+        cls,
+        object_name: str,
+        start: int = 0,
+        end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Ler objeto (ou a faixa [start, end]) em blocos, sem carregar tudo em memória"""
+        remaining = None if end is None else end - start + 1
+        chunk_size = settings.UPLOAD_CHUNK_SIZE
+
+        if not settings.UPLOAD_TO_OBJECT_STORAGE:
+            with open(os.path.join(settings.UPLOAD_SPOOL_DIR, object_name), "rb") as f:
+                f.seek(start)
+                while remaining is None or remaining > 0:
+                    size = chunk_size if remaining is None else min(chunk_size, remaining)
+                    chunk = await asyncio.to_thread(f.read, size)
+                    if not chunk:
+                        break
+                    if remaining is not None:
+                        remaining -= len(chunk)
+                    yield chunk
+            return
+
+        client = await asyncio.to_thread(cls._get_minio_client)
+        response = await asyncio.to_thread(
+            client.get_object,
+            settings.MINIO_BUCKET_NAME,
+            object_name,
+            offset=start,
+            length=remaining or 0
+        )
+        try:
+            while True:
+                chunk = await asyncio.to_thread(response.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            response.close()
+            response.release_conn()
+
+    @classmethod
+    async def put_bytes(cls, object_name: str, data: bytes, content_type: str = "application/octet-stream"):
+        """Gravar objeto pequeno a partir da memória"""
+        if not settings.UPLOAD_TO_OBJECT_STORAGE:
+            target = os.path.join(settings.UPLOAD_SPOOL_DIR, object_name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+
+            def write():
+                # Grava em arquivo temporário e renomeia: leitores nunca veem objeto parcial
+                partial = f"{target}.{os.getpid()}.part"
+                with open(partial, "wb") as f:
+                    f.write(data)
+                os.replace(partial, target)
+
+            await asyncio.to_thread(write)
+            return
+
+        client = await asyncio.to_thread(cls._get_minio_client)
+        await asyncio.to_thread(
+            client.put_object,
+            settings.MINIO_BUCKET_NAME,
+            object_name,
+            io.BytesIO(data),
+            len(data),
+            content_type=content_type
+        )
+
+    @classmethod
+    async def get_bytes(cls, object_name: str) -> bytes:
+        """Ler objeto pequeno inteiro para a memória"""
+        return b"".join([chunk async for chunk in cls.iter_object(object_name)])
+
+    @classmethod
+    async def delete_object(cls, object_name: str):
+        """Remover objeto persistido"""
+        if not settings.UPLOAD_TO_OBJECT_STORAGE:
+            path = os.path.join(settings.UPLOAD_SPOOL_DIR, object_name)
+            if os.path.exists(path):
+                os.remove(path)
+            return
+
+        client = await asyncio.to_thread(cls._get_minio_client)
+        await asyncio.to_thread(client.remove_object, settings.MINIO_BUCKET_NAME, object_name)
+        logger.info("Object removed from storage", object_name=object_name)
+
+    @classmethod
+    async def put_file(cls, path: str, object_name: str, content_type: str) -> str:
+        """Enviar arquivo do disco para o bucket em partes (multipart)"""
+        client = await asyncio.to_thread(cls._get_minio_client)
+        await asyncio.to_thread(
+            client.fput_object,
+            settings.MINIO_BUCKET_NAME,
+            object_name,
+            path,
+            content_type=content_type,
+            part_size=settings.STORAGE_MULTIPART_PART_SIZE
+        )
+
+        logger.info("File uploaded to object storage",
+                   bucket=settings.MINIO_BUCKET_NAME,
+                   object_name=object_name)
+
+        return object_name
+
+    @staticmethod
+    def extract_pdf_text(path: str, max_chars: Optional[int] = None) -> str:
+        """Extrair texto de PDF página a página, sem carregar o arquivo inteiro"""
+        PdfReader = load_capability("pdf")["PyPDF2"].PdfReader
+        reader = PdfReader(path)
+        parts = []
+        total = 0
+
+        for page in reader.pages:
+            text = page.extract_text() or ""
+            parts.append(text)
+            total += len(text)
+            if max_chars and total >= max_chars:
+                break
+
+        content = "\n".join(parts)
+        return content[:max_chars] if max_chars else content
+
+
+# Instância global do serviço
+storage_service = StorageService()
@@ -0,0 +1,109 @@
+"""
+Execução de deployments em background
+"""
+
+import asyncio
+from typing import Dict, Optional
+import structlog
+
+from app.core.celery_app import celery_app, run_async
+from app.core.config import settings
+from app.services.deployment_service import DeploymentService
+from app.services.job_service import JobService, JobReporter
+
+logger = structlog.get_logger()
+
+DEPLOYMENT_JOB_TYPE = "deployment"
+ARTIFACT_JOB_TYPE = "deployment_artifact"
+
+# Referências das tasks locais (modo sem Celery) para evitar coleta prematura
+_local_tasks = set()
+
+
+async def run_deployment_job(job_id: str, deployment_id: str, user_id: Optional[str] = None, action: str = "deploy") -> Dict:
+    """Executar rollout, pré-carga ou rollback (logs de cada host vão para o log store)"""
+    reporter = JobReporter(job_id)
+
+    try:
+        async with reporter.stage(action, 0.0, 1.0):
+            result = await DeploymentService.run(job_id, deployment_id, user_id, action=action)
+
+        await reporter.complete(result)
+        logger.info("Deployment job completed", job_id=job_id, deployment_id=deployment_id, status=result["status"])
+        return result
+
+    except Exception as e:
+        logger.error("Deployment job failed", job_id=job_id, deployment_id=deployment_id, error=str(e))
+        await reporter.fail(str(e))
+        raise
+
+
+@celery_app.task(name="milapp.run_deployment", bind=True, max_retries=0)
+def run_deployment_task(self, job_id: str, deployment_id: str, user_id: Optional[str] = None, action: str = "deploy"):
+    """Task Celery para rollout, pré-carga ou rollback de deployment"""
+    run_async(run_deployment_job(job_id, deployment_id, user_id, action))
+    return {"job_id": job_id}
+
+
+async def enqueue_deployment_job(deployment_id: str, user_id: str, action: str = "deploy") -> Dict:
+    """Criar job e enfileirar execução (Celery ou task local)"""
+    job = await JobService.create_job(
+        DEPLOYMENT_JOB_TYPE,
+        payload={"deployment_id": deployment_id, "action": action},
+        user_id=user_id
+    )
+
+    if settings.JOBS_USE_CELERY:
+        run_deployment_task.delay(job["id"], deployment_id, str(user_id), action)
+    else:
+        task = asyncio.create_task(run_deployment_job(job["id"], deployment_id, str(user_id), action))
+        _local_tasks.add(task)
+        # Erros já são registrados no job; apenas consumir a exceção
+        task.add_done_callback(lambda t: _local_tasks.discard(t) or t.cancelled() or t.exception())
+
+    return job
+
+
+async def run_artifact_job(job_id: str, file_info: Dict, project_id: str, version: str, user_id: str) -> Dict:
+    """Cortar o pacote enviado em blocos e registrar o artefato"""
+    reporter = JobReporter(job_id)
+
+    try:
+        async with reporter.stage("store", 0.0, 1.0):
+            artifact = await DeploymentService.ingest_artifact(file_info, project_id, version, created_by=user_id)
+
+        result = {"artifact": artifact}
+        await reporter.complete(result)
+        logger.info("Artifact job completed", job_id=job_id, artifact_id=artifact["id"], deduplicated=artifact["deduplicated"])
+        return result
+
+    except Exception as e:
+        logger.error("Artifact job failed", job_id=job_id, project_id=project_id, error=str(e))
+        await reporter.fail(str(e))
+        raise
+
+
+@celery_app.task(name="milapp.store_deployment_artifact", bind=True, max_retries=0)
+def store_artifact_task(self, job_id: str, file_info: Dict, project_id: str, version: str, user_id: str):
+    """Task Celery para registrar artefato no artifact store"""
+    run_async(run_artifact_job(job_id, file_info, project_id, version, user_id))
+    return {"job_id": job_id}
+
+
+async def enqueue_artifact_job(file_info: Dict, project_id: str, version: str, user_id: str) -> Dict:
+    """Criar job e enfileirar o registro do artefato (Celery ou task local)"""
+    job = await JobService.create_job(
+        ARTIFACT_JOB_TYPE,
+        payload={"file": file_info, "project_id": project_id, "version": version},
+        user_id=user_id
+    )
+
+    if settings.JOBS_USE_CELERY:
+        store_artifact_task.delay(job["id"], file_info, project_id, version, str(user_id))
+    else:
+        task = asyncio.create_task(run_artifact_job(job["id"], file_info, project_id, version, str(user_id)))
+        _local_tasks.add(task)
+        # Erros já são registrados no job; apenas consumir a exceção
+        task.add_done_callback(lambda t: _local_tasks.discard(t) or t.cancelled() or t.exception())
+
+    return job
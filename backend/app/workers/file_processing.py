@@ -0,0 +1,110 @@
+"""
+Pipeline de processamento de arquivos multimodais em background
+"""
+
+import asyncio
+from typing import Dict, Optional
+import structlog
+
+from app.core.celery_app import celery_app, run_async
+from app.core.config import settings
+from app.services.ai_service import AIService
+from app.services.embedding_service import EmbeddingService
+from app.services.job_service import JobService, JobReporter
+from app.services.storage_service import StorageService
+
+logger = structlog.get_logger()
+
+UPLOAD_JOB_TYPE = "file_upload"
+
+# Referências das tasks locais (modo sem Celery) para evitar coleta prematura
+_local_tasks = set()
+
+
+async def run_upload_job(job_id: str, file_info: Dict, description: Optional[str] = None) -> Dict:
+    """Executar job de processamento de upload com estágios e progresso"""
+    reporter = JobReporter(job_id)
+    spooled = None
+
+    try:
+        async with reporter.stage("fetch", 0.0, 0.1):
+            spooled = await StorageService.fetch_blob(
+                object_name=file_info["object_name"],
+                filename=file_info["filename"],
+                content_type=file_info["content_type"],
+                size=file_info["size"],
+                sha256=file_info["sha256"]
+            )
+
+        async with reporter.stage("analyze", 0.1, 0.9):
+            ai_response = await AIService.process_file(
+                spooled,
+                description=description,
+                progress=reporter.progress,
+                project_id=file_info.get("project_id"),
+                conversation_id=file_info.get("conversation_id")
+            )
+
+        if "error" in ai_response:
+            raise RuntimeError(ai_response["error"])
+
+        # Indexar o conteúdo para busca semântica; falha aqui não invalida a análise
+        if EmbeddingService.is_available():
+            async with reporter.stage("index", 0.9, 0.98):
+                try:
+                    await EmbeddingService.index_file(
+                        spooled,
+                        ai_response,
+                        project_id=file_info.get("project_id"),
+                        conversation_id=file_info.get("conversation_id")
+                    )
+                except Exception as e:
+                    logger.warning("File indexing failed", job_id=job_id, error=str(e))
+
+        result = {
+            "file": file_info,
+            "ai_analysis": ai_response,
+            "confidence_score": ai_response.get("confidence_score", 0.0)
+        }
+        await reporter.complete(result)
+
+        logger.info("Upload job completed",
+                   job_id=job_id,
+                   filename=file_info["filename"],
+                   stages=reporter.stages)
+
+        return result
+
+    except Exception as e:
+        logger.error("Upload job failed", job_id=job_id, error=str(e))
+        await reporter.fail(str(e))
+        raise
+    finally:
+        if spooled:
+            spooled.cleanup()
+
+
+@celery_app.task(name="milapp.process_upload", bind=True, max_retries=0)
+def process_upload_task(self, job_id: str, file_info: Dict, description: Optional[str] = None):
+    """Task Celery para processamento de upload"""
+    run_async(run_upload_job(job_id, file_info, description))
+    return {"job_id": job_id}
+
+
+async def enqueue_upload_job(file_info: Dict, description: Optional[str], user_id: str) -> Dict:
+    """Criar job e enfileirar processamento (Celery ou task local)"""
+    job = await JobService.create_job(
+        UPLOAD_JOB_TYPE,
+        payload={"file": file_info, "description": description},
+        user_id=user_id
+    )
+
+    if settings.JOBS_USE_CELERY:
+        process_upload_task.delay(job["id"], file_info, description)
+    else:
+        task = asyncio.create_task(run_upload_job(job["id"], file_info, description))
+        _local_tasks.add(task)
+        # Erros já são registrados no job; apenas consumir a exceção
+        task.add_done_callback(lambda t: _local_tasks.discard(t) or t.cancelled() or t.exception())
+
+    return job
@@ -0,0 +1,55 @@
+"""
+Tarefas de manutenção do banco e do armazenamento (periódicas e em background)
+"""
+
+import asyncio
+import structlog
+
+from app.core.celery_app import celery_app, run_async
+from app.core.config import settings
+from app.services.chunk_store import ChunkStore
+from app.services.conversation_service import ConversationService
+from app.services.document_service import DocumentService
+
+logger = structlog.get_logger()
+
+# Referências das tasks locais (modo sem Celery) para evitar coleta prematura
+_local_tasks = set()
+
+
+@celery_app.task(name="milapp.ensure_message_partitions")
+def ensure_message_partitions_task():
+    """Criar com antecedência as partições mensais de mensagens"""
+    partitions = run_async(ConversationService.ensure_partitions())
+    return {"partitions": partitions}
+
+
+@celery_app.task(name="milapp.collect_orphaned_chunks")
+def collect_orphaned_chunks_task():
+    """Apagar blocos sem referências que ficaram para trás (ex.: worker interrompido)"""
+    removed = run_async(ChunkStore.collect_garbage())
+    return {"chunks": removed}
+
+
+@celery_app.task(name="milapp.compact_document_versions")
+def compact_document_versions_task(document_id: str):
+    """Converter em blocos as versões substituídas de um documento"""
+    versions = run_async(DocumentService.compact_versions(document_id))
+    return {"document_id": document_id, "versions": versions}
+
+
+async def _compact_locally(document_id: str):
+    try:
+        await DocumentService.compact_versions(document_id)
+    except Exception as e:
+        logger.error("Document version compaction failed", document_id=document_id, error=str(e))
+
+
+def enqueue_version_compaction(document_id: str):
+    """Enfileirar a conversão das versões antigas do documento (Celery ou task local)"""
+    if settings.JOBS_USE_CELERY:
+        compact_document_versions_task.delay(document_id)
+        return
+    task = asyncio.create_task(_compact_locally(document_id))
+    _local_tasks.add(task)
+    task.add_done_callback(_local_tasks.discard)
@@ -0,0 +1,82 @@
+"""
+Execução de quality gates em background
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+import structlog
+
+from app.core.celery_app import celery_app, run_async
+from app.core.config import settings
+from app.services.job_service import JobService, JobReporter
+from app.services.quality_gate_service import QualityGateService
+
+logger = structlog.get_logger()
+
+QUALITY_GATE_JOB_TYPE = "quality_gate_execution"
+
+# Referências das tasks locais (modo sem Celery) para evitar coleta prematura
+_local_tasks = set()
+
+
+async def run_quality_gate_job(
+    job_id: str,
+    gate_ids: List[str],
+    user_id: Optional[str] = None,
+    artifacts: Optional[Dict[str, str]] = None,
+    force: bool = False
+) -> Dict:
+    """Executar job de quality gates (logs de cada verificação vão para o stream do job)"""
+    reporter = JobReporter(job_id)
+
+    try:
+        async with reporter.stage("evaluate", 0.0, 1.0):
+            result = await QualityGateService.run(job_id, gate_ids, user_id, artifacts=artifacts, force=force)
+
+        await reporter.complete(result)
+        logger.info("Quality gate job completed", job_id=job_id, gates=len(gate_ids), stages=reporter.stages)
+        return result
+
+    except Exception as e:
+        logger.error("Quality gate job failed", job_id=job_id, error=str(e))
+        await reporter.fail(str(e))
+        raise
+
+
+@celery_app.task(name="milapp.execute_quality_gates", bind=True, max_retries=0)
+def execute_quality_gates_task(
+    self,
+    job_id: str,
+    gate_ids: List[str],
+    user_id: Optional[str] = None,
+    artifacts: Optional[Dict[str, str]] = None,
+    force: bool = False
+):
+    """Task Celery para execução de quality gates"""
+    run_async(run_quality_gate_job(job_id, gate_ids, user_id, artifacts, force))
+    return {"job_id": job_id}
+
+
+async def enqueue_quality_gate_job(
+    gate_ids: List[str],
+    user_id: str,
+    project_id: Optional[str] = None,
+    artifacts: Optional[Dict[str, str]] = None,
+    force: bool = False
+) -> Dict:
+    """Criar job e enfileirar execução (Celery ou task local)"""
+    job = await JobService.create_job(
+        QUALITY_GATE_JOB_TYPE,
+        payload={"quality_gate_ids": gate_ids, "project_id": project_id, "artifacts": artifacts, "force": force},
+        user_id=user_id
+    )
+
+    if settings.JOBS_USE_CELERY:
+        execute_quality_gates_task.delay(job["id"], gate_ids, str(user_id), artifacts, force)
+    else:
+        task = asyncio.create_task(run_quality_gate_job(job["id"], gate_ids, str(user_id), artifacts, force))
+        _local_tasks.add(task)
+        # Erros já são registrados no job; apenas consumir a exceção
+        task.add_done_callback(lambda t: _local_tasks.discard(t) or t.cancelled() or t.exception())
+
+    return job
@@ -0,0 +1,112 @@
+"""
+Benchmark de importação e inicialização do MILAPP Backend
+
+Executa `python -X importtime` em um processo limpo, soma o tempo de
+importação do módulo da aplicação e verifica que nenhuma dependência pesada
+de IA/mídia é carregada no cold start.
+
+Uso:
+    python scripts/import_benchmark.py [--module app.main] [--max-ms 1500] [--json]
+
+Sai com código 1 se o tempo exceder --max-ms ou se um módulo pesado for
+importado, para uso como métrica acompanhada no CI.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Módulos que só devem ser importados sob demanda (ver app/core/capabilities.py)
+HEAVY_MODULES = (
+    "openai",
+    "anthropic",
+    "tiktoken",
+    "PIL",
+    "pytesseract",
+    "librosa",
+    "soundfile",
+    "PyPDF2",
+    "minio"
+)
+
+
+def run_importtime(module: str) -> List[Dict]:
+    """Importar o módulo com -X importtime e retornar as linhas medidas"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Falha ao importar {module}:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        # Formato: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000
+        })
+    return entries
+
+
+def summarize(entries: List[Dict], top: int) -> Dict:
+    """Tempo total, maiores importações e módulos pesados carregados"""
+    top_level = [e for e in entries if e["depth"] == 0]
+    imported = {e["module"] for e in entries}
+
+    return {
+        "total_ms": round(sum(e["cumulative_ms"] for e in top_level), 1),
+        "modules": len(entries),
+        "top": [
+            {"module": e["module"], "cumulative_ms": round(e["cumulative_ms"], 1)}
+            for e in sorted(top_level, key=lambda e: e["cumulative_ms"], reverse=True)[:top]
+        ],
+        "heavy_modules_loaded": sorted(
+            m for m in HEAVY_MODULES
+            if m in imported or any(name.startswith(f"{m}.") for name in imported)
+        )
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de importação do MILAPP Backend")
+    parser.add_argument("--module", default="app.main", help="Módulo a importar")
+    parser.add_argument("--max-ms", type=float, default=None, help="Tempo máximo aceito em ms")
+    parser.add_argument("--top", type=int, default=15, help="Quantidade de importações listadas")
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    summary = summarize(run_importtime(args.module), args.top)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"Importação de {args.module}: {summary['total_ms']} ms ({summary['modules']} módulos)")
+        for item in summary["top"]:
+            print(f"  {item['cumulative_ms']:>9.1f} ms  {item['module']}")
+        print(f"Módulos pesados carregados: {', '.join(summary['heavy_modules_loaded']) or 'nenhum'}")
+
+    failed = bool(summary["heavy_modules_loaded"])
+    if args.max_ms is not None and summary["total_ms"] > args.max_ms:
+        print(f"Tempo de importação acima do limite de {args.max_ms} ms", file=sys.stderr)
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
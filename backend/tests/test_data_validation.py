@@ -0,0 +1,71 @@
+"""
+Validação de conjuntos de dados em lotes: completude, tipos, formatos,
+unicidade entre lotes e integridade referencial
+"""
+
+import pytest
+
+from app.core.config import settings
+from app.services.data_validation import DataValidationError, DataValidator, load_reference_keys
+
+DATASET = """id,email,idade,uf
+1,ana@example.com,34,SP
+2,bruno@example.com,abc,RJ
+3,,29,MG
+2,carla@example.com,41,XX
+4,davi-at-example.com,150,SP
+"""
+
+COLUMNS = {
+    "id": {"type": "integer", "unique": True},
+    "email": {"pattern": r"[^@\s]+@[^@\s]+", "required": True},
+    "idade": {"type": "integer", "min": 0, "max": 120},
+    "uf": {"references": {"column": "sigla"}},
+    "cpf": {"required": False}
+}
+
+
+@pytest.fixture
+def files(tmp_path):
+    dataset = tmp_path / "clientes.csv"
+    dataset.write_text(DATASET, encoding="utf-8")
+    states = tmp_path / "ufs.csv"
+    states.write_text("sigla\nSP\nRJ\nMG\n", encoding="utf-8")
+    return str(dataset), str(states)
+
+
+def validate(files, chunk_rows):
+    dataset, states = files
+    references = {"uf": load_reference_keys(states, "csv", "sigla")}
+    validator = DataValidator(COLUMNS, references)
+    return validator.validate_file(dataset, "csv", chunk_rows=chunk_rows)
+
+
+@pytest.mark.parametrize("chunk_rows", [2, 100])
+def test_every_dimension_counts_failing_rows(files, chunk_rows):
+    result = validate(files, chunk_rows)
+    columns = result["details"]["columns"]
+
+    assert result["details"]["rows"] == 5
+    # Duplicado em outro lote também é detectado
+    assert columns["id"]["consistency"] == {"checked": 5, "failed": 1, "sample_rows": [4]}
+    assert columns["email"]["completeness"] == {"checked": 5, "failed": 1, "sample_rows": [3]}
+    assert columns["email"]["formats"]["sample_rows"] == [5]
+    assert columns["idade"]["types"] == {"checked": 5, "failed": 1, "sample_rows": [2]}
+    assert columns["idade"]["formats"]["sample_rows"] == [5]
+    assert columns["uf"]["consistency"]["sample_rows"] == [4]
+    # Coluna opcional ausente não reprova o arquivo
+    assert result["details"]["missing_columns"] == ["cpf"]
+    assert "cpf" not in result["details"]["dimensions"]
+
+
+def test_score_does_not_depend_on_chunk_size(files):
+    assert validate(files, 1)["score"] == validate(files, 100)["score"]
+
+
+def test_distinct_keys_are_capped(files, monkeypatch):
+    monkeypatch.setattr(settings, "DATA_VALIDATION_MAX_KEYS", 3)
+    dataset, _ = files
+
+    with pytest.raises(DataValidationError):
+        DataValidator({"id": {"unique": True}}).validate_file(dataset, "csv", chunk_rows=2)
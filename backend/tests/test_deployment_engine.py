@@ -0,0 +1,257 @@
+"""
+Planejamento de estágios, canário, limite de falhas e rollback automático do
+DeploymentEngine com hosts simulados
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.models.deployment import Deployment
+from app.services.deployment_engine import (
+    DEPLOYMENT_COMPLETED,
+    DEPLOYMENT_FAILED,
+    DEPLOYMENT_ROLLED_BACK,
+    SIMULATED_TARGETS,
+    TARGET_DEPLOYED,
+    TARGET_FAILED,
+    TARGET_ROLLED_BACK,
+    TARGET_SKIPPED,
+    DeploymentEngine,
+    HttpTargetDriver,
+    TargetError
+)
+from app.services.deployment_service import DeploymentService
+
+
+@pytest.fixture(autouse=True)
+def simulated_hosts():
+    """Hosts simulados começam vazios em cada teste"""
+    SIMULATED_TARGETS.clear()
+    yield
+    SIMULATED_TARGETS.clear()
+
+
+def hosts(count: int, **options):
+    return [{"id": f"runner-{n:02d}", "driver": "simulated", "version": "1.0.0", **options} for n in range(count)]
+
+
+def deployment(targets, **strategy):
+    return {
+        "id": "dep-1",
+        "version": "2.0.0",
+        "previous_version": "1.0.0",
+        "targets": targets,
+        # Sem novas tentativas de health check: os testes não esperam o intervalo
+        "strategy": {"health_check": {"retries": 0, "interval": 0}, **strategy}
+    }
+
+
+def stage_sizes(plan):
+    return [(stage["name"], len(stage["targets"])) for stage in plan]
+
+
+def test_plan_canary_then_single_batch_by_default():
+    assert stage_sizes(DeploymentEngine.plan(hosts(10), {})) == [("canary", 1), ("batch-1", 9)]
+    # Um único host não tem canário
+    assert stage_sizes(DeploymentEngine.plan(hosts(1), {})) == [("batch-1", 1)]
+
+
+def test_plan_percentages_and_limits():
+    plan = DeploymentEngine.plan(hosts(10), {"canary": "20%", "batch_size": 3})
+    assert stage_sizes(plan) == [("canary", 2), ("batch-1", 3), ("batch-2", 3), ("batch-3", 2)]
+    assert [t["id"] for t in plan[0]["targets"]] == ["runner-00", "runner-01"]
+
+    assert stage_sizes(DeploymentEngine.plan(hosts(3), {"canary": 5})) == [("canary", 3)]
+    assert stage_sizes(DeploymentEngine.plan(hosts(4), {"canary": 0, "batch_size": "50%"})) == [
+        ("batch-1", 2), ("batch-2", 2)
+    ]
+
+
+def test_validate_rejects_duplicate_ids_and_unknown_driver():
+    with pytest.raises(ValueError):
+        DeploymentEngine.validate([])
+    with pytest.raises(ValueError):
+        DeploymentEngine.validate(hosts(1) + hosts(1))
+    with pytest.raises(ValueError):
+        DeploymentEngine.validate([{"id": "a", "driver": "ssh"}])
+    with pytest.raises(ValueError):
+        DeploymentEngine.validate([{"id": "a", "driver": "http"}])
+
+
+async def test_successful_rollout_activates_version_everywhere():
+    result = await DeploymentEngine.deploy(deployment(hosts(5), batch_size=2))
+
+    assert result["status"] == DEPLOYMENT_COMPLETED
+    assert [stage["name"] for stage in result["stages"]] == ["canary", "batch-1", "batch-2"]
+    assert all(state["status"] == TARGET_DEPLOYED for state in result["targets"].values())
+    assert all(state["previous_version"] == "1.0.0" for state in result["targets"].values())
+    assert {host["version"] for host in SIMULATED_TARGETS.values()} == {"2.0.0"}
+
+
+async def test_canary_failure_rolls_back_and_skips_remaining_stages():
+    targets = hosts(4)
+    targets[0]["unhealthy"] = True
+    logs = []
+
+    async def on_log(entry):
+        logs.append(entry)
+
+    result = await DeploymentEngine.deploy(deployment(targets), on_log=on_log)
+
+    assert result["status"] == DEPLOYMENT_ROLLED_BACK
+    assert "canary" in result["error"]
+    assert len(result["stages"]) == 1
+    assert result["targets"]["runner-00"]["status"] == TARGET_ROLLED_BACK
+    assert SIMULATED_TARGETS["runner-00"]["version"] == "1.0.0"
+    for target_id in ("runner-01", "runner-02", "runner-03"):
+        assert result["targets"][target_id]["status"] == TARGET_SKIPPED
+        assert target_id not in SIMULATED_TARGETS
+    assert any(entry["stage"] == "rollback" for entry in logs)
+
+
+async def test_log_write_failure_does_not_abort_the_rollout():
+    targets = hosts(3)
+    targets[1]["fail_deploy"] = True
+
+    async def on_log(entry):
+        raise ConnectionError("banco indisponível")
+
+    result = await DeploymentEngine.deploy(deployment(targets, batch_size=2), on_log=on_log)
+
+    # O rollback automático ainda acontece
+    assert result["status"] == DEPLOYMENT_ROLLED_BACK
+    assert {host["version"] for host in SIMULATED_TARGETS.values()} == {"1.0.0"}
+
+
+async def test_batch_failure_rolls_back_every_touched_host():
+    targets = hosts(7)
+    targets[3]["fail_deploy"] = True
+
+    result = await DeploymentEngine.deploy(deployment(targets, batch_size=3))
+
+    assert result["status"] == DEPLOYMENT_ROLLED_BACK
+    assert [stage["failed"] for stage in result["stages"]] == [0, 1]
+    # Canário e lote 1 voltam; o lote 2 nem começa
+    for target_id in ("runner-00", "runner-01", "runner-02", "runner-03"):
+        assert result["targets"][target_id]["status"] == TARGET_ROLLED_BACK
+        assert SIMULATED_TARGETS[target_id]["version"] == "1.0.0"
+    for target_id in ("runner-04", "runner-05", "runner-06"):
+        assert result["targets"][target_id]["status"] == TARGET_SKIPPED
+
+
+async def test_without_auto_rollback_failed_hosts_are_left_as_they_are():
+    targets = hosts(3)
+    targets[0]["fail_deploy"] = True
+
+    result = await DeploymentEngine.deploy(deployment(targets, auto_rollback=False))
+
+    assert result["status"] == DEPLOYMENT_FAILED
+    assert result["targets"]["runner-00"]["status"] == TARGET_FAILED
+
+
+@pytest.mark.parametrize("ratio, expected", [(0.25, DEPLOYMENT_COMPLETED), (0.2, DEPLOYMENT_ROLLED_BACK)])
+async def test_max_failure_ratio_applies_to_batches(ratio, expected):
+    targets = hosts(5)
+    targets[4]["fail_deploy"] = True
+
+    result = await DeploymentEngine.deploy(deployment(targets, max_failure_ratio=ratio))
+
+    # Canário com 1 host e um lote de 4, com 1 falha (25%)
+    assert result["status"] == expected
+    if expected == DEPLOYMENT_COMPLETED:
+        assert result["targets"]["runner-04"]["status"] == TARGET_FAILED
+        assert sum(state["status"] == TARGET_DEPLOYED for state in result["targets"].values()) == 4
+    else:
+        assert all(state["status"] == TARGET_ROLLED_BACK for state in result["targets"].values())
+
+
+async def test_rollout_time_grows_with_stages_not_hosts():
+    # 40 hosts com 50 ms de publicação cada: em série seriam 2 s
+    result = await DeploymentEngine.deploy(deployment(hosts(40, latency_ms=50), max_parallel=100))
+
+    assert result["status"] == DEPLOYMENT_COMPLETED
+    assert len(result["stages"]) == 2
+    assert result["duration_ms"] < 40 * 50 / 4
+    assert all(stage["duration_ms"] < 40 * 50 / 8 for stage in result["stages"])
+
+
+async def test_manual_rollback_restores_recorded_previous_versions():
+    targets = hosts(3)
+    deployed = await DeploymentEngine.deploy(deployment(targets))
+
+    result = await DeploymentEngine.rollback({**deployment(targets), "result": deployed})
+
+    assert result["status"] == DEPLOYMENT_ROLLED_BACK
+    assert {host["version"] for host in SIMULATED_TARGETS.values()} == {"1.0.0"}
+
+
+def test_stale_claim_after_lease_without_heartbeat(monkeypatch):
+    monkeypatch.setattr(settings, "DEPLOYMENT_CLAIM_LEASE", 300)
+    now = datetime.now(timezone.utc)
+
+    running = Deployment(status="in_progress", started_at=now - timedelta(hours=1), heartbeat_at=now)
+    assert not DeploymentService.is_stale(running)
+
+    running.heartbeat_at = now - timedelta(seconds=301)
+    assert DeploymentService.is_stale(running)
+
+    finished = Deployment(status="completed", started_at=now - timedelta(hours=1))
+    assert not DeploymentService.is_stale(finished)
+
+
+def test_runner_credentials_stay_on_the_server(monkeypatch):
+    monkeypatch.setattr(settings, "DEPLOYMENT_RUNNER_TOKENS", {"runners-prod": "s3cr3t"})
+    monkeypatch.setattr(settings, "DEPLOYMENT_RUNNER_ADDRESSES", {"runners-prod": ["https://runner"]})
+    target = {"id": "runner-01", "driver": "http", "address": "https://runner", "credential": "runners-prod"}
+
+    DeploymentEngine.authorize_targets([target])
+    with pytest.raises(ValueError):
+        DeploymentEngine.authorize_targets([{**target, "token": "s3cr3t"}])
+    with pytest.raises(ValueError):
+        DeploymentEngine.authorize_targets([{**target, "credential": "desconhecida"}])
+
+    # Registros antigos com token gravado não o expõem
+    legacy = Deployment(targets=[{"id": "runner-02", "address": "https://runner", "token": "old"}])
+    assert DeploymentService.to_dict(legacy)["targets"] == [{"id": "runner-02", "address": "https://runner"}]
+
+
+@pytest.mark.parametrize("address", [
+    "https://attacker.example",
+    "https://runner:8443",
+    "http://runner",
+    "https://user@runner",
+    "https://runner.attacker.example",
+    "http://169.254.169.254/latest/meta-data"
+])
+def test_runner_token_is_only_sent_to_registered_addresses(monkeypatch, address):
+    monkeypatch.setattr(settings, "DEPLOYMENT_RUNNER_TOKENS", {"runners-prod": "s3cr3t"})
+    monkeypatch.setattr(settings, "DEPLOYMENT_RUNNER_ADDRESSES", {"runners-prod": ["https://runner"]})
+    target = {"id": "runner-01", "driver": "http", "address": address, "credential": "runners-prod"}
+
+    with pytest.raises(ValueError):
+        DeploymentEngine.authorize_targets([target])
+    # Registros gravados antes da lista de endereços também não recebem o token
+    with pytest.raises(TargetError):
+        HttpTargetDriver._url(target, "/health")
+
+
+def test_runner_address_allow_list_normalizes_default_ports(monkeypatch):
+    monkeypatch.setattr(settings, "DEPLOYMENT_RUNNER_TOKENS", {"runners-prod": "s3cr3t"})
+    monkeypatch.setattr(settings, "DEPLOYMENT_RUNNER_ADDRESSES", {"runners-prod": ["https://Runner:443/"]})
+    target = {"id": "runner-01", "driver": "http", "address": "https://runner/agent", "credential": "runners-prod"}
+
+    DeploymentEngine.authorize_targets([target])
+    assert HttpTargetDriver._url(target, "/health") == "https://runner/agent/health"
+    with pytest.raises(ValueError):
+        DeploymentEngine.authorize_targets([{**target, "health_path": "@attacker.example/health"}])
+
+
+def test_simulated_hosts_only_when_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "DEPLOYMENT_ALLOW_SIMULATED_TARGETS", False)
+    with pytest.raises(ValueError):
+        DeploymentEngine.authorize_targets(hosts(1))
+
+    monkeypatch.setattr(settings, "DEPLOYMENT_ALLOW_SIMULATED_TARGETS", True)
+    DeploymentEngine.authorize_targets(hosts(1))
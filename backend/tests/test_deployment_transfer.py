@@ -0,0 +1,146 @@
+"""
+Transferência por delta dos artefatos do artifact store: só os blocos que o
+host não tem são enviados, e os que ele reporta como ausentes são reenviados
+"""
+
+import hashlib
+
+import pytest
+
+from app.services.deployment_engine import (
+    DEPLOYMENT_COMPLETED,
+    DEPLOYMENT_ROLLED_BACK,
+    DEPLOYMENT_STAGED,
+    SIMULATED_TARGETS,
+    TARGET_DEPLOYED,
+    TARGET_DRIVERS,
+    TARGET_ROLLED_BACK,
+    DeploymentEngine,
+    SimulatedTargetDriver
+)
+
+CHUNKS = {hashlib.sha256(data).hexdigest(): data for data in (b"a" * 100, b"b" * 200, b"c" * 400)}
+A, B, C = CHUNKS
+MANIFEST_V1 = [[A, 100], [B, 200]]
+MANIFEST_V2 = [[A, 100], [B, 200], [C, 400]]
+
+
+class LossyDriver(SimulatedTargetDriver):
+    """Host simulado que descarta os blocos de `drop` ao recebê-los"""
+
+    drop = set()
+
+    async def put_chunk(self, target, sha256, data):
+        if sha256 in self.drop:
+            return
+        await super().put_chunk(target, sha256, data)
+
+
+@pytest.fixture(autouse=True)
+def simulated_hosts(monkeypatch):
+    SIMULATED_TARGETS.clear()
+    monkeypatch.setitem(TARGET_DRIVERS, "lossy", LossyDriver)
+    monkeypatch.setattr(LossyDriver, "drop", set())
+    yield
+    SIMULATED_TARGETS.clear()
+
+
+class Fetcher:
+    """Leitura de blocos contada (o motor deve ler cada bloco uma vez)"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, sha256):
+        self.calls.append(sha256)
+        return CHUNKS[sha256]
+
+
+def host(target_id="runner-00", driver="simulated", chunks=()):
+    target = {"id": target_id, "driver": driver, "version": "1.0.0"}
+    SimulatedTargetDriver._state(target)["chunks"].update(chunks)
+    return target
+
+
+def deployment(targets, target_state=None):
+    return {
+        "id": "dep-1",
+        "version": "2.0.0",
+        "previous_version": "1.0.0",
+        "artifact": {"id": "art", "sha256": "v2", "size": 700, "version": "2.0.0", "manifest": MANIFEST_V2},
+        "targets": targets,
+        "strategy": {"health_check": {"retries": 0, "interval": 0}},
+        "target_state": target_state or {},
+        "base_manifests": {"v1": MANIFEST_V1}
+    }
+
+
+def running_v1(*target_ids):
+    return {target_id: {"version": "1.0.0", "artifact_sha256": "v1"} for target_id in target_ids}
+
+
+async def test_only_chunks_missing_from_the_active_artifact_are_sent():
+    fetch = Fetcher()
+    targets = [host("runner-00", chunks={A, B}), host("runner-01", chunks={A, B})]
+
+    result = await DeploymentEngine.deploy(
+        deployment(targets, running_v1("runner-00", "runner-01")), fetch_chunk=fetch
+    )
+
+    assert result["status"] == DEPLOYMENT_COMPLETED
+    assert result["transfer"] == {"bytes": 800, "full_bytes": 1400, "saved_bytes": 600}
+    assert {state["transferred_bytes"] for state in result["targets"].values()} == {400}
+    assert SIMULATED_TARGETS["runner-00"]["received_bytes"] == 400
+    # Bloco lido uma vez e reaproveitado para os dois hosts
+    assert fetch.calls == [C]
+
+
+async def test_chunks_reported_missing_by_the_host_are_resent():
+    # O manifesto diz que o host tem A e B, mas o cache dele perdeu B
+    targets = [host(chunks={A})]
+
+    result = await DeploymentEngine.deploy(deployment(targets, running_v1("runner-00")), fetch_chunk=Fetcher())
+
+    assert result["status"] == DEPLOYMENT_COMPLETED
+    assert result["targets"]["runner-00"]["status"] == TARGET_DEPLOYED
+    assert result["targets"]["runner-00"]["transferred_bytes"] == 400 + 200
+    assert SIMULATED_TARGETS["runner-00"]["chunks"] == {A, B, C}
+
+
+async def test_host_still_missing_chunks_after_resend_fails_and_rolls_back():
+    LossyDriver.drop = {C}
+    targets = [host(driver="lossy", chunks={A, B}), host("runner-01", chunks={A, B})]
+
+    result = await DeploymentEngine.deploy(
+        deployment(targets, running_v1("runner-00", "runner-01")), fetch_chunk=Fetcher()
+    )
+
+    assert result["status"] == DEPLOYMENT_ROLLED_BACK
+    assert result["targets"]["runner-00"]["status"] == TARGET_ROLLED_BACK
+    assert result["targets"]["runner-00"]["error"] == "blocos ausentes após reenvio"
+    assert SIMULATED_TARGETS["runner-00"]["version"] == "1.0.0"
+
+
+async def test_host_without_known_artifact_receives_every_chunk():
+    result = await DeploymentEngine.deploy(deployment([host()]), fetch_chunk=Fetcher())
+
+    assert result["status"] == DEPLOYMENT_COMPLETED
+    assert result["transfer"]["bytes"] == 700
+    assert result["transfer"]["saved_bytes"] == 0
+
+
+async def test_pre_staged_artifact_is_only_activated_at_rollout():
+    fetch = Fetcher()
+    targets = [host(chunks={A, B})]
+
+    staged = await DeploymentEngine.stage(deployment(targets, running_v1("runner-00")), fetch_chunk=fetch)
+    assert staged["status"] == DEPLOYMENT_STAGED
+    assert staged["transfer"]["bytes"] == 400
+
+    state = {"runner-00": {"version": "1.0.0", "artifact_sha256": "v1", "staged_sha256": "v2"}}
+    result = await DeploymentEngine.deploy(deployment(targets, state), fetch_chunk=fetch)
+
+    assert result["status"] == DEPLOYMENT_COMPLETED
+    assert result["transfer"]["bytes"] == 0
+    assert fetch.calls == [C]
+    assert SIMULATED_TARGETS["runner-00"]["version"] == "2.0.0"
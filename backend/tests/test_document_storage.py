@@ -0,0 +1,166 @@
+"""
+Faixas de bytes (Range), respostas 206/416 e upload direto ao bucket
+"""
+
+import hashlib
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints.documents import _ranged_response
+from app.core.config import settings
+from app.models.document import Document
+from app.services.document_service import DocumentService
+from app.services.storage_service import (
+    RangeNotSatisfiableError,
+    StorageService,
+    parse_range_header
+)
+
+CONTENT = bytes(range(256)) * 4  # 1024 bytes
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=1000-", (1000, 1023)),
+    ("bytes=1000-5000", (1000, 1023)),
+    ("bytes=-100", (924, 1023)),
+    ("bytes=-5000", (0, 1023)),
+    ("bytes=0-9,20-29", None),
+    ("items=0-9", None),
+    ("bytes=a-b", None)
+])
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, len(CONTENT)) == expected
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1024-", 1024),
+    ("bytes=10-5", 1024),
+    ("bytes=-0", 1024),
+    ("bytes=-10", 0)
+])
+def test_parse_range_header_not_satisfiable(header, size):
+    with pytest.raises(RangeNotSatisfiableError):
+        parse_range_header(header, size)
+
+
+async def _body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+def _open_content(start, end):
+    async def body():
+        yield CONTENT[start:end + 1]
+    return body()
+
+
+async def test_ranged_response_partial_content():
+    response = _ranged_response("bytes=-24", len(CONTENT), "application/pdf", "relatório.pdf", _open_content)
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 1000-1023/1024"
+    assert response.headers["content-length"] == "24"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-disposition"] == "attachment; filename*=UTF-8''relat%C3%B3rio.pdf"
+    assert await _body(response) == CONTENT[1000:]
+
+
+async def test_ranged_response_full_content_without_range():
+    response = _ranged_response(None, len(CONTENT), "application/pdf", "a.pdf", _open_content)
+
+    assert response.status_code == 200
+    assert "content-range" not in response.headers
+    assert response.headers["content-length"] == "1024"
+    assert await _body(response) == CONTENT
+
+
+def test_ranged_response_not_satisfiable():
+    with pytest.raises(HTTPException) as error:
+        _ranged_response("bytes=2048-", len(CONTENT), "application/pdf", "a.pdf", _open_content)
+
+    assert error.value.status_code == 416
+    assert error.value.headers == {"Content-Range": "bytes */1024"}
+
+
+class RecordingSession:
+    """Sessão mínima para os métodos do serviço que só gravam o documento"""
+
+    def __init__(self):
+        self.added = []
+        self.commits = 0
+
+    def add(self, instance):
+        self.added.append(instance)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def refresh(self, instance, **kwargs):
+        pass
+
+
+@pytest.fixture
+def s3_bucket(monkeypatch):
+    """Bucket S3 local (moto) no lugar do MinIO"""
+    server_module = pytest.importorskip("moto.server")
+    server = server_module.ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    monkeypatch.setattr(settings, "UPLOAD_TO_OBJECT_STORAGE", True)
+    monkeypatch.setattr(settings, "MINIO_ENDPOINT", f"{host}:{port}")
+    monkeypatch.setattr(settings, "MINIO_PUBLIC_ENDPOINT", None)
+    monkeypatch.setattr(settings, "MINIO_SECURE", False)
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 100)
+    monkeypatch.setattr(StorageService, "minio_client", None)
+    monkeypatch.setattr(StorageService, "presign_client", None)
+    yield
+    server.stop()
+
+
+async def test_presigned_put_then_complete_records_size_and_hash(s3_bucket):
+    db = RecordingSession()
+    document, upload_url = await DocumentService.create_pending_upload(
+        db,
+        name="Contrato",
+        project_id="7f1d2c1e-4a8b-4c55-9a0e-2a6d3b1f9c10",
+        document_type="contract",
+        uploaded_by="3b9c7a52-2f43-4f5e-8d0c-6f1a2b3c4d5e",
+        filename="contrato.pdf",
+        content_type="application/pdf"
+    )
+    assert document.status == "uploading"
+    assert document.storage_key.startswith(f"documents/{document.id}/")
+
+    # Antes do PUT não há o que confirmar
+    assert await DocumentService.complete_upload(db, document) is None
+
+    async with httpx.AsyncClient() as client:
+        response = await client.put(upload_url, content=CONTENT, headers={"Content-Type": "application/pdf"})
+    assert response.status_code == 200
+
+    completed = await DocumentService.complete_upload(db, document)
+
+    assert completed.status == "pending"
+    assert completed.size_bytes == len(CONTENT)
+    assert completed.sha256 == hashlib.sha256(CONTENT).hexdigest()
+    version = db.added[-1]
+    assert version.sha256 == completed.sha256
+    assert version.storage_key == document.storage_key
+
+
+async def test_complete_rejects_object_over_size_limit(s3_bucket, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_SIZE", 512)
+    document = Document(
+        id="0d6f0c8e-3c1b-4f67-9f0e-5a1c2b3d4e5f",
+        storage_key="documents/0d6f0c8e-3c1b-4f67-9f0e-5a1c2b3d4e5f/upload"
+    )
+    await StorageService.put_bytes(document.storage_key, CONTENT)
+
+    with pytest.raises(ValueError):
+        await DocumentService.complete_upload(RecordingSession(), document)
+
+    assert await StorageService.stat(document.storage_key) is None
@@ -0,0 +1,63 @@
+"""
+Incrementos das métricas DORA por transição final de deployment
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from app.services.dora_metrics import DoraMetricsService
+
+NOW = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def timeline(**extra):
+    return {
+        "project_id": "p1",
+        "environment": "production",
+        "created_at": NOW - timedelta(hours=2),
+        "started_at": NOW - timedelta(minutes=10),
+        "deployed_at": None,
+        "finished_at": None,
+        "duration_ms": 600000,
+        **extra
+    }
+
+
+def test_completed_deploy_counts_lead_time():
+    delta = DoraMetricsService.transition(timeline(), "deploy", "completed", NOW)
+
+    assert (delta["deployments"], delta["successful_deployments"], delta["change_failures"]) == (1, 1, 0)
+    assert delta["lead_time_seconds_sum"] == 7200
+    assert delta["incident_started_at"] is None
+
+
+def test_rolled_back_rollout_is_a_change_failure():
+    delta = DoraMetricsService.transition(timeline(), "deploy", "rolled_back", NOW)
+
+    assert (delta["successful_deployments"], delta["change_failures"]) == (0, 1)
+    assert delta["incident_started_at"] == NOW - timedelta(minutes=10)
+    assert delta["last_healthy_at"] == NOW
+
+
+def test_canary_rejection_is_not_a_production_incident():
+    delta = DoraMetricsService.transition(timeline(canary_rejected=True), "deploy", "rolled_back", NOW)
+
+    assert (delta["deployments"], delta["successful_deployments"], delta["change_failures"]) == (1, 0, 0)
+    assert delta["incident_started_at"] is None
+    assert delta["last_healthy_at"] is None
+
+    # Sem rollback automático o canário fica com a versão nova: continua sendo falha
+    failed = DoraMetricsService.transition(timeline(canary_rejected=True), "deploy", "failed", NOW)
+    assert failed["change_failures"] == 1
+
+
+def test_first_manual_rollback_turns_the_change_into_a_failure():
+    deployed_at = NOW - timedelta(hours=1)
+    deployed = timeline(deployed_at=deployed_at, finished_at=deployed_at)
+
+    first = DoraMetricsService.transition(deployed, "rollback", "rolled_back", NOW)
+    assert first["change_failures"] == 1
+    assert first["incident_started_at"] == deployed_at
+
+    again = DoraMetricsService.transition({**deployed, "finished_at": NOW}, "rollback", "rolled_back", NOW)
+    assert again["change_failures"] == 0
+    assert DoraMetricsService.transition(deployed, "stage", "staged", NOW) is None
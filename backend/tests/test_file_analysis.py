@@ -0,0 +1,120 @@
+"""
+Análise de arquivos enviados: uploads idênticos simultâneos compartilham a
+mesma análise, inclusive quando a original é cancelada, e o áudio é
+transcrito no formato original
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.services.ai_service import AIService
+from app.services.cache_service import CacheService
+
+
+@pytest.fixture(autouse=True)
+def local_cache(monkeypatch):
+    monkeypatch.setattr(CacheService, "redis_client", None)
+    monkeypatch.setattr(CacheService, "_local", {})
+    monkeypatch.setattr(AIService, "_inflight_analyses", {})
+
+
+def upload():
+    return SimpleNamespace(content_type="text/plain", sha256="f" * 64)
+
+
+async def test_identical_uploads_share_one_analysis(monkeypatch):
+    calls = []
+
+    async def analyze(*args):
+        calls.append(args[0])
+        await asyncio.sleep(0.05)
+        return {"summary": "ok"}
+
+    monkeypatch.setattr(AIService, "_analyze_file", analyze)
+
+    first, second = await asyncio.gather(AIService.process_file(upload()), AIService.process_file(upload()))
+
+    assert calls == ["text"]
+    assert (first["cache_hit"], second["cache_hit"]) == (False, True)
+    assert (await AIService.process_file(upload()))["cache_hit"] is True
+
+
+async def test_waiter_takes_over_when_original_analysis_is_cancelled(monkeypatch):
+    calls = []
+
+    async def analyze(*args):
+        calls.append(args[0])
+        await asyncio.sleep(0.05)
+        return {"summary": f"análise {len(calls)}"}
+
+    monkeypatch.setattr(AIService, "_analyze_file", analyze)
+
+    original = asyncio.create_task(AIService.process_file(upload()))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(AIService.process_file(upload()))
+    await asyncio.sleep(0.01)
+    original.cancel()
+
+    result = await asyncio.wait_for(waiter, 1)
+
+    assert original.cancelled()
+    assert result == {"summary": "análise 2", "cache_hit": False}
+    assert AIService._inflight_analyses == {}
+
+
+@pytest.fixture
+def audio(tmp_path, monkeypatch):
+    monkeypatch.setattr(AIService, "initialized", True)
+    path = tmp_path / "reuniao.m4a"
+    path.write_bytes(b"\0" * 64)
+    return str(path)
+
+
+async def test_small_audio_is_sent_with_its_own_content_type(monkeypatch, audio):
+    payloads = []
+
+    async def transcribe(file_payload, offset):
+        payloads.append((file_payload[0], file_payload[2]))
+        return {"start": 0.0, "end": 1.0, "text": "olá", "segments": [{"start": 0.0, "end": 1.0, "text": "olá"}]}
+
+    async def analyze(text, context=None):
+        return {"summary": text, "confidence_score": 1.0}
+
+    monkeypatch.setattr(AIService, "_transcribe_segment", transcribe)
+    monkeypatch.setattr(AIService, "process_text_message", analyze)
+
+    await AIService.process_audio(audio, filename="reuniao.m4a", content_type="audio/x-m4a")
+    # Sem content type declarado: inferido pela extensão
+    result = await AIService.process_audio(audio, filename="reuniao.mp3")
+
+    assert payloads == [("reuniao.m4a", "audio/x-m4a"), ("reuniao.mp3", "audio/mpeg")]
+    assert result["transcription"] == "olá"
+
+
+async def test_window_analyses_are_cancelled_when_transcription_fails(monkeypatch, audio):
+    monkeypatch.setattr(settings, "AI_AUDIO_DIRECT_MAX_BYTES", 0)
+    cancelled = []
+
+    async def analyze(text, context=None):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(text)
+            raise
+
+    async def transcribe_in_segments(audio_path, assembler, on_window, progress=None):
+        on_window({"start": 0.0, "end": 30.0, "text": "primeira janela"})
+        await asyncio.sleep(0)
+        raise RuntimeError("provedor indisponível")
+
+    monkeypatch.setattr(AIService, "process_text_message", analyze)
+    monkeypatch.setattr(AIService, "_transcribe_in_segments", transcribe_in_segments)
+
+    result = await AIService.process_audio(audio, filename="reuniao.m4a")
+    await asyncio.sleep(0)
+
+    assert result["error"] == "provedor indisponível"
+    assert cancelled == ["primeira janela"]
@@ -0,0 +1,199 @@
+"""
+Roteamento, fallback e cooldown do LLMGateway com o provedor local
+"""
+
+import pytest
+
+from app.core.config import settings
+from app.services.llm_gateway import (
+    TASK_ANALYSIS,
+    TASK_EMBEDDING,
+    TASK_EXTRACTION,
+    LLMGateway,
+    LLMGatewayError,
+    StubProvider
+)
+
+
+class ScriptedProvider(StubProvider):
+    """Provedor local que responde como outro provedor e pode falhar sob demanda"""
+
+    def __init__(self, name: str, failing=()):
+        self.name = name
+        self.failing = set(failing)
+        self.calls = []
+
+    async def complete(self, model, messages, max_tokens, temperature, tool=None):
+        self.calls.append(model)
+        if model in self.failing:
+            raise RuntimeError(f"{model} indisponível")
+        return await super().complete(model, messages, max_tokens, temperature, tool)
+
+    async def embed(self, model, texts):
+        self.calls.append(model)
+        return await super().embed(model, texts)
+
+
+MESSAGES = [{"role": "user", "content": "Resuma o processo de conciliação"}]
+
+
+@pytest.fixture(autouse=True)
+def gateway_state(monkeypatch):
+    """Estado do gateway isolado por teste"""
+    monkeypatch.setattr(LLMGateway, "_providers", {})
+    monkeypatch.setattr(LLMGateway, "_latency", {})
+    monkeypatch.setattr(LLMGateway, "_unhealthy_until", {})
+    monkeypatch.setattr(LLMGateway, "_stats", {})
+    monkeypatch.setattr(settings, "AI_TASK_ROUTES", {})
+    monkeypatch.setattr(settings, "AI_ROUTING_STRATEGY", "cost")
+    monkeypatch.setattr(settings, "AI_GATEWAY_FAILURE_COOLDOWN", 60)
+
+
+def use_providers(*providers):
+    LLMGateway._providers = {provider.name: provider for provider in providers}
+
+
+async def test_stub_only_gateway_answers_every_task():
+    use_providers(StubProvider())
+
+    response = await LLMGateway.complete(TASK_ANALYSIS, MESSAGES)
+
+    assert response.model == "stub"
+    assert response.provider == "stub"
+    assert response.content.startswith("[stub] Resuma")
+    assert response.cost == 0.0
+
+
+async def test_cost_strategy_prefers_cheapest_suitable_model():
+    openai, anthropic = ScriptedProvider("openai"), ScriptedProvider("anthropic")
+    use_providers(openai, anthropic, StubProvider())
+
+    assert LLMGateway.candidates(TASK_ANALYSIS) == ["claude-2.1", "gpt-4", "stub"]
+
+    response = await LLMGateway.complete(TASK_ANALYSIS, MESSAGES)
+    assert response.model == "claude-2.1"
+    assert anthropic.calls == ["claude-2.1"]
+    assert openai.calls == []
+
+
+async def test_latency_strategy_uses_measured_latency(monkeypatch):
+    monkeypatch.setattr(settings, "AI_ROUTING_STRATEGY", "latency")
+    use_providers(ScriptedProvider("openai"), ScriptedProvider("anthropic"))
+
+    # Sem medições vale o latency_hint do catálogo (empate mantém a ordem da rota)
+    assert LLMGateway.candidates(TASK_ANALYSIS) == ["gpt-4", "claude-2.1"]
+
+    LLMGateway._latency.update({"gpt-4": 12.0, "claude-2.1": 3.0})
+    assert LLMGateway.candidates(TASK_ANALYSIS) == ["claude-2.1", "gpt-4"]
+
+
+async def test_structured_output_prefers_native_tools(monkeypatch):
+    monkeypatch.setattr(settings, "AI_TASK_ROUTES", {TASK_EXTRACTION: ["gpt-4", "claude-instant-1.2"]})
+    use_providers(ScriptedProvider("openai"), ScriptedProvider("anthropic"))
+
+    # claude-instant é mais barato, mas não tem function calling
+    assert LLMGateway.candidates(TASK_EXTRACTION) == ["claude-instant-1.2", "gpt-4"]
+    assert LLMGateway.candidates(TASK_EXTRACTION, require_tools=True) == ["gpt-4", "claude-instant-1.2"]
+
+
+async def test_task_routes_override_defaults(monkeypatch):
+    monkeypatch.setattr(settings, "AI_TASK_ROUTES", {TASK_ANALYSIS: ["gpt-4-1106-preview"]})
+    use_providers(ScriptedProvider("openai"), ScriptedProvider("anthropic"))
+
+    assert LLMGateway.candidates(TASK_ANALYSIS) == ["gpt-4-1106-preview"]
+
+
+async def test_failure_falls_back_to_next_model_and_records_stats():
+    anthropic = ScriptedProvider("anthropic", failing={"claude-2.1"})
+    openai = ScriptedProvider("openai")
+    use_providers(openai, anthropic)
+
+    response = await LLMGateway.complete(TASK_ANALYSIS, MESSAGES)
+
+    assert response.model == "gpt-4"
+    assert anthropic.calls == ["claude-2.1"]
+    assert openai.calls == ["gpt-4"]
+    stats = LLMGateway.stats()
+    assert stats["claude-2.1"]["errors"] == 1
+    assert stats["gpt-4"]["requests"] == 1
+    assert stats["gpt-4"]["errors"] == 0
+
+
+async def test_stub_is_last_resort_when_all_remote_models_fail():
+    use_providers(
+        ScriptedProvider("openai", failing={"gpt-4"}),
+        ScriptedProvider("anthropic", failing={"claude-2.1"}),
+        StubProvider()
+    )
+
+    response = await LLMGateway.complete(TASK_ANALYSIS, MESSAGES)
+
+    assert response.model == "stub"
+
+
+async def test_all_models_failing_raises_gateway_error():
+    use_providers(
+        ScriptedProvider("openai", failing={"gpt-4"}),
+        ScriptedProvider("anthropic", failing={"claude-2.1"})
+    )
+
+    with pytest.raises(LLMGatewayError) as error:
+        await LLMGateway.complete(TASK_ANALYSIS, MESSAGES)
+
+    assert "gpt-4" in str(error.value)
+    assert "claude-2.1" in str(error.value)
+
+
+async def test_no_provider_for_task_raises_gateway_error():
+    with pytest.raises(LLMGatewayError):
+        await LLMGateway.complete(TASK_ANALYSIS, MESSAGES)
+    assert not LLMGateway.is_available(TASK_ANALYSIS)
+
+
+async def test_failed_model_cools_down_until_it_succeeds_again(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("app.services.llm_gateway.time.monotonic", lambda: clock[0])
+    anthropic = ScriptedProvider("anthropic", failing={"claude-2.1"})
+    use_providers(ScriptedProvider("openai"), anthropic)
+
+    await LLMGateway.complete(TASK_ANALYSIS, MESSAGES)
+
+    # Durante o cooldown o modelo que falhou vai para o fim da fila
+    assert LLMGateway.candidates(TASK_ANALYSIS) == ["gpt-4", "claude-2.1"]
+    await LLMGateway.complete(TASK_ANALYSIS, MESSAGES)
+    assert anthropic.calls == ["claude-2.1"]
+
+    # Passado o cooldown ele volta à posição pela estratégia
+    clock[0] += settings.AI_GATEWAY_FAILURE_COOLDOWN + 1
+    assert LLMGateway.candidates(TASK_ANALYSIS) == ["claude-2.1", "gpt-4"]
+
+    anthropic.failing.clear()
+    response = await LLMGateway.complete(TASK_ANALYSIS, MESSAGES)
+    assert response.model == "claude-2.1"
+    assert "claude-2.1" not in LLMGateway._unhealthy_until
+
+
+async def test_embeddings_never_mix_stub_vectors_with_remote_model():
+    openai = ScriptedProvider("openai")
+    use_providers(openai, StubProvider())
+
+    assert LLMGateway.candidates(TASK_EMBEDDING) == [settings.EMBEDDING_MODEL]
+
+    use_providers(StubProvider())
+    response = await LLMGateway.embed(["conciliação bancária", "conciliação contábil"])
+    assert response.model == "stub"
+    assert len(response.embeddings) == 2
+    assert len(response.embeddings[0]) == settings.EMBEDDING_DIMENSIONS
+
+
+async def test_latency_ewma_weights_latest_measurement(monkeypatch):
+    use_providers(StubProvider())
+    LLMGateway._latency["stub"] = 10.0
+    ticks = iter([0.0, 2.0])
+    monkeypatch.setattr("app.services.llm_gateway.time.perf_counter", lambda: next(ticks))
+
+    await LLMGateway.complete(TASK_ANALYSIS, MESSAGES)
+
+    # 10 + 0.2 * (2 - 10)
+    assert LLMGateway._latency["stub"] == pytest.approx(8.4)
+    assert LLMGateway.stats()["stub"]["requests"] == 1
@@ -0,0 +1,176 @@
+"""
+Gerador de carga do performance_test: histograma, estágios, SLOs e execução
+contra o serviço substituto em processo
+"""
+
+import asyncio
+import math
+import random
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.load_testing import (
+    PERCENTILES,
+    LatencyHistogram,
+    LoadTest,
+    build_stages,
+    slo_score,
+    stand_in_app
+)
+from app.services.quality_checks import _performance_test_timeout
+from app.services.quality_gate_engine import (
+    CHECK_REGISTRY,
+    CHECK_TIMEOUTS,
+    STATUS_ERROR,
+    QualityGateEngine
+)
+
+
+def test_histogram_percentiles_within_relative_error_bound():
+    rng = random.Random(42)
+    # Latências de 1 µs a ~100 s, espalhadas em todas as magnitudes
+    values = [int(math.exp(rng.uniform(0, math.log(100_000_000)))) for _ in range(20_000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+
+    ordered = sorted(values)
+    bound = 1 / (1 << (histogram.bits - 1))
+    for p, measured in histogram.percentiles().items():
+        exact = ordered[math.ceil(p * len(ordered) / 100) - 1]
+        assert exact <= measured <= exact * (1 + bound)
+
+    assert histogram.total == len(values)
+    assert histogram.min == ordered[0]
+    assert histogram.max == ordered[-1]
+
+
+def test_histogram_small_values_are_exact_and_merge_adds_counts():
+    first, second = LatencyHistogram(), LatencyHistogram()
+    for value in range(1, 1001):
+        (first if value % 2 else second).record(value)
+
+    first.merge(second)
+
+    assert first.percentiles((50.0, 99.0, 100.0)) == {50.0: 500, 99.0: 990, 100.0: 1000}
+    assert first.summary_ms()["count"] == 1000
+    assert LatencyHistogram().percentiles() == {p: 0 for p in PERCENTILES}
+
+
+def test_build_stages_ramp_then_steady_state():
+    assert build_stages({"users": 20, "ramp_up": 10, "duration": 60}) == [
+        {"duration": 10.0, "users": 20},
+        {"duration": 60.0, "users": 20}
+    ]
+    # Rampa zero é descartada
+    assert build_stages({"users": 5, "duration": 30}) == [{"duration": 30.0, "users": 5}]
+
+
+def test_build_stages_explicit_and_limits(monkeypatch):
+    monkeypatch.setattr(settings, "PERFORMANCE_TEST_MAX_USERS", 100)
+    monkeypatch.setattr(settings, "PERFORMANCE_TEST_MAX_DURATION", 120)
+
+    assert build_stages({"stages": [{"duration": "30", "users": "50"}, {"duration": 0, "users": 80}]}) == [
+        {"duration": 30.0, "users": 50}
+    ]
+    with pytest.raises(ValueError, match="usuários"):
+        build_stages({"stages": [{"duration": 10, "users": 101}]})
+    with pytest.raises(ValueError, match="Duração"):
+        build_stages({"stages": [{"duration": 60, "users": 10}, {"duration": 61, "users": 10}]})
+    with pytest.raises(ValueError):
+        build_stages({"stages": [{"duration": 0, "users": 10}]})
+
+
+RESULTS = {
+    "throughput_rps": 40.0,
+    "error_rate": 0.02,
+    "latency_ms": {"p50": 80.0, "p95": 200.0, "p99": 400.0, "max": 900.0, "mean": 95.0}
+}
+
+
+def test_slo_score_all_met():
+    evaluation = slo_score(RESULTS, {"p95_ms": 250, "error_rate": 0.05, "min_rps": 30})
+
+    assert evaluation["score"] == 100.0
+    assert all(item["met"] for item in evaluation["slos"])
+
+
+def test_slo_score_weights_violations_by_ratio():
+    evaluation = slo_score(RESULTS, {"p95_ms": 100, "min_rps": 80, "error_rate": 0.05, "unknown": 1})
+
+    scores = {item["slo"]: item["score"] for item in evaluation["slos"]}
+    # p95: 100/200; throughput: 40/80; erro atendido; chave desconhecida ignorada
+    assert scores == {"p95_ms": 50.0, "min_rps": 50.0, "error_rate": 100.0}
+    assert evaluation["score"] == pytest.approx(66.67)
+    assert slo_score(RESULTS, {})["score"] == 0.0
+
+
+def test_users_at_interpolates_within_stage():
+    test = LoadTest([{"url": "/"}], [{"duration": 10, "users": 10}, {"duration": 10, "users": 30}], client=None)
+
+    assert test.users_at(0) == 0
+    assert test.users_at(5) == 5
+    assert test.users_at(15) == 20
+    assert test.users_at(25) == 30
+
+
+async def _run(app, stages, profile):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stand-in") as client:
+        test = LoadTest(profile, stages, client, base_url="http://stand-in")
+        return await test.run(tick=0.01)
+
+
+async def test_load_test_against_stand_in_app():
+    app = stand_in_app(latency_ms=5, jitter_ms=0, seed=1)
+    profile = [{"name": "home", "url": "/"}, {"name": "items", "url": "/items"}]
+
+    results = await _run(app, [{"duration": 0.2, "users": 4}, {"duration": 0.3, "users": 4}], profile)
+
+    assert results["requests"] > 0
+    assert results["failed"] == 0
+    assert results["errors"] == {}
+    assert results["users"] == 4
+    assert set(results["requests_by_name"]) == {"home", "items"}
+    assert results["latency_ms"]["count"] == results["requests"]
+    assert results["latency_ms"]["p50"] >= 5.0
+    assert results["throughput_rps"] > 0
+
+
+async def test_load_test_counts_unexpected_status_as_error():
+    app = stand_in_app(latency_ms=1, jitter_ms=0, error_rate=1.0, seed=1)
+
+    results = await _run(app, [{"duration": 0.2, "users": 2}], [{"url": "/"}])
+
+    assert results["requests"] > 0
+    assert results["failed"] == results["requests"]
+    assert results["errors"] == {"status_500": results["requests"]}
+    assert slo_score(results, {"error_rate": 0.01})["score"] == 1.0
+
+
+def test_performance_test_timeout_follows_planned_duration(monkeypatch):
+    monkeypatch.setattr(settings, "PERFORMANCE_TEST_TIMEOUT_MARGIN", 60.0)
+    monkeypatch.setattr(settings, "QUALITY_GATE_HTTP_TIMEOUT", 10.0)
+
+    assert CHECK_TIMEOUTS["performance_test"] is _performance_test_timeout
+    assert _performance_test_timeout({"users": 10, "ramp_up": 60, "duration": 540}) == 670.0
+    assert _performance_test_timeout({"stages": [{"duration": 0, "users": 1}]}) is None
+    # Teste mais longo que o timeout padrão das verificações ainda cabe no seu limite
+    planned = _performance_test_timeout({"duration": settings.PERFORMANCE_TEST_MAX_DURATION})
+    assert planned > settings.PERFORMANCE_TEST_MAX_DURATION
+
+
+async def test_run_check_uses_planned_timeout(monkeypatch):
+    async def slow_check(config, context):
+        await asyncio.sleep(1)
+        return {"score": 100}
+
+    monkeypatch.setitem(CHECK_REGISTRY, "slow_check", slow_check)
+    monkeypatch.setitem(CHECK_TIMEOUTS, "slow_check", lambda config: config["planned"])
+    criterion = {"name": "lento", "check": "slow_check", "config": {"planned": 0.05}}
+
+    result = await QualityGateEngine._run_check({"id": "gate"}, criterion, asyncio.Semaphore(1), None)
+
+    assert result["status"] == STATUS_ERROR
+    assert "0.05s" in result["message"]
@@ -0,0 +1,65 @@
+"""
+Política de destinos das verificações HTTP (integration_test, security_test
+e performance_test)
+"""
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.quality_checks import TargetNotAllowedError, ensure_target_allowed, security_test
+
+
+@pytest.fixture(autouse=True)
+def host_policy(monkeypatch):
+    monkeypatch.setattr(settings, "QUALITY_GATE_ALLOWED_HOSTS", [])
+    monkeypatch.setattr(settings, "QUALITY_GATE_DENIED_HOSTS", ["minio", "*.internal", "169.254.0.0/16"])
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:9000/",
+    "http://10.0.0.5/health",
+    "http://[::1]/",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://minio:9000/",
+    "http://metadata.internal/",
+    "file:///etc/passwd"
+])
+async def test_internal_targets_are_refused(url):
+    with pytest.raises(TargetNotAllowedError):
+        await ensure_target_allowed(url)
+
+
+async def test_public_address_is_allowed():
+    await ensure_target_allowed("https://8.8.8.8/")
+
+
+async def test_allow_list_restricts_targets_but_deny_list_wins(monkeypatch):
+    monkeypatch.setattr(settings, "QUALITY_GATE_ALLOWED_HOSTS", ["10.0.0.0/8", "minio"])
+
+    # Liberado explicitamente, mesmo em rede interna
+    await ensure_target_allowed("http://10.1.2.3/health")
+    with pytest.raises(TargetNotAllowedError):
+        await ensure_target_allowed("https://8.8.8.8/")
+    with pytest.raises(TargetNotAllowedError):
+        await ensure_target_allowed("http://minio:9000/")
+
+
+async def test_redirect_to_internal_host_is_blocked(monkeypatch):
+    monkeypatch.setattr(settings, "QUALITY_GATE_ALLOWED_HOSTS", ["app.example.com"])
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(302, headers={"Location": "http://169.254.169.254/latest/meta-data/"})
+
+    original = httpx.AsyncClient.__init__
+
+    def with_mock_transport(self, *args, **kwargs):
+        original(self, *args, transport=httpx.MockTransport(handler), **kwargs)
+
+    monkeypatch.setattr(httpx.AsyncClient, "__init__", with_mock_transport)
+
+    with pytest.raises(TargetNotAllowedError):
+        await security_test({"url": "https://app.example.com/"}, context=None)
+    assert requested == ["https://app.example.com/"]
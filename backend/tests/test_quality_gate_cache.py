@@ -0,0 +1,34 @@
+"""
+Fingerprint das entradas dos gates, base do reaproveitamento de resultados
+"""
+
+from app.services.quality_gate_service import QualityGateService
+
+DOCUMENT = "5b7c1c4e-2d0b-4e55-9d0e-3f7a9c2b1a10"
+
+
+def payload(**config):
+    return {
+        "id": "gate-1",
+        "type": "documentation",
+        "threshold": 80,
+        "criteria": [{"name": "cobertura", "check": "external", "config": {"document_id": DOCUMENT}}],
+        "config": config
+    }
+
+
+def test_fingerprint_follows_document_content():
+    artifacts = {"build": "abc"}
+    first = QualityGateService.fingerprint(payload(), {DOCUMENT: "sha-1:1"}, artifacts)
+
+    assert first == QualityGateService.fingerprint(payload(), {DOCUMENT: "sha-1:1"}, artifacts)
+    assert first != QualityGateService.fingerprint(payload(), {DOCUMENT: "sha-2:2"}, artifacts)
+
+
+def test_missing_document_is_never_cached():
+    assert QualityGateService.fingerprint(payload(), {}, {"build": "abc"}) is None
+
+
+def test_cache_disabled_or_unidentified_external_inputs():
+    assert QualityGateService.fingerprint(payload(cache=False), {DOCUMENT: "sha-1:1"}, {"build": "abc"}) is None
+    assert QualityGateService.fingerprint(payload(), {DOCUMENT: "sha-1:1"}) is None
@@ -0,0 +1,133 @@
+"""
+Avaliação dos gates: nota ponderada, critérios obrigatórios e interrupção
+antecipada (fail-fast) quando a reprovação já está garantida
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.quality_gate_engine import (
+    CHECK_REGISTRY,
+    STATUS_CANCELLED,
+    STATUS_ERROR,
+    STATUS_FAILED,
+    STATUS_PASSED,
+    QualityGateEngine
+)
+
+# Verificações em andamento que chegaram a ser canceladas
+CANCELLED = []
+
+
+def fixed(score, delay=0.0):
+    async def check(config, context):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            CANCELLED.append(score)
+            raise
+        return {"score": score}
+    return check
+
+
+async def broken(config, context):
+    raise RuntimeError("serviço indisponível")
+
+
+@pytest.fixture(autouse=True)
+def checks(monkeypatch):
+    CANCELLED.clear()
+    monkeypatch.setitem(CHECK_REGISTRY, "full", fixed(100))
+    monkeypatch.setitem(CHECK_REGISTRY, "partial", fixed(20))
+    monkeypatch.setitem(CHECK_REGISTRY, "zero", fixed(0))
+    monkeypatch.setitem(CHECK_REGISTRY, "slow", fixed(100, delay=5))
+    monkeypatch.setitem(CHECK_REGISTRY, "broken", broken)
+
+
+def gate(criteria, threshold=0, **config):
+    return {"id": "gate-1", "name": "Gate", "threshold": threshold, "criteria": criteria, "config": config}
+
+
+async def evaluate(gate):
+    return await QualityGateEngine.evaluate_gate(gate, asyncio.Semaphore(10))
+
+
+async def test_score_is_weighted_by_criterion():
+    criteria = [
+        {"name": "a", "check": "full", "weight": 3},
+        {"name": "b", "check": "partial", "weight": 1}
+    ]
+
+    passed = await evaluate(gate(criteria, threshold=80, fail_fast=False))
+    failed = await evaluate(gate(criteria, threshold=81, fail_fast=False))
+
+    # (3 * 100 + 1 * 20) / 4
+    assert passed["score"] == failed["score"] == 80.0
+    assert passed["status"] == STATUS_PASSED
+    assert failed["status"] == STATUS_FAILED
+    assert passed["stopped_early"] is None
+
+
+async def test_failed_required_criterion_cancels_pending_checks():
+    criteria = [
+        {"name": "obrigatório", "check": "zero", "required": True, "threshold": 50},
+        {"name": "lento", "check": "slow"}
+    ]
+
+    result = await evaluate(gate(criteria))
+
+    assert result["status"] == STATUS_FAILED
+    assert "obrigatório" in result["stopped_early"]
+    assert [r["status"] for r in result["results"]] == [STATUS_FAILED, STATUS_CANCELLED]
+    assert result["results"][1]["message"] == result["stopped_early"]
+    assert CANCELLED == [100]
+    assert result["duration_ms"] < 5000
+
+
+async def test_unreachable_threshold_stops_early():
+    # Mesmo com 100 no critério lento, a nota máxima seria (3 * 0 + 100) / 4 = 25
+    criteria = [
+        {"name": "rápido", "check": "zero", "weight": 3},
+        {"name": "lento", "check": "slow", "weight": 1}
+    ]
+
+    result = await evaluate(gate(criteria, threshold=50))
+
+    assert result["status"] == STATUS_FAILED
+    assert "25.0" in result["stopped_early"]
+    assert result["results"][1]["status"] == STATUS_CANCELLED
+    assert result["score"] == 0.0
+
+
+async def test_without_fail_fast_every_check_runs(monkeypatch):
+    monkeypatch.setitem(CHECK_REGISTRY, "slow", fixed(100, delay=0.05))
+    criteria = [
+        {"name": "obrigatório", "check": "zero", "required": True, "threshold": 50},
+        {"name": "lento", "check": "slow"}
+    ]
+
+    result = await evaluate(gate(criteria, fail_fast=False))
+
+    assert result["status"] == STATUS_FAILED
+    assert result["stopped_early"] is None
+    assert [r["status"] for r in result["results"]] == [STATUS_FAILED, STATUS_PASSED]
+    assert CANCELLED == []
+
+
+def test_stop_reason_only_when_failure_is_certain():
+    criteria = [{"name": "a", "weight": 1}, {"name": "b", "weight": 1}]
+    partial = {0: {"status": STATUS_FAILED, "score": 20.0}}
+
+    # Pendente com 100: melhor nota possível 60
+    assert QualityGateEngine._stop_reason(criteria, partial, 60) is None
+    assert QualityGateEngine._stop_reason(criteria, partial, 61) is not None
+    assert QualityGateEngine._stop_reason(criteria, {}, 100) is None
+
+
+async def test_only_errors_make_the_gate_error():
+    result = await evaluate(gate([{"name": "a", "check": "broken"}, {"name": "b", "check": "missing"}]))
+
+    assert result["status"] == STATUS_ERROR
+    assert "serviço indisponível" in result["results"][0]["message"]
+    assert "não suportada" in result["results"][1]["message"]
@@ -35,25 +35,34 @@ export interface Environment {
 
 export interface DeploymentsResponse {
   deployments: Deployment[];
-  total: number;
-  skip: number;
+  total: number | null;
   limit: number;
+  next_before: string | null;
+  next_before_id: string | null;
 }
 
-export const useDeployments = (skip = 0, limit = 100, projectId?: string, status?: string, environment?: string) => {
+export const useDeployments = (
+  limit = 100,
+  projectId?: string,
+  status?: string,
+  environment?: string,
+  before?: string,
+  beforeId?: string
+) => {
   const {
     data: deploymentsData,
     isLoading,
     error,
     refetch,
   } = useQuery<DeploymentsResponse>({
-    queryKey: ['deployments', skip, limit, projectId, status, environment],
+    queryKey: ['deployments', limit, projectId, status, environment, before, beforeId],
     queryFn: async () => {
       const params = new URLSearchParams();
       if (projectId) params.append('project_id', projectId);
       if (status) params.append('status', status);
       if (environment) params.append('environment', environment);
-      params.append('skip', skip.toString());
+      if (before) params.append('before', before);
+      if (beforeId) params.append('before_id', beforeId);
       params.append('limit', limit.toString());
       
       const response = await api.get(`/deployments?${params.toString()}`);
@@ -63,7 +72,9 @@ export const useDeployments = (skip = 0, limit = 100, projectId?: string, status
 
   return {
     deployments: deploymentsData?.deployments || [],
-    total: deploymentsData?.total || 0,
+    total: deploymentsData?.total ?? deploymentsData?.deployments.length ?? 0,
+    nextBefore: deploymentsData?.next_before ?? null,
+    nextBeforeId: deploymentsData?.next_before_id ?? null,
     isLoading,
     error,
     refetch,
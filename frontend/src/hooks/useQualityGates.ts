@@ -33,24 +33,32 @@ export interface QualityGateType {
 
 export interface QualityGatesResponse {
   quality_gates: QualityGate[];
-  total: number;
-  skip: number;
+  total: number | null;
   limit: number;
+  next_before: string | null;
+  next_before_id: string | null;
 }
 
-export const useQualityGates = (skip = 0, limit = 100, projectId?: string, status?: string) => {
+export const useQualityGates = (
+  limit = 100,
+  projectId?: string,
+  status?: string,
+  before?: string,
+  beforeId?: string
+) => {
   const {
     data: qualityGatesData,
     isLoading,
     error,
     refetch,
   } = useQuery<QualityGatesResponse>({
-    queryKey: ['quality-gates', skip, limit, projectId, status],
+    queryKey: ['quality-gates', limit, projectId, status, before, beforeId],
     queryFn: async () => {
       const params = new URLSearchParams();
       if (projectId) params.append('project_id', projectId);
       if (status) params.append('status', status);
-      params.append('skip', skip.toString());
+      if (before) params.append('before', before);
+      if (beforeId) params.append('before_id', beforeId);
       params.append('limit', limit.toString());
       
       const response = await api.get(`/quality-gates?${params.toString()}`);
@@ -60,7 +68,9 @@ export const useQualityGates = (skip = 0, limit = 100, projectId?: string, statu
 
   return {
     qualityGates: qualityGatesData?.quality_gates || [],
-    total: qualityGatesData?.total || 0,
+    total: qualityGatesData?.total ?? qualityGatesData?.quality_gates.length ?? 0,
+    nextBefore: qualityGatesData?.next_before ?? null,
+    nextBeforeId: qualityGatesData?.next_before_id ?? null,
     isLoading,
     error,
     refetch,
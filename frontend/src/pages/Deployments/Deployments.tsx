@@ -48,7 +48,7 @@ const Deployments: React.FC = () => {
   const [openCreateDialog, setOpenCreateDialog] = useState(false);
   const [selectedDeployment, setSelectedDeployment] = useState<any>(null);
 
-  const { deployments, isLoading, error } = useDeployments(0, 100);
+  const { deployments, isLoading, error } = useDeployments(100);
   const { environments } = useEnvironments();
   const createDeploymentMutation = useCreateDeployment();
   const executeDeploymentMutation = useExecuteDeployment();
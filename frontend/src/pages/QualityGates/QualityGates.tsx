@@ -46,7 +46,7 @@ const QualityGates: React.FC = () => {
   const [openCreateDialog, setOpenCreateDialog] = useState(false);
   const [selectedQualityGate, setSelectedQualityGate] = useState<any>(null);
 
-  const { qualityGates, isLoading, error } = useQualityGates(0, 100);
+  const { qualityGates, isLoading, error } = useQualityGates(100);
   const { qualityGateTypes } = useQualityGateTypes();
   const createQualityGateMutation = useCreateQualityGate();
   const executeQualityGateMutation = useExecuteQualityGate();